@@ -4,20 +4,66 @@ import sys
 
 path = os.path.realpath(__file__)
 basepath = os.sep.join(path.split(os.sep)[:-1])
-libblond = None
-try:
+
+# Variants of the compiled library built with compile.py --isa, from the
+# most to the least specific instruction set, with the CPU flags they need.
+# The variant can be forced with the environment variable BLOND_ISA
+# (e.g. BLOND_ISA=baseline).
+isa_variants = [
+    ('avx512', ['avx512f', 'avx512cd', 'avx512bw', 'avx512dq', 'avx512vl',
+                'avx2', 'fma']),
+    ('avx2', ['avx2', 'fma']),
+]
+
+
+def cpu_flags():
+    """Instruction set flags of the CPU (empty if unknown)"""
+    try:
+        with open('/proc/cpuinfo') as cpuinfo:
+            for line in cpuinfo:
+                if line.startswith('flags'):
+                    return set(line.split(':', 1)[1].split())
+    except (IOError, OSError):
+        pass
+    return set()
+
+
+def isa_candidates(flags, forced=None):
+    """Variants of the library supported by the CPU flags, in order of
+    preference, ending with the baseline library"""
+    if forced:
+        return [forced]
+    return [isa for isa, required in isa_variants
+            if set(required) <= flags] + ['baseline']
+
+
+def library_path(isa='baseline'):
+    """Path of the compiled library variant"""
     if ('posix' in os.name):
-        libblond = ctypes.CDLL(os.path.join(
-            basepath, 'cpp_routines/libblond.so'))
-    elif ('win' in sys.platform):
-        libblond = ctypes.CDLL(os.path.join(
-            basepath, 'cpp_routines\\libblond.dll'))
+        libname, ext = 'cpp_routines/libblond', '.so'
     else:
-        print('YOU DO NOT HAVE A WINDOWS OR LINUX OPERATING SYSTEM. ABORTING...')
-        sys.exit()
-except OSError as e:
+        libname, ext = 'cpp_routines\\libblond', '.dll'
+    if isa != 'baseline':
+        libname += '_' + isa
+    return os.path.join(basepath, libname + ext)
+
+
+libblond = None
+libblond_isa = None
+if not (('posix' in os.name) or ('win' in sys.platform)):
+    print('YOU DO NOT HAVE A WINDOWS OR LINUX OPERATING SYSTEM. ABORTING...')
+    sys.exit()
+for isa in isa_candidates(cpu_flags(), os.environ.get('BLOND_ISA')):
+    if isa != 'baseline' and not os.path.isfile(library_path(isa)):
+        continue
+    try:
+        libblond = ctypes.CDLL(library_path(isa))
+        libblond_isa = isa
+        break
+    except OSError as e:
+        pass
+if libblond is None:
     print("""
         Warning: The compiled blond library was not found.
-        You can safely ignore this warning if you are in 
+        You can safely ignore this warning if you are in
         the process of compiling the library.""")
-
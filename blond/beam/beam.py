@@ -16,6 +16,7 @@ statistics
 
 from __future__ import division
 from builtins import object
+import copy
 import numpy as np
 import itertools as itl
 from scipy.constants import m_p, m_e, e, c
@@ -77,6 +78,12 @@ class Beam(object):
         total number of macroparticles.
     intensity : float
         total intensity of the beam (in number of charge).
+    n_realisations : int
+        number of independent realisations of the beam (ensemble beam),
+        tracked together; the coordinates are then stored as
+        [n_realisations, n_macroparticles] arrays and n_macroparticles and
+        intensity are those of each realisation; default is None (single
+        beam).
 
     Attributes
     ----------
@@ -114,6 +121,10 @@ class Beam(object):
         number of macro-particles marked as 'lost' [].
     id : numpy_array, int
         unique macro-particle ID number; zero if particle is 'lost'.
+    n_realisations : int
+        number of realisations of an ensemble beam, None for a single beam;
+        the statistics and the numbers of lost and alive macro-particles
+        are then arrays with one value per realisation.
 
     See Also
     ---------
@@ -138,15 +149,21 @@ class Beam(object):
     >>> my_beam = Beam(ring, n_macroparticle, intensity)
     """
 
-    def __init__(self, Ring, n_macroparticles, intensity):
+    def __init__(self, Ring, n_macroparticles, intensity, n_realisations=None):
 
         self.Particle = Ring.Particle
         self.beta = Ring.beta[0][0]
         self.gamma = Ring.gamma[0][0]
         self.energy = Ring.energy[0][0]
         self.momentum = Ring.momentum[0][0]
-        self.dt = np.zeros([int(n_macroparticles)], dtype=bm.precision.real_t)
-        self.dE = np.zeros([int(n_macroparticles)], dtype=bm.precision.real_t)
+        if n_realisations is None:
+            shape = [int(n_macroparticles)]
+        else:
+            shape = [int(n_realisations), int(n_macroparticles)]
+        self.n_realisations = None if n_realisations is None \
+            else int(n_realisations)
+        self.dt = np.zeros(shape, dtype=bm.precision.real_t)
+        self.dE = np.zeros(shape, dtype=bm.precision.real_t)
         self.mean_dt = 0.
         self.mean_dE = 0.
         self.sigma_dt = 0.
@@ -154,7 +171,8 @@ class Beam(object):
         self.intensity = float(intensity)
         self.n_macroparticles = int(n_macroparticles)
         self.ratio = self.intensity/self.n_macroparticles
-        self.id = np.arange(1, self.n_macroparticles + 1, dtype=int)
+        self.id = np.zeros(shape, dtype=int)
+        self.id[...] = np.arange(1, self.n_macroparticles + 1, dtype=int)
         # For MPI
         self.n_total_macroparticles_lost = 0
         self.n_total_macroparticles = n_macroparticles
@@ -162,6 +180,43 @@ class Beam(object):
         self._sumsq_dt = 0.
         self._sumsq_dE = 0.
 
+    @classmethod
+    def from_realisations(cls, beams):
+        '''Ensemble beam made of beams generated separately (e.g. with
+        different seeds), with the same number of macro-particles and
+        intensity; each beam becomes one realisation.
+
+        Parameters
+        ----------
+        beams : list of Beam
+            Realisations of the ensemble.
+
+        Returns
+        -------
+        beam : Beam
+            Ensemble beam, with the synchronous particle of the first beam.
+        '''
+
+        beams = list(beams)
+        if len(beams) == 0 or \
+                any(beam.n_realisations is not None or
+                    beam.n_macroparticles != beams[0].n_macroparticles or
+                    beam.intensity != beams[0].intensity for beam in beams):
+            # EnsembleError
+            raise RuntimeError('ERROR in Beam: the realisations must be ' +
+                               'single beams with the same number of ' +
+                               'macro-particles and intensity')
+
+        ensemble = copy.copy(beams[0])
+        ensemble.n_realisations = len(beams)
+        ensemble.dt = np.array([beam.dt for beam in beams],
+                               dtype=bm.precision.real_t, order='C')
+        ensemble.dE = np.array([beam.dE for beam in beams],
+                               dtype=bm.precision.real_t, order='C')
+        ensemble.id = np.array([beam.id for beam in beams], dtype=int)
+
+        return ensemble
+
     @property
     def n_macroparticles_lost(self):
         '''Number of lost macro-particles, defined as @property.
@@ -173,6 +228,8 @@ class Beam(object):
 
         '''
 
+        if self.n_realisations is not None:
+            return np.count_nonzero(self.id == 0, axis=-1)
         return len(np.where(self.id == 0)[0])
 
     @property
@@ -216,6 +273,10 @@ class Beam(object):
         - sigma_dE
         '''
 
+        if self.n_realisations is not None:
+            self._statistics_realisations()
+            return
+
         # Statistics only for particles that are not flagged as lost
         itemindex = np.where(self.id != 0)[0]
         # itemindex = bm.where(self.id, 0)
@@ -235,6 +296,29 @@ class Beam(object):
         # R.m.s. emittance in Gaussian approximation
         self.epsn_rms_l = np.pi*self.sigma_dE*self.sigma_dt  # in eVs
 
+    def _statistics_realisations(self):
+        # Statistics of each realisation of an ensemble beam, the moments
+        # are computed on the alive particles by hand (no where argument
+        # in the numpy reductions before numpy 1.20)
+        alive = self.id != 0
+        n_alive = np.count_nonzero(alive, axis=-1)
+
+        dt = np.where(alive, self.dt, 0)
+        self.mean_dt = np.sum(dt, axis=-1) / n_alive
+        self.sigma_dt = np.sqrt(np.sum(np.where(
+            alive, self.dt - self.mean_dt[:, np.newaxis], 0)**2, axis=-1)
+            / n_alive)
+        self._sumsq_dt = np.sum(dt**2, axis=-1)
+
+        dE = np.where(alive, self.dE, 0)
+        self.mean_dE = np.sum(dE, axis=-1) / n_alive
+        self.sigma_dE = np.sqrt(np.sum(np.where(
+            alive, self.dE - self.mean_dE[:, np.newaxis], 0)**2, axis=-1)
+            / n_alive)
+        self._sumsq_dE = np.sum(dE**2, axis=-1)
+
+        self.epsn_rms_l = np.pi*self.sigma_dE*self.sigma_dt  # in eVs
+
     def losses_separatrix(self, Ring, RFStation):
         '''Beam losses based on separatrix.
 
@@ -248,11 +332,10 @@ class Beam(object):
             Used to call the function is_in_separatrix.
         '''
 
-        itemindex = np.where(is_in_separatrix(Ring, RFStation, self,
-                                              self.dt, self.dE) == False)[0]
+        lost = is_in_separatrix(Ring, RFStation, self, self.dt,
+                                self.dE) == False
 
-        if itemindex.size != 0:
-            self.id[itemindex] = 0
+        self.id[lost] = 0
 
     def losses_longitudinal_cut(self, dt_min, dt_max):
         '''Beam losses based on longitudinal cuts.
@@ -268,10 +351,7 @@ class Beam(object):
             maximum dt.
         '''
 
-        itemindex = np.where((self.dt - dt_min)*(dt_max - self.dt) < 0)[0]
-
-        if itemindex.size != 0:
-            self.id[itemindex] = 0
+        self.id[(self.dt - dt_min)*(dt_max - self.dt) < 0] = 0
 
     def losses_energy_cut(self, dE_min, dE_max):
         '''Beam losses based on energy cuts, e.g. on collimators.
@@ -286,10 +366,7 @@ class Beam(object):
             maximum dE.
         '''
 
-        itemindex = np.where((self.dE - dE_min)*(dE_max - self.dE) < 0)[0]
-
-        if itemindex.size != 0:
-            self.id[itemindex] = 0
+        self.id[(self.dE - dE_min)*(dE_max - self.dE) < 0] = 0
 
     def losses_below_energy(self, dE_min):
         '''Beam losses based on lower energy cut.
@@ -302,10 +379,7 @@ class Beam(object):
             minimum dE.
         '''
 
-        itemindex = np.where((self.dE - dE_min) < 0)[0]
-
-        if itemindex.size != 0:
-            self.id[itemindex] = 0
+        self.id[(self.dE - dE_min) < 0] = 0
 
     def add_particles(self, new_particles):
         '''
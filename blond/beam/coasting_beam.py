@@ -24,6 +24,7 @@ import numpy.random as rand
 
 #BLonD imports
 import blond.utils.exceptions as blExcept
+from blond.utils.random_generator import RandomGenerator
 
 
 
@@ -34,10 +35,13 @@ import blond.utils.exceptions as blExcept
 #according to dE/E = beta**2 * dP/P energy_offset gives an offset in dE for
 #the two standard distributions if a user_distribution is used it is taken as
 #being in dE
+#seed can be a RandomGenerator, whose dimensions 0 and 1 give dE (gaussian, or
+#bin and position in the bin) and dimension 2 gives dt; otherwise the global
+#numpy generator is used, seeded if seed is given
 def generate_coasting_beam(Beam, t_start, t_stop, spread = 1E-3, 
                            spread_type = 'dp/p', energy_offset = 0, 
                            distribution = 'gaussian' , user_distribution = None,
-                           user_probability = None):
+                           user_probability = None, seed = None):
 
     if spread_type == 'dp/p':
         energy_spread = Beam.energy * Beam.beta**2 * spread
@@ -51,19 +55,41 @@ def generate_coasting_beam(Beam, t_start, t_stop, spread = 1E-3,
         raise blExcept.DistributionError("spread_type " + str(spread_type) + \
                                    " not recognised")
 
+    n_macroparticles = Beam.n_macroparticles
+    if isinstance(seed, RandomGenerator):
+        def normal(loc, scale, size):
+            return loc + scale * seed.normal(size, 0)
+
+        def choice(values, size, p):
+            cumulative = np.cumsum(p, dtype=np.float64)
+            cumulative /= cumulative[-1]
+            return np.asarray(values)[np.searchsorted(
+                cumulative, seed.uniform(size, 0), side='right')]
+
+        def uniform(size, dimension):
+            return seed.uniform(size, dimension)
+    else:
+        if seed is not None:
+            rand.seed(seed)
+        normal = rand.normal
+        choice = rand.choice
+
+        def uniform(size, dimension):
+            return rand.rand(size)
+
 
     if distribution == 'gaussian':
-        Beam.dE = rand.normal(loc = energy_offset, scale = energy_spread, \
-                        size = Beam.n_macroparticles)
+        Beam.dE = normal(loc = energy_offset, scale = energy_spread, \
+                        size = n_macroparticles)
 
 
     elif distribution == 'parabolic':
         energyRange = np.linspace(-energy_spread, energy_spread, 10000)
         probabilityDistribution = 1 - (energyRange/energy_spread)**2
         probabilityDistribution /= np.cumsum(probabilityDistribution)[-1]
-        Beam.dE = rand.choice(energyRange, size = Beam.n_macroparticles, \
+        Beam.dE = choice(energyRange, size = n_macroparticles, \
                         p = probabilityDistribution) \
-                            + (rand.rand(Beam.n_macroparticles) - 0.5) \
+                            + (uniform(n_macroparticles, 1) - 0.5) \
                             * (energyRange[1] - energyRange[0]) \
                             + energy_offset
 
@@ -76,12 +102,12 @@ def generate_coasting_beam(Beam, t_start, t_stop, spread = 1E-3,
                                              'user_distribution' and 
                                              'user_probability' to be defined""")
             
-        Beam.dE = rand.choice(user_distribution, size = Beam.n_macroparticles, \
+        Beam.dE = choice(user_distribution, size = n_macroparticles, \
                               p = user_probability) \
-                              + (rand.rand(Beam.n_macroparticles) - 0.5) \
+                              + (uniform(n_macroparticles, 1) - 0.5) \
                               * (user_distribution[1] - user_distribution[0])
 
     else:
         raise blExcept.DistributionError("distribution type not recognised")
 
-    Beam.dt = rand.rand(Beam.n_macroparticles)*(t_stop - t_start) + t_start
+    Beam.dt = uniform(n_macroparticles, 2)*(t_stop - t_start) + t_start
@@ -26,8 +26,10 @@ import matplotlib.pyplot as plt
 from scipy.integrate import cumtrapz
 from ..trackers.utilities import is_in_separatrix
 from ..beam.profile import Profile, CutOptions
-from ..trackers.utilities import potential_well_cut, minmax_location
+from ..trackers.utilities import potential_well_cut, minmax_location, \
+    action_from_potential_well
 from ..utils import bmath as bm
+from ..utils.random_generator import RandomGenerator
 
 def matched_from_line_density(beam, full_ring_and_RF, line_density_input=None,
                               main_harmonic_option='lowest_freq',
@@ -379,7 +381,7 @@ def matched_from_distribution_function(beam, full_ring_and_RF,
                                bunch_length_fit=None,
                                distribution_variable='Hamiltonian',
                                process_pot_well = True,
-                               turn_number=0):
+                               turn_number=0, n_points_high_res=int(1e5)):
     '''
     *Function to generate a beam by inputing the distribution function (by
     choosing the type of distribution and the emittance).
@@ -401,7 +403,10 @@ def matched_from_distribution_function(beam, full_ring_and_RF,
     The user can also add an input table by setting the parameter
     distribution_type = 'user_input_table',
     distribution_options['user_table_action'] = array of action (in H or in J)
-    and distribution_options['user_table_distribution']*
+    and distribution_options['user_table_distribution'].
+    The action of all the points of the grid is computed in one pass from a
+    single potential well of n_points_high_res points covering the separatrix
+    frame, see trackers.utilities.action_from_potential_well.*
     '''
         
     # Loading the distribution function if provided by the user
@@ -428,6 +433,7 @@ def matched_from_distribution_function(beam, full_ring_and_RF,
                                     main_harmonic_option=main_harmonic_option)
     potential_well = full_ring_and_RF.potential_well 
     time_potential = full_ring_and_RF.potential_well_coordinates
+    total_voltage = full_ring_and_RF.total_voltage
     
     induced_potential = 0
     
@@ -450,7 +456,6 @@ def matched_from_distribution_function(beam, full_ring_and_RF,
         induced_voltage_object = copy.deepcopy(TotalInducedVoltage)
         profile = induced_voltage_object.profile
         
-    dE_trajectory = np.zeros(n_points_potential)
     for i in range(n_iterations):    
         old_potential = copy.deepcopy(total_potential)
         
@@ -492,44 +497,31 @@ def matched_from_distribution_function(beam, full_ring_and_RF,
         potential_well_grid = np.meshgrid(potential_well_low_res,
                                           potential_well_low_res)[0]
         
-        # Computing the action J by integrating the dE trajectories
-        J_array_dE0 = np.zeros(n_points_grid)
-        
-        full_ring_and_RF2 = copy.deepcopy(full_ring_and_RF)
-        for j in range(n_points_grid):
-            # Find left and right time coordinates for a given hamiltonian 
-            # value
-            time_indexes = np.where(potential_well_low_res <= 
-                                    potential_well_low_res[j])[0]
-            left_time = time_potential_low_res[np.max((0,time_indexes[0]))]
-            right_time = time_potential_low_res[np.min((time_indexes[-1],
-                                                        n_points_grid-1))]
-            # Potential well calculation with high resolution in that frame
-            time_potential_high_res = np.linspace(float(left_time), float(right_time),
-                                                  n_points_potential)
-            full_ring_and_RF2.potential_well_generation(
-                                     n_points=n_points_potential,
-                                     time_array=time_potential_high_res,
-                                     main_harmonic_option=main_harmonic_option)
-            pot_well_high_res = full_ring_and_RF2.potential_well
-            
-            if TotalInducedVoltage is not None and i != 0:
-                induced_potential_hires = np.interp(time_potential_high_res,
-                                           time_potential, induced_potential +
-                                           extra_potential, left=0, right=0)
-                pot_well_high_res += induced_potential_hires
-                pot_well_high_res -= pot_well_high_res.min()
-            
-            # Integration to calculate action
-            dE_trajectory[pot_well_high_res <= potential_well_low_res[j]] = \
-                np.sqrt((potential_well_low_res[j] - 
-                pot_well_high_res[pot_well_high_res <= 
-                potential_well_low_res[j]]) / eom_factor_dE)
-            dE_trajectory[pot_well_high_res > potential_well_low_res[j]] = 0
-            
-            J_array_dE0[j] = 1 / np.pi * np.trapz(dE_trajectory,
-                    dx=time_potential_high_res[1] - time_potential_high_res[0])
-            
+        # Potential well calculation with high resolution in the separatrix
+        # frame, the action J is then computed for all the points of the
+        # grid at once
+        time_potential_high_res = np.linspace(float(time_potential_sep[0]),
+                                              float(time_potential_sep[-1]),
+                                              n_points_high_res)
+        full_ring_and_RF.potential_well_generation(
+                                 turn=turn_number,
+                                 n_points=n_points_high_res,
+                                 time_array=time_potential_high_res,
+                                 main_harmonic_option=main_harmonic_option)
+        pot_well_high_res = full_ring_and_RF.potential_well
+
+        if TotalInducedVoltage is not None and i != 0:
+            induced_potential_hires = np.interp(time_potential_high_res,
+                                       time_potential, induced_potential +
+                                       extra_potential, left=0, right=0)
+            pot_well_high_res += induced_potential_hires
+            pot_well_high_res -= pot_well_high_res.min()
+
+        J_array_dE0 = action_from_potential_well(time_potential_high_res,
+                                                 pot_well_high_res,
+                                                 potential_well_low_res,
+                                                 eom_factor_dE)
+
         # Sorting the H and J functions to be able to interpolate J(H)
         H_array_dE0 = potential_well_low_res
         sorted_H_dE0 = H_array_dE0[H_array_dE0.argsort()]
@@ -612,8 +604,12 @@ def matched_from_distribution_function(beam, full_ring_and_RF,
             induced_potential = np.interp(time_potential,
                              time_potential_low_res, induced_potential_low_res,
                              left=0, right=0)
-        del full_ring_and_RF2
-        gc.collect()            
+        gc.collect()
+
+    # Restoring the potential well of the full frame
+    full_ring_and_RF.potential_well = potential_well
+    full_ring_and_RF.potential_well_coordinates = time_potential
+    full_ring_and_RF.total_voltage = total_voltage
     # Populating the bunch
     populate_bunch(beam, time_grid, deltaE_grid, density_grid, 
                    time_resolution_low, deltaE_coord_array[1] -
@@ -714,20 +710,45 @@ def populate_bunch(beam, time_grid, deltaE_grid, density_grid, time_step,
                    deltaE_step, seed):
     '''
     *Method to populate the bunch using a random number generator from the
-    particle density in phase space.*
+    particle density in phase space. The seed can also be a
+    np.random.RandomState instance, which is then used instead of the
+    global generator (e.g. to populate several bunches concurrently), or a
+    RandomGenerator, whose dimensions 0, 1 and 2 give the grid cell and the
+    dt and dE positions in the cell of each particle.*
     '''
     # Initialise the random number generator
-    np.random.seed(seed=seed)
+    if isinstance(seed, RandomGenerator):
+        def uniform(dimension):
+            return seed.uniform(beam.n_macroparticles, dimension)
+    else:
+        if isinstance(seed, np.random.RandomState):
+            random_state = seed
+        else:
+            np.random.seed(seed=seed)
+            random_state = np.random
+
+        def uniform(dimension):
+            return random_state.random_sample(beam.n_macroparticles)
+
     # Generating particles randomly inside the grid cells according to the
-    # provided density_grid
-    indexes = np.random.choice(np.arange(0,np.size(density_grid)), 
-                               beam.n_macroparticles, p=density_grid.flatten())
+    # provided density_grid, by inverse transform sampling of its cumulative
+    # distribution (same random sequence as np.random.choice)
+    cumulative_density = np.cumsum(density_grid, dtype=np.float64)
+    cumulative_density /= cumulative_density[-1]
+    indexes = np.searchsorted(cumulative_density, uniform(0), side='right')
     
     # Randomize particles inside each grid cell (uniform distribution)
-    beam.dt = (np.ascontiguousarray(time_grid.flatten()[indexes] +
-                                    (np.random.rand(beam.n_macroparticles) - 0.5) * time_step)).astype(dtype=bm.precision.real_t, order='C', copy=False)
-    beam.dE = (np.ascontiguousarray(deltaE_grid.flatten()[indexes] +
-                                    (np.random.rand(beam.n_macroparticles) - 0.5) * deltaE_step)).astype(dtype=bm.precision.real_t, order='C', copy=False)
+    dt = uniform(1)
+    dt -= 0.5
+    dt *= time_step
+    dt += np.ravel(time_grid)[indexes]
+    beam.dt = dt.astype(dtype=bm.precision.real_t, order='C', copy=False)
+    
+    dE = uniform(2)
+    dE -= 0.5
+    dE *= deltaE_step
+    dE += np.ravel(deltaE_grid)[indexes]
+    beam.dE = dE.astype(dtype=bm.precision.real_t, order='C', copy=False)
 
 def distribution_function(action_array, dist_type, length, exponent=None):
     '''
@@ -814,8 +835,10 @@ def bigaussian(Ring, RFStation, Beam, sigma_dt, sigma_dE = None, seed = None,
     sigma_dE : float (optional)
         R.m.s. extension of the Gaussian in energy; default is None and will
         match the energy coordinate according to bucket height and sigma_dt
-    seed : int (optional)
-        Fixed seed to have a reproducible distribution
+    seed : int or RandomGenerator (optional)
+        Fixed seed to have a reproducible distribution; with a
+        RandomGenerator, dt and dE are generated from its dimensions 0 and 1
+        and the particles reinserted from the next dimensions
     reinsertion : bool (optional)
         Re-insert particles that are generated outside the separatrix into the
         bucket; default in False
@@ -861,12 +884,21 @@ def bigaussian(Ring, RFStation, Beam, sigma_dt, sigma_dE = None, seed = None,
     Beam.sigma_dE = sigma_dE
     
     # Generate coordinates
-    np.random.seed(seed)
+    if isinstance(seed, RandomGenerator):
+        def randn(dimension, indices=None):
+            return seed.normal(Beam.n_macroparticles, dimension,
+                               indices=indices)
+    else:
+        np.random.seed(seed)
+
+        def randn(dimension, indices=None):
+            return np.random.randn(Beam.n_macroparticles if indices is None
+                                   else indices.size)
     
-    Beam.dt = sigma_dt*np.random.randn(Beam.n_macroparticles).astype(dtype=bm.precision.real_t, order='C', copy=False) + \
+    Beam.dt = sigma_dt*randn(0).astype(dtype=bm.precision.real_t, order='C', copy=False) + \
         (phi_s - phi_rf)/omega_rf
     Beam.dE = sigma_dE * \
-        np.random.randn(Beam.n_macroparticles).astype(
+        randn(1).astype(
             dtype=bm.precision.real_t, order='C')
     
     # Re-insert if necessary
@@ -874,14 +906,16 @@ def bigaussian(Ring, RFStation, Beam, sigma_dt, sigma_dE = None, seed = None,
         
         itemindex = np.where(is_in_separatrix(Ring, 
             RFStation, Beam, Beam.dt, Beam.dE) == False)[0]
+        dimension = 2
          
         while itemindex.size != 0:
 
-            Beam.dt[itemindex] = sigma_dt*np.random.randn(itemindex.size).astype(dtype=bm.precision.real_t, order='C', copy=False) \
+            Beam.dt[itemindex] = sigma_dt*randn(dimension, itemindex).astype(dtype=bm.precision.real_t, order='C', copy=False) \
                 + (phi_s - phi_rf)/omega_rf
 
             Beam.dE[itemindex] = sigma_dE * \
-                np.random.randn(itemindex.size).astype(
+                randn(dimension + 1, itemindex).astype(
                     dtype=bm.precision.real_t, order='C')
+            dimension += 2
             itemindex = np.where(is_in_separatrix(Ring,
                                                   RFStation, Beam, Beam.dt, Beam.dE) == False)[0]
@@ -11,7 +11,9 @@ import copy
 import matplotlib.pyplot as plt
 from scipy.integrate import cumtrapz
 import gc
+from concurrent.futures import ThreadPoolExecutor
 from ..utils import bmath as bm
+from ..utils.random_generator import RandomGenerator
 
 from ..beam.beam import Beam
 from ..beam.distributions import matched_from_distribution_function,\
@@ -26,7 +28,8 @@ def matched_from_distribution_density_multibunch(beam, Ring, FullRingAndRF, dist
                                       main_harmonic_option = 'lowest_freq', 
                                       TotalInducedVoltage = None,
                                       n_iterations_input = 1,
-                                      plot_option = False, seed=None):
+                                      plot_option = False, seed=None,
+                                      n_workers=1):
     '''
     *Function to generate a multi-bunch beam using the matched_from_distribution_density
     function for each bunch. The extra parameters to include are the number of 
@@ -36,6 +39,10 @@ def matched_from_distribution_density_multibunch(beam, Ring, FullRingAndRF, dist
     a dictionary just like the matched_from_distribution_density function (assuming
     the same parameters for all bunches), or as a list of length n_bunches
     to have different parameters for each bunch.*
+    
+    *The bunches are written directly into the slices of the beam coordinates.
+    Without intensity effects the bunches are independent and are matched
+    concurrently in a pool of n_workers threads.*
     '''  
 
     
@@ -78,6 +85,12 @@ def matched_from_distribution_density_multibunch(beam, Ring, FullRingAndRF, dist
          
     bucket_size_tau = 2 * np.pi / (main_harmonic * Ring.omega_rev[0])
 
+    # Coordinates of the full beam, each bunch fills its own slice
+    n_macroparticles_per_bunch = n_macroparticles_per_bunch.astype(int)
+    bunch_edges = np.concatenate(([0], np.cumsum(n_macroparticles_per_bunch)))
+    beam_dt = np.zeros(bunch_edges[-1], dtype=bm.precision.real_t)
+    beam_dE = np.zeros(bunch_edges[-1], dtype=bm.precision.real_t)
+
     beamIteration = Beam(Ring, 1, 0.)
     
     extraVoltageDict = None
@@ -87,8 +100,8 @@ def matched_from_distribution_density_multibunch(beam, Ring, FullRingAndRF, dist
         TotalInducedVoltageIteration = copy.deepcopy(TotalInducedVoltage)
         TotalInducedVoltageIteration.profile.Beam = beamIteration
         
-    
-    for indexBunch in range(0, n_bunches):
+    def generate_bunch(indexBunch, full_ring_and_RF, extraVoltageDict,
+                       bunch_seed):
         
         print('Generating bunch no %d' %(indexBunch+1))
         
@@ -146,7 +159,7 @@ def matched_from_distribution_density_multibunch(beam, Ring, FullRingAndRF, dist
         else:
             distribution_user_table = None
             
-        matched_from_distribution_function(bunch, FullRingAndRF,
+        matched_from_distribution_function(bunch, full_ring_and_RF,
                        distribution_function_input=distribution_function_input,
                        distribution_user_table=distribution_user_table,
                        main_harmonic_option=main_harmonic_option,
@@ -157,22 +170,42 @@ def matched_from_distribution_density_multibunch(beam, Ring, FullRingAndRF, dist
                        distribution_type=distribution_type,
                        emittance=emittance, bunch_length=bunch_length,
                        bunch_length_fit=bunch_length_fit,
-                       distribution_variable=distribution_variable, seed=seed)
+                       distribution_variable=distribution_variable,
+                       seed=bunch_seed)
+
+        bunch_slice = slice(bunch_edges[indexBunch],
+                            bunch_edges[indexBunch+1])
+        beam_dt[bunch_slice] = bunch.dt + (indexBunch *
+                                           bunch_spacing_buckets *
+                                           bucket_size_tau)
+        beam_dE[bunch_slice] = bunch.dE
+
+    if TotalInducedVoltage is None:
+        # The bunches are independent, when matched concurrently the
+        # potential well is generated on a shallow copy of FullRingAndRF for
+        # each bunch to be thread safe
+        def generate_independent_bunch(indexBunch):
+            if n_workers is None or n_workers <= 1:
+                full_ring_and_RF = FullRingAndRF
+            else:
+                full_ring_and_RF = copy.copy(FullRingAndRF)
+            generate_bunch(indexBunch, full_ring_and_RF, None,
+                           bunch_random_state(seed, n_workers))
+
+        map_bunches(generate_independent_bunch, n_bunches, n_workers)
 
-        if indexBunch==0:
-            beamIteration.dt = bunch.dt
-            beamIteration.dE = bunch.dE
-        else:
-            beamIteration.dt = np.append(beamIteration.dt, bunch.dt + 
-                        (indexBunch * bunch_spacing_buckets * bucket_size_tau))
-            beamIteration.dE = np.append(beamIteration.dE, bunch.dE)
-        
-        beamIteration.n_macroparticles = int(np.sum(n_macroparticles_per_bunch[:indexBunch+1]))
-        beamIteration.intensity = np.sum(intensity_per_bunch[:indexBunch+1])
-        beamIteration.ratio = beamIteration.intensity / beamIteration.n_macroparticles
-        
-        
-        if TotalInducedVoltage is not None:
+    else:
+        # Each bunch is matched with the induced voltage of the previous ones
+        for indexBunch in range(0, n_bunches):
+
+            generate_bunch(indexBunch, FullRingAndRF, extraVoltageDict, seed)
+
+            beamIteration.dt = beam_dt[:bunch_edges[indexBunch+1]]
+            beamIteration.dE = beam_dE[:bunch_edges[indexBunch+1]]
+            beamIteration.n_macroparticles = int(np.sum(n_macroparticles_per_bunch[:indexBunch+1]))
+            beamIteration.intensity = np.sum(intensity_per_bunch[:indexBunch+1])
+            beamIteration.ratio = beamIteration.intensity / beamIteration.n_macroparticles
+            
             TotalInducedVoltageIteration.profile.track()
             TotalInducedVoltageIteration.induced_voltage_sum()
 
@@ -196,20 +229,20 @@ def matched_from_distribution_density_multibunch(beam, Ring, FullRingAndRF, dist
                                 'voltage_array':induced_voltage_next_bunch}
 
             
-        if plot_option:
-            plt.figure('Bunch train + induced voltage')
-            plt.clf()
-            plt.plot(TotalInducedVoltageIteration.profile.bin_centers,
-                     TotalInducedVoltageIteration.profile.n_macroparticles / 
-                     (1.*np.max(TotalInducedVoltageIteration.profile.n_macroparticles)) *
-                     np.max(TotalInducedVoltageIteration.induced_voltage))
-            plt.plot(TotalInducedVoltageIteration.profile.bin_centers,
-                     TotalInducedVoltageIteration.induced_voltage)
-            plt.show()
+            if plot_option:
+                plt.figure('Bunch train + induced voltage')
+                plt.clf()
+                plt.plot(TotalInducedVoltageIteration.profile.bin_centers,
+                         TotalInducedVoltageIteration.profile.n_macroparticles / 
+                         (1.*np.max(TotalInducedVoltageIteration.profile.n_macroparticles)) *
+                         np.max(TotalInducedVoltageIteration.induced_voltage))
+                plt.plot(TotalInducedVoltageIteration.profile.bin_centers,
+                         TotalInducedVoltageIteration.induced_voltage)
+                plt.show()
                 
-    beam.dt = beamIteration.dt.astype(dtype=bm.precision.real_t, order='C', copy=False)
+    beam.dt = beam_dt
 
-    beam.dE = beamIteration.dE.astype(dtype=bm.precision.real_t, order='C', copy=False)
+    beam.dE = beam_dE
     gc.collect()    
     
 def matched_from_line_density_multibunch(beam, Ring,
@@ -379,7 +412,8 @@ def match_beam_from_distribution(beam, FullRingAndRF, GeneralParameters,
                                   main_harmonic_option='lowest_freq',
                                   TotalInducedVoltage=None, n_iterations=1,
                                   n_points_potential=1e4,
-                                  dt_margin_percent=0.40, seed=None,):
+                                  dt_margin_percent=0.40, seed=None,
+                                  n_workers=1):
     '''
     *This function generates n equaly spaced bunches for a stationary 
     distribution and try to match them with intensity effects.*
@@ -395,6 +429,9 @@ def match_beam_from_distribution(beam, FullRingAndRF, GeneralParameters,
     - The action J can be integrated over the whole phase space
     - 2piJ = emittance, this restrict the value of J0 (or H0)
     - with g0(H) we can randomize the macroparticles*
+    
+    *The bunches are matched concurrently in a pool of n_workers threads
+    and written directly into the slices of beam.dt and beam.dE.*
     '''           
 #------------------------------------------------------------------------
 # USEFUL VARIABLES
@@ -446,19 +483,31 @@ def match_beam_from_distribution(beam, FullRingAndRF, GeneralParameters,
     # shifted to plug into the real beam.
     temporary_beam = Beam(GeneralParameters, n_macro_per_bunch, intensity_per_bunch)
 
-    # Bunches placed in all the buckets without intensity effects
-    # Loop the match function to have "different" bunches in each bucket
-    for indexBunch in range(n_bunches):
-        match_a_bunch(normalization_DeltaE, temporary_beam,
-                      potential_well_coordinates,
-                      potential_well, seed, distribution_options,
-                      full_ring_and_RF=FullRingAndRF)
-        if indexBunch==0:
-            beam.dt = temporary_beam.dt.astype(dtype=bm.precision.real_t, order='C', copy=False)
-            beam.dE = temporary_beam.dE.astype(dtype=bm.precision.real_t, order='C', copy=False)
-        else:
-            beam.dt = np.append(beam.dt, temporary_beam.dt +(indexBunch *bunch_spacing_buckets *bucket_size_tau))
-            beam.dE = np.append(beam.dE, temporary_beam.dE)
+    # Without intensity effects the phase space density is the same in all
+    # the buckets, it is computed once and each bunch is populated with its
+    # own random particles
+    time_grid, deltaE_grid, distribution, time_resolution, \
+        energy_resolution = matched_bunch_density(normalization_DeltaE,
+                                temporary_beam, potential_well_coordinates,
+                                potential_well, distribution_options,
+                                full_ring_and_RF=FullRingAndRF)
+
+    beam.dt = np.zeros(n_bunches*n_macro_per_bunch, dtype=bm.precision.real_t)
+    beam.dE = np.zeros(n_bunches*n_macro_per_bunch, dtype=bm.precision.real_t)
+
+    def generate_bunch(indexBunch):
+        bunch = Beam(GeneralParameters, n_macro_per_bunch, intensity_per_bunch)
+        populate_bunch(bunch, time_grid, deltaE_grid, distribution,
+                       time_resolution, energy_resolution,
+                       bunch_random_state(seed, n_workers))
+
+        bunch_slice = slice(indexBunch*n_macro_per_bunch,
+                            (indexBunch+1)*n_macro_per_bunch)
+        beam.dt[bunch_slice] = bunch.dt + (indexBunch * bunch_spacing_buckets *
+                                           bucket_size_tau)
+        beam.dE[bunch_slice] = bunch.dE
+
+    map_bunches(generate_bunch, n_bunches, n_workers)
     gc.collect()
     
     print(str(n_bunches)+' stationary bunches without intensity generated')
@@ -468,7 +517,6 @@ def match_beam_from_distribution(beam, FullRingAndRF, GeneralParameters,
     if TotalInducedVoltage is not None:
         print('Applying intensity effects ...')
         for it in range(n_iterations):
-            conv = 0.
             # Compute the induced voltage/potential for all the beam
             profile.track()
             TotalInducedVoltage.induced_voltage_sum()
@@ -477,7 +525,7 @@ def match_beam_from_distribution(beam, FullRingAndRF, GeneralParameters,
             induced_voltage = TotalInducedVoltage.induced_voltage
             induced_potential = - normalization_potential * cumtrapz(induced_voltage, dx=induced_voltage_coordinates[1] - induced_voltage_coordinates[0], initial=0)
 
-            for indexBunch in range(n_bunches):
+            def rematch_bunch(indexBunch):
                 # Extract the induced potential for the specific bucket
                 induced_potential_bunch = np.interp(potential_well_coordinates\
                 + indexBunch*bunch_spacing_buckets*bucket_size_tau,\
@@ -485,23 +533,27 @@ def match_beam_from_distribution(beam, FullRingAndRF, GeneralParameters,
 
                 # Recompute the phase space distribution for the new
                 # perturbed potential (containing induced_potential_bunch)
-                match_a_bunch(normalization_DeltaE, temporary_beam,
+                bunch = Beam(GeneralParameters, n_macro_per_bunch,
+                             intensity_per_bunch)
+                match_a_bunch(normalization_DeltaE, bunch,
                               potential_well_coordinates,
-                              potential_well+induced_potential_bunch, seed,
+                              potential_well+induced_potential_bunch,
+                              bunch_random_state(seed, n_workers),
                               distribution_options,
                               full_ring_and_RF=FullRingAndRF)
 
-                dt = temporary_beam.dt
-                dE = temporary_beam.dE
-                
-                # Compute RMS emittance to observe convergence
-                conv += np.pi*np.std(dt)*np.std(dE)
+                dt = bunch.dt
+                dE = bunch.dE
                 
                 length_dt = len(dt)
                 length_dE = len(dE)
                 beam.dt[indexBunch*length_dt:(indexBunch+1)*length_dt] = dt+(indexBunch *bunch_spacing_buckets *bucket_size_tau)
                 beam.dE[indexBunch*length_dE:(indexBunch+1)*length_dE] = dE
 
+                # RMS emittance to observe convergence
+                return np.pi*np.std(dt)*np.std(dE)
+
+            conv = sum(map_bunches(rematch_bunch, n_bunches, n_workers))
  
             print('iteration ' + str(it) + ', average RMS emittance (4sigma) = ' + str(4*conv/n_bunches))
             profile.track()
@@ -515,7 +567,8 @@ def match_beam_from_distribution_multibatch(beam, FullRingAndRF, GeneralParamete
                                   main_harmonic_option='lowest_freq',
                                   TotalInducedVoltage=None, n_iterations=1,
                                   n_points_potential=1e4,
-                                  dt_margin_percent=0.40, seed=None):
+                                  dt_margin_percent=0.40, seed=None,
+                                  n_workers=1, plot_option=False):
     '''
     *This function generates n equaly spaced bunches for a stationary 
     distribution and try to match them with intensity effects.*
@@ -533,6 +586,9 @@ def match_beam_from_distribution_multibatch(beam, FullRingAndRF, GeneralParamete
     - The action J can be integrated over the whole phase space
     - 2piJ = emittance, this restrict the value of J0 (or H0)
     - with g0(H) we can randomize the macroparticles*
+    
+    *The bunches are matched concurrently in a pool of n_workers threads,
+    the diagnostic plots are only produced with plot_option.*
     '''           
 #------------------------------------------------------------------------
 # USEFUL VARIABLES
@@ -577,47 +633,59 @@ def match_beam_from_distribution_multibatch(beam, FullRingAndRF, GeneralParamete
 
     temporary_batch = Beam(GeneralParameters, int(n_macro_per_bunch*n_bunches), (intensity_per_bunch*n_bunches))
     
-#    print(temporary_batch.dt)
     match_beam_from_distribution(temporary_batch, FullRingAndRF, GeneralParameters,
                                   distribution_options, n_bunches,bunch_spacing_buckets,
                                   TotalInducedVoltage=None, n_iterations=n_iterations,
-                                  n_points_potential=n_points_potential)
+                                  n_points_potential=n_points_potential,
+                                  n_workers=n_workers)
                                   
 #    matched_from_distribution_density_multibunch(temporary_batch, GeneralParameters, FullRingAndRF, distribution_options,
 #                                          n_bunches, bunch_spacing_buckets,
 #                                          TotalInducedVoltage = TotalInducedVoltage,
 #                                          n_iterations_input = n_iterations)
     length_dt = len(temporary_batch.dt)
-    print(length_dt)
     for index_batch in range(n_batch):
         beam.dt[index_batch*length_dt:(index_batch+1)*length_dt] = temporary_batch.dt + index_batch*(n_bunches-1)*bunch_spacing_buckets*bucket_size_tau + (index_batch)*batch_spacing_buckets*bucket_size_tau
         beam.dE[index_batch*length_dt:(index_batch+1)*length_dt] = temporary_batch.dE
 
-    plt.figure('copymultibatch')
-    plt.plot(beam.dt[::100],beam.dE[::100],'b.')
-    plt.figure('temporarybatch')
-    plt.plot(temporary_batch.dt[::100],temporary_batch.dE[::100],'b.')
-    plt.figure('profile before induced voltage')
-    profile.track()
-    plt.plot(profile.bin_centers,profile.n_macroparticles)
-    plt.figure('beamInSlice')
-    plt.plot(profile.Beam.dt[::100],profile.Beam.dE[::100],'b.')   
+    if plot_option:
+        plt.figure('copymultibatch')
+        plt.plot(beam.dt[::100],beam.dE[::100],'b.')
+        plt.figure('temporarybatch')
+        plt.plot(temporary_batch.dt[::100],temporary_batch.dE[::100],'b.')
+        if TotalInducedVoltage is not None:
+            plt.figure('profile before induced voltage')
+            profile.track()
+            plt.plot(profile.bin_centers,profile.n_macroparticles)
+            plt.figure('beamInSlice')
+            plt.plot(profile.Beam.dt[::100],profile.Beam.dE[::100],'b.')   
 #------------------------------------------------------------------------
 # REMATCH THE BUNCHES WITH INTENSITY EFFECTS
 #------------------------------------------------------------------------
     if TotalInducedVoltage is not None:
 #        TotalInducedVoltage.profile.Beam.dt[:len(beam.dt)] = beam.dt
 #        TotalInducedVoltage.profile.Beam.dE[:len(beam.dE)] = beam.dE
+        
+        # The RF potential well is the same for all the iterations
+        FullRingAndRF.potential_well_generation(n_points=n_points_potential, 
+                                        dt_margin_percent=dt_margin_percent, 
+                                        main_harmonic_option=main_harmonic_option)
+    
+        # Restrict the potential well inside the separatrix and put min on 0
+        potential_well_coordinates, potential_well = potential_well_cut(\
+            FullRingAndRF.potential_well_coordinates,\
+            FullRingAndRF.potential_well)
+        potential_well = potential_well - np.min(potential_well)   
+        
         print('Applying intensity effects ...')
         for it in range(n_iterations):
-            conv = 0.
             # Compute the induced voltage/potential for all the beam
             profile.track()
             TotalInducedVoltage.induced_voltage_sum()
             
-            plt.figure('profile before induced voltage')
-            profile.track()
-            plt.plot(profile.bin_centers,profile.n_macroparticles)
+            if plot_option:
+                plt.figure('profile before induced voltage')
+                plt.plot(profile.bin_centers,profile.n_macroparticles)
 #            
 #            plt.figure('inducedvoltage before induced voltage')
 #            profile.track()
@@ -627,55 +695,83 @@ def match_beam_from_distribution_multibatch(beam, FullRingAndRF, GeneralParamete
             induced_voltage = TotalInducedVoltage.induced_voltage
             induced_potential = - normalization_potential * cumtrapz(induced_voltage, dx=induced_voltage_coordinates[1] - induced_voltage_coordinates[0], initial=0)
             
-            plt.figure('testInducedVolt')
-            plt.plot(induced_voltage_coordinates,induced_voltage)
-            plt.figure('testInducedPot')
-            plt.plot(induced_voltage_coordinates,induced_potential)
-
-            FullRingAndRF.potential_well_generation(n_points=n_points_potential, 
-                                            dt_margin_percent=dt_margin_percent, 
-                                            main_harmonic_option=main_harmonic_option)
-        
-            # Restrict the potential well inside the separatrix and put min on 0
-            potential_well_coordinates, potential_well = potential_well_cut(\
-                FullRingAndRF.potential_well_coordinates,\
-                FullRingAndRF.potential_well)
-            potential_well = potential_well - np.min(potential_well)   
-            
-            temporary_beam = Beam(GeneralParameters, n_macro_per_bunch, intensity_per_bunch)
-            for indexBatch in range(n_batch):
-                for indexBunch in range(n_bunches):
-                    # Extract the induced potential for the specific bucket
-                    induced_potential_bunch = np.interp(potential_well_coordinates\
-                    + indexBunch*bunch_spacing_buckets*bucket_size_tau\
-                    + indexBatch*(batch_spacing_buckets + (n_bunches-1)*bunch_spacing_buckets)*bucket_size_tau,\
-                    induced_voltage_coordinates, induced_potential)
-    
-                    # Recompute the phase space distribution for the new
-                    # perturbed potential (containing induced_potential_bunch)
-                    match_a_bunch(normalization_DeltaE, temporary_beam,
-                                  potential_well_coordinates,
-                                  potential_well+induced_potential_bunch, seed,
-                                  distribution_options,
-                                  full_ring_and_RF=FullRingAndRF)
-    
-                    dt = temporary_beam.dt
-                    dE = temporary_beam.dE
-                    
-                    # Compute RMS emittance to observe convergence
-                    conv += np.pi*np.std(dt)*np.std(dE)
-                    
-                    length_dt = len(dt)
-                    length_dE = len(dE)
-                    beam.dt[(indexBunch+n_bunches*indexBatch)*length_dt:(indexBunch+n_bunches*indexBatch+1)*length_dt] = dt+(indexBunch *bunch_spacing_buckets *bucket_size_tau) + indexBatch*(batch_spacing_buckets + (n_bunches-1)*bunch_spacing_buckets)*bucket_size_tau
-                    beam.dE[(indexBunch+n_bunches*indexBatch)*length_dE:(indexBunch+n_bunches*indexBatch+1)*length_dE] = dE
+            if plot_option:
+                plt.figure('testInducedVolt')
+                plt.plot(induced_voltage_coordinates,induced_voltage)
+                plt.figure('testInducedPot')
+                plt.plot(induced_voltage_coordinates,induced_potential)
+
+            def rematch_bunch(indexBunchTotal):
+                indexBatch, indexBunch = divmod(indexBunchTotal, n_bunches)
+                bunch_position = (indexBunch*bunch_spacing_buckets*bucket_size_tau
+                                  + indexBatch*(batch_spacing_buckets + (n_bunches-1)*bunch_spacing_buckets)*bucket_size_tau)
+
+                # Extract the induced potential for the specific bucket
+                induced_potential_bunch = np.interp(potential_well_coordinates\
+                + bunch_position, induced_voltage_coordinates, induced_potential)
 
+                # Recompute the phase space distribution for the new
+                # perturbed potential (containing induced_potential_bunch)
+                bunch = Beam(GeneralParameters, n_macro_per_bunch,
+                             intensity_per_bunch)
+                match_a_bunch(normalization_DeltaE, bunch,
+                              potential_well_coordinates,
+                              potential_well+induced_potential_bunch,
+                              bunch_random_state(seed, n_workers),
+                              distribution_options,
+                              full_ring_and_RF=FullRingAndRF)
+
+                dt = bunch.dt
+                dE = bunch.dE
+                
+                length_dt = len(dt)
+                length_dE = len(dE)
+                beam.dt[indexBunchTotal*length_dt:(indexBunchTotal+1)*length_dt] = dt + bunch_position
+                beam.dE[indexBunchTotal*length_dE:(indexBunchTotal+1)*length_dE] = dE
+
+                # RMS emittance to observe convergence
+                return np.pi*np.std(dt)*np.std(dE)
+
+            conv = sum(map_bunches(rematch_bunch, n_batch*n_bunches,
+                                   n_workers))
  
             print('iteration ' + str(it) + ', average RMS emittance (4sigma) = ' + str(4*conv/n_bunches))
             profile.track()
             TotalInducedVoltage.induced_voltage_sum()
 
 
+def map_bunches(function, n_bunches, n_workers=1):
+    '''
+    *Calls function(indexBunch) for all the bunches and returns the list of
+    the results, in the order of the bunches. With n_workers > 1 the
+    bunches are processed concurrently in a pool of threads (the large
+    numpy operations of the matching release the GIL), otherwise one after
+    the other.*
+    '''
+    
+    if n_workers is None or n_workers <= 1 or n_bunches <= 1:
+        return [function(indexBunch) for indexBunch in range(n_bunches)]
+    
+    with ThreadPoolExecutor(max_workers=min(n_workers, n_bunches)) as executor:
+        return list(executor.map(function, range(n_bunches)))
+
+
+def bunch_random_state(seed, n_workers=1):
+    '''
+    *Random number generator to populate a bunch. Sequentially the global
+    generator is (re)seeded as in populate_bunch, while for concurrent
+    matching each bunch gets its own np.random.RandomState, giving the same
+    particles for a given seed. A RandomGenerator has no state and is
+    shared by the bunches.*
+    '''
+    
+    if isinstance(seed, RandomGenerator) or n_workers is None or \
+            n_workers <= 1:
+        return seed
+    else:
+        return np.random.RandomState(seed)
+
+
 def compute_X_grid(normalization_DeltaE, time_array, potential_well,
                    distribution_variable):
     
@@ -692,11 +788,29 @@ def compute_X_grid(normalization_DeltaE, time_array, potential_well,
     potential_well_grid = np.meshgrid(potential_well, potential_well)[0]
     H_grid = normalization_DeltaE * deltaE_grid**2 + potential_well_grid
     
-    # Compute the action J
+    # Compute the action J, integrating with the trapezoidal rule
+    # sqrt((U_i-U)/normalization_DeltaE) over the points U <= U_i, by
+    # blocks of levels U_i (same as np.trapz level by level up to the
+    # rounding of the summation order)
+    n_points = len(potential_well)
+    first_inside = np.searchsorted(-np.minimum.accumulate(potential_well),
+                                   -potential_well, side='left')
+    last_inside = np.searchsorted(
+        np.minimum.accumulate(potential_well[::-1])[::-1],
+        potential_well, side='right') - 1
     J_array = np.zeros(shape=potential_well.shape, dtype=float)
-    for i in range(len(J_array)):
-        DELTA = np.sqrt((potential_well[i]-potential_well)[potential_well <= potential_well[i]]/normalization_DeltaE)
-        J_array[i] = 1./np.pi*np.trapz(DELTA, dx=time_array[1]-time_array[0])
+    n_levels_block = max(1, int(4e6 // max(n_points, 1)))
+    for start in range(0, n_points, n_levels_block):
+        levels = potential_well[start:start+n_levels_block]
+        DELTA = np.subtract.outer(levels, potential_well)
+        np.maximum(DELTA, 0, out=DELTA)
+        DELTA /= normalization_DeltaE
+        np.sqrt(DELTA, out=DELTA)
+        rows = np.arange(len(levels))
+        J_array[start:start+n_levels_block] = np.sum(DELTA, axis=1) - 0.5 * (
+            DELTA[rows, first_inside[start:start+n_levels_block]] +
+            DELTA[rows, last_inside[start:start+n_levels_block]])
+    J_array *= (time_array[1]-time_array[0]) / np.pi
     
     # Compute J grid
     sorted_H = potential_well[potential_well.argsort()]
@@ -719,6 +833,22 @@ def match_a_bunch(normalization_DeltaE, beam, potential_well_coordinates,\
                   potential_well, seed, distribution_options,\
                   full_ring_and_RF=None):
     
+    time_grid, deltaE_grid, distribution, time_resolution, \
+        energy_resolution = matched_bunch_density(normalization_DeltaE, beam,
+                                potential_well_coordinates, potential_well,
+                                distribution_options, full_ring_and_RF)
+
+    populate_bunch(beam, time_grid, deltaE_grid, distribution, time_resolution,
+                   energy_resolution, seed)
+
+def matched_bunch_density(normalization_DeltaE, beam,
+                          potential_well_coordinates, potential_well,
+                          distribution_options, full_ring_and_RF=None):
+    '''
+    *Phase space density of a bunch matched to the potential well, used by
+    match_a_bunch to populate the bunch.*
+    '''
+    
     if 'type' in distribution_options:
         distribution_type = distribution_options['type']
     else:
@@ -778,6 +908,6 @@ def match_a_bunch(normalization_DeltaE, beam, potential_well_coordinates,\
     distribution[X_grid>np.max(H)] = 0
     distribution = distribution / np.sum(distribution)
 
-    populate_bunch(beam, time_grid, deltaE_grid, distribution, time_resolution,
-                   energy_resolution, seed)
+    return time_grid, deltaE_grid, distribution, time_resolution, \
+        energy_resolution
 
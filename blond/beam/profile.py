@@ -195,11 +195,15 @@ class FitOptions(object):
     ----------
 
     fit_method : string
-        Current options are 'gaussian',
+        Current options are 'gaussian', 'gaussian_fast' (compiled fit
+        warm-started from the previous turn, see gaussian_fit_fast in
+        filters_and_fitting.py in the toolbox package),
         'fwhm' (full-width-half-maximum converted to 4 sigma gaussian bunch)
         and 'rms'. The methods 'gaussian' and 'rms' give both 4 sigma.
     fitExtraOptions : unknown
-        For the moment no options can be passed into fitExtraOptions
+        For 'gaussian_fast', optional dictionary of the keyword arguments
+        'threshold' and 'n_iterations' of gaussian_fit_fast; no options can
+        be passed for the other methods
 
     Attributes
     ----------
@@ -287,6 +291,61 @@ class OtherSlicesOptions(object):
         self.direct_slicing = direct_slicing
 
 
+class BunchFollowingOptions(object):
+    r"""
+    This class defines the bunch-following mode of the Profile class: the
+    slicing frame follows the bunch position and length turn after turn,
+    keeping the number of slices per bunch length constant (e.g. along a
+    ramp with bunch compression).
+
+    The frame is only changed when needed: it is re-centred when the bunch
+    position moves by more than margin times the frame length from the
+    frame centre, and rescaled when the frame length differs by more than a
+    factor (1 + rescale_step) from n_sigma times the RMS bunch length. The
+    frame lengths are taken on a geometric ladder of ratio
+    (1 + rescale_step) starting from the initial frame length, so that the
+    same slicings are reused (see the cache_size option of
+    TotalInducedVoltage).
+
+    Parameters
+    ----------
+    n_sigma : float
+        Length of the frame in units of RMS bunch length; default is None,
+        i.e. the n_sigma of CutOptions if given, otherwise the ratio between
+        the initial frame length and RMS bunch length
+    margin : float
+        Maximum distance of the bunch position from the frame centre, in
+        units of frame length; default is 0.1
+    rescale_step : float
+        Relative step of the frame length; default is 0.25
+
+    Attributes
+    ----------
+    n_sigma : float
+    margin : float
+    rescale_step : float
+
+    """
+
+    def __init__(self, n_sigma=None, margin=0.1, rescale_step=0.25):
+        """
+        Constructor
+        """
+
+        if n_sigma is not None:
+            self.n_sigma = float(n_sigma)
+        else:
+            self.n_sigma = n_sigma
+
+        self.margin = float(margin)
+        self.rescale_step = float(rescale_step)
+
+        if self.margin <= 0 or self.rescale_step <= 0:
+            # CutError
+            raise RuntimeError('margin and rescale_step of ' +
+                               'BunchFollowingOptions should be positive')
+
+
 class Profile(object):
     """
     Contains the beam profile and related quantities including beam spectrum,
@@ -306,6 +365,9 @@ class Profile(object):
     OtherSlicesOptions : object
         All remaining options, like smooth histogram and direct
         slicing (see above)
+    BunchFollowingOptions : object
+        Options of the bunch-following frame (see above); default is None
+        (fixed frame)
 
     Attributes
     ----------
@@ -328,7 +390,8 @@ class Profile(object):
         lenght of one bin (or slice)
     n_macroparticles : float array
         contains the histogram (or profile); its elements are real if the
-        smooth histogram tracking is used
+        smooth histogram tracking is used; [n_realisations, n_slices] for an
+        ensemble beam, one histogram per realisation
     beam_spectrum : float array
         contains the spectrum of the beam (arb. units)
     beam_spectrum_freq : float array
@@ -341,6 +404,15 @@ class Profile(object):
     bunchLength : float
         profile length [s]
     filterExtraOptions : unknown (see above)
+    frame_callbacks : list
+        contains the functions called without argument when the frame is
+        changed by the bunch-following mode, e.g. the reprocess method of
+        TotalInducedVoltage
+    frame_changed : bool
+        the frame was changed at the last track
+    follow_n_sigma : float
+        length of the bunch-following frame in units of RMS bunch length,
+        see BunchFollowingOptions
 
     Examples
     --------
@@ -368,7 +440,8 @@ class Profile(object):
                  CutOptions=CutOptions(),
                  FitOptions=FitOptions(),
                  FilterOptions=FilterOptions(),
-                 OtherSlicesOptions=OtherSlicesOptions()):
+                 OtherSlicesOptions=OtherSlicesOptions(),
+                 BunchFollowingOptions=None):
         """
         Constructor
         """
@@ -385,8 +458,13 @@ class Profile(object):
         # Get all computed parameters from CutOptions
         self.set_slices_parameters()
 
-        # Initialize profile array as zero array
-        self.n_macroparticles = np.zeros(self.n_slices, dtype=bm.precision.real_t, order='C')
+        # Initialize profile array as zero array, one row per realisation
+        # for an ensemble beam
+        shape = (self.n_slices,)
+        if getattr(Beam, 'n_realisations', None) is not None:
+            shape = (Beam.n_realisations, self.n_slices)
+        self.n_macroparticles = np.zeros(shape, dtype=bm.precision.real_t,
+                                         order='C')
 
         # Initialize beam_spectrum and beam_spectrum_freq as empty arrays
         self.beam_spectrum = np.array([], dtype=bm.precision.real_t, order='C')
@@ -397,12 +475,30 @@ class Profile(object):
         else:
             self.operations = [self._slice]
 
+        # Bunch-following frame
+        self.follow_options = BunchFollowingOptions
+        self.frame_callbacks = []
+        self.frame_changed = False
+        self.follow_n_sigma = None
+        if BunchFollowingOptions is not None:
+            # Resolved here, the options can be shared by several profiles
+            self.follow_n_sigma = BunchFollowingOptions.n_sigma
+            if self.follow_n_sigma is None:
+                self.follow_n_sigma = CutOptions.n_sigma
+            self.frame_reference_length = self.cut_right - self.cut_left
+            self.operations.append(self.follow_bunch)
+
         if FitOptions.fit_option is not None:
             self.fit_option = FitOptions.fit_option
             self.bunchPosition = 0.0
             self.bunchLength = 0.0
             if FitOptions.fit_option == 'gaussian':
                 self.operations.append(self.apply_fit)
+            elif FitOptions.fit_option == 'gaussian_fast':
+                self.fast_fit_options = {}
+                if FitOptions.fitExtraOptions is not None:
+                    self.fast_fit_options.update(FitOptions.fitExtraOptions)
+                self.operations.append(self.apply_fit_fast)
             elif FitOptions.fit_option == 'rms':
                 self.operations.append(self.rms)
             elif FitOptions.fit_option == 'fwhm':
@@ -412,6 +508,13 @@ class Profile(object):
             self.filterExtraOptions = FilterOptions.filterExtraOptions
             self.operations.append(self.apply_filter)
 
+        if self.n_macroparticles.ndim == 2 and \
+                self.operations != [self._slice]:
+            #InputDataError
+            raise RuntimeError("ERROR in Profile: only the slicing without " +
+                               "smoothing, bunch following, fit and filter " +
+                               "is available for an ensemble beam")
+
         if OtherSlicesOptions.direct_slicing:
             self.track()
 
@@ -440,6 +543,62 @@ class Profile(object):
         if bm.mpiMode():
             self.reduce_histo()
 
+    def follow_bunch(self):
+        """
+        Bunch-following mode: re-centres and rescales the frame if the bunch
+        moved past the margin or if its length changed by more than the
+        rescale step (see BunchFollowingOptions), then slices again and
+        calls the frame callbacks.
+        """
+
+        options = self.follow_options
+        self.frame_changed = False
+
+        # Bunch position and RMS length from the profile, or from the
+        # particles if the bunch is out of the frame
+        n_macroparticles = np.sum(self.n_macroparticles)
+        if n_macroparticles > 0:
+            position = np.sum(self.bin_centers * self.n_macroparticles) / \
+                n_macroparticles
+            sigma = np.sqrt(np.sum((self.bin_centers - position)**2 *
+                                   self.n_macroparticles) / n_macroparticles)
+        else:
+            position = bm.mean(self.Beam.dt)
+            sigma = bm.std(self.Beam.dt)
+
+        frame_length = self.cut_right - self.cut_left
+        if self.follow_n_sigma is None:
+            self.follow_n_sigma = frame_length / sigma
+
+        ratio = self.follow_n_sigma * sigma / frame_length
+        if sigma > 0 and (ratio > 1 + options.rescale_step or
+                          ratio < 1 / (1 + options.rescale_step)):
+            step = np.round(np.log(self.follow_n_sigma * sigma /
+                                   self.frame_reference_length) /
+                            np.log(1 + options.rescale_step))
+            frame_length = self.frame_reference_length * \
+                (1 + options.rescale_step)**step
+            self.frame_changed = True
+
+        if np.abs(position - 0.5*(self.cut_left + self.cut_right)) > \
+                options.margin * frame_length:
+            self.frame_changed = True
+
+        if not self.frame_changed:
+            return
+
+        self.cut_options.cut_left = position - frame_length/2
+        self.cut_options.cut_right = position + frame_length/2
+        self.cut_options.cuts_unit = 's'
+        self.cut_options.set_cuts()
+        self.set_slices_parameters()
+
+        # Slicing in the new frame
+        self.operations[0]()
+
+        for callback in self.frame_callbacks:
+            callback()
+
     def reduce_histo(self, dtype=np.uint32):
         if not bm.mpiMode():
             raise RuntimeError(
@@ -493,6 +652,42 @@ class Profile(object):
         self.bunchPosition = self.fitExtraOptions[1]
         self.bunchLength = 4*self.fitExtraOptions[2]
 
+    def apply_fit_fast(self, **kwargs):
+        """
+        It applies the compiled Gaussian fit to the profile, warm-started
+        from the fit of the previous turn.
+        """
+
+        kwargs = dict(getattr(self, 'fast_fit_options', {}), **kwargs)
+        if self.bunchLength == 0:
+            p0 = None
+        else:
+            p0 = self.fitExtraOptions
+
+        self.fitExtraOptions = ffroutines.gaussian_fit_fast(
+            self.n_macroparticles, self.bin_centers, p0, **kwargs)
+        self.bunchPosition = self.fitExtraOptions[1]
+        self.bunchLength = 4*self.fitExtraOptions[2]
+
+    def gaussian_fit_multibunch(self, n_bunches, bunch_spacing_buckets,
+                                bucket_size_tau, bucket_tolerance=0.40,
+                                **kwargs):
+        """
+        Bunch-by-bunch compiled Gaussian fit of the profile (bunch length =
+        4sigma), warm-started from the fit of the previous call.
+        """
+
+        p0 = getattr(self, 'fitExtraOptions', None)
+        if np.shape(p0) != (n_bunches, 3):
+            p0 = None
+
+        self.fitExtraOptions = ffroutines.gaussian_fit_multibunch(
+            self.n_macroparticles, self.bin_centers, n_bunches,
+            bunch_spacing_buckets, bucket_size_tau, bucket_tolerance, p0,
+            **kwargs)
+        self.bunchPosition = self.fitExtraOptions[:, 1]
+        self.bunchLength = 4*self.fitExtraOptions[:, 2]
+
     def apply_filter(self):
         """
         It applies Chebishev filter to the profile.
@@ -24,6 +24,7 @@ import sys
 import subprocess
 import ctypes
 import argparse
+from collections import OrderedDict
 
 path = os.path.realpath(__file__)
 basepath = os.sep.join(path.split(os.sep)[:-1])
@@ -63,6 +64,13 @@ parser.add_argument('--with-fftw-lib', type=str,
 parser.add_argument('--with-fftw-header', type=str,
                     help='Path to the FFTW3 header files.')
 
+parser.add_argument('--isa', type=str, nargs='+',
+                    choices=['avx2', 'avx512', 'all'],
+                    help='Also compile variants of the library for these'
+                    ' instruction sets (x86-64). The best variant supported'
+                    ' by the CPU is loaded at runtime, the baseline library'
+                    ' otherwise. Default: baseline library only')
+
 parser.add_argument('--flags', type=str, default='',
                     help='Additional compile flags.')
 
@@ -80,6 +88,14 @@ libs = []
 #                -mfma4 -fopenmp -ftree-vectorizer-verbose=1
 cflags = ['-O3', '-ffast-math', '-std=c++11', '-shared']
 
+# Flags of the instruction set variants of the library, libblond_<isa>,
+# matching the CPU flags checked in blond/__init__.py
+isa_flags = OrderedDict([
+    ('avx2', ['-mavx2', '-mfma']),
+    ('avx512', ['-mavx2', '-mfma', '-mavx512f', '-mavx512cd', '-mavx512bw',
+                '-mavx512dq', '-mavx512vl', '-mprefer-vector-width=512']),
+])
+
 cpp_files = [
     os.path.join(basepath, 'cpp_routines/kick.cpp'),
     os.path.join(basepath, 'cpp_routines/drift.cpp'),
@@ -89,8 +105,10 @@ cpp_files = [
     os.path.join(basepath, 'cpp_routines/blondmath.cpp'),
     os.path.join(basepath, 'cpp_routines/fast_resonator.cpp'),
     os.path.join(basepath, 'cpp_routines/beam_phase.cpp'),
+    os.path.join(basepath, 'cpp_routines/profile_analysis.cpp'),
     os.path.join(basepath, 'cpp_routines/fft.cpp'),
     os.path.join(basepath, 'cpp_routines/openmp.cpp'),
+    os.path.join(basepath, 'cpp_routines/random.cpp'),
     os.path.join(basepath, 'toolbox/tomoscope.cpp'),
     os.path.join(basepath, 'synchrotron_radiation/synchrotron_radiation.cpp'),
     os.path.join(basepath, 'beam/sparse_histogram.cpp'),
@@ -116,8 +134,8 @@ if (__name__ == "__main__"):
     if (args.parallel):
         cflags += ['-fopenmp', '-DPARALLEL', '-D_GLIBCXX_PARALLEL']
 
-    if (args.flags):
-        cflags += args.flags.split()
+    # Added last, after the instruction set flags of the variants
+    user_flags = args.flags.split()
 
     if with_fftw:
         cflags += ['-DUSEFFTW3']
@@ -151,7 +169,17 @@ if (__name__ == "__main__"):
         print(
             'YOU ARE NOT USING A WINDOWS OR LINUX OPERATING SYSTEM. ABORTING...')
         sys.exit(-1)
-    command = [compiler] + cflags + ['-o', libname] + cpp_files + libs
+    variants = [('baseline', libname, [])]
+    for isa in isa_flags:
+        if args.isa and (isa in args.isa or 'all' in args.isa):
+            variants.append((isa, root + '_' + isa + ext, isa_flags[isa]))
+        else:
+            # A variant of an earlier build would be preferred at import
+            # over the new baseline library
+            try:
+                os.remove(root + '_' + isa + ext)
+            except OSError as e:
+                pass
 
     print('Enable Multi-threaded code: ', args.parallel)
     print('Using boost: ', args.boost is not None)
@@ -164,20 +192,29 @@ if (__name__ == "__main__"):
         print('FFTW3 Library path: ', args.with_fftw_lib)
         print('FFTW3 Headers path: ', args.with_fftw_header)
     print('C++ Compiler: ', compiler)
-    print('Compiler flags: ', ' '.join(cflags))
+    print('Compiler flags: ', ' '.join(cflags + user_flags))
     print('Extra libraries: ', ' '.join(libs))
+    print('Instruction set variants: ',
+          ' '.join(isa for isa, _, _ in variants))
     subprocess.call([compiler, '--version'])
 
-    try:
-        os.remove(libname)
-    except OSError as e:
-        pass
-
-    subprocess.call(command)
-
-    try:
-        libblond = ctypes.CDLL(libname)
-        print('\nThe blond library has been successfully compiled.')
-    except Exception as e:
-        print('\nCompilation failed.')
-        print(e)
+    for isa, libname, flags in variants:
+        command = [compiler] + cflags + flags + user_flags + \
+            ['-o', libname] + cpp_files + libs
+
+        try:
+            os.remove(libname)
+        except OSError as e:
+            pass
+
+        if flags:
+            print('\nCompiling the %s variant: ' % isa, ' '.join(flags))
+        subprocess.call(command)
+
+        try:
+            libblond = ctypes.CDLL(libname)
+            print('\nThe blond library (%s) has been successfully compiled.'
+                  % isa)
+        except Exception as e:
+            print('\nCompilation failed.')
+            print(e)
@@ -1,5 +1,8 @@
 #include "blondmath.h"
 #include "openmp.h"
+#include "sincos.h"
+#include "exp.h"
+#include <algorithm>
 
 
 extern "C" double beam_phase(const double * __restrict__ bin_centers,
@@ -70,3 +73,179 @@ extern "C" float beam_phasef(const float * __restrict__ bin_centers,
 
     return scoeff / ccoeff;
 }
+
+
+// Beam phase from the particles: sums of the windowed sine and cosine
+// components over the particles with time_min <= dt <= time_max, without
+// binning. coefficients[0] is the sine, coefficients[1] the cosine sum.
+extern "C" void beam_phase_particles(const double * __restrict__ beam_dt,
+                                     const int n_macroparticles,
+                                     const double alpha,
+                                     const double time_offset,
+                                     const double time_min,
+                                     const double time_max,
+                                     const double omega_rf,
+                                     const double phi_rf,
+                                     double * __restrict__ coefficients)
+{
+    double scoeff = 0.;
+    double ccoeff = 0.;
+
+    #pragma omp parallel for reduction(+ : scoeff, ccoeff)
+    for (int i = 0; i < n_macroparticles; ++i) {
+        const double dt = beam_dt[i];
+        if (dt < time_min || dt > time_max)
+            continue;
+        double s, c;
+        vdt::fast_sincos(omega_rf * dt + phi_rf, s, c);
+        const double weight = (alpha == 0.) ? 1.
+                              : vdt::fast_exp(alpha * (dt - time_offset));
+        scoeff += weight * s;
+        ccoeff += weight * c;
+    }
+
+    coefficients[0] = scoeff;
+    coefficients[1] = ccoeff;
+}
+
+
+extern "C" void beam_phase_particlesf(const float * __restrict__ beam_dt,
+                                      const int n_macroparticles,
+                                      const float alpha,
+                                      const float time_offset,
+                                      const float time_min,
+                                      const float time_max,
+                                      const float omega_rf,
+                                      const float phi_rf,
+                                      float * __restrict__ coefficients)
+{
+    float scoeff = 0.;
+    float ccoeff = 0.;
+
+    #pragma omp parallel for reduction(+ : scoeff, ccoeff)
+    for (int i = 0; i < n_macroparticles; ++i) {
+        const float dt = beam_dt[i];
+        if (dt < time_min || dt > time_max)
+            continue;
+        float s, c;
+        vdt::fast_sincosf(omega_rf * dt + phi_rf, s, c);
+        const float weight = (alpha == 0.) ? 1.
+                             : vdt::fast_expf(alpha * (dt - time_offset));
+        scoeff += weight * s;
+        ccoeff += weight * c;
+    }
+
+    coefficients[0] = scoeff;
+    coefficients[1] = ccoeff;
+}
+
+
+// Beam phase from the profile with precomputed window weights: sums of the
+// windowed sine and cosine components, integrated with the trapezoidal rule
+// over the given bins. The RF phase is computed exactly at the start of
+// each block of bins and advanced from bin to bin by angle addition.
+// coefficients[0] is the sine, coefficients[1] the cosine sum.
+extern "C" void beam_phase_window(const double * __restrict__ bin_centers,
+                                  const double * __restrict__ profile,
+                                  const double * __restrict__ window,
+                                  const int n_bins,
+                                  const double omega_rf,
+                                  const double phi_rf,
+                                  const double bin_size,
+                                  double * __restrict__ coefficients)
+{
+    coefficients[0] = 0.;
+    coefficients[1] = 0.;
+    if (n_bins < 2)
+        return;
+
+    const int block = 32;
+    const int n_blocks = (n_bins + block - 1) / block;
+    double s_step, c_step;
+    vdt::fast_sincos(omega_rf * bin_size, s_step, c_step);
+
+    double scoeff = 0.;
+    double ccoeff = 0.;
+
+    #pragma omp parallel for reduction(+ : scoeff, ccoeff)
+    for (int b = 0; b < n_blocks; ++b) {
+        const int first = b * block;
+        const int last = std::min(first + block, n_bins);
+        double s, c;
+        vdt::fast_sincos(omega_rf * bin_centers[first] + phi_rf, s, c);
+        for (int i = first; i < last; ++i) {
+            const double weight = window[i] * profile[i];
+            scoeff += weight * s;
+            ccoeff += weight * c;
+            const double s_next = s * c_step + c * s_step;
+            c = c * c_step - s * s_step;
+            s = s_next;
+        }
+    }
+
+    // Trapezoidal rule: half weight for the end points
+    double s_first, c_first, s_last, c_last;
+    vdt::fast_sincos(omega_rf * bin_centers[0] + phi_rf, s_first, c_first);
+    vdt::fast_sincos(omega_rf * bin_centers[n_bins - 1] + phi_rf,
+                     s_last, c_last);
+    const double w_first = window[0] * profile[0];
+    const double w_last = window[n_bins - 1] * profile[n_bins - 1];
+    scoeff -= 0.5 * (w_first * s_first + w_last * s_last);
+    ccoeff -= 0.5 * (w_first * c_first + w_last * c_last);
+
+    coefficients[0] = scoeff * bin_size;
+    coefficients[1] = ccoeff * bin_size;
+}
+
+
+extern "C" void beam_phase_windowf(const float * __restrict__ bin_centers,
+                                   const float * __restrict__ profile,
+                                   const float * __restrict__ window,
+                                   const int n_bins,
+                                   const float omega_rf,
+                                   const float phi_rf,
+                                   const float bin_size,
+                                   float * __restrict__ coefficients)
+{
+    coefficients[0] = 0.;
+    coefficients[1] = 0.;
+    if (n_bins < 2)
+        return;
+
+    const int block = 32;
+    const int n_blocks = (n_bins + block - 1) / block;
+    float s_step, c_step;
+    vdt::fast_sincosf(omega_rf * bin_size, s_step, c_step);
+
+    float scoeff = 0.;
+    float ccoeff = 0.;
+
+    #pragma omp parallel for reduction(+ : scoeff, ccoeff)
+    for (int b = 0; b < n_blocks; ++b) {
+        const int first = b * block;
+        const int last = std::min(first + block, n_bins);
+        float s, c;
+        vdt::fast_sincosf(omega_rf * bin_centers[first] + phi_rf, s, c);
+        for (int i = first; i < last; ++i) {
+            const float weight = window[i] * profile[i];
+            scoeff += weight * s;
+            ccoeff += weight * c;
+            const float s_next = s * c_step + c * s_step;
+            c = c * c_step - s * s_step;
+            s = s_next;
+        }
+    }
+
+    // Trapezoidal rule: half weight for the end points
+    float s_first, c_first, s_last, c_last;
+    vdt::fast_sincosf(omega_rf * bin_centers[0] + phi_rf, s_first, c_first);
+    vdt::fast_sincosf(omega_rf * bin_centers[n_bins - 1] + phi_rf,
+                      s_last, c_last);
+    const float w_first = window[0] * profile[0];
+    const float w_last = window[n_bins - 1] * profile[n_bins - 1];
+    scoeff -= 0.5 * (w_first * s_first + w_last * s_last);
+    ccoeff -= 0.5 * (w_first * c_first + w_last * c_last);
+
+    coefficients[0] = scoeff * bin_size;
+    coefficients[1] = ccoeff * bin_size;
+}
@@ -13,6 +13,10 @@
 
 #include <stdlib.h>
 #include <math.h>
+#include <cmath>
+#include <vector>
+#include "sincos.h"
+#include "exp.h"
 
 
 extern "C" void fast_resonator_real_imag(double *__restrict__ impedanceReal,
@@ -52,10 +56,10 @@ extern "C" void fast_resonator_real_imag(double *__restrict__ impedanceReal,
       */
 
 
-    for (int res = 0; res < n_resonators; res++) {
-        const double Qsquare = Q_values[res] * Q_values[res];
-        // #pragma omp parallel for
-        for (int freq = 1; freq < n_frequencies; freq++) {
+    #pragma omp parallel for
+    for (int freq = 1; freq < n_frequencies; freq++) {
+        for (int res = 0; res < n_resonators; res++) {
+            const double Qsquare = Q_values[res] * Q_values[res];
             const double commonTerm = (frequencies[freq]
                                        / resonant_frequencies[res]
                                        - resonant_frequencies[res]
@@ -110,10 +114,10 @@ extern "C" void fast_resonator_real_imagf(float *__restrict__ impedanceReal,
       */
 
 
-    for (int res = 0; res < n_resonators; res++) {
-        const float Qsquare = Q_values[res] * Q_values[res];
-        // #pragma omp parallel for
-        for (int freq = 1; freq < n_frequencies; freq++) {
+    #pragma omp parallel for
+    for (int freq = 1; freq < n_frequencies; freq++) {
+        for (int res = 0; res < n_resonators; res++) {
+            const float Qsquare = Q_values[res] * Q_values[res];
             const float commonTerm = (frequencies[freq]
                                        / resonant_frequencies[res]
                                        - resonant_frequencies[res]
@@ -130,3 +134,279 @@ extern "C" void fast_resonator_real_imagf(float *__restrict__ impedanceReal,
 
 }
 
+
+// Impedance, resonator wake and travelling wave cavity wake and impedance
+// of all the modes in one pass, written in the given output arrays; the
+// complex impedances are interleaved real and imaginary parts.
+
+inline double mode_exp(const double x) {return vdt::fast_exp(x);}
+inline float mode_exp(const float x) {return vdt::fast_expf(x);}
+
+inline void mode_sincos(const double x, double &s, double &c)
+{
+    vdt::fast_sincos(x, s, c);
+}
+inline void mode_sincos(const float x, float &s, float &c)
+{
+    vdt::fast_sincosf(x, s, c);
+}
+
+template <typename T>
+void resonator_impedance(T *__restrict__ impedance,
+                         const T *__restrict__ frequencies,
+                         const T *__restrict__ shunt_impedances,
+                         const T *__restrict__ Q_values,
+                         const T *__restrict__ resonant_frequencies,
+                         const int n_resonators,
+                         const int n_frequencies)
+{
+    // The first frequency is assumed to be zero
+    impedance[0] = 0;
+    impedance[1] = 0;
+
+    #pragma omp parallel for
+    for (int freq = 1; freq < n_frequencies; freq++) {
+        T impedanceReal = 0;
+        T impedanceImag = 0;
+        for (int res = 0; res < n_resonators; res++) {
+            const T Qsquare = Q_values[res] * Q_values[res];
+            const T commonTerm = (frequencies[freq]
+                                  / resonant_frequencies[res]
+                                  - resonant_frequencies[res]
+                                  / frequencies[freq]);
+
+            impedanceReal += shunt_impedances[res]
+                             / (1.0 + Qsquare * commonTerm * commonTerm);
+
+            impedanceImag -= shunt_impedances[res]
+                             * (Q_values[res] * commonTerm)
+                             / (1.0 + Qsquare * commonTerm * commonTerm);
+        }
+        impedance[2 * freq] = impedanceReal;
+        impedance[2 * freq + 1] = impedanceImag;
+    }
+}
+
+
+template <typename T>
+void resonator_wake(T *__restrict__ wake,
+                    const T *__restrict__ times,
+                    const T *__restrict__ shunt_impedances,
+                    const T *__restrict__ omega_R,
+                    const T *__restrict__ Q_values,
+                    const int n_resonators,
+                    const int n_times)
+{
+    std::vector<T> alpha(n_resonators), omega_bar(n_resonators);
+    for (int res = 0; res < n_resonators; res++) {
+        alpha[res] = omega_R[res] / (2 * Q_values[res]);
+        omega_bar[res] = std::sqrt(omega_R[res] * omega_R[res]
+                                   - alpha[res] * alpha[res]);
+    }
+
+    #pragma omp parallel for
+    for (int i = 0; i < n_times; i++) {
+        const T t = times[i];
+        T w = 0;
+        // Causal wake, with half weight at t = 0
+        if (t >= 0) {
+            const T factor = (t > 0) ? 2 : 1;
+            for (int res = 0; res < n_resonators; res++) {
+                T s, c;
+                mode_sincos(omega_bar[res] * t, s, c);
+                w += factor * shunt_impedances[res] * alpha[res]
+                     * mode_exp(-alpha[res] * t)
+                     * (c - alpha[res] / omega_bar[res] * s);
+            }
+        }
+        wake[i] = w;
+    }
+}
+
+
+template <typename T>
+void travelling_wave_wake(T *__restrict__ wake,
+                          const T *__restrict__ times,
+                          const T *__restrict__ shunt_impedances,
+                          const T *__restrict__ resonant_frequencies,
+                          const T *__restrict__ a_factors,
+                          const int n_modes,
+                          const int n_times)
+{
+    #pragma omp parallel for
+    for (int i = 0; i < n_times; i++) {
+        const T t = times[i];
+        T w = 0;
+        if (t >= 0) {
+            const T factor = (t > 0) ? 2 : 1;
+            for (int mode = 0; mode < n_modes; mode++) {
+                const T a_tilde = a_factors[mode] / (2 * M_PI);
+                if (t <= a_tilde)
+                    w += factor * 2 * shunt_impedances[mode] / a_tilde
+                         * (1 - t / a_tilde)
+                         * std::cos(T(2 * M_PI) * resonant_frequencies[mode]
+                                    * t);
+            }
+        }
+        wake[i] = w;
+    }
+}
+
+
+// R [(sin(x/2) / (x/2))^2 - 2i (x - sin(x)) / x^2], series for small x
+template <typename T>
+inline void travelling_wave_term(const T x, const T shunt_impedance,
+                                 T &real, T &imag)
+{
+    if (std::abs(x) < 1e-2) {
+        const T x2 = x * x;
+        real += shunt_impedance * (1 - x2 / 12 + x2 * x2 / 360);
+        imag -= 2 * shunt_impedance * x * (1. / 6 - x2 / 120
+                                           + x2 * x2 / 5040);
+    } else {
+        T s_half, c_half;
+        mode_sincos(x / 2, s_half, c_half);
+        const T sinc = s_half / (x / 2);
+        real += shunt_impedance * sinc * sinc;
+        imag -= 2 * shunt_impedance * (x - 2 * s_half * c_half) / (x * x);
+    }
+}
+
+
+template <typename T>
+void travelling_wave_impedance(T *__restrict__ impedance,
+                               const T *__restrict__ frequencies,
+                               const T *__restrict__ shunt_impedances,
+                               const T *__restrict__ resonant_frequencies,
+                               const T *__restrict__ a_factors,
+                               const int n_modes,
+                               const int n_frequencies)
+{
+    #pragma omp parallel for
+    for (int freq = 0; freq < n_frequencies; freq++) {
+        T impedanceReal = 0;
+        T impedanceImag = 0;
+        for (int mode = 0; mode < n_modes; mode++) {
+            travelling_wave_term<T>(
+                a_factors[mode] * (frequencies[freq]
+                                   - resonant_frequencies[mode]),
+                shunt_impedances[mode], impedanceReal, impedanceImag);
+            travelling_wave_term<T>(
+                a_factors[mode] * (frequencies[freq]
+                                   + resonant_frequencies[mode]),
+                shunt_impedances[mode], impedanceReal, impedanceImag);
+        }
+        impedance[2 * freq] = impedanceReal;
+        impedance[2 * freq + 1] = impedanceImag;
+    }
+}
+
+
+extern "C" void fast_resonator_impedance(double *__restrict__ impedance,
+        const double *__restrict__ frequencies,
+        const double *__restrict__ shunt_impedances,
+        const double *__restrict__ Q_values,
+        const double *__restrict__ resonant_frequencies,
+        const int n_resonators,
+        const int n_frequencies)
+{
+    resonator_impedance<double>(impedance, frequencies, shunt_impedances,
+                                Q_values, resonant_frequencies, n_resonators,
+                                n_frequencies);
+}
+
+
+extern "C" void fast_resonator_impedancef(float *__restrict__ impedance,
+        const float *__restrict__ frequencies,
+        const float *__restrict__ shunt_impedances,
+        const float *__restrict__ Q_values,
+        const float *__restrict__ resonant_frequencies,
+        const int n_resonators,
+        const int n_frequencies)
+{
+    resonator_impedance<float>(impedance, frequencies, shunt_impedances,
+                               Q_values, resonant_frequencies, n_resonators,
+                               n_frequencies);
+}
+
+
+extern "C" void fast_resonator_wake(double *__restrict__ wake,
+        const double *__restrict__ times,
+        const double *__restrict__ shunt_impedances,
+        const double *__restrict__ omega_R,
+        const double *__restrict__ Q_values,
+        const int n_resonators,
+        const int n_times)
+{
+    resonator_wake<double>(wake, times, shunt_impedances, omega_R, Q_values,
+                           n_resonators, n_times);
+}
+
+
+extern "C" void fast_resonator_wakef(float *__restrict__ wake,
+        const float *__restrict__ times,
+        const float *__restrict__ shunt_impedances,
+        const float *__restrict__ omega_R,
+        const float *__restrict__ Q_values,
+        const int n_resonators,
+        const int n_times)
+{
+    resonator_wake<float>(wake, times, shunt_impedances, omega_R, Q_values,
+                          n_resonators, n_times);
+}
+
+
+extern "C" void fast_travelling_wave_wake(double *__restrict__ wake,
+        const double *__restrict__ times,
+        const double *__restrict__ shunt_impedances,
+        const double *__restrict__ resonant_frequencies,
+        const double *__restrict__ a_factors,
+        const int n_modes,
+        const int n_times)
+{
+    travelling_wave_wake<double>(wake, times, shunt_impedances,
+                                 resonant_frequencies, a_factors, n_modes,
+                                 n_times);
+}
+
+
+extern "C" void fast_travelling_wave_wakef(float *__restrict__ wake,
+        const float *__restrict__ times,
+        const float *__restrict__ shunt_impedances,
+        const float *__restrict__ resonant_frequencies,
+        const float *__restrict__ a_factors,
+        const int n_modes,
+        const int n_times)
+{
+    travelling_wave_wake<float>(wake, times, shunt_impedances,
+                                resonant_frequencies, a_factors, n_modes,
+                                n_times);
+}
+
+
+extern "C" void fast_travelling_wave_impedance(double *__restrict__ impedance,
+        const double *__restrict__ frequencies,
+        const double *__restrict__ shunt_impedances,
+        const double *__restrict__ resonant_frequencies,
+        const double *__restrict__ a_factors,
+        const int n_modes,
+        const int n_frequencies)
+{
+    travelling_wave_impedance<double>(impedance, frequencies, shunt_impedances,
+                                      resonant_frequencies, a_factors, n_modes,
+                                      n_frequencies);
+}
+
+
+extern "C" void fast_travelling_wave_impedancef(float *__restrict__ impedance,
+        const float *__restrict__ frequencies,
+        const float *__restrict__ shunt_impedances,
+        const float *__restrict__ resonant_frequencies,
+        const float *__restrict__ a_factors,
+        const int n_modes,
+        const int n_frequencies)
+{
+    travelling_wave_impedance<float>(impedance, frequencies, shunt_impedances,
+                                     resonant_frequencies, a_factors, n_modes,
+                                     n_frequencies);
+}
@@ -248,6 +248,50 @@ extern "C" void smooth_histogramf(const float *__restrict__ input,
 }
 
 
+// Histograms of n_rows independent sets of particles [n_rows, n_macroparticles]
+// (ensemble of realisations), one row per thread; the bins are computed as
+// in histogram() so that each row gives the same histogram as a separate call.
+template <typename T>
+static void histogram_rows_impl(const T *__restrict__ input,
+                                T *__restrict__ output, const T cut_left,
+                                const T cut_right, const int n_slices,
+                                const int n_macroparticles, const int n_rows)
+{
+    const T inv_bin_width = n_slices / (cut_right - cut_left);
+
+    #pragma omp parallel for schedule(dynamic)
+    for (int r = 0; r < n_rows; r++) {
+        const T *row = input + (size_t) r * n_macroparticles;
+        T *histo = output + (size_t) r * n_slices;
+        memset(histo, 0., n_slices * sizeof(T));
+        for (int i = 0; i < n_macroparticles; i++) {
+            const float fbin = floor((row[i] - cut_left) * inv_bin_width);
+            const int bin = (int) fbin;
+            if (bin < 0 || bin >= n_slices) continue;
+            histo[bin] += 1.;
+        }
+    }
+}
+
+extern "C" void histogram_rows(const double *__restrict__ input,
+                               double *__restrict__ output, const double cut_left,
+                               const double cut_right, const int n_slices,
+                               const int n_macroparticles, const int n_rows)
+{
+    histogram_rows_impl(input, output, cut_left, cut_right, n_slices,
+                        n_macroparticles, n_rows);
+}
+
+extern "C" void histogram_rowsf(const float *__restrict__ input,
+                                float *__restrict__ output, const float cut_left,
+                                const float cut_right, const int n_slices,
+                                const int n_macroparticles, const int n_rows)
+{
+    histogram_rows_impl(input, output, cut_left, cut_right, n_slices,
+                        n_macroparticles, n_rows);
+}
+
+
 /***** serial histogram
 
 extern "C" void histogram(const double *__restrict__ input,
@@ -12,6 +12,7 @@ Project website: http://blond.web.cern.ch/
 // Author: Danilo Quartullo, Helga Timko, Alexandre Lasheen
 
 #include "sin.h"
+#include "exp.h"
 
 using namespace vdt;
 
@@ -38,6 +39,47 @@ for (j = 0; j < n_rf; j++)
 
 }
 
+// Kick fused with the particle beam phase detector: the sine and cosine
+// components of the main RF system (j = 0) are accumulated with the window
+// weights while kicking, see beam_phase_particles
+extern "C" void kick_beam_phase(const double * __restrict__ beam_dt,
+                                double * __restrict__ beam_dE, const int n_rf,
+                                const double * __restrict__ voltage,
+                                const double * __restrict__ omega_RF,
+                                const double * __restrict__ phi_RF,
+                                const int n_macroparticles,
+                                const double acc_kick,
+                                const double alpha,
+                                const double time_offset,
+                                const double time_min,
+                                const double time_max,
+                                double * __restrict__ coefficients)
+{
+    double scoeff = 0.;
+    double ccoeff = 0.;
+
+    #pragma omp parallel for reduction(+ : scoeff, ccoeff)
+    for (int i = 0; i < n_macroparticles; i++) {
+        const double dt = beam_dt[i];
+        double s, c;
+        fast_sincos(omega_RF[0] * dt + phi_RF[0], s, c);
+        double dE = beam_dE[i] + voltage[0] * s;
+        for (int j = 1; j < n_rf; j++)
+            dE += voltage[j] * fast_sin(omega_RF[j] * dt + phi_RF[j]);
+        beam_dE[i] = dE + acc_kick;
+
+        if (dt >= time_min && dt <= time_max) {
+            const double weight = (alpha == 0.) ? 1.
+                                  : fast_exp(alpha * (dt - time_offset));
+            scoeff += weight * s;
+            ccoeff += weight * c;
+        }
+    }
+
+    coefficients[0] = scoeff;
+    coefficients[1] = ccoeff;
+}
+
 extern "C" void rf_volt_comp(const double * __restrict__ voltage,
                              const double * __restrict__ omega_RF,
                              const double * __restrict__ phi_RF,
@@ -79,6 +121,44 @@ extern "C" void kickf(const float * __restrict__ beam_dt,
 
 }
 
+extern "C" void kick_beam_phasef(const float * __restrict__ beam_dt,
+                                 float * __restrict__ beam_dE, const int n_rf,
+                                 const float * __restrict__ voltage,
+                                 const float * __restrict__ omega_RF,
+                                 const float * __restrict__ phi_RF,
+                                 const int n_macroparticles,
+                                 const float acc_kick,
+                                 const float alpha,
+                                 const float time_offset,
+                                 const float time_min,
+                                 const float time_max,
+                                 float * __restrict__ coefficients)
+{
+    float scoeff = 0.;
+    float ccoeff = 0.;
+
+    #pragma omp parallel for reduction(+ : scoeff, ccoeff)
+    for (int i = 0; i < n_macroparticles; i++) {
+        const float dt = beam_dt[i];
+        float s, c;
+        fast_sincosf(omega_RF[0] * dt + phi_RF[0], s, c);
+        float dE = beam_dE[i] + voltage[0] * s;
+        for (int j = 1; j < n_rf; j++)
+            dE += voltage[j] * fast_sinf(omega_RF[j] * dt + phi_RF[j]);
+        beam_dE[i] = dE + acc_kick;
+
+        if (dt >= time_min && dt <= time_max) {
+            const float weight = (alpha == 0.) ? 1.
+                                 : fast_expf(alpha * (dt - time_offset));
+            scoeff += weight * s;
+            ccoeff += weight * c;
+        }
+    }
+
+    coefficients[0] = scoeff;
+    coefficients[1] = ccoeff;
+}
+
 extern "C" void rf_volt_compf(const float * __restrict__ voltage,
                               const float * __restrict__ omega_RF,
                               const float * __restrict__ phi_RF,
@@ -44,6 +44,51 @@ struct particle {
 };
 
 
+// Particle sorting with respect to dt. The beam coordinates are stored in
+// the order of the previous turn, which is usually nearly sorted: the order
+// is first corrected by insertion, with a bounded number of moves, and a
+// full sort is done only if the particles moved too much.
+template <typename T>
+void sort_particles(T *__restrict__ beam_dt, T *__restrict__ beam_dE,
+                    const int n_macroparticles)
+{
+    if (std::is_sorted(beam_dt, beam_dt + n_macroparticles))
+        return;
+
+    const long max_moves = 8L * n_macroparticles;
+    long moves = 0;
+    int i = 1;
+    for (; i < n_macroparticles && moves <= max_moves; i++) {
+        const T dt = beam_dt[i];
+        const T de = beam_dE[i];
+        int j = i;
+        while (j > 0 && beam_dt[j - 1] > dt) {
+            beam_dt[j] = beam_dt[j - 1];
+            beam_dE[j] = beam_dE[j - 1];
+            j--;
+        }
+        beam_dt[j] = dt;
+        beam_dE[j] = de;
+        moves += i - j;
+    }
+    if (i == n_macroparticles)
+        return;
+
+    std::vector<particle<T>> particles; particles.reserve(n_macroparticles);
+    for (int i = 0; i < n_macroparticles; i++)
+        particles.push_back({beam_dE[i], beam_dt[i]});
+#ifdef PARALLEL
+    __gnu_parallel::sort(particles.begin(), particles.end());
+#else
+    std::sort(particles.begin(), particles.end());
+#endif
+    for (int i = 0; i < n_macroparticles; i++) {
+        beam_dE[i] = particles[i].de;
+        beam_dt[i] = particles[i].dt;
+    }
+}
+
+
 extern "C" void music_track(double *__restrict__ beam_dt,
                             double *__restrict__ beam_dE,
                             double *__restrict__ induced_voltage,
@@ -86,18 +131,7 @@ extern "C" void music_track(double *__restrict__ beam_dt,
 
 
     // Particle sorting with respect to dt
-    std::vector<particle<double>> particles; particles.reserve(n_macroparticles);
-    for (int i = 0; i < n_macroparticles; i++)
-        particles.push_back({beam_dE[i], beam_dt[i]});
-#ifdef PARALLEL
-    __gnu_parallel::sort(particles.begin(), particles.end());
-#else
-    std::sort(particles.begin(), particles.end());
-#endif
-    for (int i = 0; i < n_macroparticles; i++) {
-        beam_dE[i] = particles[i].de;
-        beam_dt[i] = particles[i].dt;
-    }
+    sort_particles(beam_dt, beam_dE, n_macroparticles);
 
     // MuSiC algorithm
     beam_dE[0] += induced_voltage[0];
@@ -152,18 +186,7 @@ extern "C" void music_track_multiturn(double *__restrict__ beam_dt,
 
 
     // Particle sorting with respect to dt
-    std::vector<particle<double>> particles; particles.reserve(n_macroparticles);
-    for (int i = 0; i < n_macroparticles; i++)
-        particles.push_back({beam_dE[i], beam_dt[i]});
-#ifdef PARALLEL
-    __gnu_parallel::sort(particles.begin(), particles.end());
-#else
-    std::sort(particles.begin(), particles.end());
-#endif
-    for (int i = 0; i < n_macroparticles; i++) {
-        beam_dE[i] = particles[i].de;
-        beam_dt[i] = particles[i].dt;
-    }
+    sort_particles(beam_dt, beam_dE, n_macroparticles);
 
     // First computation of MuSiC relative to the voltage coming from the
     // previous turn
@@ -259,18 +282,7 @@ extern "C" void music_trackf(float *__restrict__ beam_dt,
 
 
     // Particle sorting with respect to dt
-    std::vector<particle<float>> particles; particles.reserve(n_macroparticles);
-    for (int i = 0; i < n_macroparticles; i++)
-        particles.push_back({beam_dE[i], beam_dt[i]});
-#ifdef PARALLEL
-    __gnu_parallel::sort(particles.begin(), particles.end());
-#else
-    std::sort(particles.begin(), particles.end());
-#endif
-    for (int i = 0; i < n_macroparticles; i++) {
-        beam_dE[i] = particles[i].de;
-        beam_dt[i] = particles[i].dt;
-    }
+    sort_particles(beam_dt, beam_dE, n_macroparticles);
 
     // MuSiC algorithm
     beam_dE[0] += induced_voltage[0];
@@ -325,18 +337,7 @@ extern "C" void music_track_multiturnf(float *__restrict__ beam_dt,
 
 
     // Particle sorting with respect to dt
-    std::vector<particle<float>> particles; particles.reserve(n_macroparticles);
-    for (int i = 0; i < n_macroparticles; i++)
-        particles.push_back({beam_dE[i], beam_dt[i]});
-#ifdef PARALLEL
-    __gnu_parallel::sort(particles.begin(), particles.end());
-#else
-    std::sort(particles.begin(), particles.end());
-#endif
-    for (int i = 0; i < n_macroparticles; i++) {
-        beam_dE[i] = particles[i].de;
-        beam_dt[i] = particles[i].dt;
-    }
+    sort_particles(beam_dt, beam_dE, n_macroparticles);
 
     // First computation of MuSiC relative to the voltage coming from the
     // previous turn
@@ -389,4 +390,293 @@ extern "C" void music_track_multiturnf(float *__restrict__ beam_dt,
 }
 
 
+// MuSiC for several resonators, optionally in parallel. For each
+// resonator, the state (input_first_component, input_second_component) is
+// propagated from particle i to particle i+1 by the affine map
+// x -> M(dt[i+1] - dt[i]) x + (1, 0), and the induced voltage is the sum
+// over the resonators. All resonators share the sort and the sweep over
+// the particles.
+// The composition of affine maps is associative: in parallel, the sorted
+// particles are split in chunks, the composed map of each chunk is computed
+// in parallel, the states at the chunk starts are obtained by a prefix scan
+// over the chunks, and the voltages and kicks of each chunk are then
+// computed in parallel from its start state.
 
+// Parameters of the resonators, see music.py
+template <typename T>
+struct music_resonators {
+    int n;
+    const T *alpha;
+    const T *omega_bar;
+    const T *cnst;
+    const T *coeff1;
+    const T *coeff2;
+    const T *coeff3;
+    const T *coeff4;
+};
+
+
+// Matrix M of the MuSiC recursion of resonator k for a time difference
+template <typename T>
+inline void music_matrix(const T time_difference,
+                         const music_resonators<T> &res, const int k,
+                         T *matrix)
+{
+    const T exp_term = fast_exp(-res.alpha[k] * time_difference);
+    const T cos_term = fast_cos(res.omega_bar[k] * time_difference);
+    const T sin_term = fast_sin(res.omega_bar[k] * time_difference);
+
+    matrix[0] = exp_term * (cos_term + res.coeff1[k] * sin_term);
+    matrix[1] = exp_term * res.coeff2[k] * sin_term;
+    matrix[2] = exp_term * res.coeff3[k] * sin_term;
+    matrix[3] = exp_term * (cos_term + res.coeff4[k] * sin_term);
+}
+
+
+// MuSiC recursion from particle first to particle last; state holds the
+// first components of all the resonators followed by the second ones
+template <typename T>
+void music_sweep(const T *__restrict__ beam_dt, T *__restrict__ beam_dE,
+                 T *__restrict__ induced_voltage, const int first,
+                 const int last, T *__restrict__ state,
+                 const music_resonators<T> &res)
+{
+    const int n = res.n;
+    T matrix[4];
+    for (int i = first; i < last; i++) {
+        const T time_difference = beam_dt[i + 1] - beam_dt[i];
+        T voltage = 0;
+        for (int k = 0; k < n; k++) {
+            music_matrix<T>(time_difference, res, k, matrix);
+            const T product_first_component =
+                matrix[0] * state[k] + matrix[1] * state[n + k];
+            const T product_second_component =
+                matrix[2] * state[k] + matrix[3] * state[n + k];
+            voltage += res.cnst[k] * (0.5 + product_first_component);
+            state[k] = product_first_component + 1;
+            state[n + k] = product_second_component;
+        }
+        induced_voltage[i + 1] = voltage;
+        beam_dE[i + 1] += voltage;
+    }
+}
+
+
+template <typename T>
+void music_track_resonators_impl(T *__restrict__ beam_dt,
+                                 T *__restrict__ beam_dE,
+                                 T *__restrict__ induced_voltage,
+                                 T *__restrict__ array_parameters,
+                                 const int n_macroparticles,
+                                 const music_resonators<T> &res,
+                                 const int multi_turn, const int parallel)
+{
+    const int n = res.n;
+    sort_particles(beam_dt, beam_dE, n_macroparticles);
+
+    // State after the first particle
+    std::vector<T> state(2 * n);
+    if (multi_turn) {
+        T matrix[4];
+        T voltage = 0;
+        const T time_difference_0 = beam_dt[0] + array_parameters[2 * n]
+                                    - array_parameters[2 * n + 1];
+        for (int k = 0; k < n; k++) {
+            music_matrix<T>(time_difference_0, res, k, matrix);
+            const T product_first_component =
+                matrix[0] * array_parameters[k]
+                + matrix[1] * array_parameters[n + k];
+            const T product_second_component =
+                matrix[2] * array_parameters[k]
+                + matrix[3] * array_parameters[n + k];
+            voltage += res.cnst[k] * (0.5 + product_first_component);
+            state[k] = product_first_component + 1;
+            state[n + k] = product_second_component;
+        }
+        induced_voltage[0] = voltage;
+    } else {
+        for (int k = 0; k < n; k++) {
+            state[k] = 1;
+            state[n + k] = 0;
+        }
+    }
+    beam_dE[0] += induced_voltage[0];
+
+    // Chunks of at least 4096 particles, one per thread
+    const int n_steps = n_macroparticles - 1;
+    const int n_chunks = parallel ? std::max(1, std::min(
+                                        omp_get_max_threads(),
+                                        n_steps / 4096))
+                                  : 1;
+
+    if (n_chunks == 1) {
+        music_sweep<T>(beam_dt, beam_dE, induced_voltage, 0, n_steps,
+                       state.data(), res);
+    } else {
+        // Composed map x -> P x + q of each chunk and resonator
+        std::vector<T> P(4 * n * n_chunks), q(2 * n * n_chunks);
+
+        #pragma omp parallel for
+        for (int c = 0; c < n_chunks; c++) {
+            const int first = (long) n_steps * c / n_chunks;
+            const int last = (long) n_steps * (c + 1) / n_chunks;
+            T *p = &P[4 * n * c];
+            T *r = &q[2 * n * c];
+            for (int k = 0; k < n; k++) {
+                p[4 * k] = 1; p[4 * k + 1] = 0;
+                p[4 * k + 2] = 0; p[4 * k + 3] = 1;
+                r[2 * k] = 0; r[2 * k + 1] = 0;
+            }
+            T matrix[4];
+            for (int i = first; i < last; i++) {
+                const T time_difference = beam_dt[i + 1] - beam_dt[i];
+                for (int k = 0; k < n; k++) {
+                    music_matrix<T>(time_difference, res, k, matrix);
+                    T *pk = &p[4 * k];
+                    T *rk = &r[2 * k];
+                    const T n0 = matrix[0] * pk[0] + matrix[1] * pk[2];
+                    const T n1 = matrix[0] * pk[1] + matrix[1] * pk[3];
+                    const T n2 = matrix[2] * pk[0] + matrix[3] * pk[2];
+                    const T n3 = matrix[2] * pk[1] + matrix[3] * pk[3];
+                    const T r0 = matrix[0] * rk[0] + matrix[1] * rk[1] + 1;
+                    const T r1 = matrix[2] * rk[0] + matrix[3] * rk[1];
+                    pk[0] = n0; pk[1] = n1; pk[2] = n2; pk[3] = n3;
+                    rk[0] = r0; rk[1] = r1;
+                }
+            }
+        }
+
+        // Exclusive prefix scan: states at the start of each chunk
+        std::vector<T> start(2 * n * n_chunks);
+        std::copy(state.begin(), state.end(), start.begin());
+        for (int c = 1; c < n_chunks; c++) {
+            const T *x = &start[2 * n * (c - 1)];
+            T *y = &start[2 * n * c];
+            for (int k = 0; k < n; k++) {
+                const T *pk = &P[4 * n * (c - 1) + 4 * k];
+                const T *rk = &q[2 * n * (c - 1) + 2 * k];
+                y[k] = pk[0] * x[k] + pk[1] * x[n + k] + rk[0];
+                y[n + k] = pk[2] * x[k] + pk[3] * x[n + k] + rk[1];
+            }
+        }
+
+        #pragma omp parallel for
+        for (int c = 0; c < n_chunks; c++) {
+            const int first = (long) n_steps * c / n_chunks;
+            const int last = (long) n_steps * (c + 1) / n_chunks;
+            music_sweep<T>(beam_dt, beam_dE, induced_voltage, first, last,
+                           &start[2 * n * c], res);
+        }
+        std::copy(start.end() - 2 * n, start.end(), state.begin());
+    }
+
+    std::copy(state.begin(), state.end(), array_parameters);
+    array_parameters[2 * n + 1] = beam_dt[n_macroparticles - 1];
+}
+
+
+extern "C" void music_track_scan(double *__restrict__ beam_dt,
+                                 double *__restrict__ beam_dE,
+                                 double *__restrict__ induced_voltage,
+                                 double *__restrict__ array_parameters,
+                                 const int n_macroparticles,
+                                 const double alpha,
+                                 const double omega_bar,
+                                 const double cnst,
+                                 const double coeff1,
+                                 const double coeff2,
+                                 const double coeff3,
+                                 const double coeff4,
+                                 const int multi_turn)
+{
+    /*
+    Single-turn (multi_turn = 0) or multi-turn induced voltage and update
+    of the energies, as music_track and music_track_multiturn, computed in
+    parallel by chunks of particles.
+    */
+    const music_resonators<double> res = {1, &alpha, &omega_bar, &cnst,
+                                          &coeff1, &coeff2, &coeff3,
+                                          &coeff4};
+    music_track_resonators_impl<double>(beam_dt, beam_dE, induced_voltage,
+                                        array_parameters, n_macroparticles,
+                                        res, multi_turn, 1);
+}
+
+
+extern "C" void music_track_scanf(float *__restrict__ beam_dt,
+                                  float *__restrict__ beam_dE,
+                                  float *__restrict__ induced_voltage,
+                                  float *__restrict__ array_parameters,
+                                  const int n_macroparticles,
+                                  const float alpha,
+                                  const float omega_bar,
+                                  const float cnst,
+                                  const float coeff1,
+                                  const float coeff2,
+                                  const float coeff3,
+                                  const float coeff4,
+                                  const int multi_turn)
+{
+    const music_resonators<float> res = {1, &alpha, &omega_bar, &cnst,
+                                         &coeff1, &coeff2, &coeff3, &coeff4};
+    music_track_resonators_impl<float>(beam_dt, beam_dE, induced_voltage,
+                                       array_parameters, n_macroparticles,
+                                       res, multi_turn, 1);
+}
+
+
+extern "C" void music_track_resonators(double *__restrict__ beam_dt,
+                                       double *__restrict__ beam_dE,
+                                       double *__restrict__ induced_voltage,
+                                       double *__restrict__ array_parameters,
+                                       const int n_macroparticles,
+                                       const int n_resonators,
+                                       const double *__restrict__ alpha,
+                                       const double *__restrict__ omega_bar,
+                                       const double *__restrict__ cnst,
+                                       const double *__restrict__ coeff1,
+                                       const double *__restrict__ coeff2,
+                                       const double *__restrict__ coeff3,
+                                       const double *__restrict__ coeff4,
+                                       const int multi_turn,
+                                       const int parallel)
+{
+    /*
+    Single-turn (multi_turn = 0) or multi-turn induced voltage of several
+    resonators and update of the energies. The arrays alpha, ..., coeff4
+    hold the parameters of each resonator; array_parameters holds the first
+    components of the resonators, the second components, the revolution
+    period and the last longitudinal coordinate.
+    */
+    const music_resonators<double> res = {n_resonators, alpha, omega_bar,
+                                          cnst, coeff1, coeff2, coeff3,
+                                          coeff4};
+    music_track_resonators_impl<double>(beam_dt, beam_dE, induced_voltage,
+                                        array_parameters, n_macroparticles,
+                                        res, multi_turn, parallel);
+}
+
+
+extern "C" void music_track_resonatorsf(float *__restrict__ beam_dt,
+                                        float *__restrict__ beam_dE,
+                                        float *__restrict__ induced_voltage,
+                                        float *__restrict__ array_parameters,
+                                        const int n_macroparticles,
+                                        const int n_resonators,
+                                        const float *__restrict__ alpha,
+                                        const float *__restrict__ omega_bar,
+                                        const float *__restrict__ cnst,
+                                        const float *__restrict__ coeff1,
+                                        const float *__restrict__ coeff2,
+                                        const float *__restrict__ coeff3,
+                                        const float *__restrict__ coeff4,
+                                        const int multi_turn,
+                                        const int parallel)
+{
+    const music_resonators<float> res = {n_resonators, alpha, omega_bar,
+                                         cnst, coeff1, coeff2, coeff3,
+                                         coeff4};
+    music_track_resonators_impl<float>(beam_dt, beam_dE, induced_voltage,
+                                       array_parameters, n_macroparticles,
+                                       res, multi_turn, parallel);
+}
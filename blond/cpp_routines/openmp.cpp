@@ -9,3 +9,14 @@
 	int omp_get_thread_num() {return 0;}
 #endif
 
+// Number of threads of the next parallel regions (no effect without PARALLEL)
+extern "C" void set_num_threads(const int n_threads) {
+#ifdef PARALLEL
+	omp_set_num_threads(n_threads);
+#endif
+}
+
+// Number of threads of the next parallel regions (1 without PARALLEL)
+extern "C" int get_num_threads() {
+	return omp_get_max_threads();
+}
@@ -0,0 +1,288 @@
+/*
+Copyright 2014-2017 CERN. This software is distributed under the
+terms of the GNU General Public Licence version 3 (GPL Version 3),
+copied verbatim in the file LICENCE.md.
+In applying this licence, CERN does not waive the privileges and immunities
+granted to it by virtue of its status as an Intergovernmental Organization or
+submit itself to any jurisdiction.
+Project website: http://blond.web.cern.ch/
+*/
+
+// Optimised C++ routines for the bunch-by-bunch analysis of the profile.
+// The bunches are given as ranges [first, last) of bins.
+
+
+#include "openmp.h"
+#include <cmath>
+#include <limits>
+
+
+// Gaussian fit (amplitude, position, sigma) of each bunch on the bins above
+// threshold times the maximum of the bunch. Without warm start, the first
+// guess is the parabola fitted to the logarithm of these bins (weights y^2),
+// or their moments if the parabola is not concave. The guess is refined by
+// n_iterations Gauss-Newton steps, in coordinates normalised to the bin size
+// and to the maximum of the bunch.
+template <typename T>
+static void gaussian_fit_impl(const T * __restrict__ bin_centers,
+                              const T * __restrict__ profile,
+                              const int * __restrict__ first,
+                              const int * __restrict__ last,
+                              const int n_bunches,
+                              const double threshold,
+                              const int n_iterations,
+                              const bool warm_start,
+                              double * __restrict__ parameters)
+{
+    #pragma omp parallel for schedule(dynamic)
+    for (int b = 0; b < n_bunches; b++) {
+        double *p = parameters + 3 * b;
+        if (last[b] - first[b] < 2) continue;
+
+        int i_max = first[b];
+        for (int i = first[b]; i < last[b]; i++)
+            if (profile[i] > profile[i_max]) i_max = i;
+        const double y_max = profile[i_max];
+        if (y_max <= 0.) continue;
+
+        const double y_min = threshold * y_max;
+        const double x_max = bin_centers[i_max];
+        const double bin_size = bin_centers[first[b] + 1]
+                                - bin_centers[first[b]];
+
+        double amplitude, position, sigma;
+        if (warm_start && p[2] > 0.) {
+            amplitude = p[0] / y_max;
+            position = (p[1] - x_max) / bin_size;
+            sigma = p[2] / bin_size;
+        } else {
+            double s0 = 0., s1 = 0., s2 = 0., s3 = 0., s4 = 0.;
+            double t0 = 0., t1 = 0., t2 = 0.;
+            double m0 = 0., m1 = 0., m2 = 0.;
+            for (int i = first[b]; i < last[b]; i++) {
+                const double y = profile[i] / y_max;
+                if (profile[i] <= y_min || y <= 0.) continue;
+                const double u = (bin_centers[i] - x_max) / bin_size;
+                const double w = y * y;
+                const double l = std::log(y);
+                s0 += w;
+                s1 += w * u;
+                s2 += w * u * u;
+                s3 += w * u * u * u;
+                s4 += w * u * u * u * u;
+                t0 += w * l;
+                t1 += w * u * l;
+                t2 += w * u * u * l;
+                m0 += y;
+                m1 += y * u;
+                m2 += y * u * u;
+            }
+
+            // Normal equations of ln(y) = a0 + a1 u + a2 u^2, Cramer's rule
+            const double c00 = s2 * s4 - s3 * s3;
+            const double c01 = s1 * s4 - s2 * s3;
+            const double c02 = s1 * s3 - s2 * s2;
+            const double det = s0 * c00 - s1 * c01 + s2 * c02;
+            double a0 = 0., a1 = 0., a2 = 0.;
+            if (det > 0.) {
+                a0 = (t0 * c00 - s1 * (t1 * s4 - s3 * t2)
+                      + s2 * (t1 * s3 - s2 * t2)) / det;
+                a1 = (s0 * (t1 * s4 - s3 * t2) - t0 * c01
+                      + s2 * (s1 * t2 - t1 * s2)) / det;
+                a2 = (s0 * (s2 * t2 - t1 * s3) - s1 * (s1 * t2 - t1 * s2)
+                      + t0 * c02) / det;
+            }
+
+            if (a2 < 0.) {
+                amplitude = std::exp(a0 - a1 * a1 / (4. * a2));
+                position = -a1 / (2. * a2);
+                sigma = std::sqrt(-0.5 / a2);
+            } else {
+                amplitude = 1.;
+                position = m1 / m0;
+                sigma = std::sqrt(std::fmax(m2 / m0 - position * position,
+                                            0.));
+            }
+        }
+
+        for (int iteration = 0; iteration < n_iterations; iteration++) {
+            if (!(sigma > 0.)) break;
+
+            // Normal equations J^T J step = J^T r
+            double j00 = 0., j01 = 0., j02 = 0., j11 = 0., j12 = 0., j22 = 0.;
+            double r0 = 0., r1 = 0., r2 = 0.;
+            for (int i = first[b]; i < last[b]; i++) {
+                if (profile[i] <= y_min) continue;
+                const double d = ((bin_centers[i] - x_max) / bin_size
+                                  - position) / sigma;
+                const double g = std::exp(-0.5 * d * d);
+                const double r = profile[i] / y_max - amplitude * g;
+                const double dp = amplitude * g * d / sigma;
+                const double ds = dp * d;
+                j00 += g * g;
+                j01 += g * dp;
+                j02 += g * ds;
+                j11 += dp * dp;
+                j12 += dp * ds;
+                j22 += ds * ds;
+                r0 += g * r;
+                r1 += dp * r;
+                r2 += ds * r;
+            }
+
+            const double c00 = j11 * j22 - j12 * j12;
+            const double c01 = j01 * j22 - j12 * j02;
+            const double c02 = j01 * j12 - j11 * j02;
+            const double det = j00 * c00 - j01 * c01 + j02 * c02;
+            if (!(det > 0.)) break;
+
+            amplitude += (r0 * c00 - j01 * (r1 * j22 - j12 * r2)
+                          + j02 * (r1 * j12 - j11 * r2)) / det;
+            position += (j00 * (r1 * j22 - j12 * r2) - r0 * c01
+                         + j02 * (j01 * r2 - r1 * j02)) / det;
+            sigma = std::fabs(sigma + (j00 * (j11 * r2 - r1 * j12)
+                                       - j01 * (j01 * r2 - r1 * j02)
+                                       + r0 * c02) / det);
+        }
+
+        p[0] = amplitude * y_max;
+        p[1] = x_max + position * bin_size;
+        p[2] = sigma * bin_size;
+    }
+}
+
+
+extern "C" void gaussian_fit(const double * __restrict__ bin_centers,
+                             const double * __restrict__ profile,
+                             const int * __restrict__ first,
+                             const int * __restrict__ last,
+                             const int n_bunches,
+                             const double threshold,
+                             const int n_iterations,
+                             const bool warm_start,
+                             double * __restrict__ parameters)
+{
+    gaussian_fit_impl(bin_centers, profile, first, last, n_bunches,
+                      threshold, n_iterations, warm_start, parameters);
+}
+
+
+extern "C" void gaussian_fitf(const float * __restrict__ bin_centers,
+                              const float * __restrict__ profile,
+                              const int * __restrict__ first,
+                              const int * __restrict__ last,
+                              const int n_bunches,
+                              const double threshold,
+                              const int n_iterations,
+                              const bool warm_start,
+                              double * __restrict__ parameters)
+{
+    gaussian_fit_impl(bin_centers, profile, first, last, n_bunches,
+                      threshold, n_iterations, warm_start, parameters);
+}
+
+
+// Position and length (4 sigma) of each bunch from the full width at half
+// maximum (the half maximum being shift + (maximum - shift) / 2, with linear
+// interpolation between the bins) and from the RMS of the line density
+// (trapezoidal rule), in one pass over the bins of the bunches. NaN if the
+// half maximum is not crossed inside the range of the bunch.
+template <typename T>
+static void bunch_fwhm_rms_impl(const T * __restrict__ bin_centers,
+                                const T * __restrict__ profile,
+                                const int * __restrict__ first,
+                                const int * __restrict__ last,
+                                const int n_bunches,
+                                const double shift,
+                                double * __restrict__ fwhm_position,
+                                double * __restrict__ fwhm_length,
+                                double * __restrict__ rms_position,
+                                double * __restrict__ rms_length)
+{
+    // 4 sigma over the FWHM of a Gaussian
+    const double cfwhm = 4. / (2. * std::sqrt(2. * std::log(2.)));
+    const double nan = std::numeric_limits<double>::quiet_NaN();
+
+    #pragma omp parallel for schedule(dynamic)
+    for (int b = 0; b < n_bunches; b++) {
+        fwhm_position[b] = fwhm_length[b] = nan;
+        rms_position[b] = rms_length[b] = nan;
+        const int i_first = first[b];
+        const int i_last = last[b] - 1;
+        if (i_last < i_first) continue;
+
+        // Maximum and moments relative to the first bin
+        const double x_ref = bin_centers[i_first];
+        double y_max = profile[i_first];
+        double m0 = 0., m1 = 0., m2 = 0.;
+        for (int i = i_first; i <= i_last; i++) {
+            const double y = profile[i];
+            const double u = bin_centers[i] - x_ref;
+            y_max = std::fmax(y_max, y);
+            m0 += y;
+            m1 += y * u;
+            m2 += y * u * u;
+        }
+        const double u_last = bin_centers[i_last] - x_ref;
+        m0 -= 0.5 * (profile[i_first] + profile[i_last]);
+        m1 -= 0.5 * profile[i_last] * u_last;
+        m2 -= 0.5 * profile[i_last] * u_last * u_last;
+
+        if (m0 != 0.) {
+            const double mean = m1 / m0;
+            rms_position[b] = x_ref + mean;
+            rms_length[b] = 4. * std::sqrt(m2 / m0 - mean * mean);
+        }
+
+        // Bins of the first and last crossings of the half maximum
+        const double half_max = shift + 0.5 * (y_max - shift);
+        int t1 = i_first;
+        while (t1 < i_last && profile[t1] < half_max) t1++;
+        int t2 = i_last;
+        while (t2 > i_first && profile[t2] < half_max) t2--;
+        if (t1 == i_first || t2 == i_last || profile[t1] < half_max)
+            continue;
+
+        const double bin_size = bin_centers[t1] - bin_centers[t1 - 1];
+        const double t_left = bin_centers[t1] - bin_size
+                              * (profile[t1] - half_max)
+                              / (profile[t1] - profile[t1 - 1]);
+        const double t_right = bin_centers[t2] + bin_size
+                               * (profile[t2] - half_max)
+                               / (profile[t2] - profile[t2 + 1]);
+        fwhm_position[b] = 0.5 * (t_left + t_right);
+        fwhm_length[b] = cfwhm * (t_right - t_left);
+    }
+}
+
+
+extern "C" void bunch_fwhm_rms(const double * __restrict__ bin_centers,
+                               const double * __restrict__ profile,
+                               const int * __restrict__ first,
+                               const int * __restrict__ last,
+                               const int n_bunches,
+                               const double shift,
+                               double * __restrict__ fwhm_position,
+                               double * __restrict__ fwhm_length,
+                               double * __restrict__ rms_position,
+                               double * __restrict__ rms_length)
+{
+    bunch_fwhm_rms_impl(bin_centers, profile, first, last, n_bunches, shift,
+                        fwhm_position, fwhm_length, rms_position, rms_length);
+}
+
+
+extern "C" void bunch_fwhm_rmsf(const float * __restrict__ bin_centers,
+                                const float * __restrict__ profile,
+                                const int * __restrict__ first,
+                                const int * __restrict__ last,
+                                const int n_bunches,
+                                const double shift,
+                                double * __restrict__ fwhm_position,
+                                double * __restrict__ fwhm_length,
+                                double * __restrict__ rms_position,
+                                double * __restrict__ rms_length)
+{
+    bunch_fwhm_rms_impl(bin_centers, profile, first, last, n_bunches, shift,
+                        fwhm_position, fwhm_length, rms_position, rms_length);
+}
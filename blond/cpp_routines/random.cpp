@@ -0,0 +1,59 @@
+/*
+Copyright 2014-2017 CERN. This software is distributed under the
+terms of the GNU General Public Licence version 3 (GPL Version 3),
+copied verbatim in the file LICENCE.md.
+In applying this licence, CERN does not waive the privileges and immunities
+granted to it by virtue of its status as an Intergovernmental Organization or
+submit itself to any jurisdiction.
+Project website: http://blond.web.cern.ch/
+*/
+
+// Optimised C++ routines generating uniform and normal random numbers in
+// bulk, see random.h. The number of index start + i (or indices[i] if given)
+// is written in output[i]; the result does not depend on the number of
+// threads nor on the splitting of the indices between the calls.
+
+#include "openmp.h"
+#include "random.h"
+
+
+SCALAR_LOOP static void random_impl(double * __restrict__ output,
+                                    const int64_t * __restrict__ indices,
+                                    const int64_t start, const int n,
+                                    const int sequence, const uint64_t seed,
+                                    const bool shift, const uint32_t stream,
+                                    const uint32_t dimension,
+                                    const bool normal)
+{
+    const RandomSequence random(sequence, seed, shift, stream, dimension);
+
+    #pragma omp parallel for
+    for (int i = 0; i < n; i++) {
+        const double u = random.uniform(indices ? indices[i] : start + i);
+        output[i] = normal ? normal_quantile(u) : u;
+    }
+}
+
+
+extern "C" void random_uniform(double * __restrict__ output,
+                               const int64_t * __restrict__ indices,
+                               const int64_t start, const int n,
+                               const int sequence, const uint64_t seed,
+                               const bool shift, const uint32_t stream,
+                               const uint32_t dimension)
+{
+    random_impl(output, indices, start, n, sequence, seed, shift, stream,
+                dimension, false);
+}
+
+
+extern "C" void random_normal(double * __restrict__ output,
+                              const int64_t * __restrict__ indices,
+                              const int64_t start, const int n,
+                              const int sequence, const uint64_t seed,
+                              const bool shift, const uint32_t stream,
+                              const uint32_t dimension)
+{
+    random_impl(output, indices, start, n, sequence, seed, shift, stream,
+                dimension, true);
+}
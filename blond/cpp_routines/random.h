@@ -0,0 +1,207 @@
+/*
+Copyright 2014-2017 CERN. This software is distributed under the
+terms of the GNU General Public Licence version 3 (GPL Version 3),
+copied verbatim in the file LICENCE.md.
+In applying this licence, CERN does not waive the privileges and immunities
+granted to it by virtue of its status as an Intergovernmental Organization or
+submit itself to any jurisdiction.
+Project website: http://blond.web.cern.ch/
+*/
+
+// Counter-based and quasi-random number sequences. Every number is a pure
+// function of (seed, stream, dimension, index), so that any range of indices
+// can be generated by any thread or process with the same result.
+
+#ifndef _RANDOM_H_
+#define _RANDOM_H_
+
+#include <cmath>
+#include <stdint.h>
+
+// Sequences
+enum { RANDOM_PHILOX = 0, RANDOM_SOBOL = 1, RANDOM_HALTON = 2 };
+
+// Number of dimensions of the quasi-random sequences
+const int RANDOM_QUASI_DIMENSIONS = 8;
+
+// For the loops generating random numbers: the same scalar code is used for
+// every index, since a vectorised loop would round the transcendental
+// functions differently in its body and remainder
+#if defined(__GNUC__) && !defined(__clang__) && !defined(__INTEL_COMPILER)
+#define SCALAR_LOOP __attribute__((optimize("no-tree-vectorize")))
+#else
+#define SCALAR_LOOP
+#endif
+
+
+// Philox4x32-10 (Salmon et al., SC'11) of the counter
+// {index, dimension, stream} with the key seed
+static inline void philox4x32(const uint64_t seed, const uint32_t stream,
+                              const uint32_t dimension, const uint64_t index,
+                              uint32_t out[4])
+{
+    uint32_t c0 = (uint32_t) index, c1 = (uint32_t) (index >> 32);
+    uint32_t c2 = dimension, c3 = stream;
+    uint32_t k0 = (uint32_t) seed, k1 = (uint32_t) (seed >> 32);
+
+    for (int round = 0; round < 10; round++) {
+        const uint64_t p0 = (uint64_t) 0xD2511F53u * c0;
+        const uint64_t p1 = (uint64_t) 0xCD9E8D57u * c2;
+        const uint32_t n0 = (uint32_t) (p1 >> 32) ^ c1 ^ k0;
+        const uint32_t n2 = (uint32_t) (p0 >> 32) ^ c3 ^ k1;
+        c1 = (uint32_t) p1;
+        c3 = (uint32_t) p0;
+        c0 = n0;
+        c2 = n2;
+        k0 += 0x9E3779B9u;
+        k1 += 0xBB67AE85u;
+    }
+    out[0] = c0;
+    out[1] = c1;
+    out[2] = c2;
+    out[3] = c3;
+}
+
+
+// Uniform number in (0, 1), with 53 random bits
+static inline double philox_uniform(const uint64_t seed, const uint32_t stream,
+                                    const uint32_t dimension,
+                                    const uint64_t index)
+{
+    uint32_t r[4];
+    philox4x32(seed, stream, dimension, index, r);
+    const uint64_t x = ((uint64_t) r[0] << 21) ^ (r[1] >> 11);
+    return (x + 0.5) * (1. / 9007199254740992.);
+}
+
+
+// Radical inverse of index + 1 in the prime base of the dimension
+static inline double halton(const int dimension, const uint64_t index)
+{
+    static const int primes[RANDOM_QUASI_DIMENSIONS] = {2, 3, 5, 7, 11, 13,
+                                                        17, 19};
+    const uint64_t base = primes[dimension];
+    const double inv_base = 1. / base;
+    uint64_t i = index + 1;
+    double x = 0., f = inv_base;
+    while (i > 0) {
+        x += f * (i % base);
+        i /= base;
+        f *= inv_base;
+    }
+    return x;
+}
+
+
+// One dimension of a sequence. The quasi-random sequences are randomised by
+// a digital shift (Sobol) or a rotation (Halton) drawn from the seed if shift
+// is set.
+struct RandomSequence {
+    int sequence;
+    uint64_t seed;
+    uint32_t stream;
+    uint32_t dimension;
+    bool shift;
+    uint32_t v[32];
+    uint32_t sobol_shift;
+    double halton_shift;
+
+    RandomSequence(const int sequence, const uint64_t seed, const bool shift,
+                   const uint32_t stream, const uint32_t dimension)
+        : sequence(sequence), seed(seed), stream(stream),
+          dimension(dimension), shift(shift), sobol_shift(0),
+          halton_shift(0.)
+    {
+        if (sequence == RANDOM_SOBOL)
+            sobol_directions();
+        if (shift) {
+            uint32_t r[4];
+            philox4x32(seed, stream, dimension, ~(uint64_t) 0, r);
+            sobol_shift = r[0];
+            halton_shift = philox_uniform(seed, stream, dimension,
+                                          ~(uint64_t) 0);
+        }
+    }
+
+    // Direction numbers of the first dimensions of the Sobol sequence
+    // (Joe and Kuo, new-joe-kuo-6.21201); the first dimension is the van
+    // der Corput sequence in base 2
+    void sobol_directions()
+    {
+        static const int s[RANDOM_QUASI_DIMENSIONS] = {0, 1, 2, 3, 3, 4, 4, 5};
+        static const int a[RANDOM_QUASI_DIMENSIONS] = {0, 0, 1, 1, 2, 1, 4, 2};
+        static const int m[RANDOM_QUASI_DIMENSIONS][5] = {
+            {1}, {1}, {1, 3}, {1, 3, 1}, {1, 1, 1}, {1, 1, 3, 3},
+            {1, 3, 5, 13}, {1, 1, 5, 5, 17}
+        };
+
+        const int sd = s[dimension];
+        for (int k = 0; k < 32; k++) {
+            if (sd == 0) {
+                v[k] = 1u << (31 - k);
+            } else if (k < sd) {
+                v[k] = (uint32_t) m[dimension][k] << (31 - k);
+            } else {
+                v[k] = v[k - sd] ^ (v[k - sd] >> sd);
+                for (int j = 1; j < sd; j++)
+                    if ((a[dimension] >> (sd - 1 - j)) & 1)
+                        v[k] ^= v[k - j];
+            }
+        }
+    }
+
+    // Uniform number in (0, 1) of the index
+    inline double uniform(const uint64_t index) const
+    {
+        if (sequence == RANDOM_SOBOL) {
+            // Gray code order, as in the usual recursive generation, from
+            // the second point (the first one is 0)
+            const uint64_t gray = (index + 1) ^ ((index + 1) >> 1);
+            uint32_t x = sobol_shift;
+            for (int k = 0; k < 32; k++)
+                if ((gray >> k) & 1)
+                    x ^= v[k];
+            return (x + 0.5) * (1. / 4294967296.);
+        } else if (sequence == RANDOM_HALTON) {
+            double x = halton(dimension, index) + halton_shift;
+            if (x >= 1.) x -= 1.;
+            if (x <= 0.) x = 0.5 / 9007199254740992.;
+            return x;
+        }
+        return philox_uniform(seed, stream, dimension, index);
+    }
+};
+
+
+// Standard normal quantile of p in (0, 1) (Acklam's rational approximation,
+// relative error below 1.2e-9)
+static inline double normal_quantile(const double p)
+{
+    static const double a[6] = {-3.969683028665376e+01, 2.209460984245205e+02,
+                                -2.759285104469687e+02, 1.383577518672690e+02,
+                                -3.066479806614716e+01, 2.506628277459239e+00};
+    static const double b[5] = {-5.447609879822406e+01, 1.615858368580409e+02,
+                                -1.556989798598866e+02, 6.680131188771972e+01,
+                                -1.328068155288572e+01};
+    static const double c[6] = {-7.784894002430293e-03, -3.223964580411365e-01,
+                                -2.400758277161838e+00, -2.549732539343734e+00,
+                                4.374664141464968e+00, 2.938163982698783e+00};
+    static const double d[4] = {7.784695709041462e-03, 3.224671290700398e-01,
+                                2.445134137142996e+00, 3.754408661907416e+00};
+    const double p_low = 0.02425;
+
+    if (p < p_low || p > 1. - p_low) {
+        const double q = std::sqrt(-2. * std::log(p < p_low ? p : 1. - p));
+        const double x = (((((c[0] * q + c[1]) * q + c[2]) * q + c[3]) * q
+                           + c[4]) * q + c[5])
+                         / ((((d[0] * q + d[1]) * q + d[2]) * q + d[3]) * q + 1.);
+        return p < p_low ? x : -x;
+    }
+    const double q = p - 0.5;
+    const double r = q * q;
+    return (((((a[0] * r + a[1]) * r + a[2]) * r + a[3]) * r + a[4]) * r
+            + a[5]) * q
+           / (((((b[0] * r + b[1]) * r + b[2]) * r + b[3]) * r + b[4]) * r + 1.);
+}
+
+#endif // _RANDOM_H_
@@ -16,6 +16,7 @@
 
 from __future__ import division, print_function
 from builtins import range, object
+from collections import OrderedDict
 import numpy as np
 from ctypes import c_uint, c_double, c_void_p
 from scipy.constants import e
@@ -23,6 +24,18 @@ from ..toolbox.next_regular import next_regular
 from ..utils import bmath as bm
 
 
+def _output_buffer(array, shape, dtype):
+    """
+    Output array of an impedance source, reused for the next calculation
+    if it has the expected shape and type, None otherwise.
+    """
+
+    if isinstance(array, np.ndarray) and array.shape == shape and \
+            array.dtype == dtype and array.flags['C_CONTIGUOUS']:
+        return array
+    return None
+
+
 class TotalInducedVoltage(object):
     r"""
     Object gathering all the induced voltage contributions. The input is a
@@ -39,6 +52,10 @@ class TotalInducedVoltage(object):
         Profile object
     induced_voltage_list : object list
         List of objects for which induced voltages have to be calculated
+    cache_size : int, optional
+        If larger than 0, reprocess() is lazy and the total impedances and
+        wakes of the last cache_size slicings are kept, see reprocess();
+        default is 0 (no cache)
 
     Attributes
     ----------
@@ -49,12 +66,16 @@ class TotalInducedVoltage(object):
     induced_voltage_list : object list
         List of objects for which induced voltages have to be calculated
     induced_voltage : float array
-        Array to store the computed induced voltage [V]
+        Array to store the computed induced voltage [V]; [n_realisations,
+        n_slices] for an ensemble beam, from the profile of each realisation
     time_array : float array
         Time array corresponding to induced_voltage [s]
+    reprocess_pending : bool
+        Profile changed, the contributions are reprocessed at the next
+        induced voltage calculation
     """
 
-    def __init__(self, Beam, Profile, induced_voltage_list):
+    def __init__(self, Beam, Profile, induced_voltage_list, cache_size=0):
         """
         Constructor.
         """
@@ -74,18 +95,67 @@ class TotalInducedVoltage(object):
         # Time array of the wake in s
         self.time_array = self.profile.bin_centers
 
+        # Cache of the processed impedance contributions
+        self.cache_size = int(cache_size)
+        if self.cache_size > 0:
+            for induced_voltage_object in self.induced_voltage_list:
+                if hasattr(induced_voltage_object, 'process_cache'):
+                    induced_voltage_object.process_cache = OrderedDict()
+                    induced_voltage_object.process_cache_size = \
+                        self.cache_size
+        self.reprocess_pending = False
+
+        # Reprocessing when the bunch-following profile changes its frame
+        if hasattr(self.profile, 'frame_callbacks'):
+            self.profile.frame_callbacks.append(self.reprocess)
+
     def reprocess(self):
         """
-        Reprocess the impedance contributions. To be run when profile changes
+        Reprocess the impedance contributions. To be run when profile changes.
+        With a cache, the contributions are only reprocessed at the next
+        induced voltage calculation, and the total wakes and impedances are
+        taken from the cache if the slicing (bin size, number of slices and
+        of FFT points) was already used; a shift of the frame alone does not
+        require any recomputation. Called automatically when a profile in
+        bunch-following mode changes its frame.
         """
 
+        self.time_array = self.profile.bin_centers
+
+        if self.cache_size > 0:
+            self.reprocess_pending = True
+            return
+
         for induced_voltage_object in self.induced_voltage_list:
             induced_voltage_object.process()
 
+    def process_pending(self):
+        """
+        Reprocess the impedance contributions if the profile changed since
+        the last induced voltage calculation (lazy reprocess()).
+        """
+
+        if self.reprocess_pending:
+            self.reprocess_pending = False
+            for induced_voltage_object in self.induced_voltage_list:
+                induced_voltage_object.process()
+
+    def clear_cache(self):
+        """
+        Empty the cache of the processed contributions, to be run when the
+        impedance sources are modified.
+        """
+
+        for induced_voltage_object in self.induced_voltage_list:
+            if getattr(induced_voltage_object, 'process_cache', None):
+                induced_voltage_object.process_cache.clear()
+
     def induced_voltage_sum(self):
         """
         Method to sum all the induced voltages in one single array.
         """
+        self.process_pending()
+
         # For MPI, to avoid calulating beam spectrum multiple times
         beam_spectrum_dict = {}
         temp_induced_voltage = 0
@@ -94,7 +164,7 @@ class TotalInducedVoltage(object):
             induced_voltage_object.induced_voltage_generation(
                 beam_spectrum_dict)
             temp_induced_voltage += \
-                induced_voltage_object.induced_voltage[:self.profile.n_slices]
+                induced_voltage_object.induced_voltage[..., :self.profile.n_slices]
 
         self.induced_voltage = temp_induced_voltage.astype(
             dtype=bm.precision.real_t, order='C', copy=False)
@@ -105,6 +175,8 @@ class TotalInducedVoltage(object):
         Method to sum all the induced voltages in one single array.
         """
 
+        self.process_pending()
+
         # Assuming the same n_fft for all, we take only the first one
         self.induced_voltage_list[0].profile.beam_spectrum_generation(
             self.induced_voltage_list[0].n_fft)
@@ -216,8 +288,51 @@ class _InducedVoltage(object):
         # in the frequency domain. For 'time', a linear interpolation is used.
         self.mtw_mode = mtw_mode
 
+        # Optional LRU cache of the processed total wake/impedance, keyed on
+        # the slicing (enabled through TotalInducedVoltage)
+        self.process_cache = None
+        self.process_cache_size = 0
+
         self.process()
 
+    def process_key(self):
+        """
+        Key of the slicing in the process cache: bin size (to 12 significant
+        digits, as shifting the frame changes it by rounding errors), number
+        of slices and of induced voltage points, which set the number of FFT
+        points.
+        """
+
+        return (float('%.12e' % self.profile.bin_size),
+                int(self.profile.n_slices), int(self.n_induced_voltage))
+
+    def process_cached(self, key):
+        """
+        Restore the processed attributes stored for key; returns False if the
+        key is not in the cache.
+        """
+
+        if not self.process_cache or key not in self.process_cache:
+            return False
+
+        self.process_cache.move_to_end(key)
+        self.__dict__.update(self.process_cache[key])
+        return True
+
+    def process_store(self, key, attributes):
+        """
+        Store the processed attributes for key, evicting the least recently
+        used slicing if the cache is full.
+        """
+
+        if self.process_cache is None:
+            return
+
+        self.process_cache[key] = dict((attribute, getattr(self, attribute))
+                                       for attribute in attributes)
+        while len(self.process_cache) > self.process_cache_size:
+            self.process_cache.popitem(last=False)
+
     def process(self):
         """
         Reprocess the impedance contributions. To be run when profile changes
@@ -313,7 +428,7 @@ class _InducedVoltage(object):
         induced_voltage = - (self.beam.Particle.charge * e * self.beam.ratio
                              * bm.irfft(self.total_impedance.astype(dtype=bm.precision.complex_t, order='C', copy=False) * beam_spectrum))
 
-        self.induced_voltage = induced_voltage[:self.n_induced_voltage].astype(
+        self.induced_voltage = induced_voltage[..., :self.n_induced_voltage].astype(
             dtype=bm.precision.real_t, order='C', copy=False)
 
     def induced_voltage_mtw(self, beam_spectrum_dict={}):
@@ -429,6 +544,12 @@ class InducedVoltageTime(_InducedVoltage):
 
         _InducedVoltage.process(self)
 
+        key = self.process_key()
+        if self.process_cached(key):
+            self.frequency_resolution = 1 / (self.n_fft *
+                                             self.profile.bin_size)
+            return
+
         # Number of points for the FFT, equal to the length of the induced
         # voltage array + number of profile -1 to calculate a linear convolution
         # in the frequency domain. The next regular number is used for speed,
@@ -448,6 +569,9 @@ class InducedVoltageTime(_InducedVoltage):
         # Processing the wakes
         self.sum_wakes(self.time)
 
+        self.process_store(key, ['n_fft', 'time', 'total_wake',
+                                 'total_impedance'])
+
     def sum_wakes(self, time_array):
         """
         Summing all the wake contributions in one total wake.
@@ -455,7 +579,9 @@ class InducedVoltageTime(_InducedVoltage):
 
         self.total_wake = np.zeros(time_array.shape)
         for wake_object in self.wake_source_list:
-            wake_object.wake_calc(time_array)
+            # The previous wake of the source is overwritten if it fits
+            wake_object.wake_calc(time_array, wake=_output_buffer(
+                wake_object.wake, time_array.shape, bm.precision.real_t))
             self.total_wake += wake_object.wake
 
         # Pseudo-impedance used to calculate linear convolution in the
@@ -525,10 +651,14 @@ class InducedVoltageFreq(_InducedVoltage):
 
         _InducedVoltage.process(self)
 
+        key = self.process_key()
+        cached = self.process_cached(key)
+
         # Number of points for the FFT. The next regular number is used for
         # speed, therefore the frequency resolution is always equal or finer
         # than the input value
-        self.n_fft = next_regular(self.n_induced_voltage)
+        if not cached:
+            self.n_fft = next_regular(self.n_induced_voltage)
 
         self.profile.beam_spectrum_freq_generation(self.n_fft)
 
@@ -541,8 +671,20 @@ class InducedVoltageFreq(_InducedVoltage):
             self.front_wake_buffer = int(np.ceil(
                 np.max(self.front_wake_length) / self.profile.bin_size))
 
-        # Processing the impedances
+        # Processing the impedances, or rescaling the cached ones to the bin
+        # size of the shifted frame
+        if cached:
+            if self.impedance_bin_size != self.profile.bin_size:
+                self.total_impedance = self.total_impedance * \
+                    (self.impedance_bin_size / self.profile.bin_size)
+                self.impedance_bin_size = self.profile.bin_size
+            return
+
         self.sum_impedances(self.freq)
+        self.impedance_bin_size = self.profile.bin_size
+
+        self.process_store(key, ['n_fft', 'total_impedance',
+                                 'impedance_bin_size'])
 
     def sum_impedances(self, freq):
         """
@@ -552,9 +694,12 @@ class InducedVoltageFreq(_InducedVoltage):
         self.total_impedance = np.zeros(
             freq.shape, dtype=bm.precision.complex_t, order='C')
 
-        for i in range(len(self.impedance_source_list)):
-            self.impedance_source_list[i].imped_calc(freq)
-            self.total_impedance += self.impedance_source_list[i].impedance
+        for impedance_object in self.impedance_source_list:
+            # The previous impedance of the source is overwritten if it fits
+            impedance_object.imped_calc(freq, impedance=_output_buffer(
+                impedance_object.impedance, freq.shape,
+                bm.precision.complex_t))
+            self.total_impedance += impedance_object.impedance
 
         # Factor relating Fourier transform and DFT
         self.total_impedance /= self.profile.bin_size
@@ -588,6 +733,11 @@ class InductiveImpedance(_InducedVoltage):
     def __init__(self, Beam, Profile, Z_over_n, RFParams,
                  deriv_mode='gradient'):
 
+        if np.ndim(Profile.n_macroparticles) == 2:
+            # EnsembleError
+            raise RuntimeError("ERROR in InductiveImpedance: not yet " +
+                               "implemented for an ensemble beam!")
+
         # Constant imaginary Z/n program in* :math:`\Omega`.
         self.Z_over_n = Z_over_n
 
@@ -610,7 +760,7 @@ class InductiveImpedance(_InducedVoltage):
                              self.RFParams.t_rev[index] / self.profile.bin_size *
                              self.profile.beam_profile_derivative(self.deriv_mode)[1])
 
-        self.induced_voltage = (induced_voltage[:self.n_induced_voltage]).astype(
+        self.induced_voltage = (induced_voltage[..., :self.n_induced_voltage]).astype(
             dtype=bm.precision.real_t, order='C', copy=False)
 
 
@@ -665,6 +815,11 @@ class InducedVoltageResonator(_InducedVoltage):
 
     def __init__(self, Beam, Profile, Resonators, timeArray=None):
 
+        if np.ndim(Profile.n_macroparticles) == 2:
+            # EnsembleError
+            raise RuntimeError("ERROR in InducedVoltageResonator: not yet " +
+                               "implemented for an ensemble beam!")
+
         # Test if one or more quality factors is smaller than 0.5.
         if sum(Resonators.Q < 0.5) > 0:
             # ResonatorError
@@ -46,7 +46,7 @@ class _ImpedanceObject(object):
         # Impedance array in :math:`\Omega`
         self.impedance = 0
 
-    def wake_calc(self, *args):
+    def wake_calc(self, *args, **kwargs):
         """
         Method required to compute the wake function. Returns an error if
         called from an object which does not implement this method.
@@ -56,7 +56,7 @@ class _ImpedanceObject(object):
                            '. This object is probably meant to be used in the' +
                            ' frequency domain')
 
-    def imped_calc(self, *args):
+    def imped_calc(self, *args, **kwargs):
         """
         Method required to compute the impedance. Returns an error if called
         from an object which does not implement this method.
@@ -150,7 +150,7 @@ class InputTable(_ImpedanceObject):
                 self.Re_Z_array_loaded = np.hstack((0, self.Re_Z_array_loaded))
                 self.Im_Z_array_loaded = np.hstack((0, self.Im_Z_array_loaded))
 
-    def wake_calc(self, new_time_array):
+    def wake_calc(self, new_time_array, wake=None):
         r"""
         The wake from the table is interpolated using the new time array.
 
@@ -158,6 +158,8 @@ class InputTable(_ImpedanceObject):
         ----------
         new_time_array : float array
             Input time array in s
+        wake : float array, optional
+            Output array of the length of new_time_array, overwritten
 
         Attributes
         ----------
@@ -168,10 +170,15 @@ class InputTable(_ImpedanceObject):
         """
 
         self.new_time_array = new_time_array
-        self.wake = np.interp(self.new_time_array, self.time_array,
-                              self.wake_array, right=0)
+        wake_interp = np.interp(self.new_time_array, self.time_array,
+                                self.wake_array, right=0)
+        if wake is None:
+            self.wake = wake_interp
+        else:
+            wake[:] = wake_interp
+            self.wake = wake
 
-    def imped_calc(self, new_frequency_array):
+    def imped_calc(self, new_frequency_array, impedance=None):
         r"""
         The impedance from the table is interpolated using the new frequency
         array.
@@ -180,6 +187,8 @@ class InputTable(_ImpedanceObject):
         ----------
         new_frequency_array : float array
             frequency array in :math:`\Omega`
+        impedance : complex array, optional
+            Output array of the length of new_frequency_array, overwritten
 
         Attributes
         ----------
@@ -200,7 +209,12 @@ class InputTable(_ImpedanceObject):
         self.frequency_array = new_frequency_array
         self.Re_Z_array = Re_Z
         self.Im_Z_array = Im_Z
-        self.impedance = Re_Z + 1j * Im_Z
+        if impedance is None:
+            self.impedance = Re_Z + 1j * Im_Z
+        else:
+            impedance.real = Re_Z
+            impedance.imag = Im_Z
+            self.impedance = impedance
 
 
 class Resonators(_ImpedanceObject):
@@ -307,14 +321,17 @@ class Resonators(_ImpedanceObject):
         self.__frequency_R = omega_R / 2 / np.pi
         self.__omega_R = omega_R
 
-    def wake_calc(self, time_array):
+    def wake_calc(self, time_array, wake=None):
         r"""
-        Wake calculation method as a function of time.
+        Wake calculation method as a function of time, all the resonators
+        being evaluated in one pass in C++.
 
         Parameters
         ----------
         time_array : float array
             Input time array in s
+        wake : float array, optional
+            Output array of the length of time_array, overwritten
 
         Attributes
         ----------
@@ -325,19 +342,10 @@ class Resonators(_ImpedanceObject):
         """
 
         self.time_array = time_array
-        self.wake = np.zeros(self.time_array.shape, dtype=bm.precision.real_t, order='C')
-
-        for i in range(0, self.n_resonators):
-
-            alpha = self.omega_R[i] / (2 * self.Q[i])
-            omega_bar = np.sqrt(self.omega_R[i] ** 2 - alpha ** 2)
+        self.wake = bm.resonator_wake(self.R_S, self.omega_R, self.Q,
+                                      self.time_array, result=wake)
 
-            self.wake += ((np.sign(self.time_array) + 1) * self.R_S[i]
-                         * alpha * np.exp(-alpha * self.time_array)
-                          * (np.cos(omega_bar * self.time_array) - alpha /
-                             omega_bar * np.sin(omega_bar * self.time_array)))
-
-    def _imped_calc_python(self, frequency_array):
+    def _imped_calc_python(self, frequency_array, impedance=None):
         r"""
         Impedance calculation method as a function of frequency using Python.
 
@@ -345,6 +353,8 @@ class Resonators(_ImpedanceObject):
         ----------
         frequency_array : float array
             Input frequency array in Hz
+        impedance : complex array, optional
+            Output array of the length of frequency_array, overwritten
 
         Attributes
         ----------
@@ -355,15 +365,25 @@ class Resonators(_ImpedanceObject):
         """
 
         self.frequency_array = frequency_array
-        self.impedance = np.zeros(len(self.frequency_array), dtype=bm.precision.complex_t, order='C')
-
-        for i in range(0, self.n_resonators):
-
-            self.impedance[1:] += self.R_S[i] / (1 + 1j * self.Q[i]
-                                                 * (self.frequency_array[1:] / self.frequency_R[i] -
-                                                  self.frequency_R[i] / self.frequency_array[1:]))
-
-    def _imped_calc_cpp(self, frequency_array):
+        if impedance is None:
+            impedance = np.zeros(len(self.frequency_array),
+                                 dtype=bm.precision.complex_t, order='C')
+        else:
+            impedance[0] = 0
+
+        # All the resonators at once, by blocks of frequencies
+        R_S = self.R_S[:, np.newaxis]
+        Q = self.Q[:, np.newaxis]
+        frequency_R = self.frequency_R[:, np.newaxis]
+        block = max(1, 2**16 // self.n_resonators)
+        for start in range(1, len(self.frequency_array), block):
+            frequency = self.frequency_array[start:start+block]
+            impedance[start:start+block] = np.sum(
+                R_S / (1 + 1j * Q * (frequency / frequency_R -
+                                     frequency_R / frequency)), axis=0)
+        self.impedance = impedance
+
+    def _imped_calc_cpp(self, frequency_array, impedance=None):
         r"""
         Impedance calculation method as a function of frequency optimised in C++
 
@@ -371,6 +391,8 @@ class Resonators(_ImpedanceObject):
         ----------
         frequency_array : float array
             Input frequency array in Hz
+        impedance : complex array, optional
+            Output array of the length of frequency_array, overwritten
 
         Attributes
         ----------
@@ -383,7 +405,8 @@ class Resonators(_ImpedanceObject):
         self.frequency_array = frequency_array
         self.impedance = bm.fast_resonator(self.R_S, self.Q,
                                            self.frequency_array,
-                                           self.frequency_R)
+                                           self.frequency_R,
+                                           impedance=impedance)
 
 
 class TravelingWaveCavity(_ImpedanceObject):
@@ -454,14 +477,17 @@ class TravelingWaveCavity(_ImpedanceObject):
         # Number of resonant modes
         self.n_twc = len(self.R_S)
 
-    def wake_calc(self, time_array):
+    def wake_calc(self, time_array, wake=None):
         r"""
-        Wake calculation method as a function of time.
+        Wake calculation method as a function of time, all the modes being
+        evaluated in one pass in C++.
 
         Parameters
         ----------
         time_array : float array
             Input time array in s
+        wake : float array, optional
+            Output array of the length of time_array, overwritten
 
         Attributes
         ----------
@@ -472,26 +498,21 @@ class TravelingWaveCavity(_ImpedanceObject):
         """
 
         self.time_array = time_array
-        self.wake = np.zeros(self.time_array.shape, dtype=bm.precision.real_t, order='C')
-        self.wake = np.zeros(self.time_array.shape)
-
-        for i in range(0, self.n_twc):
-            a_tilde = self.a_factor[i] / (2 * np.pi)
-            indexes = np.where(self.time_array <= a_tilde)
-            self.wake[indexes] += ((np.sign(self.time_array[indexes]) + 1) * 2
-                                   * self.R_S[i] / a_tilde
-                                   * (1 - self.time_array[indexes] / a_tilde)
-                                   * np.cos(2 * np.pi * self.frequency_R[i] *
-                                          self.time_array[indexes]))
-
-    def imped_calc(self, frequency_array):
+        self.wake = bm.travelling_wave_wake(self.R_S, self.frequency_R,
+                                            self.a_factor, self.time_array,
+                                            result=wake)
+
+    def imped_calc(self, frequency_array, impedance=None):
         r"""
-        Impedance calculation method as a function of frequency.
+        Impedance calculation method as a function of frequency, all the
+        modes being evaluated in one pass in C++.
 
         Parameters
         ----------
         frequency_array : float array
             Input frequency array in Hz
+        impedance : complex array, optional
+            Output array of the length of frequency_array, overwritten
 
         Attributes
         ----------
@@ -502,29 +523,9 @@ class TravelingWaveCavity(_ImpedanceObject):
         """
 
         self.frequency_array = frequency_array
-        self.impedance = np.zeros(len(self.frequency_array), dtype=bm.precision.complex_t, order='C')
-
-        for i in range(0, self.n_twc):
-
-            Zplus = self.R_S[i] * ((np.sin(self.a_factor[i] / 2 *
-                                           (self.frequency_array - self.frequency_R[i])) /
-                                    (self.a_factor[i] / 2 * (self.frequency_array -
-                                                             self.frequency_R[i])))**2 - 2j*(self.a_factor[i] *
-                                                    (self.frequency_array - self.frequency_R[i]) -
-                    np.sin(self.a_factor[i] * (self.frequency_array -
-                                               self.frequency_R[i]))) / (self.a_factor[i] *
-                                                                           (self.frequency_array - self.frequency_R[i]))**2)
-
-            Zminus = self.R_S[i] * ((np.sin(self.a_factor[i] / 2 *
-                                            (self.frequency_array + self.frequency_R[i])) /
-                                     (self.a_factor[i] / 2 * (self.frequency_array
-                                                              + self.frequency_R[i])))**2 - 2j*(self.a_factor[i]
-                                                                              * (self.frequency_array + self.frequency_R[i])
-                - np.sin(self.a_factor[i] * (self.frequency_array
-                                           + self.frequency_R[i]))) / (self.a_factor[i] *
-                                                                     (self.frequency_array + self.frequency_R[i]))**2)
-
-            self.impedance += Zplus + Zminus
+        self.impedance = bm.travelling_wave_impedance(
+            self.R_S, self.frequency_R, self.a_factor, self.frequency_array,
+            result=impedance)
 
 
 class ResistiveWall(_ImpedanceObject):
@@ -611,7 +612,7 @@ class ResistiveWall(_ImpedanceObject):
         self.__resistivity = 1 / conductivity
         self.__conductivity = conductivity
 
-    def imped_calc(self, frequency_array):
+    def imped_calc(self, frequency_array, impedance=None):
         r"""
         Impedance calculation method as a function of frequency.
 
@@ -619,6 +620,8 @@ class ResistiveWall(_ImpedanceObject):
         ----------
         frequency_array : float array
             Input frequency array in Hz
+        impedance : complex array, optional
+            Output array of the length of frequency_array, overwritten
 
         Attributes
         ----------
@@ -637,3 +640,7 @@ class ResistiveWall(_ImpedanceObject):
                            + 1j * self.pipe_radius**2.0 * 2.0 * np.pi * self.frequency_array)).astype(dtype=bm.precision.complex_t, order='C', copy=False)
 
         self.impedance[np.isnan(self.impedance)] = 0.0
+
+        if impedance is not None:
+            impedance[:] = self.impedance
+            self.impedance = impedance
@@ -17,6 +17,7 @@ import numpy as np
 from scipy.constants import e
 import ctypes
 from ..utils import bmath as bm
+from .impedance_sources import Resonators
 
 
 class Music(object):
@@ -33,16 +34,21 @@ class Music(object):
     ----------
     Beam : object
         Beam object.
-    resonator : float list
+    resonator : float list or Resonators
         List of the resonator parameters: 
         [shunt impedance [:math:`\Omega`], angular resonant frequency [rad/s], 
-        quality factor [1]].
+        quality factor [1]], or a Resonators object whose modes are all
+        propagated in the same sweep over the sorted particles.
     n_macroparticles : int
         Number of macro-particles [1].
     n_particles : float
         Beam intensity [1].
     t_rev : float
         Revolution period [s]
+    parallel : bool
+        If True, the C++ methods split the recursion over the sorted
+        particles in chunks computed in parallel (prefix scan of the
+        per-chunk transfer maps); default is False
 
     Attributes
     ----------
@@ -54,6 +60,9 @@ class Music(object):
         angular resonant frequency [rad/s]
     Q : float
         quality factor [1]
+    n_resonators : int
+        Number of resonators [1]; with a Resonators object, R_S, omega_R, Q
+        and the derived attributes below are arrays over the resonators
     n_macroparticles : int
         Number of macro-particles [1].
     n_particles : float
@@ -85,6 +94,8 @@ class Music(object):
     array_parameters : float array
         Array gathering four attributes already defined to be used in the C++
         algorithm.
+    parallel : bool
+        Parallel MuSiC in the C++ methods
 
     Notes
     -----
@@ -100,12 +111,19 @@ class Music(object):
 
     """
 
-    def __init__(self, Beam, resonator, n_macroparticles, n_particles, t_rev):
+    def __init__(self, Beam, resonator, n_macroparticles, n_particles, t_rev,
+                 parallel=False):
 
         self.beam = Beam
-        self.R_S = resonator[0]
-        self.omega_R = resonator[1]
-        self.Q = resonator[2]
+        if isinstance(resonator, Resonators):
+            self.R_S = resonator.R_S.copy()
+            self.omega_R = resonator.omega_R.copy()
+            self.Q = resonator.Q.copy()
+        else:
+            self.R_S = resonator[0]
+            self.omega_R = resonator[1]
+            self.Q = resonator[2]
+        self.n_resonators = np.size(self.R_S)
         self.n_macroparticles = n_macroparticles
         self.n_particles = n_particles
         self.alpha = self.omega_R / (2*self.Q)
@@ -113,17 +131,19 @@ class Music(object):
         self.const = -e*self.R_S*self.omega_R * \
             self.n_particles/(self.n_macroparticles*self.Q)
         self.induced_voltage = np.zeros(len(self.beam.dt))
-        self.induced_voltage[0] = self.const/2
+        self.induced_voltage[0] = np.sum(self.const)/2
         self.coeff1 = -self.alpha/self.omega_bar
         self.coeff2 = -self.R_S*self.omega_R/(self.Q*self.omega_bar)
         self.coeff3 = self.omega_R*self.Q/(self.R_S*self.omega_bar)
         self.coeff4 = self.alpha/self.omega_bar
-        self.input_first_component = 1
-        self.input_second_component = 0
+        self.input_first_component = np.ones_like(self.R_S)
+        self.input_second_component = np.zeros_like(self.R_S)
         self.t_rev = t_rev
         self.last_dt = self.beam.dt[-1]
-        self.array_parameters = np.array([self.input_first_component,
-                                          self.input_second_component, self.t_rev, self.last_dt])
+        self.array_parameters = np.hstack([self.input_first_component,
+                                           self.input_second_component,
+                                           self.t_rev, self.last_dt])
+        self.parallel = parallel
 
     def track_cpp(self):
         r"""
@@ -141,6 +161,20 @@ class Music(object):
         >>> music_cpp.track_cpp()
 
         """
+        if np.ndim(self.R_S) > 0:
+            bm.music_track_resonators(
+                self.beam.dt, self.beam.dE, self.induced_voltage,
+                self.array_parameters, self.alpha, self.omega_bar,
+                self.const, self.coeff1, self.coeff2, self.coeff3,
+                self.coeff4, multi_turn=False, parallel=self.parallel)
+            return
+        if self.parallel:
+            bm.music_track_scan(self.beam.dt, self.beam.dE,
+                                self.induced_voltage, self.array_parameters,
+                                self.alpha, self.omega_bar, self.const,
+                                self.coeff1, self.coeff2, self.coeff3,
+                                self.coeff4, multi_turn=False)
+            return
         bm.music_track(self.beam.dt, self.beam.dE, self.induced_voltage,
                        self.array_parameters, self.alpha, self.omega_bar,
                        self.const, self.coeff1, self.coeff2, self.coeff3,
@@ -164,6 +198,20 @@ class Music(object):
         >>>     music_cpp.track_cpp_multi_turn()
 
         """
+        if np.ndim(self.R_S) > 0:
+            bm.music_track_resonators(
+                self.beam.dt, self.beam.dE, self.induced_voltage,
+                self.array_parameters, self.alpha, self.omega_bar,
+                self.const, self.coeff1, self.coeff2, self.coeff3,
+                self.coeff4, multi_turn=True, parallel=self.parallel)
+            return
+        if self.parallel:
+            bm.music_track_scan(self.beam.dt, self.beam.dE,
+                                self.induced_voltage, self.array_parameters,
+                                self.alpha, self.omega_bar, self.const,
+                                self.coeff1, self.coeff2, self.coeff3,
+                                self.coeff4, multi_turn=True)
+            return
         bm.music_track_multiturn(self.beam.dt, self.beam.dE, self.induced_voltage,
                                  self.array_parameters, self.alpha, self.omega_bar,
                                  self.const, self.coeff1, self.coeff2, self.coeff3,
@@ -189,8 +237,8 @@ class Music(object):
         self.beam.dt = self.beam.dt[indices_sorted]
         self.beam.dE = self.beam.dE[indices_sorted]
         self.beam.dE[0] += self.induced_voltage[0]
-        self.input_first_component = 1
-        self.input_second_component = 0
+        self.input_first_component = np.ones_like(self.R_S)
+        self.input_second_component = np.zeros_like(self.R_S)
 
         for i in range(len(self.beam.dt)-1):
 
@@ -207,8 +255,8 @@ class Music(object):
                 (self.coeff3*sin_term*self.input_first_component
                  + (cos_term+self.coeff4*sin_term)*self.input_second_component)
 
-            self.induced_voltage[i+1] = self.const * \
-                (0.5+product_first_component)
+            self.induced_voltage[i+1] = np.sum(self.const *
+                                               (0.5+product_first_component))
             self.beam.dE[i+1] += self.induced_voltage[i+1]
 
             self.input_first_component = product_first_component+1.0
@@ -247,8 +295,8 @@ class Music(object):
         product_second_component = exp_term * \
             (self.coeff3*sin_term*self.input_first_component
              + (cos_term+self.coeff4*sin_term)*self.input_second_component)
-        self.induced_voltage[0] = self.const * \
-            (0.5+product_first_component)
+        self.induced_voltage[0] = np.sum(self.const *
+                                         (0.5+product_first_component))
         self.beam.dE[0] += self.induced_voltage[0]
         self.input_first_component = product_first_component+1.0
         self.input_second_component = product_second_component
@@ -268,8 +316,8 @@ class Music(object):
                 (self.coeff3*sin_term*self.input_first_component
                  + (cos_term+self.coeff4*sin_term)*self.input_second_component)
 
-            self.induced_voltage[i+1] = self.const * \
-                (0.5+product_first_component)
+            self.induced_voltage[i+1] = np.sum(self.const *
+                                               (0.5+product_first_component))
             self.beam.dE[i+1] += self.induced_voltage[i+1]
 
             self.input_first_component = product_first_component+1.0
@@ -297,9 +345,8 @@ class Music(object):
                 exp_term = np.exp(-self.alpha * time_difference)
                 cos_term = np.cos(self.omega_bar * time_difference)
                 sin_term = np.sin(self.omega_bar * time_difference)
-                self.induced_voltage[i+1] += \
-                    exp_term*(cos_term+self.coeff1*sin_term)
+                self.induced_voltage[i+1] += np.sum(
+                    self.const*exp_term*(cos_term+self.coeff1*sin_term))
 
-            self.induced_voltage[i+1] = \
-                self.const*(0.5+self.induced_voltage[i+1])
+            self.induced_voltage[i+1] += np.sum(self.const)/2
             self.beam.dE[i+1] += self.induced_voltage[i+1]
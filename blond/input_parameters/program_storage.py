@@ -0,0 +1,218 @@
+# coding: utf8
+# Copyright 2014-2017 CERN. This software is distributed under the
+# terms of the GNU General Public Licence version 3 (GPL Version 3),
+# copied verbatim in the file LICENCE.md.
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+# Project website: http://blond.web.cern.ch/
+
+'''
+**Storage of the turn-by-turn programs of Ring and RFStation**
+'''
+
+from __future__ import division
+from builtins import range, object
+import os
+import tempfile
+import weakref
+import numpy as np
+
+
+def _remove_files(filenames):
+
+    while filenames:
+        try:
+            os.remove(filenames.pop())
+        except OSError:
+            pass
+
+
+class ProgramStorage(object):
+    r""" Class allocating the turn-by-turn programs of Ring and RFStation
+    (momentum, beta, gamma, energy, eta, t_rev, voltage, phi_rf, omega_rf,
+    phi_s, Q_s, ...), arrays whose last dimension is the number of turns.
+
+    By default the programs are numpy arrays kept in memory. If a directory
+    is passed, the programs are stored in memory-mapped .npy files in this
+    directory: only the windows of turns accessed during tracking are kept
+    in memory by the operating system. The programs remain numpy arrays,
+    e.g. rf_station.voltage[:, counter] and the in-place changes of the
+    feedbacks work as usual.
+
+    Only the derived programs (beta, gamma, eta, omega_rf, ...) are computed
+    by chunks of turns. The input programs (momentum, momentum compaction,
+    voltage, phase) and phi_s, Q_s are computed in memory, one at a time,
+    and then copied in their files, so that the construction of Ring and
+    RFStation still needs the memory of the largest of them and is not
+    faster than in memory; the saving is the memory held during tracking.
+
+    The files are removed by close(), at the end of a with block, or when
+    the storage is garbage collected (at the latest at exit); the programs
+    must not be used afterwards.
+
+    Parameters
+    ----------
+    directory : str
+        Directory of the memory-mapped programs; default is None (programs
+        kept in memory)
+    n_turns_chunk : int
+        Number of turns computed at once for memory-mapped programs; default
+        is 1000000
+
+    Attributes
+    ----------
+    filenames : list of str
+        Files of the memory-mapped programs
+
+    Examples
+    --------
+    >>> from blond.input_parameters.program_storage import ProgramStorage
+    >>>
+    >>> ring = Ring(C, alpha_0, (time, momentum), Proton(),
+    >>>             RingOptions=RingOptions(
+    >>>                 program_storage=ProgramStorage('/scratch/programs')))
+    >>> rf_station = RFStation(ring, harmonic, voltage, phi)
+    >>> ...
+    >>> ring.program_storage.close()
+
+    """
+
+    def __init__(self, directory=None, n_turns_chunk=1000000):
+
+        if directory is not None:
+            directory = str(directory)
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+        self.directory = directory
+
+        if n_turns_chunk > 0:
+            self.n_turns_chunk = int(n_turns_chunk)
+        else:
+            #InputDataError
+            raise RuntimeError("ERROR: n_turns_chunk value in " +
+                               "ProgramStorage not recognised. Aborting...")
+
+        self.filenames = []
+        self._finalizer = weakref.finalize(self, _remove_files,
+                                           self.filenames)
+
+    @property
+    def memory_mapped(self):
+        return self.directory is not None
+
+    def close(self):
+        r"""Function to remove the files of the memory-mapped programs"""
+
+        _remove_files(self.filenames)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def empty(self, name, shape):
+        r"""Function to allocate a program
+
+        Parameters
+        ----------
+        name : str
+            Name of the program, used as prefix of the file name
+        shape : tuple of int
+            Shape of the program
+
+        Returns
+        -------
+        float array
+            Uninitialised program
+
+        """
+
+        if not self.memory_mapped:
+            return np.empty(shape)
+
+        file_descriptor, filename = tempfile.mkstemp(
+            prefix=name + '_', suffix='.npy', dir=self.directory)
+        os.close(file_descriptor)
+        self.filenames.append(filename)
+
+        return np.lib.format.open_memmap(filename, mode='w+', dtype=float,
+                                         shape=tuple(shape))
+
+    def zeros(self, name, shape):
+        r"""Function to allocate a program filled with zeros, see empty()"""
+
+        if not self.memory_mapped:
+            return np.zeros(shape)
+
+        # Memory-mapped files are created filled with zeros
+        return self.empty(name, shape)
+
+    def store(self, name, program):
+        r"""Function to store a program computed in memory. The program is
+        returned as it is if the programs are kept in memory, otherwise it
+        is copied in a memory-mapped file.
+
+        Parameters
+        ----------
+        name : str
+            Name of the program, used as prefix of the file name
+        program : float array
+            Program to be stored
+
+        Returns
+        -------
+        float array
+            Stored program
+
+        """
+
+        if not self.memory_mapped:
+            return program
+
+        return self.compute(name, np.array, program)
+
+    def compute(self, name, function, *programs):
+        r"""Function to compute a program derived from other programs (or
+        from scalars), element by element along the turns. In memory, it is
+        simply function(\*programs); when memory-mapped, the function is
+        applied to chunks of turns of the programs and written in the stored
+        program.
+
+        Parameters
+        ----------
+        name : str
+            Name of the program, used as prefix of the file name
+        function : function
+            Function of the programs, acting independently on each turn
+        programs : float arrays or floats
+            Programs (same number of turns along the last axis) or scalars
+
+        Returns
+        -------
+        float array
+            Derived program
+
+        """
+
+        if not self.memory_mapped:
+            return function(*programs)
+
+        n_points = [np.shape(program)[-1] for program in programs
+                    if np.ndim(program) > 0][0]
+
+        derived_program = None
+        for start in range(0, n_points, self.n_turns_chunk):
+            turns = slice(start, min(start + self.n_turns_chunk, n_points))
+
+            derived_chunk = function(*[
+                program[..., turns] if np.ndim(program) > 0 else program
+                for program in programs])
+
+            if derived_program is None:
+                derived_program = self.empty(
+                    name, np.shape(derived_chunk)[:-1] + (n_points,))
+            derived_program[..., turns] = derived_chunk
+
+        return derived_program
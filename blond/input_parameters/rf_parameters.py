@@ -15,6 +15,8 @@
 
 from __future__ import division, print_function
 from builtins import str, range, object
+from collections import OrderedDict
+import hashlib
 import numpy as np
 from scipy.constants import c
 from scipy.integrate import cumtrapz
@@ -77,7 +79,9 @@ class RFStation(object):
         the harmonic condition. For input options, see above.
     phi_noise : float (opt: float array/matrix)
         Optional, programmed RF cavity phase noise, :math:`\phi_{N,l,n}` [rad].
-        Added to all RF systems in the station. For input options, see above
+        Added to all RF systems in the station. For input options, see above;
+        a streaming noise source (e.g. llrf.rf_noise.PhaseNoiseStream) is
+        kept as it is and generates the noise during tracking
     phi_modulation : class (opt: iterable of classes)
         A PhaseModulation type class (or iterable of classes)
     RFStationOptions : class
@@ -178,7 +182,8 @@ class RFStation(object):
         :math:`\omega_{rf,l,n} = \frac{h_{l,n} \beta_{l,n} c}{R_{s,n}}` [Hz].
         Initially the same as the designed angular frequency.
     phi_noise : None or float matrix [n_rf, n_turns+1]
-        Programmed cavity phase noise for each RF harmonic.
+        Programmed cavity phase noise for each RF harmonic (or streaming
+        noise source indexed in the same way).
     phi_modulation : None or float matrix [n_rf, n_turns+1]
         Programmed cavity phase modulation for each RF harmonic.
     dphi_rf : float matrix [n_rf]
@@ -244,6 +249,9 @@ class RFStation(object):
         self.alpha_order = Ring.alpha_order
         self.charge = self.Particle.charge
 
+        # The RF programs are allocated like the ones of Ring
+        storage = Ring.program_storage
+
         # The order alpha_order used here can be replaced by Ring.alpha_order
         # when the assembler can differentiate the cases 'simple' and 'exact'
         # for the drift
@@ -257,17 +265,21 @@ class RFStation(object):
 
         # Reshape input rf programs
         # Reshape design harmonic
-        self.harmonic = RFStationOptions.reshape_data(harmonic,
-                                                      self.n_turns,
-                                                      self.n_rf,
-                                                      Ring.cycle_time,
-                                                      Ring.RingOptions.t_start)
+        self.harmonic = storage.store('harmonic',
+                                      RFStationOptions.reshape_data(
+                                          harmonic,
+                                          self.n_turns,
+                                          self.n_rf,
+                                          Ring.cycle_time,
+                                          Ring.RingOptions.t_start))
         # Reshape design voltage
-        self.voltage = RFStationOptions.reshape_data(voltage,
-                                                     self.n_turns,
-                                                     self.n_rf,
-                                                     Ring.cycle_time,
-                                                     Ring.RingOptions.t_start)
+        self.voltage = storage.store('voltage',
+                                     RFStationOptions.reshape_data(
+                                         voltage,
+                                         self.n_turns,
+                                         self.n_rf,
+                                         Ring.cycle_time,
+                                         Ring.RingOptions.t_start))
 
         # Checking if the RFStation is empty
         if np.sum(self.voltage) == 0:
@@ -276,32 +288,40 @@ class RFStation(object):
             self.empty = False
 
         # Reshape design phase
-        self.phi_rf_d = RFStationOptions.reshape_data(phi_rf_d,
-                                                      self.n_turns,
-                                                      self.n_rf,
-                                                      Ring.cycle_time,
-                                                      Ring.RingOptions.t_start)
+        self.phi_rf_d = storage.store('phi_rf_d',
+                                      RFStationOptions.reshape_data(
+                                          phi_rf_d,
+                                          self.n_turns,
+                                          self.n_rf,
+                                          Ring.cycle_time,
+                                          Ring.RingOptions.t_start))
 
         # Calculating design rf angular frequency
         if omega_rf is None:
-            self.omega_rf_d = 2.*np.pi*self.beta*c*self.harmonic / \
-                (self.ring_circumference)
+            self.omega_rf_d = storage.compute(
+                'omega_rf_d', lambda beta, harmonic:
+                2.*np.pi*beta*c*harmonic / (self.ring_circumference),
+                self.beta, self.harmonic)
         else:
-            self.omega_rf_d = RFStationOptions.reshape_data(
-                omega_rf,
-                self.n_turns,
-                self.n_rf,
-                Ring.cycle_time,
-                Ring.RingOptions.t_start)
-
-        # Reshape phase noise
-        if phi_noise is not None:
-            self.phi_noise = RFStationOptions.reshape_data(
-                phi_noise,
-                self.n_turns,
-                self.n_rf,
-                Ring.cycle_time,
-                Ring.RingOptions.t_start)
+            self.omega_rf_d = storage.store('omega_rf_d',
+                                            RFStationOptions.reshape_data(
+                                                omega_rf,
+                                                self.n_turns,
+                                                self.n_rf,
+                                                Ring.cycle_time,
+                                                Ring.RingOptions.t_start))
+
+        # Reshape phase noise; streaming noise generated during tracking
+        if getattr(phi_noise, 'streaming', False):
+            self.phi_noise = phi_noise
+        elif phi_noise is not None:
+            self.phi_noise = storage.store('phi_noise',
+                                           RFStationOptions.reshape_data(
+                                               phi_noise,
+                                               self.n_turns,
+                                               self.n_rf,
+                                               Ring.cycle_time,
+                                               Ring.RingOptions.t_start))
         else:
             self.phi_noise = None
             
@@ -348,15 +368,19 @@ class RFStation(object):
 
         # Copy of the desing rf programs in the one used for tracking
         # and that can be changed by feedbacks
-        self.phi_rf = np.array(self.phi_rf_d)
+        self.phi_rf = storage.compute('phi_rf', np.array, self.phi_rf_d)
         self.dphi_rf = np.zeros(self.n_rf)
-        self.omega_rf = np.array(self.omega_rf_d)
-        self.t_rf = 2*np.pi / self.omega_rf
+        self.omega_rf = storage.compute('omega_rf', np.array,
+                                        self.omega_rf_d)
+        self.t_rf = storage.compute('t_rf', lambda omega_rf:
+                                    2*np.pi / omega_rf, self.omega_rf)
 
         # From helper functions
-        self.phi_s = calculate_phi_s(self, self.Particle)
-        self.Q_s = calculate_Q_s(self, self.Particle)
-        self.omega_s0 = self.Q_s*Ring.omega_rev
+        self.phi_s = storage.store('phi_s',
+                                   calculate_phi_s(self, self.Particle))
+        self.Q_s = storage.store('Q_s', calculate_Q_s(self, self.Particle))
+        self.omega_s0 = storage.compute('omega_s0', np.multiply, self.Q_s,
+                                        Ring.omega_rev)
 
     def eta_tracking(self, beam, counter, dE):
         r"""Function to calculate the slippage factor as a function of the
@@ -402,6 +426,28 @@ def calculate_Q_s(RFStation, Particle=Proton()):
                    (2*np.pi*RFStation.beta**2*RFStation.energy))
 
 
+#: | *Number of turns processed at once by calculate_phi_s() with 'all'*
+phi_s_n_turns_block = 1000
+
+#: | *Number of RF programs in the LRU cache of calculate_phi_s()*
+phi_s_cache_size = 8
+
+_phi_s_cache = OrderedDict()
+
+
+def _phi_s_cache_key(RFStation, Particle):
+
+    digest = hashlib.sha1()
+    for program in [RFStation.voltage, RFStation.harmonic,
+                    RFStation.phi_rf, RFStation.delta_E, RFStation.eta_0]:
+        program = np.ascontiguousarray(program, dtype=float)
+        digest.update(str(program.shape).encode())
+        digest.update(program.data)
+    digest.update(repr(float(Particle.charge)).encode())
+
+    return digest.hexdigest()
+
+
 def calculate_phi_s(RFStation, Particle=Proton(),
                     accelerating_systems='as_single'):
     r"""Function calculating the turn-by-turn synchronous phase according to
@@ -419,7 +465,10 @@ def calculate_phi_s(RFStation, Particle=Proton(),
       minimum of the potential well; no intensity effects included. In case of
       several minima, the deepest is taken. **WARNING:** in case of RF
       harmonics with comparable voltages, this may lead to inconsistent
-      values of phi_s.
+      values of phi_s. The turns are processed by blocks of
+      phi_s_n_turns_block turns and the result is kept in an LRU cache of
+      phi_s_cache_size RF programs (voltage, harmonic, phi_rf, delta_E and
+      eta_0).
     * 'first': not yet implemented. Its purpose should be to adjust the
       RFStation.phi_offset of the higher harmonics so that only the
       main harmonic is accelerating.
@@ -471,40 +520,61 @@ def calculate_phi_s(RFStation, Particle=Proton(),
 
     elif accelerating_systems == 'all':
 
-        phi_s = np.zeros(len(RFStation.voltage[0, 1:]))
-
-        for indexTurn in range(len(RFStation.delta_E)):
+        # Cache keyed on the RF program
+        key = _phi_s_cache_key(RFStation, Particle)
+        if key in _phi_s_cache:
+            _phi_s_cache.move_to_end(key)
+            return _phi_s_cache[key].copy()
+
+        n_turns = len(RFStation.delta_E)
+        phi_s = np.zeros(n_turns)
+
+        # Potential well on 1000 phase points, for blocks of turns at once
+        for start in range(0, n_turns, phi_s_n_turns_block):
+            turns = np.arange(start, min(start + phi_s_n_turns_block,
+                                         n_turns))
+            phi_rf = RFStation.phi_rf[:, turns+1]
+            voltage = RFStation.voltage[:, turns+1]
+            harmonic = RFStation.harmonic[:, turns+1]
+            sign_eta = np.sign(eta0[turns])[:, np.newaxis]
+
+            above = sign_eta[:, 0] > 0
+            phase_array = np.linspace(
+                np.where(above, -phi_rf[0], -phi_rf[0] - np.pi),
+                np.where(above, -phi_rf[0] + 2*np.pi, -phi_rf[0] + np.pi),
+                1000, axis=1)
 
             totalRF = 0
-            if np.sign(eta0[indexTurn]) > 0:
-                phase_array = np.linspace(
-                    -float(RFStation.phi_rf[0, indexTurn+1]),
-                    -float(RFStation.phi_rf[0, indexTurn+1]) + 2*np.pi, 1000)
-            else:
-                phase_array = np.linspace(
-                    -float(RFStation.phi_rf[0, indexTurn+1]) - np.pi,
-                    -float(RFStation.phi_rf[0, indexTurn+1]) + np.pi, 1000)
-
-            for indexRF in range(len(RFStation.voltage[:, indexTurn+1])):
-                totalRF += RFStation.voltage[indexRF, indexTurn+1] * \
-                    np.sin(RFStation.harmonic[indexRF, indexTurn+1] /
-                           np.min(RFStation.harmonic[:, indexTurn+1]) *
-                           phase_array +
-                           RFStation.phi_rf[indexRF, indexTurn+1])
-
-            potential_well = - cumtrapz(
-                np.sign(eta0[indexTurn])*(totalRF -
-                                          RFStation.delta_E[indexTurn] /
-                                          abs(Particle.charge)),
-                dx=phase_array[1]-phase_array[0], initial=0)
-
-            phi_s[indexTurn] = np.mean(phase_array[
-                potential_well == np.min(potential_well)])
+            for indexRF in range(len(voltage)):
+                totalRF += voltage[indexRF, :, np.newaxis] * \
+                    np.sin((harmonic[indexRF] /
+                            np.min(harmonic, axis=0))[:, np.newaxis] *
+                           phase_array + phi_rf[indexRF, :, np.newaxis])
+
+            # Same operations as cumtrapz, row by row
+            force = sign_eta*(totalRF - RFStation.delta_E[turns, np.newaxis] /
+                              abs(Particle.charge))
+            dx = (phase_array[:, 1] - phase_array[:, 0])[:, np.newaxis]
+            potential_well = np.zeros(phase_array.shape)
+            potential_well[:, 1:] = - np.cumsum(
+                dx * (force[:, 1:] + force[:, :-1]) / 2.0, axis=1)
+
+            minima = potential_well == np.min(potential_well, axis=1,
+                                              keepdims=True)
+            n_minima = np.sum(minima, axis=1)
+            single = n_minima == 1
+            phi_s[turns[single]] = phase_array[single][minima[single]]
+            for row in np.where(~single)[0]:
+                phi_s[turns[row]] = np.mean(phase_array[row][minima[row]])
 
         phi_s = np.insert(phi_s, 0, phi_s[0]) + RFStation.phi_rf[0, :]
         phi_s[eta0 < 0] += np.pi
         phi_s = phi_s % (2*np.pi)
 
+        _phi_s_cache[key] = phi_s.copy()
+        while len(_phi_s_cache) > phi_s_cache_size:
+            _phi_s_cache.popitem(last=False)
+
         return phi_s
 
     elif accelerating_systems == 'first':
@@ -151,6 +151,9 @@ class Ring(object):
     RingOptions : RingOptions()
         The RingOptions is kept as an attribute of the Ring object for further
         usage.
+    program_storage : ProgramStorage()
+        Allocates the turn-by-turn programs of the Ring and of the RFStation
+        objects, in memory or memory-mapped (see RingOptions)
 
     Examples
     --------
@@ -212,9 +215,14 @@ class Ring(object):
         # Keeps RingOptions as an attribute
         self.RingOptions = RingOptions
 
+        # Allocation of the turn-by-turn programs, in memory or
+        # memory-mapped, also used by RFStation
+        self.program_storage = RingOptions.program_storage
+        storage = self.program_storage
+
         # Reshaping the input synchronous data to the adequate format and
         # get back the momentum program from RingOptions
-        self.momentum = RingOptions.reshape_data(
+        self.momentum = storage.store('momentum', RingOptions.reshape_data(
             synchronous_data,
             self.n_turns,
             self.n_sections,
@@ -223,7 +231,7 @@ class Ring(object):
             mass=self.Particle.mass,
             charge=self.Particle.charge,
             circumference=self.ring_circumference,
-            bending_radius=self.bending_radius)
+            bending_radius=self.bending_radius))
 
         # Updating the number of turns in case it was changed after ramp
         # interpolation
@@ -234,16 +242,33 @@ class Ring(object):
                           "program.")
 
         # Derived from momentum
-        self.beta = np.sqrt(1/(1 + (self.Particle.mass/self.momentum)**2))
-        self.gamma = np.sqrt(1 + (self.momentum/self.Particle.mass)**2)
-        self.energy = np.sqrt(self.momentum**2 + self.Particle.mass**2)
-        self.kin_energy = np.sqrt(self.momentum**2 + self.Particle.mass**2) - \
-            self.Particle.mass
-        self.delta_E = np.diff(self.energy, axis=1)
-        self.t_rev = np.dot(self.ring_length, 1/(self.beta*c))
-        self.cycle_time = np.cumsum(self.t_rev)  # Always starts with zero
-        self.f_rev = 1/self.t_rev
-        self.omega_rev = 2*np.pi*self.f_rev
+        mass = self.Particle.mass
+        self.beta = storage.compute(
+            'beta', lambda momentum: np.sqrt(1/(1 + (mass/momentum)**2)),
+            self.momentum)
+        self.gamma = storage.compute(
+            'gamma', lambda momentum: np.sqrt(1 + (momentum/mass)**2),
+            self.momentum)
+        self.energy = storage.compute(
+            'energy', lambda momentum: np.sqrt(momentum**2 + mass**2),
+            self.momentum)
+        self.kin_energy = storage.compute(
+            'kin_energy',
+            lambda momentum: np.sqrt(momentum**2 + mass**2) - mass,
+            self.momentum)
+        self.delta_E = storage.compute('delta_E', np.subtract,
+                                       self.energy[:, 1:],
+                                       self.energy[:, :-1])
+        self.t_rev = storage.compute(
+            't_rev', lambda beta: np.dot(self.ring_length, 1/(beta*c)),
+            self.beta)
+        self.cycle_time = storage.store(
+            'cycle_time', np.cumsum(self.t_rev))  # Always starts with zero
+        self.f_rev = storage.compute('f_rev', lambda t_rev: 1/t_rev,
+                                     self.t_rev)
+        self.omega_rev = storage.compute('omega_rev',
+                                         lambda f_rev: 2*np.pi*f_rev,
+                                         self.f_rev)
 
         # Momentum compaction, checks, and derived slippage factors
         if RingOptions.t_start is None:
@@ -251,34 +276,34 @@ class Ring(object):
         else:
             interp_time = self.cycle_time+RingOptions.t_start
 
-        self.alpha_0 = RingOptions.reshape_data(
+        self.alpha_0 = storage.store('alpha_0', RingOptions.reshape_data(
             alpha_0, self.n_turns, self.n_sections,
-            interp_time=interp_time)
+            interp_time=interp_time))
         self.alpha_order = 0
 
         if alpha_1 is not None:
-            self.alpha_1 = RingOptions.reshape_data(
+            self.alpha_1 = storage.store('alpha_1', RingOptions.reshape_data(
                 alpha_1, self.n_turns, self.n_sections,
-                interp_time=interp_time)
+                interp_time=interp_time))
             self.alpha_order = 1
         else:
             # Filling alpha_1 with zeros
             # This can be removed when the BLonD assembler is in place
             # to avoid high order momentum compaction programs filled
             # with zeros (should be propagated in RFStation.__init__())
-            self.alpha_1 = np.zeros(self.alpha_0.shape)
+            self.alpha_1 = storage.zeros('alpha_1', self.alpha_0.shape)
 
         if alpha_2 is not None:
-            self.alpha_2 = RingOptions.reshape_data(
+            self.alpha_2 = storage.store('alpha_2', RingOptions.reshape_data(
                 alpha_2, self.n_turns, self.n_sections,
-                interp_time=interp_time)
+                interp_time=interp_time))
             self.alpha_order = 2
         else:
             # Filling alpha_2 with zeros
             # This can be removed when the BLonD assembler is in place
             # to avoid high order momentum compaction programs filled
             # with zeros (should be propagated in RFStation.__init__())
-            self.alpha_2 = np.zeros(self.alpha_0.shape)
+            self.alpha_2 = storage.zeros('alpha_2', self.alpha_0.shape)
 
         # Slippage factor derived from alpha, beta, gamma
         self.eta_generation()
@@ -302,34 +327,34 @@ class Ring(object):
         # to avoid high order momentum compaction programs filled
         # with zeros (should be propagated in RFStation.__init__())
         for i in range(self.alpha_order+1, 3):
-            setattr(self, "eta_%s" % i, np.zeros([self.n_sections,
-                                                  self.n_turns+1]))
+            setattr(self, "eta_%s" % i, self.program_storage.zeros(
+                'eta_%s' % i, [self.n_sections, self.n_turns+1]))
 
     def _eta0(self):
         """ Function to calculate the zeroth order slippage factor eta_0 """
 
-        self.eta_0 = np.empty([self.n_sections, self.n_turns+1])
-        for i in range(0, self.n_sections):
-            self.eta_0[i] = self.alpha_0[i] - self.gamma[i]**(-2.)
+        self.eta_0 = self.program_storage.compute(
+            'eta_0', lambda alpha_0, gamma: alpha_0 - gamma**(-2.),
+            self.alpha_0, self.gamma)
 
     def _eta1(self):
         """ Function to calculate the first order slippage factor eta_1 """
 
-        self.eta_1 = np.empty([self.n_sections, self.n_turns+1])
-        for i in range(0, self.n_sections):
-            self.eta_1[i] = 3*self.beta[i]**2/(2*self.gamma[i]**2) + \
-                self.alpha_1[i] - self.alpha_0[i]*self.eta_0[i]
+        self.eta_1 = self.program_storage.compute(
+            'eta_1', lambda beta, gamma, alpha_0, alpha_1, eta_0:
+            3*beta**2/(2*gamma**2) + alpha_1 - alpha_0*eta_0,
+            self.beta, self.gamma, self.alpha_0, self.alpha_1, self.eta_0)
 
     def _eta2(self):
         """ Function to calculate the second order slippage factor eta_2 """
 
-        self.eta_2 = np.empty([self.n_sections, self.n_turns+1])
-        for i in range(0, self.n_sections):
-            self.eta_2[i] = - self.beta[i]**2*(5*self.beta[i]**2 - 1) / \
-                (2*self.gamma[i]**2) + self.alpha_2[i] - 2*self.alpha_0[i] *\
-                self.alpha_1[i] + self.alpha_1[i] / self.gamma[i]**2 + \
-                self.alpha_0[i]**2*self.eta_0[i] - 3*self.beta[i]**2 * \
-                self.alpha_0[i]/(2*self.gamma[i]**2)
+        self.eta_2 = self.program_storage.compute(
+            'eta_2', lambda beta, gamma, alpha_0, alpha_1, alpha_2, eta_0:
+            - beta**2*(5*beta**2 - 1) / (2*gamma**2) + alpha_2 -
+            2*alpha_0*alpha_1 + alpha_1 / gamma**2 + alpha_0**2*eta_0 -
+            3*beta**2*alpha_0/(2*gamma**2),
+            self.beta, self.gamma, self.alpha_0, self.alpha_1, self.alpha_2,
+            self.eta_0)
 
     def parameters_at_time(self, cycle_moments):
         """ Function to return various cycle parameters at a specific moment in
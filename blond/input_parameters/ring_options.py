@@ -21,6 +21,7 @@ import matplotlib.pyplot as plt
 from scipy.constants import c
 from scipy.interpolate import splrep, splev
 from ..plots.plot import fig_folder
+from ..input_parameters.program_storage import ProgramStorage
 
 
 class RingOptions(object):
@@ -54,11 +55,16 @@ class RingOptions(object):
         Figure name to save optional plot; default is 'preprocess_ramp'
     sampling : int
         Decimation value for plotting; default is 1
+    program_storage : ProgramStorage
+        A ProgramStorage instance allocating the turn-by-turn programs of
+        Ring and of the RFStation objects built on it; default is None
+        (programs kept in memory)
 
     """
     def __init__(self, interpolation='linear', smoothing=0, flat_bottom=0,
                  flat_top=0, t_start=None, t_end=None, plot=False,
-                 figdir='fig', figname='preprocess_ramp', sampling=1):
+                 figdir='fig', figname='preprocess_ramp', sampling=1,
+                 program_storage=None):
 
         if interpolation in ['linear', 'cubic', 'derivative']:
             self.interpolation = str(interpolation)
@@ -102,6 +108,11 @@ class RingOptions(object):
             raise RuntimeError("ERROR: sampling value in PreprocessRamp" +
                                " not recognised. Aborting...")
 
+        if program_storage is None:
+            self.program_storage = ProgramStorage()
+        else:
+            self.program_storage = program_storage
+
     def reshape_data(self, input_data, n_turns, n_sections,
                      interp_time='t_rev', input_to_momentum=False,
                      synchronous_data_type='momentum', mass=None, charge=None,
@@ -309,6 +320,9 @@ class RingOptions(object):
                 raise RuntimeError("ERROR: [t_start, t_end] should be " +
                                    "included in the passed time array.")
 
+        time = np.asarray(time, dtype=float)
+        momentum = np.asarray(momentum, dtype=float)
+
         # Obtain flat bottom data, extrapolate to constant
         beta_0 = np.sqrt(1/(1 + (mass/momentum[0])**2))
         T0 = circumference/(beta_0*c)  # Initial revolution period [s]
@@ -317,36 +331,26 @@ class RingOptions(object):
         beta_interp = beta_0*np.ones(self.flat_bottom+1)
         momentum_interp = momentum[0]*np.ones(self.flat_bottom+1)
 
-        time_interp = time_interp.tolist()
-        beta_interp = beta_interp.tolist()
-        momentum_interp = momentum_interp.tolist()
-
         time_start_ramp = np.max(time[momentum == momentum[0]])
         time_end_ramp = np.min(time[momentum == momentum[-1]])
 
-        # Interpolate data recursively
+        # Interpolate data recursively, the revolution period of each turn
+        # depending on the momentum at the beginning of the turn
         if self.interpolation == 'linear':
 
-            time_interp.append(time_interp[-1]
-                               + circumference/(beta_interp[0]*c))
-
-            i = self.flat_bottom
-            for k in range(1, len(time)):
-
-                while time_interp[i+1] <= time[k]:
+            def momentum_function(time_block, time_previous,
+                                  momentum_previous):
 
-                    momentum_interp.append(
-                        momentum[k-1] + (momentum[k] - momentum[k-1]) *
-                        (time_interp[i+1] - time[k-1]) /
-                        (time[k] - time[k-1]))
+                k = np.clip(np.searchsorted(time, time_block, side='left'),
+                            1, len(time)-1)
+                momentum_block = momentum[k-1] + (momentum[k] -
+                                                  momentum[k-1]) * \
+                    (time_block - time[k-1]) / (time[k] - time[k-1])
+                momentum_block[time_block > time[-1]] = momentum[-1]
 
-                    beta_interp.append(
-                        np.sqrt(1/(1 + (mass/momentum_interp[i+1])**2)))
+                return momentum_block
 
-                    time_interp.append(
-                        time_interp[i+1] + circumference/(beta_interp[i+1]*c))
-
-                    i += 1
+            stop_on_previous = False
 
         elif self.interpolation == 'cubic':
 
@@ -355,91 +359,62 @@ class RingOptions(object):
                 momentum[(time >= time_start_ramp) * (time <= time_end_ramp)],
                 s=self.smoothing)
 
-            i = self.flat_bottom
-
-            time_interp.append(
-                time_interp[-1] + circumference / (beta_interp[0]*c))
-
-            while time_interp[i] <= time[-1]:
-
-                if (time_interp[i+1] < time_start_ramp):
-
-                    momentum_interp.append(momentum[0])
-
-                    beta_interp.append(
-                        np.sqrt(1/(1 + (mass/momentum_interp[i+1])**2)))
+            def momentum_function(time_block, time_previous,
+                                  momentum_previous):
 
-                    time_interp.append(
-                        time_interp[i+1] + circumference/(beta_interp[i+1]*c))
+                momentum_block = np.empty(len(time_block))
+                before_ramp = time_block < time_start_ramp
+                after_ramp = time_block > time_end_ramp
+                during_ramp = ~(before_ramp + after_ramp)
 
-                elif (time_interp[i+1] > time_end_ramp):
+                momentum_block[before_ramp] = momentum[0]
+                momentum_block[after_ramp] = momentum[-1]
+                if np.any(during_ramp):
+                    momentum_block[during_ramp] = splev(
+                        time_block[during_ramp], interp_funtion_momentum)
 
-                    momentum_interp.append(momentum[-1])
+                return momentum_block
 
-                    beta_interp.append(
-                        np.sqrt(1/(1 + (mass/momentum_interp[i+1])**2)))
-
-                    time_interp.append(
-                        time_interp[i+1] + circumference/(beta_interp[i+1]*c))
-
-                else:
-
-                    momentum_interp.append(
-                        splev(time_interp[i+1], interp_funtion_momentum))
-
-                    beta_interp.append(
-                        np.sqrt(1/(1 + (mass/momentum_interp[i+1])**2)))
-
-                    time_interp.append(
-                        time_interp[i+1] + circumference/(beta_interp[i+1]*c))
-
-                i += 1
+            stop_on_previous = True
 
         # Interpolate momentum in 1st derivative to maintain smooth B-dot
         elif self.interpolation == 'derivative':
 
-            momentum_initial = momentum_interp[0]
             momentum_derivative = np.gradient(momentum)/np.gradient(time)
 
-            momentum_derivative_interp = [0]*self.flat_bottom + \
-                [momentum_derivative[0]]
-            integral_point = momentum_initial
+            def momentum_function(time_block, time_previous,
+                                  momentum_previous):
 
-            i = self.flat_bottom
+                derivative_block = np.interp(time_block, time,
+                                             momentum_derivative)
+                derivative_block *= np.diff(np.concatenate(
+                    ([time_previous], time_block)))
 
-            time_interp.append(
-                time_interp[-1] + circumference/(beta_interp[0]*c))
+                return np.cumsum(np.concatenate(
+                    ([momentum_previous], derivative_block)))[1:]
 
-            while time_interp[i] <= time[-1]:
+            stop_on_previous = True
 
-                derivative_point = np.interp(time_interp[i+1], time,
-                                             momentum_derivative)
-                momentum_derivative_interp.append(derivative_point)
-                integral_point += (time_interp[i+1] - time_interp[i]) \
-                    * derivative_point
+        time_ramp, beta_ramp, momentum_ramp = integrate_revolution_period(
+            momentum_function, time_interp[-1], momentum_interp[-1],
+            time_interp[-1] + circumference/(beta_interp[0]*c), mass,
+            circumference, time[-1], stop_on_previous)
 
-                momentum_interp.append(integral_point)
-                beta_interp.append(
-                    np.sqrt(1/(1 + (mass/momentum_interp[i+1])**2)))
+        time_interp = np.concatenate((time_interp, time_ramp))
+        beta_interp = np.concatenate((beta_interp, beta_ramp))
+        momentum_interp = np.concatenate((momentum_interp, momentum_ramp))
 
-                time_interp.append(
-                    time_interp[i+1] + circumference/(beta_interp[i+1]*c))
-
-                i += 1
+        if self.interpolation == 'derivative':
 
             # Adjust result to get flat top energy correct as derivation and
             # integration leads to ~10^-8 error in flat top momentum
-            momentum_interp = np.asarray(momentum_interp)
             momentum_interp -= momentum_interp[0]
             momentum_interp /= momentum_interp[-1]
             momentum_interp *= momentum[-1] - momentum[0]
 
             momentum_interp += momentum[0]
 
-        time_interp.pop()
-        time_interp = np.asarray(time_interp)
-        beta_interp = np.asarray(beta_interp)
-        momentum_interp = np.asarray(momentum_interp)
+        time_interp = time_interp[:-1]
 
         # Obtain flat top data, extrapolate to constant
         if self.flat_top > 0:
@@ -494,6 +469,101 @@ class RingOptions(object):
         return time_interp, momentum_interp
 
 
+def integrate_revolution_period(momentum_function, time_previous,
+                                momentum_previous, time_next, mass,
+                                circumference, time_end, stop_on_previous,
+                                n_turns_block=10000):
+    r"""Function to integrate the revolution period turn by turn,
+    t[i+1] = t[i] + C/(beta(p(t[i]))*c), until the end of the momentum
+    program. The recursion is solved by blocks of turns: the times of the
+    block are guessed and the momentum, the revolution periods and their
+    cumulative sum are recomputed until the times do not change anymore.
+    The cumulative sum adds the periods in the same order as the turn by
+    turn recursion, hence the result is identical to it.
+
+    Parameters
+    ----------
+    momentum_function : function
+        Momentum at the turns of a block, called as
+        momentum_function(time_block, time_previous, momentum_previous)
+        with the time and momentum of the turn preceding the block
+    time_previous : float
+        Time [s] of the last turn already computed
+    momentum_previous : float
+        Momentum [eV/c] of the last turn already computed
+    time_next : float
+        Time [s] of the first turn to compute
+    mass : float
+        Particle mass [eV]
+    circumference : float
+        Ring circumference [m]
+    time_end : float
+        Last time [s] of the momentum program
+    stop_on_previous : bool
+        If True, the momentum of a turn is computed as long as the previous
+        turn is within time_end, otherwise as long as the turn itself is
+    n_turns_block : int
+        Number of turns integrated per block; default is 10000
+
+    Returns
+    -------
+    float array
+        Time [s] of the computed turns, plus the time of the following turn
+    float array
+        Relativistic beta of the computed turns
+    float array
+        Momentum [eV/c] of the computed turns
+
+    """
+
+    time_blocks = []
+    beta_blocks = []
+    momentum_blocks = []
+
+    period = time_next - time_previous
+
+    while True:
+
+        time_block = time_next + period*np.arange(n_turns_block)
+
+        # Fixed point iteration, at least one more turn is exact after each
+        # iteration
+        for iteration in range(n_turns_block):
+
+            momentum_block = momentum_function(time_block, time_previous,
+                                               momentum_previous)
+            beta_block = np.sqrt(1/(1 + (mass/momentum_block)**2))
+            time_updated = np.cumsum(np.concatenate(
+                ([time_next], circumference/(beta_block*c))))
+
+            if np.array_equal(time_updated[:-1], time_block):
+                break
+            time_block = time_updated[:-1]
+
+        if stop_on_previous:
+            n_turns_kept = np.searchsorted(np.concatenate(
+                ([time_previous], time_block[:-1])), time_end, side='right')
+        else:
+            n_turns_kept = np.searchsorted(time_block, time_end,
+                                           side='right')
+
+        time_blocks.append(time_block[:n_turns_kept])
+        beta_blocks.append(beta_block[:n_turns_kept])
+        momentum_blocks.append(momentum_block[:n_turns_kept])
+
+        if n_turns_kept < n_turns_block:
+            time_blocks.append(time_updated[n_turns_kept:n_turns_kept+1])
+            break
+
+        time_previous = time_block[-1]
+        momentum_previous = momentum_block[-1]
+        time_next = time_updated[-1]
+        period = time_updated[-1] - time_updated[-2]
+
+    return np.concatenate(time_blocks), np.concatenate(beta_blocks), \
+        np.concatenate(momentum_blocks)
+
+
 def convert_data(synchronous_data, mass, charge,
                  synchronous_data_type='momentum', bending_radius=None):
         """ Function to convert synchronous data (i.e. energy program of the
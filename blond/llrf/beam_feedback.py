@@ -26,12 +26,16 @@ class BeamFeedback(object):
     Use 'period' for a phase loop that is active only in certain turns. 
     The phase loop acts directly on the RF frequency of all harmonics and
     affects the RF phase as well.
+    With configuration['phase_detector'] = 'particles', the beam phase is
+    measured directly from the particles of the Beam, without Profile; in a
+    RingAndRFTracker without interpolation, it is computed during the kick
+    (except for SPS_RL).
     '''
 
     def __init__(self, Ring, RFStation, Profile,
                  configuration,
                  PhaseNoise=None,
-                 LHCNoiseFB=None, delay=0):
+                 LHCNoiseFB=None, delay=0, Beam=None):
 
         #: | *Import Ring*
         self.ring = Ring
@@ -42,6 +46,11 @@ class BeamFeedback(object):
         #: | *Import Profile*
         self.profile = Profile
 
+        #: | *Import Beam, for the particle phase detector*
+        if Beam is None and Profile is not None:
+            Beam = Profile.Beam
+        self.beam = Beam
+
         #: | *Machine-dependent configuration of LLRF system.*
         self.config = configuration
 
@@ -65,6 +74,41 @@ class BeamFeedback(object):
         else:
             self.time_offset = self.config['time_offset']
 
+        #: | *Beam phase measured from the 'profile' or the 'particles'.*
+        if 'phase_detector' not in self.config:
+            self.phase_detector = 'profile'
+        else:
+            self.phase_detector = self.config['phase_detector']
+        if self.phase_detector not in ['profile', 'particles']:
+            # PhaseLoopError
+            raise RuntimeError("ERROR: phase_detector option not " +
+                               "recognised. Aborting...")
+        if self.phase_detector == 'particles' and self.beam is None:
+            # PhaseLoopError
+            raise RuntimeError("ERROR: particle phase detector needs the " +
+                               "Beam. Aborting...")
+        if self.phase_detector == 'profile' and self.profile is None:
+            # PhaseLoopError
+            raise RuntimeError("ERROR: phase detector needs the Profile. " +
+                               "Aborting...")
+
+        #: | *Beam phase detector acting on the Profile*
+        if self.profile is not None:
+            self.phase_engine = BeamPhaseEngine(self.profile)
+        else:
+            self.phase_engine = None
+
+        #: | *Sine and cosine sums of the particle phase detector, if already
+        #: computed during the kick of the present turn.*
+        self.phase_coefficients = None
+
+        #: | *The particle phase detector is computed during the kick, unless
+        #: the loop changes the RF program of the present turn or reads the
+        #: beam energy before the kick (radial steering and radial loop of
+        #: SPS_RL).*
+        self.fused_phase_detector = self.phase_detector == 'particles' and \
+            self.machine != 'SPS_RL'
+
         #: | *Phase loop gain. Implementation depends on machine.*
         try:
             self.gain = self.config['PL_gain']
@@ -210,6 +254,7 @@ class BeamFeedback(object):
 
         # Calculate PL correction on RF frequency
         getattr(self, self.machine)()
+        self.phase_coefficients = None
 
         # Update the RF frequency of all systems for the next turn
         counter = self.rf_station.counter[0] + 1
@@ -238,6 +283,36 @@ class BeamFeedback(object):
         else:
             self.on_time = np.arange(Ring.t_rev.size)
 
+    def phase_window(self, omega_rf):
+        '''
+        *Window of the phase detector at the RF frequency omega_rf, see
+        beam_phase and beam_phase_sharpWindow: window coefficient, time
+        offset of the window and time interval of the particles or bins.*
+        '''
+
+        if self.machine == 'SPS_F':
+            if self.alpha != 0.0:
+                return 0., 0., self.time_offset - np.pi / omega_rf, \
+                    -1/self.alpha + self.time_offset - 2 * np.pi / omega_rf
+            return 0., 0., -np.inf, np.inf
+
+        if self.time_offset is None:
+            return self.alpha, 0., -np.inf, np.inf
+        return self.alpha, self.time_offset, self.time_offset, np.inf
+
+    def particle_phase_coefficients(self, omega_rf, phi_rf):
+        '''
+        *Sine and cosine components of the beam phase summed over the
+        particles, unless already computed during the kick.*
+        '''
+
+        if self.phase_coefficients is None:
+            self.phase_coefficients = bm.beam_phase_particles(
+                self.beam.dt, *self.phase_window(omega_rf),
+                omegarf=omega_rf, phirf=phi_rf)
+
+        return self.phase_coefficients
+
     def beam_phase(self):
         '''
         *Beam phase measured at the main RF frequency and phase. The beam is 
@@ -251,30 +326,14 @@ class BeamFeedback(object):
         omega_rf = self.rf_station.omega_rf[0, self.rf_station.counter[0]]
         phi_rf = self.rf_station.phi_rf[0, self.rf_station.counter[0]]
 
-        if self.time_offset is None:
-            # indexes = np.ones(self.profile.n_slices, dtype=bool)
-            # time_offset = 0.0
-            coeff = bm.beam_phase(self.profile.bin_centers,
-                                  self.profile.n_macroparticles,
-                                  self.alpha, omega_rf, phi_rf,
-                                  self.profile.bin_size)
+        if self.phase_detector == 'particles':
+            scoeff, ccoeff = self.particle_phase_coefficients(omega_rf,
+                                                              phi_rf)
         else:
-            indexes = self.profile.bin_centers >= self.time_offset
-            time_offset = self.time_offset
             # Convolve with window function
-            scoeff = np.trapz(np.exp(self.alpha*(self.profile.bin_centers[indexes] -
-                                                 time_offset)) *
-                              np.sin(omega_rf*self.profile.bin_centers[indexes] +
-                                     phi_rf) *
-                              self.profile.n_macroparticles[indexes],
-                              dx=self.profile.bin_size)
-            ccoeff = np.trapz(np.exp(self.alpha*(self.profile.bin_centers[indexes] -
-                                                 time_offset)) *
-                              np.cos(omega_rf*self.profile.bin_centers[indexes] +
-                                     phi_rf) *
-                              self.profile.n_macroparticles[indexes],
-                              dx=self.profile.bin_size)
-            coeff = scoeff/ccoeff
+            scoeff, ccoeff = self.phase_engine.coefficients(
+                omega_rf, phi_rf, *self.phase_window(omega_rf))
+        coeff = scoeff/ccoeff
 
         # Project beam phase to (pi/2,3pi/2) range
         self.phi_beam = np.arctan(coeff) + np.pi
@@ -292,24 +351,13 @@ class BeamFeedback(object):
         omega_rf = self.rf_station.omega_rf[0, turn]
         phi_rf = self.rf_station.phi_rf[0, turn]
 
-        if self.alpha != 0.0:
-            indexes = np.logical_and((self.time_offset - np.pi / omega_rf)
-                                     <= self.profile.bin_centers,
-                                     self.profile.bin_centers
-                                     <= (-1/self.alpha + self.time_offset -
-                                         2 * np.pi / omega_rf))
+        if self.phase_detector == 'particles':
+            scoeff, ccoeff = self.particle_phase_coefficients(omega_rf,
+                                                              phi_rf)
         else:
-            indexes = np.ones(self.profile.n_slices, dtype=bool)
-
-        # Convolve with window function
-        scoeff = np.trapz(np.sin(omega_rf*self.profile.bin_centers[indexes]
-                                 + phi_rf)
-                          * self.profile.n_macroparticles[indexes],
-                          dx=self.profile.bin_size)
-        ccoeff = np.trapz(np.cos(omega_rf*self.profile.bin_centers[indexes]
-                                 + phi_rf) *
-                          self.profile.n_macroparticles[indexes],
-                          dx=self.profile.bin_size)
+            # Average over the window
+            scoeff, ccoeff = self.phase_engine.coefficients(
+                omega_rf, phi_rf, *self.phase_window(omega_rf))
 
         # Project beam phase to (pi/2,3pi/2) range
         self.phi_beam = np.arctan(scoeff/ccoeff) + np.pi
@@ -345,7 +393,7 @@ class BeamFeedback(object):
 #        self.average_dE = np.mean(self.profile.Beam.dE[(self.profile.Beam.dt >
 #            self.profile.bin_centers[0])*(self.profile.Beam.dt <
 #                                         self.profile.bin_centers[-1])])
-        self.average_dE = np.mean(self.profile.Beam.dE)
+        self.average_dE = np.mean(self.beam.dE)
 
         self.drho = self.ring.alpha_0[0, counter] * \
             self.ring.ring_radius*self.average_dE / \
@@ -547,3 +595,63 @@ class BeamFeedback(object):
         # Apply frequency correction
         self.domega_rf = - self.domega_PL - self.domega_RL
 
+
+
+class BeamPhaseEngine(object):
+    '''
+    *Beam phase detector acting on a Profile. The profile is weighted by the
+    window exp(alpha*(t - time_offset)) and integrated with the trapezoidal
+    rule over the bins time_min <= t <= time_max, see
+    BeamFeedback.phase_window. The window weights are kept for the profile
+    grid and recomputed only when Profile.bin_centers or the window change;
+    the sine and cosine of the RF phase are obtained in the compiled routine
+    by angle-addition recurrences along the bins.*
+    '''
+
+    def __init__(self, Profile):
+
+        #: | *Import Profile*
+        self.profile = Profile
+
+        #: | *Profile grid, window parameters and weights of the last call*
+        self.bin_centers = None
+        self.window_parameters = None
+        self.window = None
+
+    def update_window(self, alpha, time_offset):
+        '''
+        *Recompute the window weights if the profile grid or the window
+        changed since the last call.*
+        '''
+
+        bin_centers = self.profile.bin_centers
+        if (self.window_parameters == (alpha, time_offset)
+                and self.bin_centers is not None
+                and np.array_equal(self.bin_centers, bin_centers)):
+            return
+
+        self.bin_centers = np.array(bin_centers, dtype=bm.precision.real_t)
+        self.window_parameters = (alpha, time_offset)
+        if alpha == 0.:
+            self.window = np.ones(len(bin_centers), dtype=bm.precision.real_t)
+        else:
+            # Bins outside of the detector interval may overflow
+            with np.errstate(over='ignore'):
+                self.window = np.exp(alpha*(self.bin_centers - time_offset))
+
+    def coefficients(self, omega_rf, phi_rf, alpha=0., time_offset=0.,
+                     time_min=-np.inf, time_max=np.inf):
+        '''
+        *Sine and cosine components of the windowed profile at the RF
+        frequency omega_rf and phase phi_rf.*
+        '''
+
+        self.update_window(alpha, time_offset)
+
+        first = np.searchsorted(self.bin_centers, time_min, side='left')
+        last = np.searchsorted(self.bin_centers, time_max, side='right')
+
+        return bm.beam_phase_window(self.bin_centers[first:last],
+                                    self.profile.n_macroparticles[first:last],
+                                    self.window[first:last],
+                                    omega_rf, phi_rf, self.profile.bin_size)
@@ -22,14 +22,14 @@ import scipy
 from scipy.constants import e
 import sys
 
-from ..llrf.signal_processing import comb_filter, cartesian_to_polar, \
+from ..llrf.signal_processing import cartesian_to_polar, \
     fir_filter_lhc_otfb_coeff, \
-    polar_to_cartesian, modulator, moving_average, rf_beam_current
+    polar_to_cartesian, modulator, rf_beam_current, \
+    OverlapSaveConvolution, CombFilter, MovingAverage, FIRFilter, ACCoupling
 from ..llrf.impulse_response import SPS3Section200MHzTWC, \
     SPS4Section200MHzTWC, SPS5Section200MHzTWC
 from ..llrf.signal_processing import feedforward_filter_TWC3, \
     feedforward_filter_TWC4, feedforward_filter_TWC5
-from ..utils import bmath as bm
 from ..beam.profile import Profile, CutOptions
 
 
@@ -312,10 +312,18 @@ class SPSOneTurnFeedback(object):
         for tracking the beam
     a_comb : float
         Recursion constant of the comb filter; :math:`a_{\mathsf{comb}}=15/16`
+    comb : class
+        CombFilter type class, one-turn delay comb filter of the LLRF
     n_mov_av : const int
         Number of points for moving average modelling cavity response;
         :math:`n_{\mathsf{mov.av.}} = \frac{f_r}{f_{\mathsf{bw,cav}}}`, where
         :math:`f_r` is the cavity resonant frequency of TWC_4 and TWC_5
+    cavity_filter : class
+        MovingAverage type class over n_mov_av points modelling the cavity
+        response
+    convolutions : dict
+        Convolution engines of the impulse responses, reused as long as the
+        impulse responses and signal lengths do not change
     logger : logger
         Logger of the present class
 
@@ -393,6 +401,8 @@ class SPSOneTurnFeedback(object):
 
         # TWC resonant frequency
         self.omega_r = self.TWC.omega_r
+        # Convolution engines with pre-transformed impulse responses
+        self.convolutions = {}
         # Length of arrays in LLRF
         self.n_coarse = int(self.rf.t_rev[0]/self.rf.t_rf[0, 0])
         # Initialise turn-by-turn variables
@@ -405,8 +415,8 @@ class SPSOneTurnFeedback(object):
         self.logger.debug("Length of arrays on coarse grid %d", self.n_coarse)
 
         # Initialise comb filter
-        self.dV_comb_out_prev = np.zeros(self.n_coarse, dtype=complex)
         self.a_comb = float(a_comb)
+        self.comb = CombFilter(self.n_coarse, self.a_comb)
 
         # Initialise cavity filter (moving average)
         self.n_mov_av = int(self.TWC.tau/self.rf.t_rf[0, 0])
@@ -415,16 +425,17 @@ class SPSOneTurnFeedback(object):
         if self.n_mov_av < 2:
             raise RuntimeError("ERROR in SPSOneTurnFeedback: profile has to" +
                                " have at least 12.5 ns resolution!")
-        self.dV_ma_in_prev = np.zeros(self.n_coarse, dtype=complex)
-        # Initialise generator-induced voltage
-        self.I_gen_prev = np.zeros(self.n_mov_av, dtype=complex)
+        self.cavity_filter = MovingAverage(self.n_mov_av)
+        # Initialise generator-induced voltage; the first n_mov_av points
+        # are the last points of the previous turn
+        self.I_gen = np.zeros(self.n_mov_av + self.n_coarse, dtype=complex)
         self.logger.info("Class initialized")
 
         # Initialise feed-forward; sampled every 5 buckets
         if self.open_FF == 1:
             self.logger.debug("Feed-forward active")
             self.n_coarse_FF = int(self.n_coarse/5)
-            self.I_beam_coarse_prev = np.zeros(self.n_coarse_FF, dtype=complex)
+            self.fir_FF = FIRFilter(self.coeff_FF)
             self.I_ff_corr = np.zeros(self.n_coarse_FF, dtype=complex)
             self.V_ff_corr = np.zeros(self.n_coarse_FF, dtype=complex)
 
@@ -466,15 +477,9 @@ class SPSOneTurnFeedback(object):
         self.induced_voltage('beam_coarse')
 
         if self.open_FF == 1:
-            # Calculate correction based on previous turn on coarse grid
-            for ind in range(self.n_coarse_FF):
-                self.I_ff_corr[ind] = self.coeff_FF[0]* \
-                                      self.I_beam_coarse_prev[ind]
-                for k in range(self.n_FF):
-                    self.I_ff_corr[ind] += self.coeff_FF[k] * \
-                                           self.I_beam_coarse_prev[ind-k]
+            # Correction based on previous turn on coarse grid
             self.V_ff_corr = self.G_ff* \
-                self.matr_conv(self.I_ff_corr, self.TWC.h_gen[::5])
+                self.matr_conv(self.I_ff_corr, self.TWC.h_gen[::5], 'ff')
 
             # Compensate for FIR filter delay
             self.dV_ff = np.concatenate((self.V_ff_corr[self.n_FF_delay:],
@@ -490,20 +495,10 @@ class SPSOneTurnFeedback(object):
             self.V_coarse_ind_beam += self.n_cavities*self.V_ff_corr_coarse
             self.V_fine_ind_beam += self.n_cavities*self.V_ff_corr_fine
 
-            # Update vector from previous turn
-            self.I_beam_coarse_prev = np.copy(self.I_beam_coarse[::5])
-
-    def call_conv(self, signal, kernel):
-        """Routine to call optimised C++ convolution"""
-
-        # Make sure that the buffers are stored contiguously
-        signal = np.ascontiguousarray(signal)
-        kernel = np.ascontiguousarray(kernel)
-
-        result = np.zeros(len(kernel) + len(signal) - 1)
-        bm.convolve(signal, kernel, result)
-
-        return result
+            # Filter the beam current for the correction of the next turn
+            I_beam_coarse_FF = self.I_beam_coarse[:5*self.n_coarse_FF:5]
+            self.fir_FF.process(I_beam_coarse_FF, out=self.I_ff_corr)
+            self.I_ff_corr += self.coeff_FF[0]*I_beam_coarse_FF
 
     def generator_induced_voltage(self):
         r"""Calculates the generator-induced voltage. The transmitter model is
@@ -528,16 +523,15 @@ class SPSOneTurnFeedback(object):
             self.omega_c, self.rf.t_rf[0, self.counter]) \
             + self.open_drive*self.V_set
 
-        # Generator charge from voltage, transmitter model
-        self.I_gen = self.G_tx*self.V_gen/self.TWC.R_gen*self.T_s
-
         # Circular convolution: attach last points of previous turn
-        self.I_gen = np.concatenate((self.I_gen_prev, self.I_gen))
+        self.I_gen[:self.n_mov_av] = self.I_gen[-self.n_mov_av:]
+
+        # Generator charge from voltage, transmitter model
+        self.I_gen[self.n_mov_av:] = \
+            self.G_tx*self.V_gen/self.TWC.R_gen*self.T_s
 
         # Generator-induced voltage
         self.induced_voltage('gen')
-        # Update memory of previous turn
-        self.I_gen_prev = self.I_gen[-self.n_mov_av:]
 
     def induced_voltage(self, name):
         r"""Generation of beam- or generator-induced voltage from the
@@ -573,21 +567,21 @@ class SPSOneTurnFeedback(object):
             # Compute the beam-induced voltage on the fine grid
             self.__setattr__("V_fine_ind_"+name,
                 self.matr_conv(self.__getattribute__("I_"+name+"_fine"),
-                               self.TWC.__getattribute__("h_"+name)))
+                               self.TWC.__getattribute__("h_"+name), name))
             self.V_fine_ind_beam *= -self.n_cavities
 
         if name == "beam_coarse" and hasattr(self.TWC, "h_beam_coarse"):
             # Compute the beam-induced voltage on the coarse grid
             self.__setattr__("V_coarse_ind_beam",
                 self.matr_conv(self.__getattribute__("I_"+name),
-                               self.TWC.__getattribute__("h_"+name)))
+                               self.TWC.__getattribute__("h_"+name), name))
             self.V_coarse_ind_beam *= -self.n_cavities
 
         if name == "gen":
             # Compute the generator-induced voltage on the coarse grid
             self.__setattr__("V_coarse_ind_" + name,
                 self.matr_conv(self.__getattribute__("I_"+name),
-                               self.TWC.__getattribute__("h_"+name)))
+                               self.TWC.__getattribute__("h_"+name), name))
             # Circular convolution
             self.V_coarse_ind_gen = +self.n_cavities \
                 *self.V_coarse_ind_gen[self.n_mov_av:self.n_coarse+self.n_mov_av]
@@ -627,34 +621,31 @@ class SPSOneTurnFeedback(object):
         self.logger.debug("Voltage error %.6f MV",
                           1e-6*np.mean(np.absolute(self.dV_gen)))
 
-        # One-turn delay comb filter; memorise the value of the previous turn
-        self.dV_comb_out = comb_filter(self.dV_comb_out_prev, self.dV_gen,
-                                       self.a_comb)
-
-        # Shift signals with the delay time (to make exactly one turn)
-        self.dV_gen = np.concatenate((self.dV_comb_out_prev[-self.n_delay:],
-            self.dV_comb_out[:self.n_coarse-self.n_delay]))
-
-        # For comb filter, update memory of previous turn
-        self.dV_comb_out_prev = np.copy(self.dV_comb_out)
+        # One-turn delay comb filter; shift signals with the delay time (to
+        # make exactly one turn)
+        self.dV_gen = self.comb.process(self.dV_gen, n_delay=self.n_delay)
 
         # Modulate from omega_rf to omega_r
         self.dV_gen = modulator(self.dV_gen, self.omega_c, self.omega_r,
                                 self.rf.t_rf[0, self.counter])
 
 
-        # Cavity filter: CIRCULAR moving average over filling time
-        # Memorize last points of previous turn for beginning of next turn
-        self.dV_ma_in = np.copy(self.dV_gen)
-        self.dV_gen = moving_average(self.dV_gen, self.n_mov_av,
-            x_prev=self.dV_ma_in_prev[-self.n_mov_av+1:])
-        self.dV_ma_in_prev = np.copy(self.dV_ma_in)
+        # Cavity filter: CIRCULAR moving average over filling time, starting
+        # from the last points of previous turn
+        self.cavity_filter.process(self.dV_gen, out=self.dV_gen)
 
-    def matr_conv(self, I, h):
+    def matr_conv(self, I, h, name=None):
         """Convolution of beam current with impulse response; uses a complete
-        matrix with off-diagonal elements."""
+        matrix with off-diagonal elements. The convolution engine of the
+        impulse response is stored under the given name and reused in the
+        next turns, as long as the impulse response is unchanged."""
 
-        return scipy.signal.fftconvolve(I, h, mode='full')[:I.shape[0]]
+        convolution = self.convolutions.get(name)
+        if convolution is None or not convolution.same_kernel(h, I.shape[0]):
+            convolution = OverlapSaveConvolution(h, I.shape[0])
+            self.convolutions[name] = convolution
+
+        return convolution.convolve(I)
 
     def track(self):
         """Turn-by-turn tracking method."""
@@ -955,6 +946,12 @@ class LHCCavityLoop(object):
     V_coarse_tot : complex array
         Cavity voltage [V] at present turn in (I,Q) coordinates which is used
         for tracking the LLRF
+    ac_coupling_in : class
+        ACCoupling type class at the input of the OTFB
+    fir_filter : class
+        FIRFilter type class of the OTFB
+    ac_coupling_out : class
+        ACCoupling type class at the output of the OTFB
     logger : logger
         Logger of the present class
     '''
@@ -1013,6 +1010,13 @@ class LHCCavityLoop(object):
         self.fir_coeff = fir_filter_lhc_otfb_coeff(n_taps=self.fir_n_taps)
         self.logger.debug('Sum of FIR coefficients %.4e' %np.sum(self.fir_coeff))
 
+        # OTFB v2 implementation: AC couplings and FIR filter sample by sample
+        self.ac_coupling_in = ACCoupling(self.rf.t_rev[0]/self.n_coarse,
+                                         self.tau_o)
+        self.fir_filter = FIRFilter(self.fir_coeff)
+        self.ac_coupling_out = ACCoupling(self.rf.t_rev[0]/self.n_coarse,
+                                          self.tau_o)
+
         # Initialise antenna voltage to set point value
         self.update_variables()
         self.logger.debug("Relative detuning is %.4e", self.detuning)
@@ -1033,10 +1037,6 @@ class LHCCavityLoop(object):
         self.V_fb_in_prev = 0
         self.V_otfb_prev = 0
 
-        # OTFB v2 implementation
-        self.V_AC1_out_prev = 0
-        self.V_FIR_out_prev = 0
-
         # Pre-track without beam
         self.logger.debug("Track without beam for %d turns", self.n_pretrack)
         if self.excitation:
@@ -1108,27 +1108,17 @@ class LHCCavityLoop(object):
 
         # AC coupling at input
         ind = self.ind - self.n_coarse + self.n_otfb
-        self.V_AC1_out = (1- self.T_s/self.tau_o)*self.V_AC1_out_prev + \
-            self.V_FB_IN[ind] - self.V_FB_IN[ind-1]
+        self.V_AC1_out = self.ac_coupling_in.process(self.V_FB_IN[ind])
 
         # OTFB itself
         self.V_OTFB_INT[self.ind] = self.alpha*self.V_OTFB_INT[self.ind-self.n_coarse] \
             + self.G_o*(1 - self.alpha)*self.V_AC1_out
 
         # FIR filter
-        self.V_FIR_out = self.fir_coeff[0]*self.V_OTFB_INT[self.ind]
-        for k in range(1, self.fir_n_taps):
-             self.V_FIR_out += self.fir_coeff[k]*self.V_OTFB_INT[self.ind-k]
-        #self.V_FIR_out = self.V_OTFB_INT[self.ind]
+        self.V_FIR_out = self.fir_filter.process(self.V_OTFB_INT[self.ind])
 
         # AC coupling at output
-        self.V_OTFB[self.ind] = (1- self.T_s/self.tau_o)* \
-            self.V_OTFB[self.ind-1] + self.V_FIR_out - self.V_FIR_out_prev
-
-        # Update memory
-        #self.V_otfb = self.V_OTFB[self.ind]
-        self.V_AC1_out_prev = self.V_AC1_out
-        self.V_FIR_out_prev = self.V_FIR_out
+        self.V_OTFB[self.ind] = self.ac_coupling_out.process(self.V_FIR_out)
 
 
     def rf_beam_current(self):
@@ -1394,6 +1384,9 @@ class LHCCavityLoop(object):
         # Dimensionless quantities
         self.samples = self.omega*self.T_s
         self.detuning = self.d_omega/self.omega
+        # Sampling time of the OTFB filters
+        self.ac_coupling_in.T_s = self.T_s
+        self.ac_coupling_out.T_s = self.T_s
 
 
     @staticmethod
@@ -206,6 +206,11 @@ class TravellingWaveCavity(object):
     tau : float
         Cavity filling time [s]
 
+    Notes
+    -----
+    The impulse responses are cached: they are recomputed only if the carrier
+    frequency or the time arrays differ from the previous call.
+
     """
 
     def __init__(self, l_cell, N_cells, rho, v_g, omega_r):
@@ -232,6 +237,9 @@ class TravellingWaveCavity(object):
         self.R_beam = 0.125*self.rho*self.l_cav**2
         self.R_gen = self.l_cav*np.sqrt(0.5*self.rho*self.Z_0)
 
+        # Carrier frequency and time arrays of the cached impulse responses
+        self._response_keys = {}
+
         # Set up logging
         self.logger = logging.getLogger(__class__.__name__)
         self.logger.info("Class initialized")
@@ -272,6 +280,9 @@ class TravellingWaveCavity(object):
                                " should be close to central frequency of the" +
                                " cavity!")
 
+        if self._cached_response('gen', self.omega_c, time_coarse):
+            return
+
         # Move starting point of impulse response to correct value
         t_gen = time_coarse - time_coarse[0] - 0.5*self.tau
 
@@ -321,6 +332,10 @@ class TravellingWaveCavity(object):
                                " should be close to central frequency of the" +
                                " cavity!")
 
+        if self._cached_response('beam', self.omega_c, time_fine,
+                                 time_coarse):
+            return
+
         # Move starting point of impulse response to correct value
         t_beam = time_fine - time_fine[0]
 
@@ -347,6 +362,23 @@ class TravellingWaveCavity(object):
                                      (np.cos(self.d_omega*t_beam) +
                                       1j*np.sin(self.d_omega*t_beam))
 
+    def _cached_response(self, name, omega_c, *time_arrays):
+        r"""Checks whether the impulse response 'name' was computed for the
+        same carrier frequency and time arrays; if not, the new ones are
+        stored as key of the impulse response to be computed."""
+
+        key = self._response_keys.get(name)
+        if key is not None and key[0] == omega_c and \
+                all((time is None and time_cached is None) or
+                    (time is not None and time_cached is not None and
+                     np.array_equal(time, time_cached))
+                    for time, time_cached in zip(time_arrays, key[1:])):
+            return True
+
+        self._response_keys[name] = (omega_c,) + tuple(
+            None if time is None else np.array(time) for time in time_arrays)
+        return False
+
     def compute_wakes(self, time):
         r"""Computes the wake fields towards the beam and generator on the
         central cavity frequency.
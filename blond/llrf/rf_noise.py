@@ -16,25 +16,91 @@ amplitude as a function of bunch length**
 
 from __future__ import division, print_function
 from builtins import range, object
+import collections
+import queue
+import threading
 import numpy as np
 import numpy.random as rnd
 from scipy.constants import c
 from ..plots.plot import *
 from ..plots.plot_llrf import *
 from ..toolbox.next_regular import next_regular
+from ..utils import bmath as bm
 #from input_parameters.rf_parameters import calculate_phi_s
 cfwhm = np.sqrt(2./np.log(2.))
 import matplotlib.pyplot as plt
 
 
 
+def phase_noise_from_spectrum(freq, spectrum, seed1, seed2, transform=None,
+                              random_generator=None):
+    '''
+    Phase noise in time domain from the spectrum (double-sided [rad^2/Hz])
+    on the frequencies freq, with the seeds seed1 and seed2 of the uniform
+    random numbers of the white noise; returns the time [s] and phase noise
+    [rad] arrays. With a RandomGenerator, the uniform random numbers are
+    its pseudo-random dimensions 2*seed1 and 2*seed2 + 1.
+    '''
+    
+    nf = len(spectrum)
+    fmax = freq[nf-1]
+    
+    # Resolution in time domain
+    if transform==None or transform=='r':
+        nt = 2*(nf - 1) 
+        dt = 1/(2*fmax) # in [s]
+    elif transform=='c':  
+        nt = nf 
+        dt = 1./fmax # in [s]
+    else:
+        #NoiseError
+        raise RuntimeError('ERROR: The choice of Fourier transform for the\
+         RF noise generation could not be recognized. Use "r" or "c".')
+        
+    # Generate white noise in time domain
+    if random_generator is None:
+        r1 = rnd.RandomState(seed1).random_sample(nt)
+        r2 = rnd.RandomState(seed2).random_sample(nt)
+    else:
+        random_generator = random_generator.pseudo_random()
+        r1 = random_generator.uniform(nt, dimension=2*seed1)
+        r2 = random_generator.uniform(nt, dimension=2*seed2 + 1)
+    if transform==None or transform=='r':
+        Gt = np.cos(2*np.pi*r1) * np.sqrt(-2*np.log(r2))     
+    elif transform=='c':  
+        Gt = np.exp(2*np.pi*1j*r1)*np.sqrt(-2*np.log(r2)) 
+ 
+    # FFT to frequency domain
+    if transform==None or transform=='r':
+        Gf = np.fft.rfft(Gt)  
+    elif transform=='c':
+        Gf = np.fft.fft(Gt)   
+         
+    # Multiply by desired noise probability density
+    if transform==None or transform=='r':
+        s = np.sqrt(2*fmax*spectrum) # in [rad]
+    elif transform=='c':
+        s = np.sqrt(fmax*spectrum) # in [rad]
+    dPf = s*Gf.real + 1j*s*Gf.imag  # in [rad]
+            
+    # FFT back to time domain to get final phase shift
+    if transform==None or transform=='r':
+        dPt = np.fft.irfft(dPf) # in [rad]
+    elif transform=='c':
+        dPt = np.fft.ifft(dPf) # in [rad]
+                
+    # Use only real part for the phase shift and normalize
+    return np.linspace(0, float(nt*dt), nt), dPt.real
+
+
 class FlatSpectrum(object): 
     
     def __init__(self, Ring, RFStation, delta_f = 1, 
                  corr_time = 10000, fmin_s0 = 0.8571, fmax_s0 = 1.1, 
                  initial_amplitude = 1.e-6, seed1 = 1234, seed2 = 7564, 
                  predistortion = None, continuous_phase = False, folder_plots =
-                  'fig_noise', print_option = True, initial_final_turns = [0,-1]):
+                  'fig_noise', print_option = True, initial_final_turns = [0,-1],
+                 random_generator = None):
 
         '''
         Generate phase noise from a band-limited spectrum.
@@ -44,6 +110,8 @@ class FlatSpectrum(object):
         Select 'time_points' suitably to resolve the spectrum in frequency 
         domain. After 'corr_time' turns, the seed is changed to cut numerical
         correlated sequences of the random number generator.
+        Optionally, the random numbers are drawn from 'random_generator' (a
+        RandomGenerator), the seeds selecting its dimensions.
         '''
         self.total_n_turns = Ring.n_turns
         self.initial_final_turns = initial_final_turns
@@ -58,6 +126,7 @@ class FlatSpectrum(object):
         self.A_i = initial_amplitude    # initial spectrum amplitude [rad^2/Hz]
         self.seed1 = seed1
         self.seed2 = seed2
+        self.random_generator = random_generator
         self.predistortion = predistortion
         if self.predistortion == 'weightfunction':
             # Overwrite frequencies
@@ -71,123 +140,120 @@ class FlatSpectrum(object):
             self.dphi2 = np.zeros(self.n_turns+1+self.corr/4)
         self.folder_plots = folder_plots    
         self.print_option = print_option
+        self.n_chunks = int(np.ceil(self.n_turns/self.corr))
     
     
     def spectrum_to_phase_noise(self, freq, spectrum, transform=None):
+        '''
+        Phase noise from the spectrum with the current seeds, stored in
+        self.t and self.dphi_output, see phase_noise_from_spectrum().
+        '''
+
+        self.t, self.dphi_output = phase_noise_from_spectrum(
+            freq, spectrum, self.seed1, self.seed2, transform,
+            self.random_generator)
+
+
+    def noise_spectrum(self, k):
+        '''
+        Frequencies and spectrum of the phase noise generated at turn k.
+        '''
+
+        # Scale amplitude to keep area (phase noise amplitude) constant
+        ampl = self.A_i*self.fs[0]/self.fs[k]
         
-        nf = len(spectrum)
-        fmax = freq[nf-1]
+        # Calculate the frequency step
+        f_max = self.f0[k]/2
+        n_points_pos_f_incl_zero = int(np.ceil(f_max/self.delta_f) + 1)
+        nt = 2*(n_points_pos_f_incl_zero - 1)
+        nt_regular = next_regular(int(nt))
+        if nt_regular%2!=0 or nt_regular < self.corr:
+            #NoiseError
+            raise RuntimeError('Error in noise generation!')
+        n_points_pos_f_incl_zero = int(nt_regular/2 + 1)  
+        freq = np.linspace(0, float(f_max), n_points_pos_f_incl_zero)
+        delta_f = f_max/(n_points_pos_f_incl_zero-1) 
+
+        # Construct spectrum   
+        nmin = int(np.floor(self.fmin_s0*self.fs[k]/delta_f))  
+        nmax = int(np.ceil(self.fmax_s0*self.fs[k]/delta_f))    
         
-        # Resolution in time domain
-        if transform==None or transform=='r':
-            nt = 2*(nf - 1) 
-            dt = 1/(2*fmax) # in [s]
-        elif transform=='c':  
-            nt = nf 
-            dt = 1./fmax # in [s]
+        # To compensate the notch due to PL at central frequency
+        if self.predistortion == 'exponential':
+            
+            spectrum = np.concatenate((np.zeros(nmin), ampl*np.exp(
+                np.log(100.)*np.arange(0,nmax-nmin+1)/(nmax-nmin) ), 
+                                       np.zeros(n_points_pos_f_incl_zero-nmax-1) ))
+         
+        elif self.predistortion == 'linear':
+            
+            spectrum = np.concatenate((np.zeros(nmin), 
+                np.linspace(0, float(ampl), nmax-nmin+1), np.zeros(n_points_pos_f_incl_zero-nmax-1)))   
+            
+        elif self.predistortion == 'hyperbolic':
+
+            spectrum = np.concatenate((np.zeros(nmin), 
+                ampl*np.ones(nmax-nmin+1)* \
+                1/(1 + 0.99*(nmin - np.arange(nmin,nmax+1))
+                   /(nmax-nmin)), np.zeros(n_points_pos_f_incl_zero-nmax-1) ))
+
+        elif self.predistortion == 'weightfunction':
+
+            frel = freq[nmin:nmax+1]/self.fs[k] # frequency relative to fs0
+            frel[np.where(frel > 0.999)[0]] = 0.999 # truncate center freqs
+            sigma = 0.754 # rms bunch length in rad corresponding to 1.2 ns
+            gamma = 0.577216
+            weight = (4.*np.pi*frel/sigma**2)**2 * \
+                np.exp(-16.*(1. - frel)/sigma**2) + \
+                0.25*( 1 + 8.*frel/sigma**2 * 
+                       np.exp(-8.*(1. - frel)/sigma**2) * 
+                       ( gamma + np.log(8.*(1. - frel)/sigma**2) + 
+                         8.*(1. - frel)/sigma**2 ) )**2
+            weight /= weight[0] # normalise to have 1 at fmin
+            spectrum = np.concatenate((np.zeros(nmin), ampl*weight, 
+                                        np.zeros(n_points_pos_f_incl_zero-nmax-1)))
+
         else:
+            spectrum = np.concatenate((np.zeros(nmin), 
+                ampl*np.ones(nmax-nmin+1), np.zeros(n_points_pos_f_incl_zero-nmax-1)))
+
+        return freq, spectrum
+
+    def noise_chunks(self):
+        '''
+        Generator of the phase noise chunk by chunk, yielding the first turn
+        (relative to initial_final_turns[0]) and the phase noise of the
+        chunk, equal to the noise of generate() without continuous_phase.
+        Only one chunk of corr turns is computed at a time.
+        '''
+
+        if self.continuous_phase:
             #NoiseError
-            raise RuntimeError('ERROR: The choice of Fourier transform for the\
-             RF noise generation could not be recognized. Use "r" or "c".')
-            
-        # Generate white noise in time domain
-        rnd.seed(self.seed1)
-        r1 = rnd.random_sample(nt)
-        rnd.seed(self.seed2)
-        r2 = rnd.random_sample(nt)
-        if transform==None or transform=='r':
-            Gt = np.cos(2*np.pi*r1) * np.sqrt(-2*np.log(r2))     
-        elif transform=='c':  
-            Gt = np.exp(2*np.pi*1j*r1)*np.sqrt(-2*np.log(r2)) 
- 
-        # FFT to frequency domain
-        if transform==None or transform=='r':
-            Gf = np.fft.rfft(Gt)  
-        elif transform=='c':
-            Gf = np.fft.fft(Gt)   
-             
-        # Multiply by desired noise probability density
-        if transform==None or transform=='r':
-            s = np.sqrt(2*fmax*spectrum) # in [rad]
-        elif transform=='c':
-            s = np.sqrt(fmax*spectrum) # in [rad]
-        dPf = s*Gf.real + 1j*s*Gf.imag  # in [rad]
-                
-        # FFT back to time domain to get final phase shift
-        if transform==None or transform=='r':
-            dPt = np.fft.irfft(dPf) # in [rad]
-        elif transform=='c':
-            dPt = np.fft.ifft(dPf) # in [rad]
-                    
-        # Use only real part for the phase shift and normalize
-        self.t = np.linspace(0, float(nt*dt), nt) 
-        self.dphi_output = dPt.real
- 
-    
+            raise RuntimeError('ERROR: streaming phase noise not available' +
+                               ' with continuous_phase.')
+
+        seed1 = self.seed1
+        seed2 = self.seed2
+        for i in range(0, self.n_chunks):
+            k = i*self.corr
+            if i < self.n_chunks - 1:
+                kmax = (i + 1)*self.corr
+            else:
+                kmax = self.n_turns + 1
+
+            freq, spectrum = self.noise_spectrum(k)
+            dphi = phase_noise_from_spectrum(freq, spectrum, seed1 + 239*i,
+                                             seed2 + 158*i, None,
+                                             self.random_generator)[1]
+            yield k, dphi[0:(kmax-k)]
+
     def generate(self):
        
-        for i in range(0, np.int(np.ceil(self.n_turns/self.corr))):
+        for i in range(0, self.n_chunks):
         
-            # Scale amplitude to keep area (phase noise amplitude) constant
             k = i*self.corr       # current time step
-            ampl = self.A_i*self.fs[0]/self.fs[k]
-            
-            # Calculate the frequency step
-            f_max = self.f0[k]/2
-            n_points_pos_f_incl_zero = int(np.ceil(f_max/self.delta_f) + 1)
-            nt = 2*(n_points_pos_f_incl_zero - 1)
-            nt_regular = next_regular(int(nt))
-            if nt_regular%2!=0 or nt_regular < self.corr:
-                #NoiseError
-                raise RuntimeError('Error in noise generation!')
-            n_points_pos_f_incl_zero = int(nt_regular/2 + 1)  
-            freq = np.linspace(0, float(f_max), n_points_pos_f_incl_zero)
-            delta_f = f_max/(n_points_pos_f_incl_zero-1) 
-
-            # Construct spectrum   
-            nmin = np.int(np.floor(self.fmin_s0*self.fs[k]/delta_f))  
-            nmax = np.int(np.ceil(self.fmax_s0*self.fs[k]/delta_f))    
-            
-            # To compensate the notch due to PL at central frequency
-            if self.predistortion == 'exponential':
-                
-                spectrum = np.concatenate((np.zeros(nmin), ampl*np.exp(
-                    np.log(100.)*np.arange(0,nmax-nmin+1)/(nmax-nmin) ), 
-                                           np.zeros(n_points_pos_f_incl_zero-nmax-1) ))
-             
-            elif self.predistortion == 'linear':
-                
-                spectrum = np.concatenate((np.zeros(nmin), 
-                    np.linspace(0, float(ampl), nmax-nmin+1), np.zeros(n_points_pos_f_incl_zero-nmax-1)))   
-                
-            elif self.predistortion == 'hyperbolic':
-
-                spectrum = np.concatenate((np.zeros(nmin), 
-                    ampl*np.ones(nmax-nmin+1)* \
-                    1/(1 + 0.99*(nmin - np.arange(nmin,nmax+1))
-                       /(nmax-nmin)), np.zeros(n_points_pos_f_incl_zero-nmax-1) ))
-
-            elif self.predistortion == 'weightfunction':
-
-                frel = freq[nmin:nmax+1]/self.fs[k] # frequency relative to fs0
-                frel[np.where(frel > 0.999)[0]] = 0.999 # truncate center freqs
-                sigma = 0.754 # rms bunch length in rad corresponding to 1.2 ns
-                gamma = 0.577216
-                weight = (4.*np.pi*frel/sigma**2)**2 * \
-                    np.exp(-16.*(1. - frel)/sigma**2) + \
-                    0.25*( 1 + 8.*frel/sigma**2 * 
-                           np.exp(-8.*(1. - frel)/sigma**2) * 
-                           ( gamma + np.log(8.*(1. - frel)/sigma**2) + 
-                             8.*(1. - frel)/sigma**2 ) )**2
-                weight /= weight[0] # normalise to have 1 at fmin
-                spectrum = np.concatenate((np.zeros(nmin), ampl*weight, 
-                                            np.zeros(n_points_pos_f_incl_zero-nmax-1)))
+            freq, spectrum = self.noise_spectrum(k)
 
-            else:
-                spectrum = np.concatenate((np.zeros(nmin), 
-                    ampl*np.ones(nmax-nmin+1), np.zeros(n_points_pos_f_incl_zero-nmax-1)))               
-            
-            
             # Fill phase noise array
             if i < int(self.n_turns/self.corr) - 1:
                 kmax = (i + 1)*self.corr
@@ -231,6 +297,152 @@ class FlatSpectrum(object):
         if self.initial_final_turns[0]>0 or self.initial_final_turns[1]<self.total_n_turns+1:
             self.dphi = np.concatenate((np.zeros(self.initial_final_turns[0]), self.dphi, np.zeros(1+self.total_n_turns-self.initial_final_turns[1])))
 
+class PhaseNoiseStream(FlatSpectrum):
+    '''
+    Phase noise of FlatSpectrum generated chunk by chunk on demand, to be
+    passed as phi_noise to RFStation. The chunks of corr_time turns are
+    generated ahead of the tracker, optionally in a background thread, and
+    only the last n_chunks_kept chunks are retained, so that the memory does
+    not grow with the number of turns. The noise is identical to the one of
+    FlatSpectrum.generate() with the same parameters; continuous_phase and
+    the plots are not available.
+    Access the noise with phase_noise[:, turn] (all RF systems) as for the
+    phi_noise array of RFStation; the turns have to be accessed in
+    increasing order, up to n_chunks_kept chunks back.
+    '''
+
+    def __init__(self, Ring, RFStation, delta_f = 1, 
+                 corr_time = 10000, fmin_s0 = 0.8571, fmax_s0 = 1.1, 
+                 initial_amplitude = 1.e-6, seed1 = 1234, seed2 = 7564, 
+                 predistortion = None, initial_final_turns = [0,-1],
+                 n_chunks_ahead = 1, n_chunks_kept = 2, background = False,
+                 random_generator = None):
+
+        FlatSpectrum.__init__(self, Ring, RFStation, delta_f = delta_f,
+                              corr_time = corr_time, fmin_s0 = fmin_s0,
+                              fmax_s0 = fmax_s0,
+                              initial_amplitude = initial_amplitude,
+                              seed1 = seed1, seed2 = seed2,
+                              predistortion = predistortion,
+                              folder_plots = None, print_option = False,
+                              initial_final_turns = list(initial_final_turns),
+                              random_generator = random_generator)
+
+        # The full noise array is never allocated
+        self.dphi = None
+
+        #: | *Flag read by RFStation to keep the stream as phi_noise*
+        self.streaming = True
+
+        #: | *Number of chunks generated ahead of the tracker (background)*
+        self.n_chunks_ahead = max(int(n_chunks_ahead), 1)
+
+        #: | *Number of chunks retained in the sliding window*
+        self.n_chunks_kept = max(int(n_chunks_kept), 1)
+
+        #: | *Generation in a background thread*
+        self.background = background
+
+        self.window = collections.deque(maxlen = self.n_chunks_kept)
+        self.chunks = None
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.reset()
+
+    def reset(self):
+        '''
+        Restart the generation of the noise from the first turn.
+        '''
+
+        self.close()
+        self.window.clear()
+        self.chunks = self.noise_chunks()
+        if self.background:
+            self.stop_event = threading.Event()
+            self.queue = queue.Queue(maxsize = self.n_chunks_ahead)
+            self.thread = threading.Thread(target = self._produce,
+                                           args = (self.chunks, self.queue,
+                                                   self.stop_event))
+            self.thread.daemon = True
+            self.thread.start()
+
+    def close(self):
+        '''
+        Stop the background thread, if any.
+        '''
+
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+
+    @staticmethod
+    def _produce(chunks, chunk_queue, stop_event):
+
+        # Exceptions and the end of the noise (None) are passed to the
+        # tracker through the queue
+        try:
+            for chunk in chunks:
+                if not PhaseNoiseStream._put(chunk_queue, chunk, stop_event):
+                    return
+        except Exception as error:
+            PhaseNoiseStream._put(chunk_queue, error, stop_event)
+            return
+        PhaseNoiseStream._put(chunk_queue, None, stop_event)
+
+    @staticmethod
+    def _put(chunk_queue, item, stop_event):
+
+        # Waits for a free place in the queue until the stream is closed,
+        # returns False if the item was dropped
+        while not stop_event.is_set():
+            try:
+                chunk_queue.put(item, timeout = 0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _next_chunk(self):
+
+        if self.background:
+            chunk = self.queue.get()
+            if isinstance(chunk, Exception):
+                self.thread = None
+                raise chunk
+        else:
+            chunk = next(self.chunks, None)
+        if chunk is None:
+            #NoiseError
+            raise RuntimeError('ERROR: turn beyond the end of the phase' +
+                               ' noise.')
+        self.window.append(chunk)
+
+    def turn_noise(self, turn):
+        '''
+        Phase noise [rad] at the turn of the Ring.
+        '''
+
+        turn = int(turn) - self.initial_final_turns[0]
+        if turn < 0 or turn > self.n_turns:
+            return 0.
+
+        while len(self.window) == 0 or \
+                turn >= self.window[-1][0] + len(self.window[-1][1]):
+            self._next_chunk()
+        for k, dphi in self.window:
+            if k <= turn < k + len(dphi):
+                return dphi[turn - k]
+        #NoiseError
+        raise RuntimeError('ERROR: turn %d of the phase noise ' % turn +
+                           'no longer in the window of the stream.')
+
+    def __getitem__(self, item):
+
+        rows, turn = item
+        return np.array([self.turn_noise(turn)])[rows]
+
+
 class LHCNoiseFB(object): 
     '''
     *Feedback on phase noise amplitude for LHC controlled longitudinal emittance
@@ -285,13 +497,19 @@ class LHCNoiseFB(object):
         #: | *Function dictionary to calculate FWHM bunch length*
         fwhm_functions = {'single': self.fwhm_single_bunch,
                           'multi': self.fwhm_multi_bunch}
-        if self.bunch_pattern == None:
+        if self.bunch_pattern is None:
             self.fwhm = fwhm_functions['single']
             self.bl_meas_bbb = None
         else: 
             self.bunch_pattern = np.ascontiguousarray(self.bunch_pattern)
             self.bl_meas_bbb = np.zeros(len(self.bunch_pattern))
             self.fwhm = fwhm_functions['multi']
+
+        #: | *Bins of the buckets of the bunch pattern, first and last
+        #: (excluded), cached for the RF frequency, phase and frame in key*
+        self.bucket_first = None
+        self.bucket_last = None
+        self.bucket_key = None
         
 
     def track(self):
@@ -348,20 +566,25 @@ class LHCNoiseFB(object):
         *Multi-bunch FWHM bunch length calculation with interpolation.*
         '''    
 
-        # Find correct RF buckets
-        phi_RF = self.rf_params.phi_RF[0,self.rf_params.counter[0]]
-        omega_RF = self.rf_params.omega_RF[0,self.rf_params.counter[0]]
-        bucket_min = (phi_RF + 2.*np.pi*self.bunch_pattern)/omega_RF
-        bucket_max = bucket_min + 2.*np.pi/omega_RF
+        # Find correct RF buckets, updated when the RF frequency or phase or
+        # the profile frame change
+        phi_rf = self.rf_params.phi_rf[0, self.rf_params.counter[0]]
+        omega_rf = self.rf_params.omega_rf[0, self.rf_params.counter[0]]
+        key = (phi_rf, omega_rf, self.profile.cut_left,
+               self.profile.cut_right, self.profile.n_slices)
+        if key != self.bucket_key:
+            bucket_min = (phi_rf + 2.*np.pi*self.bunch_pattern)/omega_rf
+            bucket_max = bucket_min + 2.*np.pi/omega_rf
+            self.bucket_first = np.searchsorted(self.profile.bin_centers,
+                                                bucket_min, side='right')
+            self.bucket_last = np.searchsorted(self.profile.bin_centers,
+                                               bucket_max, side='left')
+            self.bucket_key = key
+
+        # Bunch-by-bunch FWHM bunch length, in one compiled pass
+        self.bl_meas_bbb[:] = bm.bunch_fwhm_rms(
+            self.profile.bin_centers, self.profile.n_macroparticles,
+            self.bucket_first, self.bucket_last)[1]
 
-        # Bunch-by-bunch FWHM bunch length
-        for i in range(len(self.bunch_pattern)):
-            
-            bind = np.where((self.profile.bin_centers - bucket_min[i])*
-                            (self.profile.bin_centers - bucket_max[i]) < 0)[0]
-            hheight = np.max(self.profile.n_macroparticles[bind])/2.
-            index = np.where(self.profile.n_macroparticles[bind] > hheight)[0]
-            self.bl_meas_bbb[i] = self.fwhm_interpolation(bind[index], hheight)
-            
         # Average FWHM bunch length            
         self.bl_meas = np.mean(self.bl_meas_bbb)
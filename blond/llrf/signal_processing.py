@@ -17,6 +17,7 @@ from __future__ import division
 import numpy as np
 from scipy.constants import e
 from scipy import signal as sgn
+from scipy import fft as sfft
 import matplotlib.pyplot as plt
 
 # Set up logging
@@ -381,6 +382,405 @@ def moving_average(x, N, x_prev=None):
     return mov_avg[N-1:] / N
 
 
+class CombFilter(object):
+    r"""Comb filter acting turn by turn, see comb_filter(),
+
+    .. math:: y_n = a \, y_{n-1} + (1 - a) \, x_n \, ,
+
+    where :math:`n` is the turn. The output of the previous turn is kept in a
+    preallocated array that is updated in place.
+
+    Parameters
+    ----------
+    n_points : int
+        Number of points per turn
+    a : float
+        Recursion constant of the comb filter
+    dtype : data-type
+        Type of the signal; default is complex
+
+    Attributes
+    ----------
+    output : complex array
+        Output of the last processed turn
+
+    """
+
+    def __init__(self, n_points, a, dtype=complex):
+
+        self.a = float(a)
+        self.output = np.zeros(int(n_points), dtype=dtype)
+        self._input = np.zeros(int(n_points), dtype=dtype)
+
+    def process(self, x, n_delay=0, out=None):
+        r"""Filters the signal of one turn
+
+        Parameters
+        ----------
+        x : complex array
+            Input signal of the present turn
+        n_delay : int
+            Delay of the returned signal in points; the first n_delay points
+            are the last points of the previous turn; default is 0
+        out : complex array
+            Array to write the result to; default is None (new array)
+
+        Returns
+        -------
+        complex array
+            Filtered signal, delayed by n_delay points
+
+        """
+
+        n_points = len(self.output)
+        if out is None:
+            out = np.empty(n_points, dtype=self.output.dtype)
+        if n_delay > 0:
+            out[:n_delay] = self.output[n_points - n_delay:]
+
+        np.multiply(x, 1 - self.a, out=self._input)
+        self.output *= self.a
+        self.output += self._input
+
+        out[n_delay:] = self.output[:n_points - n_delay]
+        return out
+
+
+class MovingAverage(object):
+    r"""Moving average over N points, see moving_average(), of a signal
+    processed block by block. The last N-1 points of the input are kept from
+    one block to the next, such that the output has the length of the
+    block.
+
+    Parameters
+    ----------
+    N : int
+        Window size in points
+    dtype : data-type
+        Type of the signal; default is complex
+
+    Attributes
+    ----------
+    history : complex array
+        Last N-1 points of the input
+
+    """
+
+    def __init__(self, N, dtype=complex):
+
+        self.N = int(N)
+        if self.N < 1:
+            #SignalProcessingError
+            raise RuntimeError("ERROR in MovingAverage: N should be" +
+                               " positive!")
+        self.history = np.zeros(self.N - 1, dtype=dtype)
+        self._buffer = np.zeros(0, dtype=dtype)
+
+    def process(self, x, out=None):
+        r"""Moving average of a block of the signal
+
+        Parameters
+        ----------
+        x : complex array
+            Input block
+        out : complex array
+            Array to write the result to; default is None (new array)
+
+        Returns
+        -------
+        complex array
+            Smoothed block, of the same length as the input block
+
+        """
+
+        n_points = len(x)
+        if len(self._buffer) != self.N - 1 + n_points:
+            self._buffer = np.empty(self.N - 1 + n_points,
+                                    dtype=self.history.dtype)
+
+        buffer = self._buffer
+        buffer[:self.N - 1] = self.history
+        buffer[self.N - 1:] = x
+        self.history[:] = buffer[n_points:]
+
+        # Running sum, as in moving_average()
+        np.cumsum(buffer, out=buffer)
+        np.subtract(buffer[self.N:], buffer[:-self.N], out=buffer[self.N:])
+
+        if out is None:
+            out = np.empty(n_points, dtype=self.history.dtype)
+        np.divide(buffer[self.N - 1:], self.N, out=out)
+        return out
+
+
+class FIRFilter(object):
+    r"""FIR filter of a signal processed block by block or sample by sample,
+
+    .. math:: y_n = \sum_{k=0}^{n_{\mathsf{taps}}-1} c_k \, x_{n-k} \, .
+
+    The last n_taps-1 points of the input are kept from one call to the
+    next.
+
+    Parameters
+    ----------
+    coeff : float array
+        Coefficients of the FIR filter with length of number of taps
+    dtype : data-type
+        Type of the signal; default is complex
+
+    Attributes
+    ----------
+    history : complex array
+        Last n_taps-1 points of the input, the latest at the end
+
+    """
+
+    def __init__(self, coeff, dtype=complex):
+
+        self.coeff = np.array(coeff, dtype=float)
+        self.n_taps = len(self.coeff)
+        if self.n_taps < 1:
+            #SignalProcessingError
+            raise RuntimeError("ERROR in FIRFilter: at least one" +
+                               " coefficient is needed!")
+        self.history = np.zeros(self.n_taps - 1, dtype=dtype)
+        # Coefficients of the past points, aligned with the history
+        self._coeff_history = self.coeff[:0:-1]
+        self._buffer = np.zeros(0, dtype=dtype)
+
+    def process(self, x, out=None):
+        r"""Filters a block or a single sample of the signal
+
+        Parameters
+        ----------
+        x : complex array or complex
+            Input block or sample
+        out : complex array
+            Array to write the result to, for blocks; default is None (new
+            array)
+
+        Returns
+        -------
+        complex array or complex
+            Filtered block or sample
+
+        """
+
+        n_history = self.n_taps - 1
+
+        if np.ndim(x) == 0:
+            y = self.coeff[0]*x + np.dot(self._coeff_history, self.history)
+            if n_history > 0:
+                self.history[:-1] = self.history[1:]
+                self.history[-1] = x
+            return y
+
+        n_points = len(x)
+        if len(self._buffer) != n_history + n_points:
+            self._buffer = np.empty(n_history + n_points,
+                                    dtype=self.history.dtype)
+
+        buffer = self._buffer
+        buffer[:n_history] = self.history
+        buffer[n_history:] = x
+        self.history[:] = buffer[n_points:]
+
+        if out is None:
+            out = np.empty(n_points, dtype=self.history.dtype)
+        out[:] = np.convolve(buffer, self.coeff, mode='valid')
+        return out
+
+
+class ACCoupling(object):
+    r"""First-order AC coupling (high-pass filter) of a signal processed
+    block by block or sample by sample,
+
+    .. math:: y_n = \left(1 - \frac{T_s}{\tau}\right) y_{n-1} + x_n - x_{n-1}
+        \, .
+
+    The last input and output points are kept from one call to the next.
+
+    Parameters
+    ----------
+    T_s : float
+        Sampling time [s]; can be updated between calls
+    tau : float
+        Time constant [s] of the AC coupling
+
+    Attributes
+    ----------
+    x_prev : complex
+        Last input point
+    y_prev : complex
+        Last output point
+
+    """
+
+    def __init__(self, T_s, tau):
+
+        self.T_s = float(T_s)
+        self.tau = float(tau)
+        self.x_prev = 0
+        self.y_prev = 0
+
+    def process(self, x, out=None):
+        r"""Filters a block or a single sample of the signal
+
+        Parameters
+        ----------
+        x : complex array or complex
+            Input block or sample
+        out : complex array
+            Array to write the result to, for blocks; default is None (new
+            array)
+
+        Returns
+        -------
+        complex array or complex
+            Filtered block or sample
+
+        """
+
+        a = 1 - self.T_s/self.tau
+
+        if np.ndim(x) == 0:
+            y = a*self.y_prev + x - self.x_prev
+            self.x_prev = x
+            self.y_prev = y
+            return y
+
+        y, _ = sgn.lfilter([1, -1], [1, -a], x,
+                           zi=[a*self.y_prev - self.x_prev])
+        if len(x) > 0:
+            self.x_prev = x[-1]
+            self.y_prev = y[-1]
+
+        if out is None:
+            return y
+        out[:] = y
+        return out
+
+
+class OverlapSaveConvolution(object):
+    r"""Linear convolution of signals of fixed length with a fixed kernel,
+    truncated to the length of the signal,
+
+    .. math:: y[n] = \sum_{k=0}^{n} h[k] \, x[n-k] \, , \quad 0 \leq n < N \, ,
+
+    which is equivalent to
+    scipy.signal.fftconvolve(x, h, mode='full')[:N]. The trailing zeros of
+    the kernel are dropped and the spectrum of the remaining kernel is
+    computed once, such that the signal can be convolved block-wise with the
+    overlap-save method. The working buffers are allocated once and reused
+    for every signal.
+
+    Parameters
+    ----------
+    kernel : complex or float array
+        Convolution kernel (e.g. impulse response)
+    n_signal : int
+        Number of points of the signals to be convolved
+    n_fft : int
+        Number of points of the FFT of the blocks; default is None (chosen
+        from the kernel and signal lengths)
+
+    Attributes
+    ----------
+    kernel : complex array
+        Copy of the kernel, used to check whether the engine can be reused
+    n_kernel : int
+        Number of points of the kernel after dropping the trailing zeros
+    n_step : int
+        Number of output points per block
+    n_blocks : int
+        Number of blocks per signal
+    kernel_spectrum : complex array
+        FFT of the kernel on n_fft points
+
+    """
+
+    def __init__(self, kernel, n_signal, n_fft=None):
+
+        self.kernel = np.array(kernel, dtype=np.complex128)
+        self.n_signal = int(n_signal)
+        if self.n_signal < 1:
+            #SignalProcessingError
+            raise RuntimeError("ERROR in OverlapSaveConvolution: n_signal" +
+                               " should be positive!")
+
+        # Support of the kernel, without trailing zeros
+        non_zero = np.flatnonzero(self.kernel)
+        self.n_kernel = int(non_zero[-1]) + 1 if len(non_zero) > 0 else 1
+
+        if n_fft is None:
+            # Blocks of a few kernel lengths, at most one block for the signal
+            n_fft = min(sfft.next_fast_len(8*self.n_kernel),
+                        sfft.next_fast_len(self.n_signal +
+                                              self.n_kernel - 1))
+        self.n_fft = int(n_fft)
+        if self.n_fft < self.n_kernel:
+            #SignalProcessingError
+            raise RuntimeError("ERROR in OverlapSaveConvolution: n_fft" +
+                               " should be larger than the kernel support!")
+
+        self.n_step = self.n_fft - self.n_kernel + 1
+        self.n_blocks = -(-self.n_signal // self.n_step)
+        self.kernel_spectrum = sfft.fft(self.kernel[:self.n_kernel],
+                                           self.n_fft)
+
+        # Signal preceded by n_kernel - 1 zeros, blocks overlap by as much
+        self._padded = np.zeros(self.n_kernel - 1 +
+                                self.n_blocks*self.n_step, dtype=np.complex128)
+        itemsize = self._padded.itemsize
+        self._blocks = np.lib.stride_tricks.as_strided(
+            self._padded, shape=(self.n_blocks, self.n_fft),
+            strides=(self.n_step*itemsize, itemsize), writeable=False)
+        self._spectra = np.empty((self.n_blocks, self.n_fft),
+                                 dtype=np.complex128)
+        self._output = np.empty((self.n_blocks, self.n_step),
+                                dtype=np.complex128)
+
+    def same_kernel(self, kernel, n_signal):
+        r"""Whether the engine convolves signals of n_signal points with the
+        given kernel"""
+
+        return n_signal == self.n_signal and \
+            np.array_equal(kernel, self.kernel)
+
+    def convolve(self, signal, out=None):
+        r"""Convolution of a signal with the kernel
+
+        Parameters
+        ----------
+        signal : complex or float array
+            Signal of n_signal points
+        out : complex array
+            Array to write the result to; default is None (new array)
+
+        Returns
+        -------
+        complex array
+            Convolved signal of n_signal points
+
+        """
+
+        self._padded[self.n_kernel - 1:self.n_kernel - 1 + self.n_signal] = \
+            signal
+
+        np.copyto(self._spectra, self._blocks)
+        spectra = sfft.fft(self._spectra, axis=-1, overwrite_x=True)
+        spectra *= self.kernel_spectrum
+        spectra = sfft.ifft(spectra, axis=-1, overwrite_x=True)
+
+        # Only the last n_step points of each block are not aliased
+        np.copyto(self._output, spectra[:, self.n_kernel - 1:])
+
+        if out is None:
+            return self._output.reshape(-1)[:self.n_signal].copy()
+        out[:] = self._output.reshape(-1)[:self.n_signal]
+        return out
+
+
 def feedforward_filter(TWC: TravellingWaveCavity, T_s, debug=False, taps=None,
                        opt_output=False):
     """Function to design n-tap FIR filter for SPS TravellingWaveCavity.
@@ -14,22 +14,9 @@ Project website: http://blond.web.cern.ch/
 
 #include <math.h>
 #include <stdlib.h>
-#include <random>
-#include <thread>
-#include <chrono>
 #include "../cpp_routines/openmp.h"
+#include "../cpp_routines/random.h"
 
-#ifdef BOOST
-#include <boost/random.hpp>
-#include <boost/random/normal_distribution.hpp>
-using namespace boost;
-
-#else
-using namespace std;
-
-#endif
-
-long unsigned int seed = clock();
 
 // This function calculates and applies only the synchrotron radiation damping term
 extern "C" void synchrotron_radiation(double * __restrict__ beam_dE, const double U0,
@@ -55,36 +42,32 @@ extern "C" void synchrotron_radiation(double * __restrict__ beam_dE, const doubl
 
 // This function calculates and applies synchrotron radiation damping and
 // quantum excitation terms
-extern "C" void synchrotron_radiation_full(double * __restrict__ beam_dE, const double U0,
+extern "C" SCALAR_LOOP void synchrotron_radiation_full(double * __restrict__ beam_dE, const double U0,
         const int n_macroparticles, const double sigma_dE,
         const double tau_z, const double energy,
-        const int n_kicks)
+        const int n_kicks, const uint64_t seed, const uint32_t stream,
+        const uint32_t dimension)
 {
 
-    std::hash<std::thread::id> hash;
-
     // Quantum excitation constant
     const double const_quantum_exc = 2.0 * sigma_dE / sqrt(tau_z) * energy;
 
     // Adjusted SR damping constant
     const double const_synch_rad = 1.0 - 2.0 / tau_z;
 
-    // Random number generator for the quantum excitation term
+    // Normal random numbers of the quantum excitation term, counter-based
+    // (one dimension per kick, indexed by the particle) so that they do not
+    // depend on the number of threads
 
     for (int j = 0; j < n_kicks; j++) {
         // Compute synchrotron radiation damping term and
         // Applies the quantum excitation term
-        #pragma omp parallel
-        {
-            static __thread mt19937_64 *gen = nullptr;
-            if (!gen) gen = new mt19937_64(seed + omp_get_thread_num());
-            static __thread normal_distribution<> dist(0.0, 1.0);
-            #pragma omp for
-            for (int i = 0; i < n_macroparticles; i++) {
-                beam_dE[i] = beam_dE[i] * const_synch_rad
-                             + const_quantum_exc * dist(*gen)
-                             - U0;
-            }
+        #pragma omp parallel for
+        for (int i = 0; i < n_macroparticles; i++) {
+            const double u = philox_uniform(seed, stream, dimension + j, i);
+            beam_dE[i] = beam_dE[i] * const_synch_rad
+                         + const_quantum_exc * normal_quantile(u)
+                         - U0;
         }
     }
 }
@@ -114,41 +97,32 @@ extern "C" void synchrotron_radiationf(float * __restrict__ beam_dE, const float
 
 // This function calculates and applies synchrotron radiation damping and
 // quantum excitation terms
-extern "C" void synchrotron_radiation_fullf(float * __restrict__ beam_dE, const float U0,
+extern "C" SCALAR_LOOP void synchrotron_radiation_fullf(float * __restrict__ beam_dE, const float U0,
         const int n_macroparticles, const float sigma_dE,
         const float tau_z, const float energy,
-        const int n_kicks)
+        const int n_kicks, const uint64_t seed, const uint32_t stream,
+        const uint32_t dimension)
 {
 
-    std::hash<std::thread::id> hash;
-
     // Quantum excitation constant
     const float const_quantum_exc = 2.0 * sigma_dE / sqrt(tau_z) * energy;
 
     // Adjusted SR damping constant
     const float const_synch_rad = 1.0 - 2.0 / tau_z;
 
-    // Random number generator for the quantum excitation term
+    // Normal random numbers of the quantum excitation term, counter-based
+    // (one dimension per kick, indexed by the particle) so that they do not
+    // depend on the number of threads
 
     for (int j = 0; j < n_kicks; j++) {
         // Compute synchrotron radiation damping term and
         // Applies the quantum excitation term
-        #pragma omp parallel
-        {
-            static __thread mt19937_64 *gen = nullptr;
-            if (!gen) gen = new mt19937_64(seed + omp_get_thread_num());
-            static __thread normal_distribution<> dist(0.0, 1.0);
-            #pragma omp for
-            for (int i = 0; i < n_macroparticles; i++) {
-                beam_dE[i] = beam_dE[i] * const_synch_rad
-                             + const_quantum_exc * dist(*gen)
-                             - U0;
-            }
+        #pragma omp parallel for
+        for (int i = 0; i < n_macroparticles; i++) {
+            const double u = philox_uniform(seed, stream, dimension + j, i);
+            beam_dE[i] = beam_dE[i] * const_synch_rad
+                         + const_quantum_exc * normal_quantile(u)
+                         - U0;
         }
     }
 }
-
-
-extern "C" void set_random_seed(const int _seed) {
-    seed = _seed;
-}
\ No newline at end of file
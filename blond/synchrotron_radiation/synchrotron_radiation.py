@@ -18,6 +18,7 @@ from builtins import range, object
 import numpy as np
 from scipy.constants import e, c, epsilon_0, hbar
 from ..utils import bmath as bm
+from ..utils.random_generator import RandomGenerator
 
 
 class SynchrotronRadiation(object):
@@ -37,7 +38,15 @@ class SynchrotronRadiation(object):
         self.beam = Beam
         self.rho = bending_radius
         self.n_kicks = n_kicks  # To apply SR in several kicks
-        np.random.seed(seed=seed)
+
+        # Random numbers of the quantum excitation: with a RandomGenerator,
+        # its pseudo-random dimensions, one per kick
+        if isinstance(seed, RandomGenerator):
+            self.random_generator = seed.pseudo_random()
+            self.random_dimension = 0
+        else:
+            self.random_generator = None
+            np.random.seed(seed=seed)
 
         # Calculate static parameters
         self.Cgamma = 1.0 / (e**2.0 * 3.0 * epsilon_0
@@ -76,7 +85,7 @@ class SynchrotronRadiation(object):
                 self.track = self.track_SR_python
         else:
             if quantum_excitation:
-                if seed is not None:
+                if seed is not None and self.random_generator is None:
                     bm.set_random_seed(seed)
                 self.track = self.track_full_C
             else:
@@ -149,7 +158,7 @@ class SynchrotronRadiation(object):
                               self.U0 / self.n_kicks - 2.0 * self.sigma_dE /
                               np.sqrt(self.tau_z * self.n_kicks) *
                               self.ring.energy[0, i_turn] *
-                              np.random.randn(self.beam.n_macroparticles))
+                              self.random_normal())
 
     # Track particles with SR only (without quantum excitation)
     # C implementation
@@ -171,6 +180,23 @@ class SynchrotronRadiation(object):
                 self.ring.energy[0, i_turn-1]):
             self.calculate_SR_params()
 
-        bm.synchrotron_radiation_full(self.beam.dE, self.U0, self.n_kicks,
-                                      self.tau_z, self.sigma_dE,
-                                      self.ring.energy[0, i_turn])
+        if self.random_generator is None:
+            bm.synchrotron_radiation_full(self.beam.dE, self.U0, self.n_kicks,
+                                          self.tau_z, self.sigma_dE,
+                                          self.ring.energy[0, i_turn])
+        else:
+            bm.synchrotron_radiation_full(
+                self.beam.dE, self.U0, self.n_kicks, self.tau_z,
+                self.sigma_dE, self.ring.energy[0, i_turn],
+                seed=self.random_generator.seed,
+                stream=self.random_generator.stream,
+                dimension=self.random_dimension)
+            self.random_dimension += self.n_kicks
+
+    # Normal random numbers of one kick of the quantum excitation
+    def random_normal(self):
+        if self.random_generator is None:
+            return np.random.randn(self.beam.n_macroparticles)
+        self.random_dimension += 1
+        return self.random_generator.normal(self.beam.n_macroparticles,
+                                            self.random_dimension - 1)
@@ -18,6 +18,9 @@ from __future__ import division
 from builtins import range
 import numpy as np
 from scipy.special import ellipk
+import scipy.linalg
+import scipy.sparse
+import scipy.sparse.linalg
 import scipy.integrate as int
 import matplotlib.pyplot as plt
 from pylab import cm
@@ -28,7 +31,8 @@ from ..toolbox.action import *
 
 def phase_noise_diffusion(Ring, RFStation, spectrum, distribution,
                           distributionBins, Ngrids = 200, M = 1,
-                          iterations = 100000, figdir = None):
+                          iterations = 100000, figdir = None,
+                          method = 'eigen'):
     '''
     Calculate diffusion in action space according to a given double-sided phase
     noise spectrum, on a uniform grid in oscillation amplitude.
@@ -39,6 +43,7 @@ def phase_noise_diffusion(Ring, RFStation, spectrum, distribution,
     is M = 1; N.B. this will only give impair modes for phase noise. 
     Optional: number of iterations to track.
     Optional: save figures into directory 'figdir'.
+    Optional: method of the time evolution, see CrankNicolsonDiffusion.
     '''
     
     # Input check
@@ -112,46 +117,12 @@ def phase_noise_diffusion(Ring, RFStation, spectrum, distribution,
 
      
     # Discretised diffusion equation ------------------------------------------
-    A = np.zeros((N,N),float)
-    for i in range(1,N-1):
-        A[i,i-1] = dJ[i-1]
-        A[i,i] = 2.*(dJ[i-1]+dJ[i])
-        A[i,i+1] = dJ[i]
-    A[0,0] = 2.*dJ[0]
-    A[0,1] = dJ[0]
-    A[N-1,N-2] = dJ[N-2]
-    A[N-1,N-1] = 2.*(dJ[N-2]+dJ[N-1])
-    A *= Jsep/6.
-        
-    B = np.zeros((N,N),float)
-    for i in range(1,N-1):
-        B[i,i-1] = -Dav[i-1]/dJ[i-1]
-        B[i,i] = Dav[i-1]/dJ[i-1] + Dav[i]/dJ[i]
-        B[i,i+1] = -Dav[i]/dJ[i]
-    B[0,0] = Dav[0]/dJ[0]
-    B[0,1] = -Dav[0]/dJ[0]
-    B[N-1,N-2] = -Dav[N-2]/dJ[N-2]
-    B[N-1,N-1] = Dav[N-2]/dJ[N-2]+Dav[N-1]/dJ[N-1]
-    B /= Jsep
+    A, B = diffusion_matrices(dJ, Dav, Jsep)
 
     # Time evolution ----------------------------------------------------------
-    M1 = A - T0 * B / 2.
-    M2 = A + T0 * B / 2.
-    M1 = np.matrix(M1)
-    M2 = np.matrix(M2)
-    F = np.matrix(distributionInterp)
-    Mtot = np.dot(M2.I,M1)    
-    Fold = F.T
-    
-    for i in range(0,iterations):
-        
-        Fnew = np.dot(Mtot,Fold)
-        Fold = Fnew
-     
-    # Back to array for post-processing
-    Fnew = Fnew.T   
-    F = np.array(F,order=0)
-    Fnew = np.array(Fnew,order=0)
+    evolution = CrankNicolsonDiffusion(A, B, T0, method=method)
+    F = np.array([distributionInterp])
+    Fnew = np.array([evolution.evolve(distributionInterp, iterations)])
 
     # Plot --------------------------------------------------------------------
     # Distributions along action J
@@ -205,3 +176,107 @@ def phase_noise_diffusion(Ring, RFStation, spectrum, distribution,
 
 
     return Jav, distributionInterp, Fnew[0]
+
+
+def diffusion_matrices(dJ, Dav, Jsep):
+    '''
+    Tridiagonal matrices A and B of the discretised diffusion equation
+    A dF/dt = -B F on a grid of Ngrids cells of widths dJ, with the diffusion
+    coefficient Dav averaged on the cells and the action at the separatrix
+    Jsep. The matrices are returned in the banded storage of
+    scipy.linalg.solve_banded, arrays of shape (3, Ngrids) with the upper
+    diagonal, diagonal and lower diagonal.
+    '''
+
+    N = len(dJ)
+    A = np.zeros((3, N))
+    A[0, 1:] = dJ[:-1]
+    A[1, 0] = 2.*dJ[0]
+    A[1, 1:] = 2.*(dJ[:-1] + dJ[1:])
+    A[2, :-1] = dJ[:-1]
+    A *= Jsep/6.
+
+    coupling = Dav/dJ
+    B = np.zeros((3, N))
+    B[0, 1:] = -coupling[:-1]
+    B[1, 0] = coupling[0]
+    B[1, 1:] = coupling[:-1] + coupling[1:]
+    B[2, :-1] = -coupling[:-1]
+    B /= Jsep
+
+    return A, B
+
+
+class CrankNicolsonDiffusion(object):
+    '''
+    Crank-Nicolson time evolution of the discretised diffusion equation
+    A dF/dt = -B F, F(t + dt) = (A + dt B/2)^-1 (A - dt B/2) F(t), for banded
+    symmetric matrices A (positive definite) and B as returned by
+    diffusion_matrices(). The operators are factorised once at
+    construction; evolve() can then be called for any number of time steps
+    and for a batch of distributions.
+
+    Methods:
+
+    * 'lu': sparse LU factorisation of A + dt B/2, one banded product and
+      one sparse solve per time step,
+    * 'squaring': dense one-step operator raised to the number of steps by
+      repeated squaring,
+    * 'eigen': generalised eigendecomposition B v = lambda A v, every number
+      of steps at the cost of two dense products.
+
+    '''
+
+    def __init__(self, A, B, dt, method = 'eigen'):
+
+        if method not in ['lu', 'squaring', 'eigen']:
+            #NoiseDiffusionError
+            raise RuntimeError("In CrankNicolsonDiffusion: method not " +
+                               "recognised!")
+        self.method = method
+        self.dt = dt
+
+        N = A.shape[1]
+        M1 = scipy.sparse.dia_matrix((A - 0.5*dt*B, [1, 0, -1]),
+                                     shape=(N, N))
+        M2 = scipy.sparse.dia_matrix((A + 0.5*dt*B, [1, 0, -1]),
+                                     shape=(N, N))
+
+        if method == 'lu':
+            self.M1 = M1.tocsr()
+            self.lu = scipy.sparse.linalg.splu(M2.tocsc())
+        elif method == 'squaring':
+            self.Mtot = scipy.sparse.linalg.splu(M2.tocsc()).solve(
+                M1.toarray())
+        else:
+            A_dense = scipy.sparse.dia_matrix((A, [1, 0, -1]),
+                                              shape=(N, N)).toarray()
+            B_dense = scipy.sparse.dia_matrix((B, [1, 0, -1]),
+                                              shape=(N, N)).toarray()
+            eigenvalues, self.eigenvectors = scipy.linalg.eigh(B_dense,
+                                                               A_dense)
+            # Gain per time step of each eigenmode, projection on the modes
+            self.gain = (1 - 0.5*dt*eigenvalues) / (1 + 0.5*dt*eigenvalues)
+            self.projection = np.dot(self.eigenvectors.T, A_dense)
+
+    def evolve(self, distribution, iterations):
+        '''
+        Distribution(s) after a number of time steps; distribution is an
+        array of Ngrids elements or of shape (Ngrids, K) for K distributions
+        evolved at once.
+        '''
+
+        F = np.array(distribution, dtype=float)
+
+        if self.method == 'lu':
+            for i in range(0, iterations):
+                F = self.lu.solve(self.M1.dot(F))
+            return F
+        elif self.method == 'squaring':
+            return np.dot(np.linalg.matrix_power(self.Mtot, iterations), F)
+        else:
+            modes = np.dot(self.projection, F)
+            gain = self.gain**iterations
+            if F.ndim > 1:
+                gain = gain[:, np.newaxis]
+            return np.dot(self.eigenvectors, gain*modes)
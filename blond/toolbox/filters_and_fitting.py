@@ -19,6 +19,7 @@ import numpy as np
 from scipy.signal import cheb2ord, cheby2, filtfilt, freqz
 import matplotlib.pyplot as plt
 from scipy.optimize import curve_fit
+from ..utils import bmath as bm
 
 
 def beam_profile_filter_chebyshev(Y_array, X_array, filter_option):
@@ -107,6 +108,55 @@ def gaussian_fit(Y_array, X_array, p0):
     return curve_fit(gauss, X_array, Y_array, p0)[0]
 
 
+def gaussian_fit_fast(Y_array, X_array, p0=None, threshold=0.01,
+                      n_iterations=3):
+    """
+    Compiled Gaussian fit of the profile by a few Gauss-Newton steps on the
+    bins above threshold times the maximum, starting from p0 (e.g. the fit
+    of the previous turn) or, if None, from a log-parabola estimate. Returns
+    fit values [A, x0, sigma] in units of s, as gaussian_fit.
+    """
+
+    return bm.gaussian_fit(X_array, Y_array, [0], [len(Y_array)],
+                           threshold, n_iterations, p0)[0]
+
+
+def gaussian_fit_multibunch(Y_array, X_array, n_bunches,
+                            bunch_spacing_buckets, bucket_size_tau,
+                            bucket_tolerance=0.40, p0=None, threshold=0.01,
+                            n_iterations=3):
+    """
+    Bunch-by-bunch Gaussian fit of the profile (see gaussian_fit_fast), the
+    bunches being in the same windows as in rms_multibunch. Returns an array
+    of fit values [A, x0, sigma] per bunch; p0 is None or an array of the
+    same shape.
+    """
+
+    first, last = bunch_indexes(X_array, n_bunches, bunch_spacing_buckets,
+                                bucket_size_tau, bucket_tolerance)
+
+    return bm.gaussian_fit(X_array, Y_array, first, last, threshold,
+                           n_iterations, p0)
+
+
+def bunch_indexes(X_array, n_bunches, bunch_spacing_buckets,
+                  bucket_size_tau, bucket_tolerance=0.40):
+    """
+    First and last (excluded) indexes of the bins of each bunch, the bins
+    being strictly inside the bucket of the bunch extended by
+    bucket_tolerance buckets on both sides.
+    """
+
+    left_edges = np.arange(n_bunches) * bunch_spacing_buckets * \
+        bucket_size_tau - bucket_tolerance * bucket_size_tau
+    right_edges = left_edges + (1 + 2*bucket_tolerance) * bucket_size_tau
+
+    first = np.searchsorted(X_array, left_edges, side='right')
+    last = np.searchsorted(X_array, right_edges, side='left')
+
+    return first, np.maximum(first, last)
+
+
 def gauss(x, *p):
     """
     Defined as:
@@ -173,50 +223,33 @@ def fwhm_multibunch(Y_array, X_array, n_bunches,
                     bucket_tolerance=0.40, shift=0):
     """
     Computation of the bunch length and position from the FWHM
-    assuming Gaussian line density for multibunch case.
+    assuming Gaussian line density for multibunch case. All the bunches are
+    analysed by one compiled routine; returns the arrays of bunch positions
+    and lengths.
     """
 
-    bl_fwhm = np.zeros(n_bunches)
-    bp_fwhm = np.zeros(n_bunches)
-
-    for indexBunch in range(0, n_bunches):
+    first, last = bunch_indexes(X_array, n_bunches, bunch_spacing_buckets,
+                                bucket_size_tau, bucket_tolerance)
 
-        left_edge = indexBunch * bunch_spacing_buckets * bucket_size_tau -\
-            bucket_tolerance * bucket_size_tau
-        right_edge = indexBunch * bunch_spacing_buckets * bucket_size_tau +\
-            bucket_size_tau + bucket_tolerance * bucket_size_tau
-        indexes_bucket = np.where((X_array > left_edge) *
-                                  (X_array < right_edge))[0]
+    bp_fwhm, bl_fwhm = bm.bunch_fwhm_rms(X_array, Y_array, first, last,
+                                         shift)[:2]
 
-        bl_fwhm[indexBunch], bp_fwhm[indexBunch] = fwhm(
-            Y_array[indexes_bucket], X_array[indexes_bucket], shift)
-
-    return bl_fwhm, bp_fwhm
+    return bp_fwhm, bl_fwhm
 
 
 def rms_multibunch(Y_array, X_array, n_bunches,
                    bunch_spacing_buckets, bucket_size_tau,
                    bucket_tolerance=0.40):
     """
-    Computation of the rms bunch length (4sigma) and position.
+    Computation of the rms bunch length (4sigma) and position. All the
+    bunches are analysed by one compiled routine; returns the arrays of
+    bunch positions and lengths.
     """
 
-    bl_rms = np.zeros(n_bunches)
-    bp_rms = np.zeros(n_bunches)
-
-    for indexBunch in range(0, n_bunches):
+    first, last = bunch_indexes(X_array, n_bunches, bunch_spacing_buckets,
+                                bucket_size_tau, bucket_tolerance)
 
-        left_edge = indexBunch * bunch_spacing_buckets * bucket_size_tau -\
-            bucket_tolerance * bucket_size_tau
-        right_edge = indexBunch * bunch_spacing_buckets * bucket_size_tau +\
-            bucket_size_tau + bucket_tolerance * bucket_size_tau
+    bp_rms, bl_rms = bm.bunch_fwhm_rms(X_array, Y_array, first, last)[2:]
 
-        indexes_bucket = np.where((X_array > left_edge) *
-                                  (X_array < right_edge))[0]
-
-        bl_rms[indexBunch], bp_rms[indexBunch] = rms(
-            Y_array[indexes_bucket],
-            X_array[indexes_bucket])
-
-    return bl_rms, bp_rms
+    return bp_rms, bl_rms
 
@@ -280,6 +280,9 @@ class RingAndRFTracker(object):
             self.solver = 'exact'
         self.solver = self.solver.encode(encoding='utf_8')
 
+        # Kick and drift kernels, bound to the particle coordinates
+        self.particle_kernels = bm.ParticleKernels()
+
         # Options
         self.beamFB = BeamFeedback
         self.noiseFB = NoiseFeedback
@@ -310,6 +313,14 @@ class RingAndRFTracker(object):
             # PeriodicityError
             raise RuntimeError("ERROR in RingAndRFTracker: Empty RFStation" +
                                " with periodicity not yet implemented!")
+        if np.ndim(self.beam.dt) == 2 and (self.periodicity or
+                                           self.beamFB is not None or
+                                           self.noiseFB is not None or
+                                           self.cavityFB is not None):
+            # EnsembleError
+            raise RuntimeError("ERROR in RingAndRFTracker: Periodicity and" +
+                               " feedbacks not yet implemented for an" +
+                               " ensemble beam!")
         if (self.cavityFB is not None) and (self.interpolation is False):
             self.interpolation = True
             warnings.warn('Setting interpolation to TRUE')
@@ -332,9 +343,23 @@ class RingAndRFTracker(object):
         # voltage_kick = np.ascontiguousarray(self.charge*self.voltage[:, index])
         # omegarf_kick = np.ascontiguousarray(self.omega_rf[:, index])
         # phirf_kick = np.ascontiguousarray(self.phi_rf[:, index])
-        bm.kick(beam_dt, beam_dE, self.voltage[:, index],
-                self.omega_rf[:, index], self.phi_rf[:, index],
-                self.charge, self.n_rf, self.acceleration_kick[index])
+        self.particle_kernels.kick(
+            beam_dt, beam_dE, self.voltage[:, index],
+            self.omega_rf[:, index], self.phi_rf[:, index],
+            self.charge, self.n_rf, self.acceleration_kick[index])
+
+    def kick_beam_phase(self, index):
+        """Function applying the RF kick, see kick(), and measuring at the
+        same time the beam phase for the particle phase detector of the
+        BeamFeedback, from the coordinates before the kick.
+
+        """
+
+        self.beamFB.phase_coefficients = bm.kick_beam_phase(
+            self.beam.dt, self.beam.dE, self.voltage[:, index],
+            self.omega_rf[:, index], self.phi_rf[:, index], self.charge,
+            self.n_rf, self.acceleration_kick[index],
+            *self.beamFB.phase_window(self.omega_rf[0, index]))
 
     def drift(self, beam_dt, beam_dE, index):
         """Function updating the particle arrival time to the RF station
@@ -363,11 +388,12 @@ class RingAndRFTracker(object):
             \\delta = \\frac{\\Delta E}{\\beta_s^2 E_s} \quad \\text{(simple, legacy)}
 
         """
-        bm.drift(beam_dt, beam_dE, self.solver, self.t_rev[index],
-                 self.length_ratio, self.alpha_order, self.eta_0[index],
-                 self.eta_1[index], self.eta_2[index], self.alpha_0[index],
-                 self.alpha_1[index], self.alpha_2[index],
-                 self.rf_params.beta[index], self.rf_params.energy[index])
+        self.particle_kernels.drift(
+            beam_dt, beam_dE, self.solver, self.t_rev[index],
+            self.length_ratio, self.alpha_order, self.eta_0[index],
+            self.eta_1[index], self.eta_2[index], self.alpha_0[index],
+            self.alpha_1[index], self.alpha_2[index],
+            self.rf_params.beta[index], self.rf_params.energy[index])
 
     def rf_voltage_calculation(self):
         """Function calculating the total, discretised RF voltage seen by the
@@ -414,7 +440,14 @@ class RingAndRFTracker(object):
                 self.phi_modulation[1][:, turn]
 
         # Determine phase loop correction on RF phase and frequency
+        kicked = False
         if self.beamFB is not None and turn >= self.beamFB.delay:
+            if self.beamFB.fused_phase_detector and \
+                    not self.periodicity and not self.interpolation and \
+                    self.rf_params.empty is False:
+                # Particle phase detector fused with the kick of this turn
+                self.kick_beam_phase(turn)
+                kicked = True
             self.beamFB.track()
 
         # Update the RF phase of all systems for the next turn
@@ -488,11 +521,12 @@ class RingAndRFTracker(object):
                     else:
                         self.total_voltage = self.rf_voltage
 
-                    bm.linear_interp_kick(dt=self.beam.dt, dE=self.beam.dE,
-                                          voltage=self.total_voltage,
-                                          bin_centers=self.profile.bin_centers,
-                                          charge=self.beam.Particle.charge,
-                                          acceleration_kick=self.acceleration_kick[turn])
+                    self.particle_kernels.linear_interp_kick(
+                        dt=self.beam.dt, dE=self.beam.dE,
+                        voltage=self.total_voltage,
+                        bin_centers=self.profile.bin_centers,
+                        charge=self.beam.Particle.charge,
+                        acceleration_kick=self.acceleration_kick[turn])
 
                     # self.drift(self.beam.dt, self.beam.dE, turn + 1)
 
@@ -511,7 +545,7 @@ class RingAndRFTracker(object):
                     #                   self.eta_2[turn],
                     #                   self.rf_params.beta[turn],
                     #                   self.rf_params.energy[turn])
-                else:
+                elif not kicked:
                     self.kick(self.beam.dt, self.beam.dE, turn)
 
             self.drift(self.beam.dt, self.beam.dE, turn + 1)
@@ -39,21 +39,37 @@ _CPU_func_dict = {
     'add': butils_wrap.add,
     'mul': butils_wrap.mul,
     'beam_phase': butils_wrap.beam_phase,
+    'beam_phase_particles': butils_wrap.beam_phase_particles,
+    'beam_phase_window': butils_wrap.beam_phase_window,
+    'gaussian_fit': butils_wrap.gaussian_fit,
+    'bunch_fwhm_rms': butils_wrap.bunch_fwhm_rms,
     'fast_resonator': butils_wrap.fast_resonator,
+    'resonator_wake': butils_wrap.resonator_wake,
+    'travelling_wave_wake': butils_wrap.travelling_wave_wake,
+    'travelling_wave_impedance': butils_wrap.travelling_wave_impedance,
     'kick': butils_wrap.kick,
+    'kick_beam_phase': butils_wrap.kick_beam_phase,
     'rf_volt_comp': butils_wrap.rf_volt_comp,
     'drift': butils_wrap.drift,
     'linear_interp_kick': butils_wrap.linear_interp_kick,
     'LIKick_n_drift': butils_wrap.linear_interp_kick_n_drift,
+    'ParticleKernels': butils_wrap.ParticleKernels,
     'synchrotron_radiation': butils_wrap.synchrotron_radiation,
     'synchrotron_radiation_full': butils_wrap.synchrotron_radiation_full,
     'set_random_seed': butils_wrap.set_random_seed,
+    'random_uniform': butils_wrap.random_uniform,
+    'random_normal': butils_wrap.random_normal,
+    'set_num_threads': butils_wrap.set_num_threads,
+    'get_num_threads': butils_wrap.get_num_threads,
     'sparse_histogram': butils_wrap.sparse_histogram,
     # 'linear_interp_time_translation': butils_wrap.linear_interp_time_translation,
     'slice': butils_wrap.slice,
+    'slice_rows': butils_wrap.slice_rows,
     'slice_smooth': butils_wrap.slice_smooth,
     'music_track': butils_wrap.music_track,
     'music_track_multiturn': butils_wrap.music_track_multiturn,
+    'music_track_resonators': butils_wrap.music_track_resonators,
+    'music_track_scan': butils_wrap.music_track_scan,
     'diff': np.diff,
     'cumsum': np.cumsum,
     'cumprod': np.cumprod,
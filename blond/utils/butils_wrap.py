@@ -8,6 +8,8 @@ BLonD math wrapper functions
 import ctypes as ct
 import numpy as np
 import os
+from collections import OrderedDict
+from scipy.fft import next_fast_len
 from .. import libblond as __lib
 
 
@@ -275,18 +277,145 @@ def sort(x, reverse=False):
     return x
 
 
-def convolve(signal, kernel, mode='full', result=None):
-    if mode != 'full':
-        # ConvolutionError
-        raise RuntimeError('[convolve] Only full mode is supported')
-    if result is None:
-        result = np.empty(len(signal) + len(kernel) - 1, dtype=float)
+# Transforms of the kernels of the FFT convolutions, least recently used first
+_convolve_spectra = OrderedDict()
+_convolve_spectra_size = 16
+
+
+def __convolve_spectrum(x, n_fft, real, cache=True):
+    # Transform of x on n_fft points, taken from the cache if x was already
+    # transformed on n_fft points
+    if not cache:
+        return np.fft.rfft(x, n_fft) if real else np.fft.fft(x, n_fft)
+
+    key = (n_fft, real, x.dtype.str, len(x), hash(x.tobytes()))
+    if key in _convolve_spectra and np.array_equal(_convolve_spectra[key][0],
+                                                   x):
+        _convolve_spectra.move_to_end(key)
+        return _convolve_spectra[key][1]
+
+    spectrum = np.fft.rfft(x, n_fft) if real else np.fft.fft(x, n_fft)
+    _convolve_spectra[key] = (np.copy(x), spectrum)
+    if len(_convolve_spectra) > _convolve_spectra_size:
+        _convolve_spectra.popitem(last=False)
+    return spectrum
+
+
+def __convolve_direct(signal, kernel, result):
+    if np.iscomplexobj(result):
+        # Complex convolution from the real one of the I,Q components
+        parts = [np.ascontiguousarray(x.real) for x in (signal, kernel)] + \
+            [np.ascontiguousarray(x.imag) for x in (signal, kernel)]
+        signal_re, kernel_re, signal_im, kernel_im = parts
+        result[:] = __convolve_direct(signal_re, kernel_re,
+                                      np.empty(len(result))) \
+            - __convolve_direct(signal_im, kernel_im, np.empty(len(result)))
+        result.imag = __convolve_direct(signal_re, kernel_im,
+                                        np.empty(len(result))) \
+            + __convolve_direct(signal_im, kernel_re, np.empty(len(result)))
+        return result
+
     __lib.convolution(__getPointer(signal), __getLen(signal),
                       __getPointer(kernel), __getLen(kernel),
                       __getPointer(result))
     return result
 
 
+def __convolve_fft(signal, kernel, real):
+    n_full = len(signal) + len(kernel) - 1
+    n_fft = next_fast_len(n_full)
+    spectrum = __convolve_spectrum(kernel, n_fft, real) * \
+        __convolve_spectrum(signal, n_fft, real, cache=False)
+    if real:
+        return np.fft.irfft(spectrum, n_fft)[:n_full]
+    return np.fft.ifft(spectrum, n_fft)[:n_full]
+
+
+def __convolve_overlap_add(signal, kernel, real):
+    # The longer array is cut in blocks, the shorter one is transformed once
+    if len(signal) >= len(kernel):
+        longer, shorter, cache = signal, kernel, True
+    else:
+        longer, shorter, cache = kernel, signal, False
+    n_short = len(shorter)
+    n_fft = next_fast_len(8*n_short)
+    n_step = n_fft - n_short + 1
+    n_blocks = -(-len(longer) // n_step)
+
+    blocks = np.zeros((n_blocks, n_step), dtype=longer.dtype)
+    blocks.reshape(-1)[:len(longer)] = longer
+    spectra = (np.fft.rfft(blocks, n_fft, axis=1) if real else
+               np.fft.fft(blocks, n_fft, axis=1)) * \
+        __convolve_spectrum(shorter, n_fft, real, cache=cache)
+    blocks = np.fft.irfft(spectra, n_fft, axis=1) if real else \
+        np.fft.ifft(spectra, n_fft, axis=1)
+
+    # Each block overlaps with the beginning of the next one
+    full = np.zeros((n_blocks + 1, n_step), dtype=blocks.dtype)
+    full[:-1] += blocks[:, :n_step]
+    full[1:, :n_short - 1] += blocks[:, n_step:]
+    return full.reshape(-1)[:len(longer) + n_short - 1]
+
+
+def convolve_method(n_signal, n_kernel):
+    '''
+    Fastest convolution algorithm for the given lengths: 'direct' for short
+    arrays, 'overlap-add' if one array is much longer than the other,
+    'fft' otherwise
+    '''
+    n_short, n_long = sorted((n_signal, n_kernel))
+    if n_short <= 32 or n_short*n_long <= 2**15:
+        return 'direct'
+    elif n_long > 16*n_short:
+        return 'overlap-add'
+    else:
+        return 'fft'
+
+
+def convolve(signal, kernel, mode='full', result=None, method='auto'):
+    '''
+    Convolution of real or complex arrays, as numpy.convolve.
+    The algorithm is the direct sum, the FFT of the whole arrays or the
+    overlap-add of FFTs of blocks; method='auto' chooses it from the array
+    lengths, see convolve_method. The transforms of the kernel are cached,
+    repeated convolutions with the same kernel only transform the signal.
+    '''
+    if mode not in ['full', 'same', 'valid']:
+        # ConvolutionError
+        raise RuntimeError('[convolve] Mode %s not supported' % mode)
+    if method == 'auto':
+        method = convolve_method(len(signal), len(kernel))
+    if method not in ['direct', 'fft', 'overlap-add']:
+        # ConvolutionError
+        raise RuntimeError('[convolve] Method %s not supported' % method)
+
+    real = not (np.iscomplexobj(signal) or np.iscomplexobj(kernel))
+    dtype = float if real else complex
+    signal = np.ascontiguousarray(signal, dtype=dtype)
+    kernel = np.ascontiguousarray(kernel, dtype=dtype)
+
+    n_full = len(signal) + len(kernel) - 1
+    if method == 'direct':
+        full = __convolve_direct(signal, kernel,
+                                 np.empty(n_full, dtype=dtype))
+    elif method == 'fft':
+        full = __convolve_fft(signal, kernel, real)
+    else:
+        full = __convolve_overlap_add(signal, kernel, real)
+
+    n_short, n_long = sorted((len(signal), len(kernel)))
+    if mode == 'same':
+        start = (n_short - 1) // 2
+        full = full[start:start + n_long]
+    elif mode == 'valid':
+        full = full[n_short - 1:n_long]
+
+    if result is None:
+        return full
+    result[:] = full
+    return result
+
+
 def mean(x):
     if isinstance(x[0], np.float32):
         __lib.meanf.restype = ct.c_float
@@ -583,6 +712,61 @@ def beam_phase(bin_centers, profile, alpha, omegarf, phirf, bin_size):
     return coeff
 
 
+def beam_phase_window(bin_centers, profile, window, omegarf, phirf,
+                      bin_size):
+    '''
+    Sine and cosine components of the profile at the RF frequency and phase,
+    weighted by the precomputed window and integrated with the trapezoidal
+    rule over all the given (equally spaced) bins
+    '''
+    bin_centers = bin_centers.astype(dtype=precision.real_t, order='C',
+                                     copy=False)
+    profile = profile.astype(dtype=precision.real_t, order='C', copy=False)
+    window = window.astype(dtype=precision.real_t, order='C', copy=False)
+
+    coefficients = np.zeros(2, dtype=precision.real_t)
+    if precision.num == 1:
+        __lib.beam_phase_windowf(__getPointer(bin_centers),
+                                 __getPointer(profile),
+                                 __getPointer(window), __getLen(profile),
+                                 __c_real(omegarf), __c_real(phirf),
+                                 __c_real(bin_size),
+                                 __getPointer(coefficients))
+    else:
+        __lib.beam_phase_window(__getPointer(bin_centers),
+                                __getPointer(profile),
+                                __getPointer(window), __getLen(profile),
+                                __c_real(omegarf), __c_real(phirf),
+                                __c_real(bin_size),
+                                __getPointer(coefficients))
+    return coefficients[0], coefficients[1]
+
+
+def beam_phase_particles(dt, alpha, time_offset, time_min, time_max,
+                         omegarf, phirf):
+    '''
+    Sine and cosine components of the beam at the RF frequency and phase,
+    summed over the particles with time_min <= dt <= time_max and weighted
+    by exp(alpha*(dt - time_offset))
+    '''
+    assert isinstance(dt[0], precision.real_t)
+
+    coefficients = np.zeros(2, dtype=precision.real_t)
+    if precision.num == 1:
+        __lib.beam_phase_particlesf(__getPointer(dt), __getLen(dt),
+                                    __c_real(alpha), __c_real(time_offset),
+                                    __c_real(time_min), __c_real(time_max),
+                                    __c_real(omegarf), __c_real(phirf),
+                                    __getPointer(coefficients))
+    else:
+        __lib.beam_phase_particles(__getPointer(dt), __getLen(dt),
+                                   __c_real(alpha), __c_real(time_offset),
+                                   __c_real(time_min), __c_real(time_max),
+                                   __c_real(omegarf), __c_real(phirf),
+                                   __getPointer(coefficients))
+    return coefficients[0], coefficients[1]
+
+
 def rf_volt_comp(voltages, omega_rf, phi_rf, bin_centers):
 
     bin_centers = bin_centers.astype(
@@ -645,6 +829,51 @@ def kick(dt, dE, voltage, omega_rf, phi_rf, charge, n_rf, acceleration_kick):
                    __c_real(acceleration_kick))
 
 
+def kick_beam_phase(dt, dE, voltage, omega_rf, phi_rf, charge, n_rf,
+                    acceleration_kick, alpha, time_offset, time_min,
+                    time_max):
+    '''
+    Kick, see kick(), fused with the particle beam phase detector of the
+    main RF system, see beam_phase_particles(); returns the sine and cosine
+    components
+    '''
+    assert isinstance(dt[0], precision.real_t)
+    assert isinstance(dE[0], precision.real_t)
+
+    voltage_kick = charge * \
+        voltage.astype(dtype=precision.real_t, order='C', copy=False)
+    omegarf_kick = omega_rf.astype(
+        dtype=precision.real_t, order='C', copy=False)
+    phirf_kick = phi_rf.astype(dtype=precision.real_t, order='C', copy=False)
+
+    coefficients = np.zeros(2, dtype=precision.real_t)
+    if precision.num == 1:
+        __lib.kick_beam_phasef(__getPointer(dt),
+                               __getPointer(dE),
+                               ct.c_int(n_rf),
+                               __getPointer(voltage_kick),
+                               __getPointer(omegarf_kick),
+                               __getPointer(phirf_kick),
+                               __getLen(dt),
+                               __c_real(acceleration_kick),
+                               __c_real(alpha), __c_real(time_offset),
+                               __c_real(time_min), __c_real(time_max),
+                               __getPointer(coefficients))
+    else:
+        __lib.kick_beam_phase(__getPointer(dt),
+                              __getPointer(dE),
+                              ct.c_int(n_rf),
+                              __getPointer(voltage_kick),
+                              __getPointer(omegarf_kick),
+                              __getPointer(phirf_kick),
+                              __getLen(dt),
+                              __c_real(acceleration_kick),
+                              __c_real(alpha), __c_real(time_offset),
+                              __c_real(time_min), __c_real(time_max),
+                              __getPointer(coefficients))
+    return coefficients[0], coefficients[1]
+
+
 def drift(dt, dE, solver, t_rev, length_ratio, alpha_order, eta_0,
           eta_1, eta_2, alpha_0, alpha_1, alpha_2, beta, energy):
     assert isinstance(dt[0], precision.real_t)
@@ -690,6 +919,15 @@ def linear_interp_kick(dt, dE, voltage,
                        bin_centers, charge,
                        acceleration_kick):
 
+    if dt.ndim == 2:
+        # Ensemble beam: kick of each realisation by its own voltage, if
+        # given per realisation
+        for row in range(len(dt)):
+            linear_interp_kick(dt[row], dE[row],
+                               voltage[row] if voltage.ndim == 2 else voltage,
+                               bin_centers, charge, acceleration_kick)
+        return
+
     assert isinstance(dt[0], precision.real_t)
     assert isinstance(dE[0], precision.real_t)
     assert isinstance(voltage[0], precision.real_t)
@@ -721,6 +959,159 @@ def linear_interp_kick(dt, dE, voltage,
                                  __c_real(acceleration_kick))
 
 
+def _kernel(name, argtypes):
+    # Separate function object of the library (not shared with the calls
+    # above), with the argument types declared once
+    function = __lib[name]
+    function.argtypes = argtypes
+    function.restype = None
+    return function
+
+
+class ParticleKernels(object):
+    '''
+    Kick, drift and linear interpolation kick of the particle coordinates
+    (dt, dE), with the same arguments as kick(), drift() and
+    linear_interp_kick(). The dtype, contiguity and length of dt and dE are
+    checked, and their pointers computed, only when other arrays are passed;
+    the scalars are converted by the declared argument types of the
+    kernels, and the RF arrays of the kick are copied in buffers of fixed
+    address. This removes most of the per-call ctypes overhead for small
+    beams tracked over many turns.
+
+    The coordinates of an ensemble beam [n_realisations, n_macroparticles]
+    are kicked and drifted as one array; the voltage of the linear
+    interpolation kick can be given per realisation [n_realisations,
+    n_slices].
+    '''
+
+    def __init__(self):
+
+        self.dt = None
+        self.dE = None
+        self.n_macroparticles = None
+        self.real_t = None
+        self.arrays = {}
+
+    def bind(self, dt, dE):
+        '''
+        Check and convert the particle coordinates, if not already bound
+        '''
+
+        if dt is self.dt and dE is self.dE and \
+                precision.real_t is self.real_t:
+            return
+
+        for x in [dt, dE]:
+            if not isinstance(x, np.ndarray) or \
+                    x.dtype != precision.real_t or \
+                    not x.flags.c_contiguous or not x.flags.writeable:
+                #InputDataError
+                raise RuntimeError('ERROR in ParticleKernels: the particle ' +
+                                   'coordinates must be writeable, ' +
+                                   'contiguous arrays of ' +
+                                   str(np.dtype(precision.real_t)))
+        if dt.shape != dE.shape:
+            #InputDataError
+            raise RuntimeError('ERROR in ParticleKernels: dt and dE have ' +
+                               'different shapes')
+
+        if precision.real_t is not self.real_t:
+            real = precision.c_real_t
+            pointer = ct.c_void_p
+            suffix = 'f' if precision.num == 1 else ''
+            self._kick = _kernel(
+                'kick' + suffix,
+                [pointer, pointer, ct.c_int, pointer, pointer, pointer,
+                 ct.c_int, real])
+            self._drift = _kernel(
+                'drift' + suffix,
+                [pointer, pointer, ct.c_char_p] + [real]*11 + [ct.c_int])
+            self._linear_interp_kick = _kernel(
+                'linear_interp_kick' + suffix,
+                [pointer, pointer, pointer, pointer, real, ct.c_int,
+                 ct.c_int, real])
+            self.arrays = {}
+            self.real_t = precision.real_t
+
+        self.dt = dt
+        self.dE = dE
+        self.dt_pointer = dt.ctypes.data
+        self.dE_pointer = dE.ctypes.data
+        self.n_macroparticles = dt.size
+        self.n_rows = len(dt) if dt.ndim == 2 else 1
+
+    def _buffer(self, name, x):
+        # Copy of a small array in a buffer of fixed address
+        buffer = self.arrays.get(name)
+        if buffer is None or len(buffer[0]) != len(x):
+            array = np.empty(len(x), dtype=self.real_t)
+            buffer = self.arrays[name] = (array, array.ctypes.data)
+        buffer[0][:] = x
+        return buffer
+
+    def _pointer(self, name, x):
+        # Pointer of an array, computed again only for another array
+        cached = self.arrays.get(name)
+        if cached is None or cached[0] is not x:
+            if x.dtype != self.real_t or not x.flags.c_contiguous:
+                #InputDataError
+                raise RuntimeError('ERROR in ParticleKernels: ' + name +
+                                   ' must be a contiguous array of ' +
+                                   str(np.dtype(self.real_t)))
+            cached = self.arrays[name] = (x, x.ctypes.data)
+        return cached[1]
+
+    def kick(self, dt, dE, voltage, omega_rf, phi_rf, charge, n_rf,
+             acceleration_kick):
+
+        self.bind(dt, dE)
+        voltage_kick = self._buffer('voltage', voltage)
+        np.multiply(voltage_kick[0], charge, out=voltage_kick[0])
+        self._kick(self.dt_pointer, self.dE_pointer, n_rf, voltage_kick[1],
+                   self._buffer('omega_rf', omega_rf)[1],
+                   self._buffer('phi_rf', phi_rf)[1],
+                   self.n_macroparticles, float(acceleration_kick))
+
+    def drift(self, dt, dE, solver, t_rev, length_ratio, alpha_order, eta_0,
+              eta_1, eta_2, alpha_0, alpha_1, alpha_2, beta, energy):
+
+        self.bind(dt, dE)
+        self._drift(self.dt_pointer, self.dE_pointer, solver, float(t_rev),
+                    float(length_ratio), float(alpha_order), float(eta_0),
+                    float(eta_1), float(eta_2), float(alpha_0),
+                    float(alpha_1), float(alpha_2), float(beta),
+                    float(energy), self.n_macroparticles)
+
+    def linear_interp_kick(self, dt, dE, voltage, bin_centers, charge,
+                           acceleration_kick):
+
+        self.bind(dt, dE)
+        voltage_pointer = self._pointer('voltage_interp', voltage)
+        bin_centers_pointer = self._pointer('bin_centers', bin_centers)
+        if voltage.ndim == 1:
+            self._linear_interp_kick(
+                self.dt_pointer, self.dE_pointer, voltage_pointer,
+                bin_centers_pointer, float(charge), len(bin_centers),
+                self.n_macroparticles, float(acceleration_kick))
+            return
+
+        # One voltage per realisation, applied row by row
+        if len(voltage) != self.n_rows:
+            #InputDataError
+            raise RuntimeError('ERROR in ParticleKernels: one voltage per ' +
+                               'realisation is needed')
+        n_row = self.n_macroparticles // self.n_rows
+        itemsize = np.dtype(self.real_t).itemsize
+        for row in range(self.n_rows):
+            offset = row * n_row * itemsize
+            self._linear_interp_kick(
+                self.dt_pointer + offset, self.dE_pointer + offset,
+                voltage_pointer + row * len(bin_centers) * itemsize,
+                bin_centers_pointer, float(charge), len(bin_centers),
+                n_row, float(acceleration_kick))
+
+
 def linear_interp_kick_n_drift(dt, dE, total_voltage, bin_centers, charge, acc_kick,
                                solver, t_rev, length_ratio, alpha_order, eta_0, eta_1,
                                eta_2, beta, energy):
@@ -774,6 +1165,10 @@ def linear_interp_kick_n_drift(dt, dE, total_voltage, bin_centers, charge, acc_k
 
 
 def slice(dt, profile, cut_left, cut_right):
+    if dt.ndim == 2:
+        slice_rows(dt, profile, cut_left, cut_right)
+        return
+
     assert isinstance(dt[0], precision.real_t)
     assert isinstance(profile[0], precision.real_t)
 
@@ -796,6 +1191,33 @@ def slice(dt, profile, cut_left, cut_right):
                         __getLen(dt))
 
 
+def slice_rows(dt, profile, cut_left, cut_right):
+    '''
+    Histograms of the rows of dt [n_realisations, n_macroparticles] (ensemble
+    beam) in the rows of profile [n_realisations, n_slices], in one call
+    '''
+    assert dt.dtype == precision.real_t and dt.flags.c_contiguous
+    assert profile.dtype == precision.real_t and profile.flags.c_contiguous
+    assert len(dt) == len(profile)
+
+    if precision.num == 1:
+        __lib.histogram_rowsf(__getPointer(dt),
+                              __getPointer(profile),
+                              __c_real(cut_left),
+                              __c_real(cut_right),
+                              ct.c_int(profile.shape[-1]),
+                              ct.c_int(dt.shape[-1]),
+                              ct.c_int(len(dt)))
+    else:
+        __lib.histogram_rows(__getPointer(dt),
+                             __getPointer(profile),
+                             __c_real(cut_left),
+                             __c_real(cut_right),
+                             ct.c_int(profile.shape[-1]),
+                             ct.c_int(dt.shape[-1]),
+                             ct.c_int(len(dt)))
+
+
 def slice_smooth(dt, profile, cut_left, cut_right):
     assert isinstance(dt[0], precision.real_t)
     assert isinstance(profile[0], precision.real_t)
@@ -933,6 +1355,154 @@ def music_track_multiturn(dt, dE, induced_voltage, array_parameters,
                                     __c_real(coeff4))
 
 
+
+def music_track_scan(dt, dE, induced_voltage, array_parameters,
+                     alpha, omega_bar,
+                     const, coeff1, coeff2, coeff3, coeff4, multi_turn=False):
+    '''
+    Single-turn or multi-turn MuSiC (see music_track and
+    music_track_multiturn), with the recursion over the sorted particles
+    split in chunks computed in parallel
+    '''
+    assert isinstance(dt[0], precision.real_t)
+    assert isinstance(dE[0], precision.real_t)
+    assert isinstance(induced_voltage[0], precision.real_t)
+    assert isinstance(array_parameters[0], precision.real_t)
+
+    if precision.num == 1:
+        __lib.music_track_scanf(__getPointer(dt),
+                                __getPointer(dE),
+                                __getPointer(induced_voltage),
+                                __getPointer(array_parameters),
+                                __getLen(dt),
+                                __c_real(alpha),
+                                __c_real(omega_bar),
+                                __c_real(const),
+                                __c_real(coeff1),
+                                __c_real(coeff2),
+                                __c_real(coeff3),
+                                __c_real(coeff4),
+                                ct.c_int(int(multi_turn)))
+    else:
+        __lib.music_track_scan(__getPointer(dt),
+                               __getPointer(dE),
+                               __getPointer(induced_voltage),
+                               __getPointer(array_parameters),
+                               __getLen(dt),
+                               __c_real(alpha),
+                               __c_real(omega_bar),
+                               __c_real(const),
+                               __c_real(coeff1),
+                               __c_real(coeff2),
+                               __c_real(coeff3),
+                               __c_real(coeff4),
+                               ct.c_int(int(multi_turn)))
+
+
+def music_track_resonators(dt, dE, induced_voltage, array_parameters,
+                           alpha, omega_bar, const, coeff1, coeff2, coeff3,
+                           coeff4, multi_turn=False, parallel=False):
+    '''
+    Single-turn or multi-turn MuSiC for several resonators in one sweep over
+    the sorted particles; alpha, ..., coeff4 are arrays with the parameters
+    of each resonator
+    '''
+    assert isinstance(dt[0], precision.real_t)
+    assert isinstance(dE[0], precision.real_t)
+    assert isinstance(induced_voltage[0], precision.real_t)
+    assert isinstance(array_parameters[0], precision.real_t)
+
+    parameters = [np.ascontiguousarray(parameter, dtype=precision.real_t)
+                  for parameter in (alpha, omega_bar, const, coeff1, coeff2,
+                                    coeff3, coeff4)]
+
+    if precision.num == 1:
+        __lib.music_track_resonatorsf(__getPointer(dt),
+                                      __getPointer(dE),
+                                      __getPointer(induced_voltage),
+                                      __getPointer(array_parameters),
+                                      __getLen(dt),
+                                      __getLen(parameters[0]),
+                                      *[__getPointer(parameter)
+                                        for parameter in parameters],
+                                      ct.c_int(int(multi_turn)),
+                                      ct.c_int(int(parallel)))
+    else:
+        __lib.music_track_resonators(__getPointer(dt),
+                                     __getPointer(dE),
+                                     __getPointer(induced_voltage),
+                                     __getPointer(array_parameters),
+                                     __getLen(dt),
+                                     __getLen(parameters[0]),
+                                     *[__getPointer(parameter)
+                                       for parameter in parameters],
+                                     ct.c_int(int(multi_turn)),
+                                     ct.c_int(int(parallel)))
+
+
+def gaussian_fit(bin_centers, profile, first, last, threshold=0.01,
+                 n_iterations=3, p0=None):
+    '''
+    Gaussian fits [amplitude, position, sigma] of the bunches in the ranges of
+    bins [first, last), by Gauss-Newton steps on the bins above threshold
+    times the maximum of each bunch, starting from p0 if given (warm start)
+    or from a log-parabola estimate
+    '''
+    bin_centers = bin_centers.astype(dtype=precision.real_t, order='C',
+                                     copy=False)
+    profile = profile.astype(dtype=precision.real_t, order='C', copy=False)
+    first = np.ascontiguousarray(first, dtype=np.int32)
+    last = np.ascontiguousarray(last, dtype=np.int32)
+
+    if p0 is None:
+        parameters = np.zeros((len(first), 3), dtype=np.float64)
+    else:
+        parameters = np.array(p0, dtype=np.float64).reshape(len(first), 3)
+
+    if precision.num == 1:
+        __lib.gaussian_fitf(__getPointer(bin_centers), __getPointer(profile),
+                            __getPointer(first), __getPointer(last),
+                            __getLen(first), ct.c_double(threshold),
+                            ct.c_int(n_iterations),
+                            ct.c_bool(p0 is not None),
+                            __getPointer(parameters))
+    else:
+        __lib.gaussian_fit(__getPointer(bin_centers), __getPointer(profile),
+                           __getPointer(first), __getPointer(last),
+                           __getLen(first), ct.c_double(threshold),
+                           ct.c_int(n_iterations), ct.c_bool(p0 is not None),
+                           __getPointer(parameters))
+    return parameters
+
+
+def bunch_fwhm_rms(bin_centers, profile, first, last, shift=0):
+    '''
+    Positions and lengths (4 sigma) from the FWHM and from the RMS of the
+    bunches in the ranges of bins [first, last), in one pass over the profile;
+    returns fwhm_position, fwhm_length, rms_position, rms_length
+    '''
+    bin_centers = bin_centers.astype(dtype=precision.real_t, order='C',
+                                     copy=False)
+    profile = profile.astype(dtype=precision.real_t, order='C', copy=False)
+    first = np.ascontiguousarray(first, dtype=np.int32)
+    last = np.ascontiguousarray(last, dtype=np.int32)
+
+    results = np.empty((4, len(first)), dtype=np.float64)
+    if precision.num == 1:
+        __lib.bunch_fwhm_rmsf(__getPointer(bin_centers),
+                              __getPointer(profile), __getPointer(first),
+                              __getPointer(last), __getLen(first),
+                              ct.c_double(shift),
+                              *[__getPointer(result) for result in results])
+    else:
+        __lib.bunch_fwhm_rms(__getPointer(bin_centers),
+                             __getPointer(profile), __getPointer(first),
+                             __getPointer(last), __getLen(first),
+                             ct.c_double(shift),
+                             *[__getPointer(result) for result in results])
+    return tuple(results)
+
+
 def synchrotron_radiation(dE, U0, n_kicks, tau_z):
     assert isinstance(dE[0], precision.real_t)
     # dE = dE.astype(dtype=precision.real_t, order='C', copy=False)
@@ -953,10 +1523,22 @@ def synchrotron_radiation(dE, U0, n_kicks, tau_z):
             ct.c_int(n_kicks))
 
 
-def synchrotron_radiation_full(dE, U0, n_kicks, tau_z, sigma_dE, energy):
+def synchrotron_radiation_full(dE, U0, n_kicks, tau_z, sigma_dE, energy,
+                               seed=None, stream=0, dimension=None):
+    '''
+    Synchrotron radiation damping and quantum excitation. The normal random
+    numbers of the kick j are those of random_normal() with the seed, stream
+    and dimension + j, indexed by the particle; by default, the seed of
+    set_random_seed() and the next dimensions
+    '''
     assert isinstance(dE[0], precision.real_t)
 
     # dE = dE.astype(dtype=precision.real_t, order='C', copy=False)
+    if seed is None:
+        seed = _random_state['seed']
+    if dimension is None:
+        dimension = _random_state['dimension']
+        _random_state['dimension'] += n_kicks
 
     if precision.num == 1:
         __lib.synchrotron_radiation_fullf(
@@ -966,7 +1548,10 @@ def synchrotron_radiation_full(dE, U0, n_kicks, tau_z, sigma_dE, energy):
             __c_real(sigma_dE),
             __c_real(tau_z * n_kicks),
             __c_real(energy),
-            ct.c_int(n_kicks))
+            ct.c_int(n_kicks),
+            ct.c_uint64(seed & 0xFFFFFFFFFFFFFFFF),
+            ct.c_uint32(stream),
+            ct.c_uint32(dimension))
     else:
         __lib.synchrotron_radiation_full(
             __getPointer(dE),
@@ -975,14 +1560,107 @@ def synchrotron_radiation_full(dE, U0, n_kicks, tau_z, sigma_dE, energy):
             __c_real(sigma_dE),
             __c_real(tau_z * n_kicks),
             __c_real(energy),
-            ct.c_int(n_kicks))
+            ct.c_int(n_kicks),
+            ct.c_uint64(seed & 0xFFFFFFFFFFFFFFFF),
+            ct.c_uint32(stream),
+            ct.c_uint32(dimension))
+
+
+# Seed and next dimension of the random numbers of
+# synchrotron_radiation_full() when not given
+_random_state = {'seed': int.from_bytes(os.urandom(8), 'little'),
+                 'dimension': 0}
 
 
 def set_random_seed(seed):
-    __lib.set_random_seed(ct.c_int(seed))
+    '''
+    Seed of the random numbers of the compiled routines when not given
+    (quantum excitation of the synchrotron radiation)
+    '''
+    _random_state['seed'] = int(seed)
+    _random_state['dimension'] = 0
+
+
+# Number of dimensions of the quasi-random sequences, see random.h
+_random_quasi_dimensions = 8
+
+
+def __random(function, n, start, indices, sequence, seed, shift, stream,
+             dimension, result):
+
+    if sequence not in (0, 1, 2):
+        raise ValueError(
+            'sequence must be 0 (Philox), 1 (Sobol) or 2 (Halton), not %r'
+            % (sequence,))
+    if sequence == 0:
+        max_dimension = 2**32
+    else:
+        max_dimension = _random_quasi_dimensions
+    if not 0 <= dimension < max_dimension:
+        raise ValueError(
+            'dimension of the sequence %d must be in [0, %d), not %r'
+            % (sequence, max_dimension, dimension))
+
+    if indices is not None:
+        indices = np.ascontiguousarray(indices, dtype=np.int64)
+        n = len(indices)
+    if result is None:
+        result = np.empty(n, dtype=np.float64)
+    assert result.dtype == np.float64 and result.flags.c_contiguous
+    assert len(result) == n
+
+    function(__getPointer(result),
+             None if indices is None else __getPointer(indices),
+             ct.c_int64(start), ct.c_int(n), ct.c_int(sequence),
+             ct.c_uint64(seed & 0xFFFFFFFFFFFFFFFF), ct.c_bool(shift),
+             ct.c_uint32(stream), ct.c_uint32(dimension))
+    return result
+
+
+def random_uniform(n, start=0, indices=None, sequence=0, seed=0, shift=False,
+                   stream=0, dimension=0, result=None):
+    '''
+    Uniform random numbers in (0, 1) of the indices start to start + n - 1
+    (or of the given indices) of one dimension of a sequence: 0 pseudo-random
+    (Philox), 1 Sobol, 2 Halton (randomised by the seed if shift), see
+    random.h
+    '''
+    return __random(__lib.random_uniform, n, start, indices, sequence, seed,
+                    shift, stream, dimension, result)
+
+
+def random_normal(n, start=0, indices=None, sequence=0, seed=0, shift=False,
+                  stream=0, dimension=0, result=None):
+    '''
+    Standard normal random numbers, quantiles of the uniform random numbers
+    of random_uniform()
+    '''
+    return __random(__lib.random_normal, n, start, indices, sequence, seed,
+                    shift, stream, dimension, result)
+
+
+def set_num_threads(n_threads):
+    '''
+    Number of OpenMP threads of the compiled routines (no effect if the
+    library is compiled without -p)
+    '''
+    __lib.set_num_threads(ct.c_int(n_threads))
+
+
+def get_num_threads():
+    '''
+    Number of OpenMP threads of the compiled routines (1 if the library is
+    compiled without -p)
+    '''
+    return __lib.get_num_threads()
 
 
 def fast_resonator(R_S, Q, frequency_array, frequency_R, impedance=None):
+    '''
+    Impedance of all the resonators, written in impedance if given (complex
+    array of the length of frequency_array); the first frequency is assumed
+    to be zero
+    '''
     R_S = R_S.astype(dtype=precision.real_t, order='C', copy=False)
     Q = Q.astype(dtype=precision.real_t, order='C', copy=False)
     frequency_array = frequency_array.astype(
@@ -990,13 +1668,15 @@ def fast_resonator(R_S, Q, frequency_array, frequency_R, impedance=None):
     frequency_R = frequency_R.astype(
         dtype=precision.real_t, order='C', copy=False)
 
-    realImp = np.zeros(len(frequency_array), dtype=precision.real_t)
-    imagImp = np.zeros(len(frequency_array), dtype=precision.real_t)
+    if impedance is None:
+        impedance = np.empty(len(frequency_array), dtype=precision.complex_t)
+    assert impedance.dtype == precision.complex_t
+    assert impedance.flags['C_CONTIGUOUS']
+    assert len(impedance) == len(frequency_array)
 
     if precision.num == 1:
-        __lib.fast_resonator_real_imagf(
-            __getPointer(realImp),
-            __getPointer(imagImp),
+        __lib.fast_resonator_impedancef(
+            __getPointer(impedance),
             __getPointer(frequency_array),
             __getPointer(R_S),
             __getPointer(Q),
@@ -1004,9 +1684,8 @@ def fast_resonator(R_S, Q, frequency_array, frequency_R, impedance=None):
             __getLen(R_S),
             __getLen(frequency_array))
     else:
-        __lib.fast_resonator_real_imag(
-            __getPointer(realImp),
-            __getPointer(imagImp),
+        __lib.fast_resonator_impedance(
+            __getPointer(impedance),
             __getPointer(frequency_array),
             __getPointer(R_S),
             __getPointer(Q),
@@ -1014,10 +1693,62 @@ def fast_resonator(R_S, Q, frequency_array, frequency_R, impedance=None):
             __getLen(R_S),
             __getLen(frequency_array))
 
-    impedance = realImp + 1j * imagImp
     return impedance
 
 
+def __mode_sum(function, parameters, x, result, dtype):
+    # Common part of the wake and impedance functions below: one pass over
+    # the points x, summing all the modes, written in result
+    parameters = [parameter.astype(dtype=precision.real_t, order='C',
+                                   copy=False) for parameter in parameters]
+    x = x.astype(dtype=precision.real_t, order='C', copy=False)
+
+    if result is None:
+        result = np.empty(len(x), dtype=dtype)
+    assert result.dtype == dtype
+    assert result.flags['C_CONTIGUOUS']
+    assert len(result) == len(x)
+
+    if precision.num == 1:
+        function = getattr(__lib, function + 'f')
+    else:
+        function = getattr(__lib, function)
+    function(__getPointer(result), __getPointer(x),
+             *[__getPointer(parameter) for parameter in parameters],
+             __getLen(parameters[0]), __getLen(x))
+
+    return result
+
+
+def resonator_wake(R_S, omega_R, Q, time_array, result=None):
+    '''
+    Wake of all the resonators, written in result if given
+    '''
+    return __mode_sum('fast_resonator_wake', [R_S, omega_R, Q], time_array,
+                      result, precision.real_t)
+
+
+def travelling_wave_wake(R_S, frequency_R, a_factor, time_array,
+                         result=None):
+    '''
+    Wake of all the travelling wave cavity modes, written in result if given
+    '''
+    return __mode_sum('fast_travelling_wave_wake', [R_S, frequency_R,
+                                                    a_factor],
+                      time_array, result, precision.real_t)
+
+
+def travelling_wave_impedance(R_S, frequency_R, a_factor, frequency_array,
+                              result=None):
+    '''
+    Impedance of all the travelling wave cavity modes, written in result
+    (complex array) if given
+    '''
+    return __mode_sum('fast_travelling_wave_impedance', [R_S, frequency_R,
+                                                         a_factor],
+                      frequency_array, result, precision.complex_t)
+
+
 # def mean(x):
 #     __lib.mean.restype = ct.c_double
 #     return __lib.mean(__getPointer(x), __getLen(x))
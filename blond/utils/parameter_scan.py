@@ -0,0 +1,267 @@
+# Copyright 2016 CERN. This software is distributed under the
+# terms of the GNU General Public Licence version 3 (GPL Version 3),
+# copied verbatim in the file LICENCE.md.
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+# Project website: http://blond.web.cern.ch/
+
+'''
+**Module to run the points of a parameter scan in parallel processes and
+collect their outputs in one h5 file**
+'''
+
+from __future__ import division, print_function
+from builtins import range, object
+import copy
+import itertools
+import multiprocessing
+import os
+import warnings
+import h5py as hp
+import numpy as np
+
+from .track_iteration import TrackIteration
+from ..utils import bmath as bm
+
+# Scan run by the worker processes, inherited from the parent at the fork
+_scan = None
+
+
+def _track_point(index):
+
+    return _scan.track_point(index)
+
+
+class ParameterScan(object):
+    r"""Class running a parameter scan of a tracking study (voltage,
+    intensity, emittance, feedback gain, ...) on a single node.
+
+    The objects common to all the points (Ring, RFStation, impedance tables,
+    ...) are built once, before the scan, and passed as shared to setup().
+    Each point is then tracked in a worker process forked from the scan
+    process: the shared objects are inherited copy-on-write, without being
+    pickled or rebuilt, and a new worker is forked for every point so that
+    the changes of the shared objects during tracking (e.g. the RF phase
+    of the feedbacks) do not affect the next points. The outputs recorded
+    during tracking are sent back to the scan process, which writes them in
+    one h5 file indexed by the point number.
+
+    Without fork (e.g. on Windows) or with one process, the points are
+    tracked one after the other on deep copies of the shared objects.
+
+    Parameters
+    ----------
+    setup : function
+        setup(shared, point) builds the objects of a point and returns its
+        tracking map, a list of callables called every turn (e.g.
+        [rf_tracker.track, profile.track])
+    points : list of dict
+        Parameters of the points passed to setup(), see grid()
+    n_turns : int
+        Number of turns tracked for each point
+    record : function
+        record(track_map, turn) returns a dict of the outputs (floats or
+        arrays of fixed shape) recorded at turn 0 and every record_interval
+        turns
+    shared : object
+        Objects common to all the points, passed to setup(); default is None
+    record_interval : int
+        Number of turns between the records; default is 1
+    n_processes : int
+        Number of worker processes; default is the number of CPUs
+    n_threads : int
+        Number of OpenMP threads of the compiled routines when the points
+        are tracked one after the other in this process, restored at the
+        end; default is 1. The forked workers always run with one thread
+        (the OpenMP runtime can hang in a process forked after the parent
+        ran parallel regions)
+
+    Attributes
+    ----------
+    n_records : int
+        Number of records of each point
+    h5 file
+        turns : turns of the records [n_records];
+        parameters/<name> : parameters of the points [n_points];
+        outputs/<name> : outputs [n_points, n_records, ...];
+        completed : points tracked [n_points]
+
+    Examples
+    --------
+    >>> def setup(ring, point):
+    >>>     rf_station = RFStation(ring, [4620], [point['voltage']], [0])
+    >>>     beam = Beam(ring, 100000, point['intensity'])
+    >>>     bigaussian(ring, rf_station, beam, 1e-9, seed=1)
+    >>>     return [RingAndRFTracker(rf_station, beam).track]
+    >>>
+    >>> def record(track_map, turn):
+    >>>     beam = track_map[0].__self__.beam
+    >>>     beam.statistics()
+    >>>     return {'sigma_dt': beam.sigma_dt, 'mean_dE': beam.mean_dE}
+    >>>
+    >>> points = ParameterScan.grid(voltage=[1e6, 2e6],
+    >>>                             intensity=[1e10, 1e11])
+    >>> scan = ParameterScan(setup, points, 10000, record, shared=ring,
+    >>>                      record_interval=100)
+    >>> scan.run('scan')
+
+    """
+
+    def __init__(self, setup, points, n_turns, record, shared=None,
+                 record_interval=1, n_processes=None, n_threads=1):
+
+        if not callable(setup) or not callable(record):
+            #InputDataError
+            raise RuntimeError("ERROR in ParameterScan: setup and record " +
+                               "must be functions")
+
+        self.setup = setup
+        self.points = [dict(point) for point in points]
+        self.n_turns = int(n_turns)
+        self.record = record
+        self.shared = shared
+        self.record_interval = int(record_interval)
+        if self.record_interval < 1:
+            #InputDataError
+            raise RuntimeError("ERROR in ParameterScan: record_interval " +
+                               "must be positive")
+        self.n_records = self.n_turns // self.record_interval + 1
+
+        if n_processes is None:
+            n_processes = os.cpu_count() or 1
+        self.n_processes = max(int(n_processes), 1)
+        self.n_threads = int(n_threads)
+
+    @staticmethod
+    def grid(**parameters):
+        r"""Function returning the points of the grid of all the
+        combinations of the parameter values (last parameter varying
+        fastest)
+
+        Parameters
+        ----------
+        parameters : lists
+            Values of each parameter
+
+        Returns
+        -------
+        list of dict
+            Points of the grid
+
+        """
+
+        names = list(parameters)
+        return [dict(zip(names, values)) for values in
+                itertools.product(*[parameters[name] for name in names])]
+
+    def track_point(self, index, copy_shared=False):
+        r"""Function tracking one point and returning its index and the
+        recorded outputs, stacked along the records"""
+
+        shared = copy.deepcopy(self.shared) if copy_shared else self.shared
+        track_map = self.setup(shared, self.points[index])
+
+        outputs = {}
+
+        def store(track_map, turn):
+            for name, value in self.record(track_map, turn).items():
+                outputs.setdefault(name, []).append(np.array(value))
+
+        store(track_map, 0)
+        iteration = TrackIteration(track_map, 0, self.n_turns)
+        iteration.add_function(store, self.record_interval)
+        for turn in iteration:
+            pass
+
+        return index, dict((name, np.array(values))
+                           for name, values in outputs.items())
+
+    def _context(self):
+
+        if self.n_processes < 2 or len(self.points) < 2:
+            return None
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            warnings.warn("ParameterScan: fork not available, the points " +
+                          "are tracked one after the other")
+            return None
+        if self.n_threads > 1:
+            warnings.warn("ParameterScan: the forked workers run with one " +
+                          "OpenMP thread, n_threads is ignored")
+        return multiprocessing.get_context('fork')
+
+    def run(self, filename):
+        r"""Function tracking all the points and writing their outputs in
+        filename.h5, as the points are completed
+
+        Parameters
+        ----------
+        filename : str
+            Name of the h5 file, without extension
+
+        """
+
+        global _scan
+
+        context = self._context()
+        with hp.File(filename + '.h5', 'w') as h5file:
+            self.init_data(h5file)
+
+            if context is None:
+                n_threads = bm.get_num_threads()
+                bm.set_num_threads(self.n_threads)
+                try:
+                    for index in range(len(self.points)):
+                        self.write_data(h5file, *self.track_point(
+                            index, copy_shared=True))
+                finally:
+                    bm.set_num_threads(n_threads)
+                return
+
+            # One fresh fork of this process per point, with one OpenMP
+            # thread set before the first parallel region of the worker
+            _scan = self
+            try:
+                with context.Pool(min(self.n_processes, len(self.points)),
+                                  initializer=bm.set_num_threads,
+                                  initargs=(1,),
+                                  maxtasksperchild=1) as pool:
+                    for index, outputs in pool.imap_unordered(
+                            _track_point, range(len(self.points))):
+                        self.write_data(h5file, index, outputs)
+            finally:
+                _scan = None
+
+    def init_data(self, h5file):
+
+        n_points = len(self.points)
+        h5file.attrs['n_points'] = n_points
+        h5file.attrs['n_turns'] = self.n_turns
+        h5file.attrs['record_interval'] = self.record_interval
+        h5file.create_dataset('turns', data=self.record_interval *
+                              np.arange(self.n_records))
+        h5file.create_dataset('completed', data=np.zeros(n_points, bool))
+
+        h5group = h5file.require_group('parameters')
+        names = sorted(set(name for point in self.points for name in point))
+        for name in names:
+            values = np.array([point.get(name, np.nan)
+                               for point in self.points])
+            if values.dtype.kind not in 'biuf':
+                values = values.astype(str).astype(np.bytes_)
+            h5group.create_dataset(name, data=values)
+
+        h5file.require_group('outputs')
+
+    def write_data(self, h5file, index, outputs):
+
+        h5group = h5file['outputs']
+        for name, values in outputs.items():
+            if name not in h5group:
+                h5group.create_dataset(
+                    name, shape=(len(self.points), self.n_records) +
+                    values.shape[1:], dtype=values.dtype,
+                    fillvalue=np.nan if values.dtype.kind == 'f' else 0)
+            h5group[name][index, :len(values)] = values
+        h5file['completed'][index] = True
+        h5file.flush()
@@ -0,0 +1,137 @@
+# Copyright 2016 CERN. This software is distributed under the
+# terms of the GNU General Public Licence version 3 (GPL Version 3),
+# copied verbatim in the file LICENCE.md.
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+# Project website: http://blond.web.cern.ch/
+
+'''
+**Counter-based and quasi-random number generator of the distributions and
+noise sources**
+'''
+
+from __future__ import division
+from builtins import object
+import os
+
+from ..utils import bmath as bm
+
+
+class RandomGenerator(object):
+    r"""Random number generator in which every number is a function of the
+    seed, the stream, the dimension and the index only, and is computed in
+    bulk by the compiled library.
+
+    The particle i of a distribution uses the index i, and each random
+    coordinate its own dimension (e.g. dt and dE of bigaussian() use the
+    dimensions 0 and 1), so that the numbers do not depend on the number of
+    threads, and a process generating the particles start to start + n - 1
+    gets the same numbers as a single process generating all the particles.
+    Independent streams (e.g. one per bunch) are obtained with spawn().
+
+    The generator is passed as the seed of bigaussian(), populate_bunch()
+    (matched distributions), generate_coasting_beam(), FlatSpectrum and
+    SynchrotronRadiation.
+
+    Parameters
+    ----------
+    seed : int
+        Seed (64 bits); default is None, a random seed for the pseudo-random
+        sequence and no randomisation of the quasi-random sequences
+    stream : int
+        Number of the stream (32 bits); default is 0
+    sequence : str
+        'philox' for the pseudo-random Philox4x32-10 sequence (default),
+        'sobol' or 'halton' for the quasi-random sequences of low-noise
+        distributions, with quasi_dimensions dimensions (Sobol from its
+        second point, up to 2^32 - 1 numbers; Halton from its second point);
+        the further dimensions are pseudo-random
+
+    Attributes
+    ----------
+    shift : bool
+        The quasi-random sequence is randomised by the seed (digital shift
+        for Sobol, rotation for Halton)
+
+    Examples
+    --------
+    >>> random_generator = RandomGenerator(seed=1, sequence='sobol')
+    >>> bigaussian(ring, rf_station, beam, 1e-9, seed=random_generator)
+
+    """
+
+    #: *Sequences of the compiled library, see cpp_routines/random.h*
+    sequences = {'philox': 0, 'sobol': 1, 'halton': 2}
+
+    #: *Number of dimensions of the quasi-random sequences*
+    quasi_dimensions = 8
+
+    def __init__(self, seed=None, stream=0, sequence='philox'):
+
+        if sequence not in self.sequences:
+            #InputDataError
+            raise RuntimeError("ERROR in RandomGenerator: sequence must be " +
+                               "one of " + ", ".join(sorted(self.sequences)))
+
+        self.sequence = sequence
+        self.shift = seed is not None
+        if seed is None:
+            seed = int.from_bytes(os.urandom(8), 'little')
+        self.seed = int(seed) & 0xFFFFFFFFFFFFFFFF
+        self.stream = int(stream)
+
+    def spawn(self, stream):
+        r"""Generator of the same seed and sequence on another stream"""
+
+        generator = RandomGenerator(self.seed, stream, self.sequence)
+        generator.shift = self.shift
+        return generator
+
+    def pseudo_random(self):
+        r"""Pseudo-random generator of the same seed and stream (e.g. for
+        the noise sources)"""
+
+        if self.sequence == 'philox':
+            return self
+        return RandomGenerator(self.seed, self.stream)
+
+    def _arguments(self, dimension):
+
+        if self.sequence != 'philox' and dimension < self.quasi_dimensions:
+            return dict(sequence=self.sequences[self.sequence],
+                        seed=self.seed, shift=self.shift, stream=self.stream,
+                        dimension=dimension)
+        return dict(sequence=self.sequences['philox'], seed=self.seed,
+                    stream=self.stream, dimension=dimension)
+
+    def uniform(self, n=None, dimension=0, start=0, indices=None):
+        r"""Uniform random numbers in (0, 1)
+
+        Parameters
+        ----------
+        n : int
+            Number of random numbers, of the indices start to start + n - 1
+        dimension : int
+            Dimension of the sequence; default is 0
+        start : int
+            First index; default is 0
+        indices : int array
+            Indices of the random numbers, instead of n and start
+
+        Returns
+        -------
+        float array
+            Random numbers
+
+        """
+
+        return bm.random_uniform(n, start, indices,
+                                 **self._arguments(dimension))
+
+    def normal(self, n=None, dimension=0, start=0, indices=None):
+        r"""Standard normal random numbers (normal quantiles of the uniform
+        random numbers), see uniform()"""
+
+        return bm.random_normal(n, start, indices,
+                                **self._arguments(dimension))
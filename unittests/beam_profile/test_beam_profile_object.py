@@ -278,6 +278,117 @@ class testProfileClass(unittest.TestCase):
             rtol=rtol, atol=atol,
             err_msg='Bunch length values not correct')
 
+    def test_bunch_following(self):
+
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        my_beam = Beam(self.ring, 100000, 1e10)
+        my_beam.dt = np.load(dir_path+'/dt_coordinates.npz')['arr_0']
+        initial_position = np.mean(my_beam.dt)
+
+        follow_options = profileModule.BunchFollowingOptions()
+        profile = profileModule.Profile(
+            my_beam,
+            CutOptions=profileModule.CutOptions(n_slices=64, n_sigma=10),
+            BunchFollowingOptions=follow_options)
+
+        frame_changes = []
+        profile.frame_callbacks.append(
+            lambda: frame_changes.append(profile.cut_left))
+
+        frame_lengths = []
+        for turn in range(40):
+            # Bunch compression and drift
+            my_beam.dt = initial_position + 1e-9*turn + \
+                (my_beam.dt - initial_position - 1e-9*(turn - 1))*0.96
+            profile.track()
+
+            frame_length = profile.cut_right - profile.cut_left
+            frame_lengths.append(frame_length)
+            self.assertLessEqual(np.abs(np.mean(my_beam.dt) - 0.5 *
+                                        (profile.cut_left +
+                                         profile.cut_right)),
+                                 0.1*frame_length)
+            # Profile RMS slightly below the particle one (cut tails)
+            self.assertLess(np.abs(np.log(10*np.std(my_beam.dt) /
+                                          frame_length)), np.log(1.3))
+
+            reference = profileModule.Profile(
+                my_beam, CutOptions=profileModule.CutOptions(
+                    profile.cut_left, profile.cut_right, 64))
+            reference.track()
+            np.testing.assert_array_equal(profile.n_macroparticles,
+                                          reference.n_macroparticles)
+
+        # Frame only changed past the margins, lengths on the ladder
+        self.assertGreater(len(frame_changes), 0)
+        self.assertLess(len(frame_changes), 40)
+        steps = np.log(np.array(frame_lengths) / frame_lengths[0]) / \
+            np.log(1.25)
+        np.testing.assert_allclose(steps, np.round(steps), atol=1e-9)
+        self.assertEqual(len(np.unique(np.round(steps))), 8)
+
+        # The options are not changed by the profile
+        self.assertEqual(profile.follow_n_sigma, 10)
+        self.assertIsNone(follow_options.n_sigma)
+
+    def test_gaussian_fast(self):
+
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        my_beam = Beam(self.ring, 100000, 1e10)
+        my_beam.dt = np.load(dir_path+'/dt_coordinates.npz')['arr_0']
+
+        profiles = {}
+        for fit_option, fitExtraOptions in [
+                ('gaussian', None), ('gaussian_fast', None),
+                ('gaussian_fast', {'threshold': 0, 'n_iterations': 10})]:
+            profile = profileModule.Profile(
+                my_beam,
+                CutOptions=profileModule.CutOptions(n_slices=100),
+                FitOptions=profileModule.FitOptions(
+                    fit_option=fit_option, fitExtraOptions=fitExtraOptions),
+                OtherSlicesOptions=profileModule.OtherSlicesOptions(
+                    direct_slicing=True))
+            profiles[fit_option, fitExtraOptions is None] = profile
+
+        reference = profiles['gaussian', True]
+        for fast, rtol in [(profiles['gaussian_fast', True], 1e-3),
+                           (profiles['gaussian_fast', False], 1e-6)]:
+            np.testing.assert_allclose(fast.fitExtraOptions,
+                                       reference.fitExtraOptions, rtol=rtol)
+
+        # Warm start from the previous turn, same fit as from the estimate
+        fast = profiles['gaussian_fast', True]
+        my_beam.dt += 0.5*fast.bin_size
+        fast.track()
+        fit = np.copy(fast.fitExtraOptions)
+        fast.bunchLength = 0
+        fast.apply_fit_fast(n_iterations=10)
+        np.testing.assert_allclose(fit, fast.fitExtraOptions, rtol=1e-6)
+
+    def test_gaussian_fit_multibunch(self):
+
+        n_bunches = 4
+        bucket_size = 2.5e-9
+        positions = np.array([1.2e-9, 6.4e-9, 11.2e-9, 16.3e-9])
+        sigmas = np.array([0.3e-9, 0.25e-9, 0.35e-9, 0.2e-9])
+        amplitudes = np.array([1e3, 2e3, 5e2, 1e3])
+
+        my_beam = Beam(self.ring, 1000, 1e10)
+        my_beam.dt = np.linspace(0, 20e-9, 1000)
+        profile = profileModule.Profile(
+            my_beam, CutOptions=profileModule.CutOptions(0, 20e-9, 400))
+        profile.n_macroparticles = np.sum(
+            amplitudes[:, np.newaxis] *
+            np.exp(-0.5*((profile.bin_centers - positions[:, np.newaxis]) /
+                         sigmas[:, np.newaxis])**2), axis=0)
+
+        profile.gaussian_fit_multibunch(n_bunches, 2, bucket_size)
+        np.testing.assert_allclose(profile.bunchPosition, positions,
+                                   rtol=1e-6)
+        np.testing.assert_allclose(profile.bunchLength, 4*sigmas, rtol=1e-6)
+        np.testing.assert_allclose(profile.fitExtraOptions[:, 0], amplitudes,
+                                   rtol=1e-6)
+
 
 if __name__ == '__main__':
 
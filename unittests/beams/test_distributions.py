@@ -0,0 +1,73 @@
+# coding: utf8
+# Copyright 2014-2017 CERN. This software is distributed under the
+# terms of the GNU General Public Licence version 3 (GPL Version 3),
+# copied verbatim in the file LICENCE.md.
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+# Project website: http://blond.web.cern.ch/
+
+"""
+Unittest for beam.distributions.py
+
+"""
+
+import unittest
+import numpy as np
+
+from blond.beam.beam import Beam, Proton
+from blond.input_parameters.ring import Ring
+from blond.beam.distributions import populate_bunch
+
+
+class TestPopulateBunch(unittest.TestCase):
+
+    def setUp(self):
+        ring = Ring(6911.5038, 1/17.95142852**2, 450e9, Proton(), 1)
+        self.beam = Beam(ring, 10000, 1e9)
+
+        time_coord = np.linspace(0, 1e-9, 50)
+        energy_coord = np.linspace(-1e6, 1e6, 40)
+        self.time_grid, self.deltaE_grid = np.meshgrid(time_coord,
+                                                       energy_coord)
+        self.time_step = time_coord[1] - time_coord[0]
+        self.deltaE_step = energy_coord[1] - energy_coord[0]
+
+        density_grid = np.exp(-((self.time_grid - 0.5e-9)/2e-10)**2 -
+                              (self.deltaE_grid/4e5)**2)
+        self.density_grid = density_grid / np.sum(density_grid)
+
+    def test_same_sequence_as_random_choice(self):
+        # Reference implementation, sampling with np.random.choice
+        np.random.seed(seed=1234)
+        indexes = np.random.choice(np.arange(0, np.size(self.density_grid)),
+                                   self.beam.n_macroparticles,
+                                   p=self.density_grid.flatten())
+        dt = self.time_grid.flatten()[indexes] + \
+            (np.random.rand(self.beam.n_macroparticles) - 0.5) * \
+            self.time_step
+        dE = self.deltaE_grid.flatten()[indexes] + \
+            (np.random.rand(self.beam.n_macroparticles) - 0.5) * \
+            self.deltaE_step
+
+        populate_bunch(self.beam, self.time_grid, self.deltaE_grid,
+                       self.density_grid, self.time_step, self.deltaE_step,
+                       1234)
+
+        np.testing.assert_array_equal(self.beam.dt, dt)
+        np.testing.assert_array_equal(self.beam.dE, dE)
+
+    def test_empty_cells(self):
+        density_grid = np.copy(self.density_grid)
+        density_grid[:, :25] = 0
+
+        populate_bunch(self.beam, self.time_grid, self.deltaE_grid,
+                       density_grid, self.time_step, self.deltaE_step, 1)
+
+        self.assertGreaterEqual(np.min(self.beam.dt),
+                                self.time_grid[0, 25] - 0.5*self.time_step)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
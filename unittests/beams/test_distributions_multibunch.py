@@ -0,0 +1,124 @@
+# coding: utf8
+# Copyright 2014-2017 CERN. This software is distributed under the
+# terms of the GNU General Public Licence version 3 (GPL Version 3),
+# copied verbatim in the file LICENCE.md.
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+# Project website: http://blond.web.cern.ch/
+
+"""
+Unittest for beam.distributions_multibunch.py
+
+"""
+
+import unittest
+import numpy as np
+
+from blond.beam.beam import Beam, Proton
+from blond.input_parameters.ring import Ring
+from blond.input_parameters.rf_parameters import RFStation
+from blond.trackers.tracker import RingAndRFTracker, FullRingAndRF
+from blond.beam.distributions_multibunch import compute_X_grid, \
+    match_beam_from_distribution, \
+    matched_from_distribution_density_multibunch
+
+
+class TestComputeXGrid(unittest.TestCase):
+
+    def test_action_as_trapezoidal_loop(self):
+        # Reference: trapezoidal integration level by level
+        time_array = np.linspace(-1e-9, 1e-9, 301)
+        potential_well = 1e3 * (1 - np.cos(np.pi * time_array / 1e-9)) \
+            + 50 * np.sin(7e9 * time_array)**2
+        normalization_DeltaE = 1e-6
+
+        J_reference = np.zeros(len(potential_well))
+        for i in range(len(J_reference)):
+            DELTA = np.sqrt((potential_well[i] - potential_well)[
+                potential_well <= potential_well[i]] / normalization_DeltaE)
+            J_reference[i] = 1. / np.pi * np.trapz(
+                DELTA, dx=time_array[1] - time_array[0])
+
+        sorted_H, sorted_J = compute_X_grid(normalization_DeltaE, time_array,
+                                            potential_well, 'Hamiltonian')[:2]
+
+        order = potential_well.argsort()
+        np.testing.assert_array_equal(sorted_H, potential_well[order])
+        np.testing.assert_allclose(sorted_J, J_reference[order], rtol=1e-12,
+                                   atol=1e-12 * np.max(J_reference))
+
+
+class TestMatchBeamFromDistribution(unittest.TestCase):
+
+    def setUp(self):
+        self.ring = Ring(26658.883, 1/55.759505**2, 450e9, Proton(), 1)
+        self.rf = RFStation(self.ring, [35640], [6e6], [0])
+        self.options = {'type': 'binomial', 'exponent': 1.5,
+                        'emittance': 1.0, 'density_variable': 'Hamiltonian'}
+
+    def match(self, n_bunches, seed, n_workers):
+        beam = Beam(self.ring, n_bunches * 2000, n_bunches * 1e11)
+        full_ring = FullRingAndRF([RingAndRFTracker(self.rf, beam)])
+        match_beam_from_distribution(beam, full_ring, self.ring, self.options,
+                                     n_bunches, 10, n_points_potential=500,
+                                     seed=seed, n_workers=n_workers)
+        return beam
+
+    def test_bunches_in_their_buckets(self):
+        beam = self.match(3, 1, 1)
+        bucket_length = 2 * np.pi / self.rf.omega_rf[0, 0]
+
+        self.assertEqual(len(beam.dt), 6000)
+        for indexBunch in range(3):
+            dt = beam.dt[indexBunch*2000:(indexBunch+1)*2000] \
+                - indexBunch * 10 * bucket_length
+            self.assertTrue(np.all(np.abs(dt) < bucket_length))
+
+    def test_concurrent_same_as_sequential(self):
+        beam_sequential = self.match(4, 7, 1)
+        beam_concurrent = self.match(4, 7, 3)
+
+        np.testing.assert_array_equal(beam_sequential.dt, beam_concurrent.dt)
+        np.testing.assert_array_equal(beam_sequential.dE, beam_concurrent.dE)
+
+
+class TestMatchedFromDistributionDensityMultibunch(unittest.TestCase):
+
+    def setUp(self):
+        self.ring = Ring(26658.883, 1/55.759505**2, 450e9, Proton(), 1)
+        self.rf = RFStation(self.ring, [35640], [6e6], [0])
+        # Different emittances and sizes for each bunch, so that a bunch
+        # written in the wrong slice is detected
+        self.options = [{'type': 'binomial', 'exponent': 1.5,
+                         'emittance': emittance,
+                         'density_variable': 'Hamiltonian'}
+                        for emittance in [0.6, 0.8, 1.0, 1.2]]
+        self.intensities = [1e11, 2e11, 1.5e11, 0.5e11]
+
+    def match(self, seed, n_workers):
+        beam = Beam(self.ring, 10000, 5e11)
+        full_ring = FullRingAndRF([RingAndRFTracker(self.rf, beam)])
+        matched_from_distribution_density_multibunch(
+            beam, self.ring, full_ring, self.options, 4, 10,
+            intensity_list=self.intensities, seed=seed, n_workers=n_workers)
+        return beam
+
+    def test_concurrent_same_as_sequential(self):
+        beam_sequential = self.match(7, 1)
+        beam_concurrent = self.match(7, 3)
+
+        np.testing.assert_array_equal(beam_sequential.dt, beam_concurrent.dt)
+        np.testing.assert_array_equal(beam_sequential.dE, beam_concurrent.dE)
+
+        # The bunches have the requested sizes and differ from each other
+        bunch_edges = np.cumsum([0, 2000, 4000, 3000, 1000])
+        std_dE = [np.std(beam_sequential.dE[bunch_edges[i]:bunch_edges[i+1]])
+                  for i in range(4)]
+        self.assertEqual(len(beam_sequential.dE), bunch_edges[-1])
+        self.assertTrue(np.all(np.diff(std_dE) > 0))
+
+
+if __name__ == '__main__':
+
+    unittest.main()
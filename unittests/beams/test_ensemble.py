@@ -0,0 +1,140 @@
+# coding: utf8
+# Copyright 2014-2017 CERN. This software is distributed under the
+# terms of the GNU General Public Licence version 3 (GPL Version 3),
+# copied verbatim in the file LICENCE.md.
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+# Project website: http://blond.web.cern.ch/
+
+"""
+Unittest for the ensemble beam (realisations tracked together)
+
+"""
+
+import unittest
+import numpy as np
+
+from blond.input_parameters.ring import Ring
+from blond.input_parameters.rf_parameters import RFStation
+from blond.beam.beam import Beam, Proton
+from blond.beam.distributions import bigaussian
+from blond.beam.profile import Profile, CutOptions, OtherSlicesOptions
+from blond.impedances.impedance import InducedVoltageFreq, \
+    InducedVoltageResonator, InductiveImpedance, TotalInducedVoltage
+from blond.impedances.impedance_sources import Resonators
+from blond.trackers.tracker import RingAndRFTracker
+
+
+class TestEnsemble(unittest.TestCase):
+
+    def setUp(self):
+
+        self.n_realisations = 3
+        self.ring = Ring(6911.56, 1/18**2, 25.92e9, Proton(), 10)
+
+    def beams(self):
+
+        beams = []
+        for k in range(self.n_realisations):
+            beam = Beam(self.ring, 5000, 1e11)
+            bigaussian(self.ring, self.rf_station, beam, 1e-9, seed=k + 1)
+            beams.append(beam)
+        return beams
+
+    def track_map(self, beam, rf_station):
+
+        profile = Profile(beam, CutOptions(
+            cut_left=0, cut_right=2*np.pi/rf_station.omega_rf[0, 0],
+            n_slices=64))
+        induced_voltage = TotalInducedVoltage(beam, profile, [
+            InducedVoltageFreq(beam, profile, [Resonators(5e6, 1e9, 5)],
+                               frequency_resolution=2e6)])
+        tracker = RingAndRFTracker(rf_station, beam, interpolation=True,
+                                   Profile=profile,
+                                   TotalInducedVoltage=induced_voltage)
+        return profile, induced_voltage, tracker
+
+    def test_tracking(self):
+
+        # Each realisation tracked alone and in the ensemble, with its own
+        # profile and induced voltage
+        self.rf_station = RFStation(self.ring, [4620], [0.9e6], [0])
+        beams = self.beams()
+        ensemble = Beam.from_realisations(beams)
+        self.assertEqual(ensemble.dt.shape, (self.n_realisations, 5000))
+
+        maps = []
+        for beam in beams:
+            maps.append(self.track_map(
+                beam, RFStation(self.ring, [4620], [0.9e6], [0])))
+        profile, induced_voltage, tracker = self.track_map(
+            ensemble, self.rf_station)
+
+        for turn in range(self.ring.n_turns):
+            for track_map in maps + [(profile, induced_voltage, tracker)]:
+                track_map[0].track()
+                track_map[1].induced_voltage_sum()
+                track_map[2].track()
+
+        self.assertEqual(induced_voltage.induced_voltage.shape,
+                         (self.n_realisations, 64))
+        for k in range(self.n_realisations):
+            np.testing.assert_array_equal(profile.n_macroparticles[k],
+                                          maps[k][0].n_macroparticles)
+            np.testing.assert_array_equal(induced_voltage.induced_voltage[k],
+                                          maps[k][1].induced_voltage)
+            np.testing.assert_array_equal(ensemble.dt[k], beams[k].dt)
+            np.testing.assert_array_equal(ensemble.dE[k], beams[k].dE)
+
+    def test_statistics(self):
+
+        self.rf_station = RFStation(self.ring, [4620], [0.9e6], [0])
+        beams = self.beams()
+        beams[1].losses_longitudinal_cut(0, 2.5e-9)
+        ensemble = Beam.from_realisations(beams)
+        ensemble.statistics()
+
+        for k, beam in enumerate(beams):
+            beam.statistics()
+            self.assertEqual(ensemble.n_macroparticles_lost[k],
+                             beam.n_macroparticles_lost)
+            for name in ['mean_dt', 'sigma_dt', 'mean_dE', 'sigma_dE']:
+                self.assertAlmostEqual(getattr(ensemble, name)[k],
+                                       getattr(beam, name),
+                                       delta=1e-12*abs(getattr(beam, name)))
+        self.assertGreater(ensemble.n_macroparticles_lost[1], 0)
+
+        ensemble.losses_energy_cut(-1e6, 1e6)
+        self.assertTrue(np.all(ensemble.n_macroparticles_alive <
+                               ensemble.n_macroparticles))
+
+    def test_errors(self):
+
+        self.rf_station = RFStation(self.ring, [4620], [0.9e6], [0])
+        beams = self.beams()
+        beams[0] = Beam(self.ring, 1000, 1e11)
+        with self.assertRaises(RuntimeError):
+            Beam.from_realisations(beams)
+
+        ensemble = Beam(self.ring, 1000, 1e11,
+                        n_realisations=self.n_realisations)
+        with self.assertRaises(RuntimeError):
+            Profile(ensemble, OtherSlicesOptions=OtherSlicesOptions(
+                smooth=True))
+        with self.assertRaises(RuntimeError):
+            RingAndRFTracker(self.rf_station, ensemble, periodicity=True)
+
+        profile = Profile(ensemble, CutOptions(cut_left=0, cut_right=2.5e-9,
+                                               n_slices=64))
+        with self.assertRaises(RuntimeError):
+            InducedVoltageResonator(ensemble, profile,
+                                    Resonators(5e6, 1e9, 5))
+        with self.assertRaises(RuntimeError):
+            InductiveImpedance(ensemble, profile, np.ones(11),
+                               self.rf_station)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -16,9 +16,15 @@ Unittest for impedances.impedance
 import unittest
 import numpy as np
 
-from blond.beam.profile import Profile, CutOptions
-from blond.impedances.impedance import InducedVoltageFreq, InducedVoltageTime
-from blond.impedances.impedance_sources import Resonators
+from blond.beam.profile import Profile, CutOptions, BunchFollowingOptions
+from blond.impedances.impedance import InducedVoltageFreq, \
+    InducedVoltageTime, TotalInducedVoltage
+from blond.input_parameters.ring import Ring
+from blond.input_parameters.rf_parameters import RFStation
+from blond.beam.beam import Beam, Proton
+from blond.beam.distributions import bigaussian
+from blond.impedances.impedance_sources import Resonators, \
+    TravelingWaveCavity, InputTable, ResistiveWall
 
 class TestInducedVoltageFreq(unittest.TestCase):
 
@@ -120,6 +126,233 @@ class TestInducedVoltageTime(unittest.TestCase):
         np.testing.assert_allclose(test_object.wake_length_input, 11e-9)
 
 
+class TestImpedanceSources(unittest.TestCase):
+
+    def setUp(self):
+
+        self.time = np.linspace(0, 20e-9, 2001)
+        # Frequencies not exactly at the resonances
+        self.frequency = np.linspace(0, 3e9, 3001) + 0.1
+        self.frequency[0] = 0
+
+    def test_resonators(self):
+
+        R_S = [1e5, 2e4, 3e3]
+        frequency_R = [200e6, 800e6, 1.5e9]
+        Q = [100, 3, 1e4]
+        resonators = Resonators(R_S, frequency_R, Q)
+
+        wake = np.zeros_like(self.time)
+        impedance = np.zeros(len(self.frequency), dtype=complex)
+        for i in range(3):
+            omega_R = 2*np.pi*frequency_R[i]
+            alpha = omega_R / (2*Q[i])
+            omega_bar = np.sqrt(omega_R**2 - alpha**2)
+            wake += ((np.sign(self.time) + 1) * R_S[i] * alpha
+                     * np.exp(-alpha*self.time)
+                     * (np.cos(omega_bar*self.time) - alpha/omega_bar
+                        * np.sin(omega_bar*self.time)))
+            impedance[1:] += R_S[i] / (1 + 1j*Q[i] *
+                                       (self.frequency[1:]/frequency_R[i] -
+                                        frequency_R[i]/self.frequency[1:]))
+
+        resonators.wake_calc(self.time)
+        np.testing.assert_allclose(resonators.wake, wake, rtol=0,
+                                   atol=1e-13*np.max(np.abs(wake)))
+
+        # Caller-provided output arrays
+        output = np.empty(len(self.frequency), dtype=complex)
+        for imped_calc in [resonators._imped_calc_cpp,
+                           resonators._imped_calc_python]:
+            imped_calc(self.frequency, impedance=output)
+            self.assertIs(resonators.impedance, output)
+            np.testing.assert_allclose(resonators.impedance, impedance,
+                                       rtol=1e-12)
+
+    def test_travelling_wave_cavity(self):
+
+        R_S = [2.7e4, 1.7e4]
+        frequency_R = [200.1e6, 199.9e6]
+        a_factor = [6.2e-7, 4.6e-7]
+        twc = TravelingWaveCavity(R_S, frequency_R, a_factor)
+
+        wake = np.zeros_like(self.time)
+        impedance = np.zeros(len(self.frequency), dtype=complex)
+        for i in range(2):
+            a_tilde = a_factor[i] / (2*np.pi)
+            indexes = self.time <= a_tilde
+            wake[indexes] += ((np.sign(self.time[indexes]) + 1) * 2
+                              * R_S[i] / a_tilde
+                              * (1 - self.time[indexes] / a_tilde)
+                              * np.cos(2*np.pi*frequency_R[i]
+                                       * self.time[indexes]))
+            for sign in [-1, 1]:
+                x = a_factor[i] * (self.frequency + sign*frequency_R[i])
+                impedance += R_S[i] * ((np.sin(x/2) / (x/2))**2
+                                       - 2j*(x - np.sin(x)) / x**2)
+
+        twc.wake_calc(self.time)
+        np.testing.assert_allclose(twc.wake, wake, rtol=0,
+                                   atol=1e-13*np.max(np.abs(wake)))
+        twc.imped_calc(self.frequency)
+        np.testing.assert_allclose(twc.impedance, impedance, rtol=0,
+                                   atol=1e-12*np.max(np.abs(impedance)))
+
+        # Finite impedance at the resonant frequency
+        twc.imped_calc(np.array(frequency_R))
+        self.assertTrue(np.all(np.isfinite(twc.impedance)))
+        self.assertAlmostEqual(twc.impedance[0].real / np.sum(R_S), 1,
+                               delta=0.1)
+
+    def test_sum_output_arrays(self):
+
+        # The sums overwrite the arrays of the sources computed previously
+        profile = Profile(None, CutOptions=CutOptions(cut_left=0,
+                                                      cut_right=5e-9,
+                                                      n_slices=16))
+        resonators = Resonators([1e5, 2e4], [200e6, 800e6], [100, 3])
+        impedance_table = InputTable(self.frequency, self.frequency*1e-6,
+                                     self.frequency*2e-6)
+        resistive_wall = ResistiveWall(6.9e-3, 1, 1.7e-8)
+        wake_table = InputTable(self.time, np.exp(-self.time/1e-9))
+
+        induced_voltage_freq = InducedVoltageFreq(
+            None, profile, [resonators, impedance_table, resistive_wall])
+        induced_voltage_time = InducedVoltageTime(
+            None, profile, [resonators, wake_table], wake_length=10e-9)
+        total_impedance = induced_voltage_freq.total_impedance
+        total_wake = induced_voltage_time.total_wake
+        impedances = [source.impedance for source in
+                      induced_voltage_freq.impedance_source_list]
+        wakes = [source.wake for source in
+                 induced_voltage_time.wake_source_list]
+
+        induced_voltage_freq.sum_impedances(induced_voltage_freq.freq)
+        induced_voltage_time.sum_wakes(induced_voltage_time.time)
+        for source, impedance in zip(
+                induced_voltage_freq.impedance_source_list, impedances):
+            self.assertIs(source.impedance, impedance)
+        for source, wake in zip(induced_voltage_time.wake_source_list,
+                                wakes):
+            self.assertIs(source.wake, wake)
+        np.testing.assert_allclose(induced_voltage_freq.total_impedance,
+                                   total_impedance, rtol=1e-15)
+        np.testing.assert_allclose(induced_voltage_time.total_wake,
+                                   total_wake, rtol=1e-15)
+
+
+class TestTotalInducedVoltageCache(unittest.TestCase):
+
+    def setUp(self):
+
+        ring = Ring(6911.56, 1/18**2, 25.92e9, Proton(), 10)
+        rf_station = RFStation(ring, [4620], [0.9e6], [0])
+        self.beam = Beam(ring, 10000, 1e11)
+        bigaussian(ring, rf_station, self.beam, 1e-9, seed=1)
+        self.resonators = Resonators([1e5, 2e4], [200e6, 800e6], [100, 3])
+
+    def total_induced_voltage(self, cache_size):
+
+        cut_options = CutOptions(cut_left=-3e-9, cut_right=3e-9,
+                                 n_slices=100)
+        profile = Profile(self.beam, CutOptions=cut_options)
+        induced_voltage_list = [
+            InducedVoltageFreq(self.beam, profile, [self.resonators],
+                               frequency_resolution=20e6),
+            InducedVoltageTime(self.beam, profile, [self.resonators],
+                               wake_length=20e-9)]
+
+        return TotalInducedVoltage(self.beam, profile, induced_voltage_list,
+                                   cache_size=cache_size)
+
+    def reslice(self, total_induced_voltage, cut_left, cut_right, n_slices):
+
+        profile = total_induced_voltage.profile
+        profile.cut_options.cut_left = cut_left
+        profile.cut_options.cut_right = cut_right
+        profile.cut_options.n_slices = n_slices
+        profile.cut_options.set_cuts()
+        profile.set_slices_parameters()
+        profile.n_macroparticles = np.zeros(n_slices)
+        total_induced_voltage.reprocess()
+        profile.track()
+        total_induced_voltage.induced_voltage_sum()
+
+    def test_cache(self):
+
+        reference = self.total_induced_voltage(0)
+        cached = self.total_induced_voltage(2)
+        frequency_object = cached.induced_voltage_list[0]
+        time_object = cached.induced_voltage_list[1]
+
+        slicings = [(-3e-9, 3e-9, 100), (-2.9e-9, 3.1e-9, 100),
+                    (-3e-9, 3e-9, 200), (-3e-9, 3e-9, 100),
+                    (-3e-9, 3e-9, 150), (-3e-9, 3e-9, 200)]
+        impedances = []
+        for slicing in slicings:
+            self.reslice(reference, *slicing)
+            self.reslice(cached, *slicing)
+            impedances.append(time_object.total_impedance)
+            self.assertFalse(cached.reprocess_pending)
+            np.testing.assert_allclose(
+                cached.induced_voltage, reference.induced_voltage, rtol=0,
+                atol=1e-12*np.max(np.abs(reference.induced_voltage)))
+            np.testing.assert_allclose(
+                frequency_object.total_impedance,
+                reference.induced_voltage_list[0].total_impedance,
+                rtol=1e-12)
+
+        # Frame shift and return to a cached slicing: no recomputation
+        self.assertIs(impedances[1], impedances[0])
+        self.assertIs(impedances[3], impedances[0])
+        # Slicing with 200 bins evicted by the 150 bins one
+        self.assertIsNot(impedances[5], impedances[2])
+        self.assertEqual(len(time_object.process_cache), 2)
+
+        # Lazy reprocess
+        cached.reprocess()
+        self.assertTrue(cached.reprocess_pending)
+
+        cached.clear_cache()
+        self.assertEqual(len(time_object.process_cache), 0)
+
+    def test_bunch_following(self):
+
+        profile = Profile(self.beam, CutOptions=CutOptions(n_slices=64,
+                                                           n_sigma=10),
+                          BunchFollowingOptions=BunchFollowingOptions())
+        total_induced_voltage = TotalInducedVoltage(
+            self.beam, profile,
+            [InducedVoltageFreq(self.beam, profile, [self.resonators],
+                                frequency_resolution=20e6)], cache_size=4)
+
+        position = np.mean(self.beam.dt)
+        for turn in range(12):
+            self.beam.dt = position + (self.beam.dt - position)*0.9
+            profile.track()
+            self.assertEqual(total_induced_voltage.reprocess_pending,
+                             profile.frame_changed)
+            total_induced_voltage.induced_voltage_sum()
+
+            # Reference in a fixed frame
+            reference_profile = Profile(self.beam, CutOptions=CutOptions(
+                profile.cut_left, profile.cut_right, 64))
+            reference_profile.track()
+            reference = TotalInducedVoltage(
+                self.beam, reference_profile,
+                [InducedVoltageFreq(self.beam, reference_profile,
+                                    [self.resonators],
+                                    frequency_resolution=20e6)])
+            reference.induced_voltage_sum()
+
+            np.testing.assert_allclose(
+                total_induced_voltage.induced_voltage,
+                reference.induced_voltage, rtol=0,
+                atol=1e-10*np.max(np.abs(reference.induced_voltage)))
+            self.assertIs(total_induced_voltage.time_array,
+                          profile.bin_centers)
+
+
 if __name__ == '__main__':
 
     unittest.main()
@@ -0,0 +1,146 @@
+# coding: utf8
+# Copyright 2014-2017 CERN. This software is distributed under the
+# terms of the GNU General Public Licence version 3 (GPL Version 3),
+# copied verbatim in the file LICENCE.md.
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+# Project website: http://blond.web.cern.ch/
+
+"""
+Unittest for impedances.music
+
+"""
+
+import unittest
+import numpy as np
+
+from blond.utils import bmath as bm
+from blond.input_parameters.ring import Ring
+from blond.input_parameters.rf_parameters import RFStation
+from blond.beam.beam import Beam, Proton
+from blond.beam.distributions import bigaussian
+from blond.impedances.music import Music
+from blond.impedances.impedance_sources import Resonators
+
+
+class TestMusic(unittest.TestCase):
+
+    def setUp(self):
+
+        self.n_macroparticles = 20000
+        self.intensity = 1e11
+        self.ring = Ring(6911.56, 1/18**2, 25.92e9, Proton(), 10)
+        self.rf_station = RFStation(self.ring, [4620], [0.9e6], [0])
+        self.resonator = [1e6, 2*np.pi*1e9, 10]
+
+        # Several chunks in the parallel prefix scan, also on one core
+        self.addCleanup(bm.set_num_threads, bm.get_num_threads())
+        bm.set_num_threads(4)
+
+    def music(self, parallel):
+
+        beam = Beam(self.ring, self.n_macroparticles, self.intensity)
+        bigaussian(self.ring, self.rf_station, beam, 1e-9, seed=1)
+
+        return Music(beam, self.resonator, self.n_macroparticles,
+                     self.intensity, self.ring.t_rev[0], parallel=parallel)
+
+    def test_parallel(self):
+
+        music = self.music(False)
+        music_parallel = self.music(True)
+
+        for turn in range(3):
+            if turn == 0:
+                music.track_cpp()
+                music_parallel.track_cpp()
+            else:
+                # Small displacement keeping the particles nearly sorted
+                for m in [music, music_parallel]:
+                    m.beam.dt += 1e-12*np.sin(1e-6*m.beam.dE + turn)
+                music.track_cpp_multi_turn()
+                music_parallel.track_cpp_multi_turn()
+
+            np.testing.assert_allclose(music_parallel.beam.dt,
+                                       music.beam.dt, rtol=1e-14)
+            np.testing.assert_allclose(
+                music_parallel.induced_voltage, music.induced_voltage,
+                rtol=0, atol=1e-10*np.max(np.abs(music.induced_voltage)))
+            np.testing.assert_allclose(
+                music_parallel.beam.dE, music.beam.dE,
+                rtol=0, atol=1e-12*np.max(np.abs(music.beam.dE)))
+            np.testing.assert_allclose(music_parallel.array_parameters,
+                                       music.array_parameters, rtol=1e-10)
+
+    def test_python(self):
+
+        self.n_macroparticles = 2000
+        music = self.music(False)
+        music_parallel = self.music(True)
+
+        music.track_py()
+        music_parallel.track_cpp()
+
+        np.testing.assert_allclose(
+            music_parallel.induced_voltage, music.induced_voltage,
+            rtol=0, atol=1e-10*np.max(np.abs(music.induced_voltage)))
+        np.testing.assert_allclose(
+            music_parallel.beam.dE, music.beam.dE,
+            rtol=0, atol=1e-12*np.max(np.abs(music.beam.dE)))
+
+
+    def test_resonators(self):
+
+        resonators = Resonators([1e6, 2e5, 5e5], [1e9, 0.2e9, 1.5e9],
+                                [10, 100, 3])
+
+        for parallel in [False, True]:
+            self.resonator = resonators
+            music = self.music(parallel)
+
+            # One Music object per resonator, acting on the same beam
+            music_modes = []
+            for mode in range(resonators.n_resonators):
+                self.resonator = [resonators.R_S[mode],
+                                  resonators.omega_R[mode],
+                                  resonators.Q[mode]]
+                music_modes.append(self.music(parallel))
+                music_modes[-1].beam = music_modes[0].beam
+            beam_modes = music_modes[0].beam
+
+            for turn in range(3):
+                if turn > 0:
+                    for beam in [music.beam, beam_modes]:
+                        beam.dt += 1e-12*np.sin(1e-6*beam.dE + turn)
+                induced_voltage = 0
+                for m in [music] + music_modes:
+                    if turn == 0:
+                        m.track_cpp()
+                    else:
+                        m.track_cpp_multi_turn()
+                    if m is not music:
+                        induced_voltage += m.induced_voltage
+
+                np.testing.assert_allclose(
+                    music.induced_voltage, induced_voltage, rtol=0,
+                    atol=1e-10*np.max(np.abs(induced_voltage)))
+                np.testing.assert_allclose(
+                    music.beam.dE, beam_modes.dE, rtol=0,
+                    atol=1e-10*np.max(np.abs(beam_modes.dE)))
+
+        # Python reference
+        self.n_macroparticles = 2000
+        self.resonator = resonators
+        music = self.music(False)
+        music_python = self.music(False)
+        music.track_cpp()
+        music_python.track_py()
+        np.testing.assert_allclose(
+            music.induced_voltage, music_python.induced_voltage, rtol=0,
+            atol=1e-10*np.max(np.abs(music_python.induced_voltage)))
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -15,6 +15,7 @@ Test preprocess.py
 import sys
 import unittest
 import numpy as np
+from scipy.constants import c
 
 from blond.input_parameters.ring_options import RingOptions
 
@@ -81,6 +82,62 @@ class test_preprocess(unittest.TestCase):
 
             RingOptions(sampling=0)
 
+    def test_linear_same_as_turn_by_turn(self):
+        mass = 938.272e6
+        circumference = 6911.5
+        time = np.array([0, 0.01, 0.02, 0.05, 0.06])
+        momentum = np.array([26e9, 26e9, 40e9, 120e9, 120e9])
+
+        time_interp, momentum_interp = RingOptions(
+            interpolation='linear', flat_bottom=5).preprocess(
+                mass, circumference, time, momentum)
+
+        # Reference: turn by turn recursion
+        beta = np.sqrt(1/(1 + (mass/momentum[0])**2))
+        time_ref = [time[0] + circumference/(beta*c)]
+        momentum_ref = []
+        while time_ref[-1] <= time[-1]:
+            k = np.searchsorted(time, time_ref[-1])
+            momentum_ref.append(momentum[k-1] + (momentum[k] -
+                                momentum[k-1]) * (time_ref[-1] - time[k-1])
+                                / (time[k] - time[k-1]))
+            beta = np.sqrt(1/(1 + (mass/momentum_ref[-1])**2))
+            time_ref.append(time_ref[-1] + circumference/(beta*c))
+
+        self.assertEqual(len(time_interp), len(momentum_interp))
+        self.assertEqual(len(momentum_interp), 6 + len(momentum_ref))
+        np.testing.assert_array_equal(momentum_interp[6:], momentum_ref)
+        np.testing.assert_array_equal(time_interp[6:], time_ref[:-1])
+
+    def test_derivative_same_as_turn_by_turn(self):
+        mass = 938.272e6
+        circumference = 6911.5
+        time = np.linspace(0, 0.05, 20)
+        momentum = 26e9 + 20e9*np.sin(np.pi*time/0.1)**2
+
+        time_interp, momentum_interp = RingOptions(
+            interpolation='derivative').preprocess(
+                mass, circumference, time, momentum)
+
+        # Reference: turn by turn recursion
+        momentum_derivative = np.gradient(momentum)/np.gradient(time)
+        beta = np.sqrt(1/(1 + (mass/momentum[0])**2))
+        time_ref = [time[0], time[0] + circumference/(beta*c)]
+        momentum_ref = [momentum[0]]
+        while time_ref[-2] <= time[-1]:
+            momentum_ref.append(momentum_ref[-1] + (time_ref[-1] -
+                                time_ref[-2]) * np.interp(
+                                    time_ref[-1], time, momentum_derivative))
+            beta = np.sqrt(1/(1 + (mass/momentum_ref[-1])**2))
+            time_ref.append(time_ref[-1] + circumference/(beta*c))
+        momentum_ref = np.array(momentum_ref)
+        momentum_ref = (momentum_ref - momentum_ref[0]) / \
+            (momentum_ref[-1] - momentum_ref[0]) * \
+            (momentum[-1] - momentum[0]) + momentum[0]
+
+        np.testing.assert_array_equal(time_interp, time_ref[:-1])
+        np.testing.assert_allclose(momentum_interp, momentum_ref, rtol=1e-14)
+
 
 if __name__ == '__main__':
 
@@ -0,0 +1,112 @@
+# coding: utf8
+# Copyright 2014-2017 CERN. This software is distributed under the
+# terms of the GNU General Public Licence version 3 (GPL Version 3),
+# copied verbatim in the file LICENCE.md.
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+# Project website: http://blond.web.cern.ch/
+
+'''
+Test program_storage.py
+
+'''
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+from blond.beam.beam import Proton
+from blond.input_parameters.ring import Ring
+from blond.input_parameters.ring_options import RingOptions
+from blond.input_parameters.rf_parameters import RFStation
+from blond.input_parameters.program_storage import ProgramStorage
+
+
+class TestProgramStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def build(self, RingOptions):
+        time = np.linspace(0, 0.02, 10)
+        momentum = 26e9 + 1e12*time
+        ring = Ring(6911.5038, 1/18**2, (time, momentum), Proton(),
+                    alpha_1=1e-4, RingOptions=RingOptions)
+        rf_station = RFStation(ring, [4620, 9240], [4.5e6, 0.45e6],
+                               [0, np.pi], n_rf=2)
+        return ring, rf_station
+
+    def test_n_turns_chunk_exception(self):
+        with self.assertRaises(RuntimeError):
+            ProgramStorage(n_turns_chunk=0)
+
+    def test_in_memory_by_default(self):
+        ring, rf_station = self.build(RingOptions())
+
+        self.assertFalse(ring.program_storage.memory_mapped)
+        self.assertNotIsInstance(rf_station.voltage, np.memmap)
+
+    def test_memory_mapped_same_programs(self):
+        storage = ProgramStorage(self.directory, n_turns_chunk=300)
+        ring_ref, rf_station_ref = self.build(RingOptions())
+        ring, rf_station = self.build(RingOptions(program_storage=storage))
+
+        self.assertIsInstance(rf_station.voltage, np.memmap)
+        self.assertEqual(ring.n_turns, ring_ref.n_turns)
+        self.assertGreater(ring.n_turns, 800)
+        for name in ['momentum', 'beta', 'gamma', 'energy', 'delta_E',
+                     't_rev', 'cycle_time', 'omega_rev', 'eta_0', 'eta_1',
+                     'eta_2']:
+            np.testing.assert_array_equal(getattr(ring, name),
+                                          getattr(ring_ref, name))
+        for name in ['harmonic', 'voltage', 'phi_rf', 'omega_rf', 't_rf',
+                     'phi_s', 'Q_s', 'omega_s0', 'eta_1']:
+            np.testing.assert_array_equal(getattr(rf_station, name),
+                                          getattr(rf_station_ref, name))
+
+        # Programs are in the directory, and can be changed in place
+        self.assertTrue(all(os.path.dirname(filename) == self.directory
+                            for filename in storage.filenames))
+        rf_station.omega_rf[:, 10] += 1.
+        np.testing.assert_array_equal(rf_station.omega_rf[:, 10],
+                                      rf_station_ref.omega_rf[:, 10] + 1.)
+        np.testing.assert_array_equal(rf_station.omega_rf_d,
+                                      rf_station_ref.omega_rf_d)
+
+    def test_compute_by_chunks(self):
+        storage = ProgramStorage(self.directory, n_turns_chunk=7)
+        programs = np.random.rand(3, 50)
+
+        derived = storage.compute('derived', lambda x, y: x * y + 1,
+                                  programs, programs[0])
+
+        np.testing.assert_array_equal(derived, programs * programs[0] + 1)
+        np.testing.assert_array_equal(
+            np.load(storage.filenames[-1]), derived)
+
+    def test_files_removed(self):
+        with ProgramStorage(self.directory) as storage:
+            ring, rf_station = self.build(RingOptions(program_storage=storage))
+            filenames = list(storage.filenames)
+            self.assertGreater(len(filenames), 20)
+            self.assertTrue(all(os.path.isfile(filename)
+                                for filename in filenames))
+        self.assertEqual(os.listdir(self.directory), [])
+
+        # Also when the storage is garbage collected
+        storage = ProgramStorage(self.directory)
+        storage.empty('program', (2, 10))
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+        del storage
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+if __name__ == '__main__':
+
+    unittest.main()
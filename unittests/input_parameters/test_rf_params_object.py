@@ -22,7 +22,9 @@ import numpy
 # BLonD imports
 # --------------
 from blond.input_parameters.ring import Ring
-from blond.input_parameters.rf_parameters import RFStation
+from scipy.integrate import cumtrapz
+from blond.input_parameters import rf_parameters
+from blond.input_parameters.rf_parameters import RFStation, calculate_phi_s
 from blond.beam.beam import Beam, Proton
 from blond.llrf.rf_modulation import PhaseModulation as PMod
 #from beam.distributions import matched_from_distribution_function
@@ -218,8 +220,53 @@ class testRFParamClass(unittest.TestCase):
 
     def test_rf_parameters_calculate_phi_s(self):
 
-        # To be written
-        pass
+        n_turns = 50
+        momentum = numpy.linspace(450e9, 450.1e9, n_turns+1)
+        ring = Ring(6911.5038, 1./17.95142852**2, momentum, Proton(),
+                    n_turns)
+        ones = numpy.ones(n_turns+1)
+        rf_params = RFStation(
+            ring, [4620, 9240],
+            numpy.array([7e6*ones, numpy.linspace(0, 3e6, n_turns+1)]),
+            numpy.array([0*ones, numpy.linspace(0, numpy.pi, n_turns+1)]),
+            n_rf=2)
+
+        # Reference from the potential well turn by turn
+        reference = numpy.zeros(n_turns)
+        for turn in range(n_turns):
+            phase = numpy.linspace(-rf_params.phi_rf[0, turn+1],
+                                   -rf_params.phi_rf[0, turn+1] + 2*numpy.pi,
+                                   1000)
+            voltage = 0
+            for i in range(2):
+                voltage += rf_params.voltage[i, turn+1] * numpy.sin(
+                    rf_params.harmonic[i, turn+1]/4620*phase +
+                    rf_params.phi_rf[i, turn+1])
+            well = - cumtrapz(voltage - rf_params.delta_E[turn],
+                              dx=phase[1]-phase[0], initial=0)
+            reference[turn] = numpy.mean(phase[well == numpy.min(well)])
+        reference = (numpy.insert(reference, 0, reference[0]) +
+                     rf_params.phi_rf[0, :]) % (2*numpy.pi)
+
+        block = rf_parameters.phi_s_n_turns_block
+        try:
+            rf_parameters.phi_s_n_turns_block = 7
+            rf_parameters._phi_s_cache.clear()
+            phi_s = calculate_phi_s(rf_params, accelerating_systems='all')
+        finally:
+            rf_parameters.phi_s_n_turns_block = block
+        numpy.testing.assert_array_equal(phi_s, reference)
+
+        # Cached for the same RF program only
+        phi_s[:] = 0
+        numpy.testing.assert_array_equal(
+            calculate_phi_s(rf_params, accelerating_systems='all'), reference)
+        self.assertEqual(len(rf_parameters._phi_s_cache), 1)
+        rf_params.voltage[1] *= 2
+        self.assertFalse(numpy.array_equal(
+            calculate_phi_s(rf_params, accelerating_systems='all'),
+            reference))
+        self.assertEqual(len(rf_parameters._phi_s_cache), 2)
 
 
 if __name__ == '__main__':
@@ -171,6 +171,147 @@ class TestBeamFeedback(unittest.TestCase):
                                    rtol=rtol, atol=atol,
                                    err_msg='In TestBeamFeedback test_SPS_RL: difference between simulated and analytic result different than expected')
 
+    def test_particle_phase_detector(self):
+
+        n_turns = 20
+        configuration = {'machine': 'LHC', 'PL_gain': 1000}
+        beam_particles = Beam(self.ring, self.beam.n_macroparticles,
+                              self.beam.intensity)
+        beam_particles.dt[:] = self.beam.dt
+        beam_particles.dE[:] = self.beam.dE
+        rf_particles = RFStation(self.ring, 4620, 4.5e6, 0)
+
+        # Phase detector on the profile
+        phase_loop = BeamFeedback(self.ring, self.rf_station, self.profile,
+                                  configuration)
+        tracker = RingAndRFTracker(self.rf_station, self.beam,
+                                   Profile=self.profile,
+                                   BeamFeedback=phase_loop)
+
+        # Phase detector on the particles, fused with the kick, no profile
+        configuration = dict(configuration, phase_detector='particles')
+        phase_loop_particles = BeamFeedback(self.ring, rf_particles, None,
+                                            configuration,
+                                            Beam=beam_particles)
+        tracker_particles = RingAndRFTracker(rf_particles, beam_particles,
+                                             BeamFeedback=phase_loop_particles)
+
+        for turn in range(n_turns):
+            self.profile.track()
+            tracker.track()
+
+            # Same measurement without fusion, before the kick
+            phase_loop_particles.beam_phase()
+            phi_beam = phase_loop_particles.phi_beam
+            phase_loop_particles.phase_coefficients = None
+
+            tracker_particles.track()
+            self.assertAlmostEqual(phase_loop_particles.phi_beam, phi_beam,
+                                   places=10, msg='In TestBeamFeedback ' +
+                                   'test_particle_phase_detector: fused ' +
+                                   'phase detector differs')
+            self.assertAlmostEqual(phase_loop_particles.phi_beam,
+                                   phase_loop.phi_beam, delta=1e-3,
+                                   msg='In TestBeamFeedback ' +
+                                   'test_particle_phase_detector: beam ' +
+                                   'phase differs from profile')
+
+        np.testing.assert_allclose(rf_particles.omega_rf[0, :n_turns + 1],
+                                   self.rf_station.omega_rf[0, :n_turns + 1],
+                                   rtol=1e-9, atol=0)
+
+        with self.assertRaises(RuntimeError):
+            BeamFeedback(self.ring, rf_particles, None,
+                         {'machine': 'LHC', 'PL_gain': 1000})
+        with self.assertRaises(RuntimeError):
+            BeamFeedback(self.ring, rf_particles, self.profile,
+                         {'machine': 'LHC', 'PL_gain': 1000,
+                          'phase_detector': 'bins'})
+
+
+    def test_phase_engine(self):
+
+        self.profile.track()
+        bin_centers = self.profile.bin_centers
+        profile = self.profile.n_macroparticles
+        omega_rf = self.rf_station.omega_rf[0, 0]
+        phi_rf = 0.3
+
+        for configuration in [{}, {'window_coefficient': -1e9},
+                              {'window_coefficient': -1e9,
+                               'time_offset': 0.5e-9},
+                              {'machine': 'SPS_F',
+                               'window_coefficient': -1/3e-9,
+                               'time_offset': 2e-9}]:
+            configuration = dict(configuration, PL_gain=1000)
+            phase_loop = BeamFeedback(self.ring, self.rf_station,
+                                      self.profile, configuration)
+            alpha, time_offset, time_min, time_max = \
+                phase_loop.phase_window(omega_rf)
+            indexes = (bin_centers >= time_min) * (bin_centers <= time_max)
+            weights = np.exp(alpha*(bin_centers[indexes] - time_offset)) \
+                * profile[indexes]
+            scoeff = np.trapz(weights*np.sin(omega_rf*bin_centers[indexes]
+                                             + phi_rf),
+                              dx=self.profile.bin_size)
+            ccoeff = np.trapz(weights*np.cos(omega_rf*bin_centers[indexes]
+                                             + phi_rf),
+                              dx=self.profile.bin_size)
+
+            np.testing.assert_allclose(
+                phase_loop.phase_engine.coefficients(
+                    omega_rf, phi_rf, alpha, time_offset, time_min,
+                    time_max),
+                [scoeff, ccoeff], rtol=1e-12,
+                err_msg='In TestBeamFeedback test_phase_engine: ' +
+                'coefficients differ for ' + str(configuration))
+
+        # Window weights kept until the profile grid changes
+        window = phase_loop.phase_engine.window
+        phase_loop.phase_engine.coefficients(omega_rf, phi_rf)
+        self.assertIs(phase_loop.phase_engine.window, window)
+        self.profile.bin_centers = self.profile.bin_centers + 1e-12
+        phase_loop.phase_engine.coefficients(omega_rf, phi_rf)
+        self.assertIsNot(phase_loop.phase_engine.window, window)
+
+    def test_particle_phase_detector_SPS_RL(self):
+
+        # The radial loop reads the beam energy before the kick: the
+        # default is the phase detector computed apart from the kick, and
+        # differs from the fused one
+        n_turns = 20
+        configuration = {'machine': 'SPS_RL', 'PL_gain': 1000,
+                         'RL_gain': 1e7, 'phase_detector': 'particles'}
+        beams, rf_stations, trackers = [], [], []
+        for fused in [None, False, True]:
+            beam = Beam(self.ring, self.beam.n_macroparticles,
+                        self.beam.intensity)
+            beam.dt[:] = self.beam.dt
+            beam.dE[:] = self.beam.dE + 1e6
+            rf_station = RFStation(self.ring, 4620, 4.5e6, 0)
+            phase_loop = BeamFeedback(self.ring, rf_station, None,
+                                      configuration, Beam=beam)
+            if fused is None:
+                self.assertFalse(phase_loop.fused_phase_detector)
+            else:
+                phase_loop.fused_phase_detector = fused
+            beams.append(beam)
+            rf_stations.append(rf_station)
+            trackers.append(RingAndRFTracker(rf_station, beam,
+                                             BeamFeedback=phase_loop))
+
+        for turn in range(n_turns):
+            for tracker in trackers:
+                tracker.track()
+
+        np.testing.assert_array_equal(rf_stations[0].omega_rf,
+                                      rf_stations[1].omega_rf)
+        np.testing.assert_array_equal(beams[0].dE, beams[1].dE)
+        np.testing.assert_array_equal(beams[0].dt, beams[1].dt)
+        self.assertFalse(np.allclose(rf_stations[2].omega_rf,
+                                     rf_stations[1].omega_rf, rtol=1e-12,
+                                     atol=0))
+
 
 if __name__ == '__main__':
 
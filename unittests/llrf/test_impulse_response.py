@@ -116,8 +116,41 @@ class TestTravelingWaveCavity(unittest.TestCase):
         TWC_impulse_response.compute_wakes(time)
         wake_impResp = np.around(TWC_impulse_response.W_beam/1e12, 12)
 
-        self.assertListEqual(wake_impSource.tolist(), wake_impResp.tolist(),
-            msg="In TestTravelingWaveCavity test_wake: wake fields differ")
+        # Compiled and numpy evaluations agree to the last rounded digit
+        np.testing.assert_allclose(wake_impSource, wake_impResp, rtol=0,
+            atol=1.1e-12,
+            err_msg="In TestTravelingWaveCavity test_wake: wake fields differ")
+
+    def test_cache(self):
+
+        TWC = SPS4Section200MHzTWC()
+        time = np.linspace(0, 1e-6, 1000)
+        omega_c = 2*np.pi*200.1e6
+
+        TWC.impulse_response_gen(omega_c, time)
+        h_gen = TWC.h_gen
+        TWC.impulse_response_gen(omega_c, np.copy(time))
+        self.assertIs(TWC.h_gen, h_gen,
+            msg="In TestTravelingWaveCavity test_cache: impulse response" +
+            " recomputed for same carrier frequency and time")
+
+        TWC.impulse_response_gen(omega_c + 1e3, time)
+        self.assertIsNot(TWC.h_gen, h_gen,
+            msg="In TestTravelingWaveCavity test_cache: impulse response" +
+            " not recomputed for new carrier frequency")
+
+        TWC.impulse_response_beam(omega_c, time, time[::10])
+        h_beam = TWC.h_beam
+        TWC.impulse_response_beam(omega_c, 2*time, time[::10])
+        self.assertIsNot(TWC.h_beam, h_beam,
+            msg="In TestTravelingWaveCavity test_cache: impulse response" +
+            " not recomputed for new time array")
+
+        reference = SPS4Section200MHzTWC()
+        reference.impulse_response_beam(omega_c, 2*time, time[::10])
+        np.testing.assert_array_equal(TWC.h_beam, reference.h_beam)
+        np.testing.assert_array_equal(TWC.h_beam_coarse,
+                                      reference.h_beam_coarse)
 
     def test_vind(self):
 
@@ -0,0 +1,191 @@
+# coding: utf8
+# Copyright 2014-2017 CERN. This software is distributed under the
+# terms of the GNU General Public Licence version 3 (GPL Version 3),
+# copied verbatim in the file LICENCE.md.
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+# Project website: http://blond.web.cern.ch/
+
+"""
+Unittest for llrf.rf_noise
+
+"""
+
+import unittest
+import threading
+import time
+import numpy as np
+
+from blond.input_parameters.ring import Ring
+from blond.input_parameters.rf_parameters import RFStation
+from blond.beam.beam import Beam, Proton
+from blond.beam.profile import Profile, CutOptions
+from blond.llrf.rf_noise import FlatSpectrum, PhaseNoiseStream, LHCNoiseFB
+from blond.trackers.tracker import RingAndRFTracker
+import blond.toolbox.filters_and_fitting as ffroutines
+
+
+class TestLHCNoiseFB(unittest.TestCase):
+
+    def setUp(self):
+
+        ring = Ring(26658.883, 3.225e-4, 450e9, Proton(), 10)
+        self.rf_station = RFStation(ring, [35640], [6e6], [0])
+        self.t_rf = 2*np.pi / self.rf_station.omega_rf[0, 0]
+
+        beam = Beam(ring, 1000, 1e11)
+        self.profile = Profile(beam, CutOptions=CutOptions(
+            0, 40*self.t_rf, 2000))
+
+        # Gaussian bunches in the buckets of the pattern
+        self.bunch_pattern = np.array([0, 10, 20, 30])
+        self.sigmas = np.array([0.25e-9, 0.3e-9, 0.35e-9, 0.28e-9])
+        positions = (self.bunch_pattern + 0.5) * self.t_rf
+        self.profile.n_macroparticles = np.sum(np.exp(
+            -0.5*((self.profile.bin_centers - positions[:, np.newaxis]) /
+                  self.sigmas[:, np.newaxis])**2), axis=0)
+
+    def test_fwhm_multi_bunch(self):
+
+        noise_feedback = LHCNoiseFB(self.rf_station, self.profile, 1.2e-9,
+                                    bunch_pattern=self.bunch_pattern)
+        noise_feedback.fwhm()
+
+        # Reference from the bunch-by-bunch FWHM in each bucket
+        reference = np.zeros(len(self.bunch_pattern))
+        for i, bucket in enumerate(self.bunch_pattern):
+            indexes = np.where(
+                (self.profile.bin_centers > bucket * self.t_rf) *
+                (self.profile.bin_centers < (bucket + 1) * self.t_rf))[0]
+            reference[i] = ffroutines.fwhm(
+                self.profile.n_macroparticles[indexes],
+                self.profile.bin_centers[indexes])[1]
+
+        np.testing.assert_allclose(noise_feedback.bl_meas_bbb, reference,
+                                   rtol=1e-12)
+        # Linear interpolation of the half maximum on 1/5 sigma bins
+        np.testing.assert_allclose(noise_feedback.bl_meas_bbb,
+                                   4*self.sigmas, rtol=1e-2)
+        self.assertAlmostEqual(noise_feedback.bl_meas,
+                               np.mean(noise_feedback.bl_meas_bbb),
+                               delta=1e-20)
+
+        # Buckets cached as long as the RF and the frame do not change
+        bucket_first = noise_feedback.bucket_first
+        noise_feedback.fwhm()
+        self.assertIs(noise_feedback.bucket_first, bucket_first)
+        self.rf_station.phi_rf[0, 0] = 0.1
+        noise_feedback.fwhm()
+        self.assertIsNot(noise_feedback.bucket_first, bucket_first)
+
+    def test_multibunch_analysis(self):
+
+        n_bunches = 4
+        results = {'fwhm': ffroutines.fwhm_multibunch(
+                       self.profile.n_macroparticles,
+                       self.profile.bin_centers, n_bunches, 10, self.t_rf),
+                   'rms': ffroutines.rms_multibunch(
+                       self.profile.n_macroparticles,
+                       self.profile.bin_centers, n_bunches, 10, self.t_rf)}
+
+        for method, function in [('fwhm', ffroutines.fwhm),
+                                 ('rms', ffroutines.rms)]:
+            for i in range(n_bunches):
+                indexes = np.where(
+                    (self.profile.bin_centers > (10*i - 0.4) * self.t_rf) *
+                    (self.profile.bin_centers < (10*i + 1.4) * self.t_rf))[0]
+                position, length = function(
+                    self.profile.n_macroparticles[indexes],
+                    self.profile.bin_centers[indexes])
+                self.assertAlmostEqual(results[method][0][i], position,
+                                       delta=1e-12*position)
+                self.assertAlmostEqual(results[method][1][i], length,
+                                       delta=1e-12*length)
+
+
+class TestPhaseNoiseStream(unittest.TestCase):
+
+    def setUp(self):
+
+        self.ring = Ring(26658.883, 3.225e-4, 450e9, Proton(), 2500)
+        self.rf_station = RFStation(self.ring, [35640], [6e6], [0])
+        self.parameters = dict(corr_time=1000, initial_amplitude=1e-5,
+                               predistortion='weightfunction')
+
+    def reference(self, initial_final_turns=[0, -1]):
+
+        noise = FlatSpectrum(self.ring, self.rf_station, folder_plots=None,
+                             print_option=False,
+                             initial_final_turns=list(initial_final_turns),
+                             **self.parameters)
+        noise.generate()
+        return noise.dphi
+
+    def test_generate(self):
+
+        for initial_final_turns in [[0, -1], [200, 2301]]:
+            reference = self.reference(initial_final_turns)
+            for background in [False, True]:
+                stream = PhaseNoiseStream(
+                    self.ring, self.rf_station, background=background,
+                    initial_final_turns=initial_final_turns,
+                    **self.parameters)
+                dphi = np.array([stream[:, turn][0] for turn in
+                                 range(self.ring.n_turns + 1)])
+                stream.close()
+                np.testing.assert_array_equal(dphi, reference)
+
+    def test_window(self):
+
+        stream = PhaseNoiseStream(self.ring, self.rf_station,
+                                  n_chunks_kept=2, **self.parameters)
+        self.assertIsNone(stream.dphi)
+        stream[:, 2400]
+        self.assertEqual(len(stream.window), 2)
+        self.assertEqual(stream.window[0][0], 1000)
+        stream[:, 1500]
+        with self.assertRaises(RuntimeError):
+            stream[:, 500]
+
+        stream.reset()
+        self.assertEqual(stream[:, 500][0], self.reference()[500])
+
+    def test_tracking(self):
+
+        reference = self.reference()
+        stream = PhaseNoiseStream(self.ring, self.rf_station,
+                                  background=True, **self.parameters)
+        rf_station = RFStation(self.ring, [35640], [6e6], [0],
+                               phi_noise=stream)
+        self.assertIs(rf_station.phi_noise, stream)
+
+        beam = Beam(self.ring, 100, 1e11)
+        tracker = RingAndRFTracker(rf_station, beam)
+        for turn in range(20):
+            tracker.track()
+        stream.close()
+        np.testing.assert_array_equal(rf_station.phi_rf[0, :20],
+                                      reference[:20])
+
+    def test_close(self):
+
+        # close() returns with chunks still in the queue, and with the end
+        # of the noise waiting for a free place in the queue
+        for turn in [None, 1500]:
+            stream = PhaseNoiseStream(self.ring, self.rf_station,
+                                      background=True, **self.parameters)
+            if turn is not None:
+                stream[:, turn]
+            time.sleep(0.5)
+            closing = threading.Thread(target=stream.close)
+            closing.daemon = True
+            closing.start()
+            closing.join(10)
+            self.assertFalse(closing.is_alive())
+            self.assertIsNone(stream.thread)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
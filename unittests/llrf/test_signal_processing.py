@@ -16,11 +16,15 @@ Unittest for llrf.filters
 import unittest
 import numpy as np
 from scipy.constants import e
+from scipy import signal as sgn
 
 from blond.llrf.signal_processing import moving_average, modulator
 from blond.llrf.signal_processing import polar_to_cartesian, cartesian_to_polar
 from blond.llrf.signal_processing import comb_filter, low_pass_filter
 from blond.llrf.signal_processing import rf_beam_current, feedforward_filter
+from blond.llrf.signal_processing import OverlapSaveConvolution
+from blond.llrf.signal_processing import CombFilter, MovingAverage, \
+    FIRFilter, ACCoupling
 from blond.llrf.signal_processing import feedforward_filter_TWC3, \
     feedforward_filter_TWC4, feedforward_filter_TWC5
 
@@ -512,6 +516,123 @@ class TestMovingAverage(unittest.TestCase):
             msg="In TestMovingAverage, test_3: arrays differ")
 
 
+class TestFilterObjects(unittest.TestCase):
+
+    def setUp(self):
+
+        np.random.seed(1234)
+        self.turns = [np.random.randn(100) + 1j*np.random.randn(100)
+                      for i in range(3)]
+
+    def test_comb(self):
+
+        comb = CombFilter(100, 15/16)
+        y_prev = np.zeros(100, dtype=complex)
+        for x in self.turns:
+            y = comb_filter(y_prev, x, 15/16)
+            expected = np.concatenate((y_prev[-7:], y[:-7]))
+            np.testing.assert_array_equal(comb.process(x, n_delay=7),
+                expected, err_msg="In TestFilterObjects test_comb: output" +
+                " differs from comb_filter")
+            y_prev = y
+
+    def test_moving_average(self):
+
+        moving_av = MovingAverage(8)
+        x_prev = np.zeros(100, dtype=complex)
+        for x in self.turns:
+            np.testing.assert_array_equal(moving_av.process(x),
+                moving_average(x, 8, x_prev=x_prev[-7:]),
+                err_msg="In TestFilterObjects test_moving_average: output" +
+                " differs from moving_average")
+            x_prev = x
+
+    def test_fir(self):
+
+        coeff = np.random.randn(15)
+        signal = np.concatenate(self.turns)
+        expected = np.convolve(signal, coeff)[:len(signal)]
+
+        fir_blocks = FIRFilter(coeff)
+        result = np.concatenate([fir_blocks.process(x) for x in self.turns])
+        np.testing.assert_allclose(result, expected, rtol=0, atol=1e-12,
+            err_msg="In TestFilterObjects test_fir: block-wise output" +
+            " differs from convolution")
+
+        fir_samples = FIRFilter(coeff)
+        result = np.array([fir_samples.process(x) for x in signal])
+        np.testing.assert_allclose(result, expected, rtol=0, atol=1e-12,
+            err_msg="In TestFilterObjects test_fir: sample-wise output" +
+            " differs from convolution")
+
+    def test_ac_coupling(self):
+
+        signal = np.concatenate(self.turns)
+        ac_samples = ACCoupling(25e-9, 110e-6)
+        expected = np.array([ac_samples.process(x) for x in signal])
+
+        y_prev = x_prev = 0
+        for i in range(5):
+            y_prev = (1 - 25e-9/110e-6)*y_prev + signal[i] - x_prev
+            x_prev = signal[i]
+            self.assertEqual(expected[i], y_prev)
+
+        ac_blocks = ACCoupling(25e-9, 110e-6)
+        result = np.concatenate([ac_blocks.process(x) for x in self.turns])
+        np.testing.assert_allclose(result, expected, rtol=0, atol=1e-12,
+            err_msg="In TestFilterObjects test_ac_coupling: block-wise" +
+            " output differs from sample-wise output")
+
+
+class TestOverlapSaveConvolution(unittest.TestCase):
+
+    def setUp(self):
+
+        np.random.seed(1234)
+        self.signal = np.random.randn(1000) + 1j*np.random.randn(1000)
+        self.kernel = np.zeros(1000, dtype=complex)
+        self.kernel[:37] = np.random.randn(37) + 1j*np.random.randn(37)
+
+    def test_1(self):
+
+        expected = sgn.fftconvolve(self.signal, self.kernel)[:1000]
+
+        convolution = OverlapSaveConvolution(self.kernel, 1000)
+        self.assertEqual(convolution.n_kernel, 37,
+            msg="In TestOverlapSaveConvolution test_1: kernel support" +
+            " wrong")
+        self.assertGreater(convolution.n_blocks, 1,
+            msg="In TestOverlapSaveConvolution test_1: expected several" +
+            " blocks")
+        np.testing.assert_allclose(convolution.convolve(self.signal),
+            expected, rtol=0, atol=1e-12,
+            err_msg="In TestOverlapSaveConvolution test_1: convolution" +
+            " differs from fftconvolve")
+
+        # Buffers are reused for the next signal
+        np.testing.assert_allclose(convolution.convolve(self.signal[::-1]),
+            sgn.fftconvolve(self.signal[::-1], self.kernel)[:1000],
+            rtol=0, atol=1e-12,
+            err_msg="In TestOverlapSaveConvolution test_1: second" +
+            " convolution differs from fftconvolve")
+
+    def test_2(self):
+
+        convolution = OverlapSaveConvolution(self.kernel.real, 1000,
+                                             n_fft=64)
+        result = np.zeros(1000, dtype=complex)
+        convolution.convolve(self.signal.real, out=result)
+
+        np.testing.assert_allclose(result,
+            sgn.fftconvolve(self.signal.real, self.kernel.real)[:1000],
+            rtol=0, atol=1e-12,
+            err_msg="In TestOverlapSaveConvolution test_2: convolution" +
+            " differs from fftconvolve")
+        self.assertTrue(convolution.same_kernel(self.kernel.real, 1000))
+        self.assertFalse(convolution.same_kernel(2*self.kernel.real, 1000))
+        self.assertFalse(convolution.same_kernel(self.kernel.real, 999))
+
+
 class TestFeedforwardFilter(unittest.TestCase):
 
     # Run before every test
@@ -0,0 +1,94 @@
+# coding: utf8
+# Copyright 2014-2017 CERN. This software is distributed under the
+# terms of the GNU General Public Licence version 3 (GPL Version 3),
+# copied verbatim in the file LICENCE.md.
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+# Project website: http://blond.web.cern.ch/
+
+"""
+Unittest for toolbox.diffusion
+
+"""
+
+import unittest
+import numpy as np
+import scipy.sparse
+
+from blond.toolbox.diffusion import diffusion_matrices, \
+    CrankNicolsonDiffusion
+
+
+class TestCrankNicolsonDiffusion(unittest.TestCase):
+
+    def setUp(self):
+
+        np.random.seed(1)
+        self.N = 100
+        self.dJ = np.full(self.N, 1./self.N) * \
+            (1 + 0.1*np.random.rand(self.N))
+        self.Dav = 1e3 * (1 + np.random.rand(self.N))
+        self.Jsep = 3.
+        self.dt = 1e-6
+        self.distribution = np.exp(-np.cumsum(self.dJ) / 0.2)
+
+    def dense(self, banded):
+
+        return scipy.sparse.dia_matrix(
+            (banded, [1, 0, -1]), shape=(self.N, self.N)).toarray()
+
+    def test_matrices(self):
+
+        A, B = diffusion_matrices(self.dJ, self.Dav, self.Jsep)
+        A, B = self.dense(A), self.dense(B)
+
+        # Reference construction, row by row
+        dJ, Dav, N = self.dJ, self.Dav, self.N
+        A_ref = np.zeros((N, N))
+        B_ref = np.zeros((N, N))
+        A_ref[0, :2] = [2.*dJ[0], dJ[0]]
+        B_ref[0, :2] = [Dav[0]/dJ[0], -Dav[0]/dJ[0]]
+        for i in range(1, N):
+            A_ref[i, i-1] = dJ[i-1]
+            A_ref[i, i] = 2.*(dJ[i-1] + dJ[i])
+            B_ref[i, i-1] = -Dav[i-1]/dJ[i-1]
+            B_ref[i, i] = Dav[i-1]/dJ[i-1] + Dav[i]/dJ[i]
+            if i < N - 1:
+                A_ref[i, i+1] = dJ[i]
+                B_ref[i, i+1] = -Dav[i]/dJ[i]
+
+        np.testing.assert_allclose(A, A_ref*self.Jsep/6., rtol=1e-15)
+        np.testing.assert_allclose(B, B_ref/self.Jsep, rtol=1e-15)
+
+    def test_methods(self):
+
+        A, B = diffusion_matrices(self.dJ, self.Dav, self.Jsep)
+        M1 = self.dense(A - 0.5*self.dt*B)
+        M2 = self.dense(A + 0.5*self.dt*B)
+        Mtot = np.linalg.solve(M2, M1)
+
+        iterations = 500
+        reference = self.distribution
+        for i in range(iterations):
+            reference = np.dot(Mtot, reference)
+
+        distributions = np.stack((self.distribution, 2*self.distribution),
+                                 axis=1)
+        for method in ['lu', 'squaring', 'eigen']:
+            evolution = CrankNicolsonDiffusion(A, B, self.dt, method=method)
+            np.testing.assert_allclose(
+                evolution.evolve(self.distribution, iterations), reference,
+                rtol=0, atol=1e-10*np.max(reference))
+            # Batch of distributions
+            np.testing.assert_allclose(
+                evolution.evolve(distributions, iterations)[:, 1],
+                2*reference, rtol=0, atol=1e-10*np.max(reference))
+
+        with self.assertRaises(RuntimeError):
+            CrankNicolsonDiffusion(A, B, self.dt, method='dense')
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,131 @@
+# coding: utf8
+# Copyright 2014-2017 CERN. This software is distributed under the
+# terms of the GNU General Public Licence version 3 (GPL Version 3),
+# copied verbatim in the file LICENCE.md.
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+# Project website: http://blond.web.cern.ch/
+
+"""
+Unittest for trackers.utilities.py
+
+"""
+
+import unittest
+import warnings
+import numpy as np
+
+from blond.input_parameters.ring import Ring
+from blond.input_parameters.rf_parameters import RFStation
+from blond.beam.beam import Beam, Proton
+from blond.beam.distributions import bigaussian
+from blond.trackers.tracker import RingAndRFTracker, FullRingAndRF
+from blond.trackers.utilities import action_from_potential_well, \
+    synchrotron_frequency_distribution
+
+
+class TestActionFromPotentialWell(unittest.TestCase):
+
+    def test_harmonic_well(self):
+        # U = a*t**2 gives closed ellipses, J = H / (2*sqrt(a*k))
+        a = 3.
+        k = 0.5
+        time_array = np.linspace(-1, 1, 10001)
+        potential_well = a * time_array**2
+        H_levels = np.linspace(0, 2.5, 50)
+
+        J_array = action_from_potential_well(time_array, potential_well,
+                                             H_levels, k)
+        J_expected = H_levels / (2*np.sqrt(a*k))
+
+        np.testing.assert_allclose(J_array, J_expected, rtol=1e-6,
+                                   atol=1e-9)
+
+    def test_levels_outside_well(self):
+        time_array = np.linspace(-1, 1, 1001)
+        potential_well = time_array**2 + 1.
+
+        J_array = action_from_potential_well(time_array, potential_well,
+                                             np.array([0., 0.5, 1.]), 1.)
+
+        np.testing.assert_array_equal(J_array, np.zeros(3))
+
+    def test_shape(self):
+        time_array = np.linspace(-1, 1, 1001)
+        potential_well = time_array**2
+
+        J_array = action_from_potential_well(time_array, potential_well,
+                                             np.ones((3, 4))*0.5, 1.,
+                                             n_levels_block=5)
+
+        self.assertEqual(J_array.shape, (3, 4))
+        np.testing.assert_allclose(J_array, 0.25, rtol=1e-4)
+
+    def test_pendulum_well(self):
+        # Potential well of a stationary bucket, compared to the brute force
+        # integration of each trajectory
+        time_array = np.linspace(-np.pi, np.pi, 20001)
+        potential_well = 1 - np.cos(time_array)
+        H_levels = np.linspace(0.01, 1.99, 20)
+
+        J_array = action_from_potential_well(time_array, potential_well,
+                                             H_levels, 1.)
+
+        J_expected = np.zeros(len(H_levels))
+        for i, H in enumerate(H_levels):
+            t_turn = np.arccos(1 - H)
+            t_fine = np.linspace(-t_turn, t_turn, 200001)
+            J_expected[i] = np.trapz(np.sqrt(np.maximum(
+                H - 1 + np.cos(t_fine), 0)), t_fine) / np.pi
+
+        np.testing.assert_allclose(J_array, J_expected, rtol=1e-5)
+
+
+class TestSynchrotronFrequencyDistribution(unittest.TestCase):
+
+    def test_double_rf(self):
+        # Reference values from the integration of each energy level on its
+        # own potential well; the single high resolution well agrees within
+        # 1% on fs (close to the separatrix) and 1e-6 eVs on the emittance
+        ring = Ring(6911.56, 1/18**2, 25.92e9, Proton(), 10)
+        rf_station = RFStation(ring, [4620, 18480], [0.9e6, 0.09e6],
+                               [0, np.pi], n_rf=2)
+        beam = Beam(ring, 20000, 1e11)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            bigaussian(ring, rf_station, beam, 1e-9, seed=1)
+        full_tracker = FullRingAndRF([RingAndRFTracker(rf_station, beam)])
+
+        sync_freq, emittance, delta_time, particle_freq, synchronous_time = \
+            synchrotron_frequency_distribution(beam, full_tracker)
+
+        indices = [0, 952, 1904, 2856, 3808, 4760]
+        sync_freq_expected = [
+            [345.653247423, 307.2463278052, 254.1982419737, 230.9387334567,
+             175.6393685489, 41.0787994393],
+            [345.653247423, 307.2463278052, 254.1982419737, 231.5514231735,
+             175.6386687672, 41.0075366111]]
+        emittance_expected = [
+            [0., 0.0224754624, 0.075557222, 0.154603407, 0.2326082609,
+             0.2643113868],
+            [0., 0.0224754624, 0.075557222, 0.1546038974, 0.2326079284,
+             0.2643113296]]
+        for side in range(2):
+            self.assertEqual(len(sync_freq[side]), 4761)
+            np.testing.assert_allclose(sync_freq[side][indices],
+                                       sync_freq_expected[side], rtol=1e-2)
+            np.testing.assert_allclose(emittance[side][indices],
+                                       emittance_expected[side], rtol=0,
+                                       atol=1e-6)
+            np.testing.assert_allclose(
+                delta_time[side][indices],
+                np.arange(6) * 4.9919179214e-10, rtol=1e-9, atol=1e-20)
+        self.assertAlmostEqual(float(synchronous_time), 2.496708048028915e-09,
+                               delta=1e-20)
+        self.assertEqual(len(particle_freq), beam.n_macroparticles)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
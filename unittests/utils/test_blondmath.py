@@ -478,11 +478,45 @@ class TestConvolve(unittest.TestCase):
 
     def test_convolve_2(self):
         s = np.random.randn(200)
-        k = np.random.randn(200)
+        k = np.random.randn(50)
+        for mode in ['same', 'valid']:
+            for method in ['direct', 'fft', 'overlap-add']:
+                np.testing.assert_almost_equal(
+                    bm.convolve(s, k, mode=mode, method=method),
+                    np.convolve(s, k, mode=mode), decimal=8)
+                np.testing.assert_almost_equal(
+                    bm.convolve(k, s, mode=mode, method=method),
+                    np.convolve(k, s, mode=mode), decimal=8)
         with self.assertRaises(RuntimeError):
-            bm.convolve(s, k, mode='same', )
+            bm.convolve(s, k, mode='circular')
         with self.assertRaises(RuntimeError):
-            bm.convolve(s, k, mode='valid')
+            bm.convolve(s, k, method='winograd')
+
+    def test_convolve_3(self):
+        s = np.random.randn(3000) + 1j*np.random.randn(3000)
+        k = np.random.randn(100) + 1j*np.random.randn(100)
+        for method in ['auto', 'direct', 'fft', 'overlap-add']:
+            np.testing.assert_almost_equal(
+                bm.convolve(s, k, mode='full', method=method),
+                np.convolve(s, k, mode='full'), decimal=8)
+        np.testing.assert_almost_equal(
+            bm.convolve(s.real, k, mode='same', method='overlap-add'),
+            np.convolve(s.real, k, mode='same'), decimal=8)
+
+    def test_convolve_4(self):
+        s = np.random.randn(5000)
+        k = np.random.randn(1000)
+        result = np.zeros(5999)
+        bm.convolve(s, k, result=result, method='fft')
+        np.testing.assert_almost_equal(result, np.convolve(s, k), decimal=8)
+        # Same kernel with another signal, transform taken from the cache
+        bm.convolve(s[::-1], k, result=result, method='fft')
+        np.testing.assert_almost_equal(result, np.convolve(s[::-1], k),
+                                       decimal=8)
+        # Kernel changed in place
+        k[10] += 1.
+        bm.convolve(s, k, result=result, method='fft')
+        np.testing.assert_almost_equal(result, np.convolve(s, k), decimal=8)
 
 
 class TestInterp(unittest.TestCase):
@@ -655,6 +689,60 @@ class TestSort(unittest.TestCase):
         np.testing.assert_equal(y, y2)
 
 
+class TestParticleKernels(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        self.dt = np.random.uniform(0, 2.5e-9, 1001)
+        self.dE = np.random.normal(0, 1e7, 1001)
+        self.voltage = np.array([[6e6, 6.1e6], [1e6, 1.1e6]])
+        self.omega_rf = np.array([[2.5e9, 2.5e9], [5e9, 5e9]])
+        self.phi_rf = np.array([[0.1, 0.2], [0.3, 0.4]])
+        self.kernels = bm.ParticleKernels()
+
+    def test_kick_drift(self):
+        dt, dE = self.dt.copy(), self.dE.copy()
+        for index in range(2):
+            bm.kick(dt, dE, self.voltage[:, index], self.omega_rf[:, index],
+                    self.phi_rf[:, index], -1., 2, 1e3)
+            bm.drift(dt, dE, b'exact', 2.3e-5, 1., 1, 3e-3, 0, 0, 3e-3, 0,
+                     0, 0.999, 26e9)
+            self.kernels.kick(self.dt, self.dE, self.voltage[:, index],
+                              self.omega_rf[:, index], self.phi_rf[:, index],
+                              -1., 2, 1e3)
+            self.kernels.drift(self.dt, self.dE, b'exact', 2.3e-5, 1., 1,
+                               3e-3, 0, 0, 3e-3, 0, 0, 0.999, 26e9)
+        np.testing.assert_array_equal(self.dt, dt)
+        np.testing.assert_array_equal(self.dE, dE)
+
+        # Rebound to other arrays
+        dt, dE = dt[:500].copy(), dE[:500].copy()
+        dE_reference = dE.copy()
+        bm.kick(dt, dE_reference, self.voltage[:, 0], self.omega_rf[:, 0],
+                self.phi_rf[:, 0], 1., 2, 0.)
+        self.kernels.kick(dt, dE, self.voltage[:, 0], self.omega_rf[:, 0],
+                          self.phi_rf[:, 0], 1., 2, 0.)
+        self.assertIs(self.kernels.dE, dE)
+        np.testing.assert_array_equal(dE, dE_reference)
+
+    def test_linear_interp_kick(self):
+        bin_centers = np.linspace(0, 2.5e-9, 100)
+        voltage = np.sin(1e9*bin_centers)
+        dE = self.dE.copy()
+        bm.linear_interp_kick(self.dt, dE, voltage, bin_centers, 1., 1e3)
+        self.kernels.linear_interp_kick(self.dt, self.dE, voltage,
+                                        bin_centers, 1., 1e3)
+        np.testing.assert_array_equal(self.dE, dE)
+
+    def test_checks(self):
+        with self.assertRaises(RuntimeError):
+            self.kernels.bind(self.dt[::2], self.dE[::2])
+        with self.assertRaises(RuntimeError):
+            self.kernels.bind(self.dt, self.dE[:-1])
+        with self.assertRaises(RuntimeError):
+            self.kernels.bind(self.dt.astype(np.float32), self.dE)
+
+
 if __name__ == '__main__':
 
     unittest.main()
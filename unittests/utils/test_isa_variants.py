@@ -0,0 +1,73 @@
+# coding: utf8
+# Copyright 2014-2017 CERN. This software is distributed under the
+# terms of the GNU General Public Licence version 3 (GPL Version 3),
+# copied verbatim in the file LICENCE.md.
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+# Project website: http://blond.web.cern.ch/
+
+"""
+Unittest for the instruction set variants of the compiled library
+
+"""
+
+import unittest
+import os
+import ctypes as ct
+import numpy as np
+
+import blond
+
+
+class TestISAVariants(unittest.TestCase):
+
+    def test_candidates(self):
+
+        avx512 = set(dict(blond.isa_variants)['avx512'])
+        self.assertEqual(blond.isa_candidates(set()), ['baseline'])
+        self.assertEqual(blond.isa_candidates({'sse2', 'avx2', 'fma'}),
+                         ['avx2', 'baseline'])
+        self.assertEqual(blond.isa_candidates(avx512),
+                         ['avx512', 'avx2', 'baseline'])
+        self.assertEqual(blond.isa_candidates(avx512, forced='baseline'),
+                         ['baseline'])
+        self.assertIn(blond.libblond_isa,
+                      blond.isa_candidates(blond.cpu_flags(),
+                                           os.environ.get('BLOND_ISA')))
+
+    def test_kick(self):
+
+        variants = [isa for isa in blond.isa_candidates(blond.cpu_flags())
+                    if isa != 'baseline' and
+                    os.path.isfile(blond.library_path(isa))]
+        if not variants:
+            self.skipTest('No instruction set variant of the library')
+
+        np.random.seed(0)
+        n_particles = 10001
+        dt = np.random.uniform(0, 2.5e-9, n_particles)
+        voltage = np.array([6e6, 1e6])
+        omega_rf = np.array([2.5e9, 5e9])
+        phi_rf = np.array([0.1, 0.2])
+
+        results = []
+        for isa in ['baseline'] + variants:
+            library = ct.CDLL(blond.library_path(isa))
+            dE = np.zeros(n_particles)
+            library.kick(dt.ctypes.data_as(ct.c_void_p),
+                         dE.ctypes.data_as(ct.c_void_p), ct.c_int(2),
+                         voltage.ctypes.data_as(ct.c_void_p),
+                         omega_rf.ctypes.data_as(ct.c_void_p),
+                         phi_rf.ctypes.data_as(ct.c_void_p),
+                         ct.c_int(n_particles), ct.c_double(1e3))
+            results.append(dE)
+
+        for dE in results[1:]:
+            np.testing.assert_allclose(dE, results[0], rtol=0,
+                                       atol=1e-9*np.max(np.abs(results[0])))
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,144 @@
+# coding: utf8
+# Copyright 2014-2017 CERN. This software is distributed under the
+# terms of the GNU General Public Licence version 3 (GPL Version 3),
+# copied verbatim in the file LICENCE.md.
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+# Project website: http://blond.web.cern.ch/
+
+"""
+Unittest for utils.parameter_scan
+
+"""
+
+import unittest
+import os
+import shutil
+import tempfile
+import warnings
+import h5py as hp
+import numpy as np
+
+from blond.input_parameters.ring import Ring
+from blond.input_parameters.rf_parameters import RFStation
+from blond.beam.beam import Beam, Proton
+from blond.beam.distributions import bigaussian
+from blond.trackers.tracker import RingAndRFTracker
+from blond.utils import bmath as bm
+from blond.utils.parameter_scan import ParameterScan
+
+
+def setup(ring, point):
+
+    rf_station = RFStation(ring, [4620], [point['voltage']], [0])
+    beam = Beam(ring, 2000, 1e11)
+    bigaussian(ring, rf_station, beam, point['sigma'], seed=1)
+    return [RingAndRFTracker(rf_station, beam).track]
+
+
+def record(track_map, turn):
+
+    beam = track_map[0].__self__.beam
+    beam.statistics()
+    return {'sigma_dt': beam.sigma_dt, 'dE': beam.dE[:3]}
+
+
+class TestParameterScan(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+        self.ring = Ring(6911.56, 1/18**2, 25.92e9, Proton(), 50)
+        self.points = ParameterScan.grid(voltage=[0.9e6, 2e6],
+                                         sigma=[1e-9, 1.5e-9])
+
+    def tearDown(self):
+
+        shutil.rmtree(self.directory)
+
+    def test_grid(self):
+
+        self.assertEqual(self.points, [
+            {'voltage': 0.9e6, 'sigma': 1e-9},
+            {'voltage': 0.9e6, 'sigma': 1.5e-9},
+            {'voltage': 2e6, 'sigma': 1e-9},
+            {'voltage': 2e6, 'sigma': 1.5e-9}])
+
+    def test_run(self):
+
+        results = []
+        for n_processes in [1, 3]:
+            filename = os.path.join(self.directory, 'scan%d' % n_processes)
+            scan = ParameterScan(setup, self.points, 50, record,
+                                 shared=self.ring, record_interval=20,
+                                 n_processes=n_processes)
+            scan.run(filename)
+
+            with hp.File(filename + '.h5', 'r') as h5file:
+                self.assertTrue(np.all(h5file['completed'][:]))
+                np.testing.assert_array_equal(h5file['turns'][:],
+                                              [0, 20, 40])
+                np.testing.assert_array_equal(h5file['parameters/voltage'],
+                                              [0.9e6, 0.9e6, 2e6, 2e6])
+                self.assertEqual(h5file['outputs/dE'].shape, (4, 3, 3))
+                results.append(h5file['outputs/sigma_dt'][:])
+
+        # Reference of one point tracked directly
+        track_map = setup(self.ring, self.points[3])
+        sigma_dt = [record(track_map, 0)['sigma_dt']]
+        for turn in range(1, 41):
+            track_map[0]()
+            if turn % 20 == 0:
+                sigma_dt.append(record(track_map, turn)['sigma_dt'])
+
+        # Equal up to the OpenMP reductions (one thread in the workers)
+        np.testing.assert_allclose(results[1], results[0], rtol=1e-12)
+        np.testing.assert_allclose(results[1][3], sigma_dt, rtol=1e-12)
+        self.assertNotEqual(results[1][0, -1], results[1][2, -1])
+
+    def test_threads_after_parent_openmp(self):
+
+        # OpenMP used by the parent with several threads before the fork
+        self.addCleanup(bm.set_num_threads, bm.get_num_threads())
+        bm.set_num_threads(2)
+        setup(self.ring, self.points[0])[0]()
+
+        filename = os.path.join(self.directory, 'scan_threads')
+        scan = ParameterScan(setup, self.points, 20, record,
+                             shared=self.ring, record_interval=20,
+                             n_processes=3, n_threads=2)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            scan.run(filename)
+        self.assertEqual(scan.n_threads, 2)
+        self.assertTrue(any('one OpenMP thread' in str(warning.message)
+                            for warning in caught))
+
+        with hp.File(filename + '.h5', 'r') as h5file:
+            self.assertTrue(np.all(h5file['completed'][:]))
+
+    def test_threads_serial(self):
+
+        # n_threads applies to the points tracked in this process, and the
+        # number of threads is restored afterwards
+        self.addCleanup(bm.set_num_threads, bm.get_num_threads())
+        bm.set_num_threads(1)
+
+        def record_threads(track_map, turn):
+            return {'n_threads': bm.get_num_threads()}
+
+        filename = os.path.join(self.directory, 'scan_serial_threads')
+        scan = ParameterScan(setup, self.points[:2], 20, record_threads,
+                             shared=self.ring, record_interval=20,
+                             n_processes=1, n_threads=2)
+        scan.run(filename)
+        self.assertEqual(bm.get_num_threads(), 1)
+
+        with hp.File(filename + '.h5', 'r') as h5file:
+            np.testing.assert_array_equal(h5file['outputs/n_threads'][:], 2)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
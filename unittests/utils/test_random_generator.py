@@ -0,0 +1,191 @@
+# coding: utf8
+# Copyright 2014-2017 CERN. This software is distributed under the
+# terms of the GNU General Public Licence version 3 (GPL Version 3),
+# copied verbatim in the file LICENCE.md.
+# In applying this licence, CERN does not waive the privileges and immunities
+# granted to it by virtue of its status as an Intergovernmental Organization or
+# submit itself to any jurisdiction.
+# Project website: http://blond.web.cern.ch/
+
+"""
+Unittest for the counter-based and quasi-random number generator
+
+"""
+
+import unittest
+import numpy as np
+
+from blond.utils import bmath as bm
+from blond.utils.random_generator import RandomGenerator
+from blond.input_parameters.ring import Ring
+from blond.input_parameters.rf_parameters import RFStation
+from blond.beam.beam import Beam, Proton, Positron
+from blond.beam.distributions import bigaussian
+from blond.beam.coasting_beam import generate_coasting_beam
+from blond.llrf.rf_noise import phase_noise_from_spectrum
+from blond.synchrotron_radiation.synchrotron_radiation import \
+    SynchrotronRadiation
+
+
+class TestRandomGenerator(unittest.TestCase):
+
+    def test_philox(self):
+
+        # Known answers of Philox4x32-10 (Random123), first two words
+        for key, counter, words in [(0, 0, (0x6627e8d5, 0xe169c58d)),
+                                    (2**64 - 1, 2**32 - 1,
+                                     (0x408f276d, 0x41c83b0e))]:
+            x = (words[0] << 21) ^ (words[1] >> 11)
+            index = -1 if counter else 0
+            u = bm.random_uniform(None, indices=[index], seed=key,
+                                  stream=counter, dimension=counter)
+            self.assertEqual(u[0], (x + 0.5) / 2**53)
+
+    def test_indices(self):
+
+        random_generator = RandomGenerator(seed=5, stream=2)
+        for sequence in ['philox', 'sobol', 'halton']:
+            random_generator.sequence = sequence
+            full = random_generator.normal(1000, dimension=1)
+            split = np.concatenate([random_generator.normal(300, 1),
+                                    random_generator.normal(700, 1, 300)])
+            np.testing.assert_array_equal(full, split)
+            indices = np.array([999, 3, 500])
+            np.testing.assert_array_equal(
+                random_generator.normal(dimension=1, indices=indices),
+                full[indices])
+
+    def test_threads(self):
+
+        random_generator = RandomGenerator(seed=5)
+        self.addCleanup(bm.set_num_threads, bm.get_num_threads())
+        bm.set_num_threads(1)
+        single = random_generator.normal(100001)
+        bm.set_num_threads(4)
+        multi = random_generator.normal(100001)
+        np.testing.assert_array_equal(single, multi)
+
+    def test_uniform(self):
+
+        for sequence in ['philox', 'sobol', 'halton']:
+            for seed in [None, 3]:
+                u = RandomGenerator(seed, sequence=sequence).uniform(
+                    4096, dimension=7)
+                self.assertTrue(np.all((u > 0) & (u < 1)))
+                self.assertAlmostEqual(np.mean(u), 0.5, delta=0.02)
+
+        # Streams and dimensions are independent
+        random_generator = RandomGenerator(seed=1)
+        self.assertLess(abs(np.corrcoef(
+            random_generator.uniform(10000),
+            random_generator.spawn(1).uniform(10000))[0, 1]), 0.05)
+        self.assertLess(abs(np.corrcoef(
+            random_generator.uniform(10000, 0),
+            random_generator.uniform(10000, 1))[0, 1]), 0.05)
+
+        with self.assertRaises(RuntimeError):
+            RandomGenerator(sequence='mersenne')
+
+    def test_arguments(self):
+
+        for sequence, dimension in [(3, 0), (-1, 0), (1, 8), (2, 8),
+                                    (0, -1), (0, 2**32)]:
+            for random in [bm.random_uniform, bm.random_normal]:
+                with self.assertRaises(ValueError):
+                    random(10, sequence=sequence, dimension=dimension)
+        self.assertEqual(len(bm.random_uniform(10, sequence=1,
+                                               dimension=7)), 10)
+        self.assertEqual(len(bm.random_normal(10, dimension=2**32 - 1)), 10)
+
+    def test_sobol(self):
+
+        try:
+            from scipy.stats import qmc
+        except ImportError:
+            self.skipTest('scipy.stats.qmc not available')
+
+        # Unscrambled Sobol points, from the second one
+        points = qmc.Sobol(8, scramble=False).random(1024)[1:]
+        random_generator = RandomGenerator(sequence='sobol')
+        random_generator.shift = False
+        for dimension in range(8):
+            np.testing.assert_allclose(
+                random_generator.uniform(1023, dimension) - 0.5 / 2**32,
+                points[:, dimension], rtol=0, atol=1e-15)
+
+        # Low-noise normal numbers
+        normal = random_generator.normal(4095)
+        self.assertAlmostEqual(np.mean(normal), 0, delta=1e-3)
+        self.assertAlmostEqual(np.std(normal), 1, delta=1e-2)
+
+
+class TestRandomConsumers(unittest.TestCase):
+
+    def setUp(self):
+
+        self.ring = Ring(6911.56, 1/18**2, 25.92e9, Proton(), 10)
+        self.rf_station = RFStation(self.ring, [4620], [0.9e6], [0])
+
+    def test_bigaussian(self):
+
+        beams = []
+        for stream in [0, 0, 1]:
+            beam = Beam(self.ring, 10000, 1e11)
+            bigaussian(self.ring, self.rf_station, beam, 1e-9,
+                       seed=RandomGenerator(seed=3, stream=stream))
+            beams.append(beam)
+        np.testing.assert_array_equal(beams[0].dt, beams[1].dt)
+        np.testing.assert_array_equal(beams[0].dE, beams[1].dE)
+        self.assertFalse(np.any(beams[0].dt == beams[2].dt))
+        self.assertAlmostEqual(np.std(beams[0].dt), 1e-9, delta=3e-11)
+
+    def test_coasting_beam(self):
+
+        beams = []
+        for sequence in ['philox', 'philox', 'halton']:
+            beam = Beam(self.ring, 10000, 1e11)
+            generate_coasting_beam(
+                beam, 0, 1e-6,
+                seed=RandomGenerator(seed=3, sequence=sequence))
+            beams.append(beam)
+        np.testing.assert_array_equal(beams[0].dt, beams[1].dt)
+        np.testing.assert_array_equal(beams[0].dE, beams[1].dE)
+        for beam in beams:
+            self.assertTrue(np.all((beam.dt >= 0) & (beam.dt <= 1e-6)))
+
+    def test_phase_noise(self):
+
+        freq = np.linspace(0, 1e3, 101)
+        spectrum = np.ones(101) * 1e-6
+        random_generator = RandomGenerator(seed=4)
+        noise = [phase_noise_from_spectrum(freq, spectrum, seed1, 7,
+                                           random_generator=random_generator)[1]
+                 for seed1 in [1, 1, 2]]
+        np.testing.assert_array_equal(noise[0], noise[1])
+        self.assertFalse(np.allclose(noise[0], noise[2]))
+
+    def test_synchrotron_radiation(self):
+
+        ring = Ring(110.4, 0.0082, 2.5e9, Positron(),
+                    synchronous_data_type='total energy', n_turns=2)
+        rf_station = RFStation(ring, 184, 800e3, 0, n_rf=1)
+
+        # The compiled and python routines use the same random numbers
+        beams = []
+        for python in [False, True]:
+            beam = Beam(ring, 1000, 1e9)
+            bigaussian(ring, rf_station, beam, 10e-12,
+                       seed=RandomGenerator(seed=1))
+            sync_rad = SynchrotronRadiation(
+                ring, rf_station, beam, 5.559, n_kicks=2, python=python,
+                seed=RandomGenerator(seed=2), shift_beam=False)
+            for turn in range(2):
+                sync_rad.track()
+            beams.append(beam)
+        np.testing.assert_allclose(beams[0].dE, beams[1].dE, rtol=1e-12,
+                                   atol=1e-6)
+
+
+if __name__ == '__main__':
+
+    unittest.main()